@@ -16,14 +16,17 @@ from random import randint
 import numpy as np
 from functools import partial
 from socketserver import TCPIPserver
+from asyncserver import AsyncTCPIPserver
 #from interpreter import message_interpreter (that's the old one)
 from JSONinterpreter import JSONread
-from fitterclass import GeneralFitter1D, PrefitterDialog
-from fitmodelclass import Fitmodel
+from commandbuilder import Command, Request
+from plottercore import PlotterCore
+from prefitterdialog import PrefitterDialog
+from renderscheduler import RenderScheduler
 from mathfunctions import fitmodels
 import helperfunctions
+import jsoncodec
 from typing import Optional, Tuple, List, Any, Union
-import socket
 
 pg.setConfigOptions(crashWarning=True)
 
@@ -50,6 +53,9 @@ class WorkerSignals(QtCore.QObject):
     request_to_main = QtCore.pyqtSignal(object)
     set_client_communication_socket = QtCore.pyqtSignal(object) # maybe the argument should be socket.socket, not sure now
     newdata = QtCore.pyqtSignal(str) # This is what apparently the spawned socket emits after parsing the data
+    newarrays = QtCore.pyqtSignal(object) # The columns dictionary of a binary array frame, with numpy arrays
+    newcommands = QtCore.pyqtSignal(object) # The Request (the Command tuples and where they came from) made from a message on the worker thread
+    commandsavailable = QtCore.pyqtSignal() # There are requests in the command queue, which were not there before
 
 class TCP_IP_Worker(QtCore.QRunnable):
     """
@@ -87,13 +93,18 @@ class TCP_IP_Worker(QtCore.QRunnable):
             exctype, value = sys.exc_info()[:2]
             self.signals.error.emit((exctype, value, traceback.format_exc()))
 
-class MainWindow(QtGui.QMainWindow):
+class MainWindow(QtGui.QMainWindow, PlotterCore):
+    """
+    The Qt front end of PlotterCore (see plottercore.py): it draws the curves and the fits,
+    and applies the commands from the network on the GUI thread
+    """
 
     # These are class variables, or effetively constants for our purposes
-    DEFINED_FITFUNCTIONS = ["sinewave","damped_sinewave","gaussian","curvepeak","linearfit","parabolicfit","resonancetrackingzero"]
-    MAX_NUM_CURVES = 50 # This is a large upper limit on the max number of curves that
-                        # can be plotted at the same time
+    # (DEFINED_FITFUNCTIONS, MAX_NUM_CURVES and the settings of the command queue are in PlotterCore)
     NUMPOINTS_CURVE_DENSE = 350
+    MAX_FRAMES_PER_SECOND = 30 # the curves are redrawn at most this many times per second
+    DECIMATION_MARGIN = 1. # a decimated curve is drawn this many view widths beyond the view on each side,
+                           # so that panning a bit does not show empty space before the next redraw
     PARAMETERS_doClear = JSONread.doClear_message_keys # This may seem 
     # strange, but it's done here not for checking whether 
     # parameters are correct, but rather to put these doClear options
@@ -101,6 +112,7 @@ class MainWindow(QtGui.QMainWindow):
 
     def __init__(self, aTCPIPserver):
 
+        # this also runs PlotterCore.__init__, which makes the curve store, the command queue, etc.
         super().__init__()
 
         maxthreads_threadpool = 5
@@ -114,26 +126,15 @@ class MainWindow(QtGui.QMainWindow):
         #multiple members during the fitting procedures
         """
 
-        self.yaxis_name : the basis for the attributes that will hold the data
-            on the vertical axis (Dependent variable)
-        self.err_name : the basis for the attributes that will hold the error values
-            bars for each point
         self.plot_line_name : the basis for the plot name, to be used with pyqtgraph
         self.errorbar_item_name : the basis for the objects of type ErrorbarItem"
             that pyqtgraph will use for plotting error bars
         self.pen_name : the basis for style container for the curves in pyqtgraph
         self.errorbar_pen_name : the basis for the style of the error bar marks
-        self.fitmodel_instance_name : this is a string holding the name of the fitmodel instance, which will have the data and the fit function in one data structure. 
-            we need a fitmodel_instance_name for every curve
         self.fitmethod_name : the name of the fit method to give to scipy.optimize. It could be least_squares, 
             differential_evolution, etc. Check scipy.optimize documentation
         
         """
-        # The numerical data inputs
-        self.xaxis_name = "x"
-        self.yaxis_name = "y"
-        self.err_name = "err"
-        
         # Other data for plotting and fitting each curve
         self.fit_cropbounds_name = "fitcropbounds"
         self.plot_line_name = "data_line"
@@ -142,12 +143,8 @@ class MainWindow(QtGui.QMainWindow):
         self.legend_item_name = "legend_item"
         self.pen_name = "pen"
         self.errorbar_pen_name = "errpen"
-        self.fitmodel_instance_name = "fitmodel"
 
-        self.all_instance_attribute_names = [self.xaxis_name,
-                self.yaxis_name,
-                self.err_name,
-                self.fit_cropbounds_name,
+        self.all_instance_attribute_names = [self.fit_cropbounds_name,
                 self.plot_line_name,
                 self.fitplot_line_name,
                 self.errorbar_item_name,
@@ -155,9 +152,6 @@ class MainWindow(QtGui.QMainWindow):
                 self.errorbar_pen_name,
                 self.fitmodel_instance_name]
 
-        self.all_config_names = ["axisLabels",
-                "plotTitle"] # we don't put the legends here because they kind of belong to individual curves
-
         self.legend_label_list = [] # processed in self._create_plotline
         self.legend_label_dict = {}
 
@@ -166,6 +160,10 @@ class MainWindow(QtGui.QMainWindow):
         self.arePlotsCleared = True
         self.prefitDialogWindow = None
 
+        # Incoming data only mark their curve as dirty, the scheduler redraws the dirty curves
+        # at most MAX_FRAMES_PER_SECOND times per second
+        self.render_scheduler = RenderScheduler(self._redraw_curve, self.MAX_FRAMES_PER_SECOND, parent=self)
+
         #================== Below is the stuff for building the GUI itslef
 
         # the main window is the one holding the plot, and some buttons below. 
@@ -181,6 +179,8 @@ class MainWindow(QtGui.QMainWindow):
         self.graphWidget.autoRange()
         # we set the legend here. The labels have to be set in the definitions of curves later in the code
         setattr(self, self.legend_item_name, self.graphWidget.addLegend())
+        # large curves are decimated according to the visible range, so they are redrawn when the view changes
+        self.graphWidget.getViewBox().sigXRangeChanged.connect(self._process_view_range_change)
         mainwindow_layout.addWidget(self.graphWidget)
 
         self.RegisterCurvesButton = QtGui.QPushButton("Reg. cv.")
@@ -260,14 +260,22 @@ class MainWindow(QtGui.QMainWindow):
         
         # Note that this listener_function_Qt is the one that 
         #has the while True loop to keep listening
+        # the requests wait in the bounded command queue of PlotterCore until the GUI thread takes them
+        self.attach_server(aTCPIPserver)
+
+        # While there are shared-memory rings of producers, the timer looks into them and puts their points into the curves
+        self.shared_memory_timer = QtCore.QTimer(self)
+        self.shared_memory_timer.timeout.connect(self._poll_shared_memory_rings)
         myTCP_IP_Worker = TCP_IP_Worker(aTCPIPserver.listener_function_Qt)
         #myTCP_IP_Worker_Twoway = TCP_IP_Worker(aTCPIPServerTwoway.listener_function_Twoway)
         myTCP_IP_Worker.signals.newdata.connect(self.interpret_message)
+        myTCP_IP_Worker.signals.newarrays.connect(self.plot_columns)
+        myTCP_IP_Worker.signals.newcommands.connect(self.apply_request)
+        myTCP_IP_Worker.signals.commandsavailable.connect(self.apply_queued_requests)
         myTCP_IP_Worker.signals.set_client_communication_socket.connect(self._register_client_communication_socket)
         #myTCP_IP_Worker_Twoway.signals.request_to_main.connect(self.process_fitresults_call)
         self.threadpool.start(myTCP_IP_Worker)
         #self.threadpool.start(myTCP_IP_Worker_Twoway)
-        self.client_communication_socket = None # This will be the socket to use for sending data to the client
 
     ###### End of __init__()
 
@@ -281,47 +289,6 @@ class MainWindow(QtGui.QMainWindow):
             callable_function(int(parameter_string_name))
 
 
-    def _register_client_communication_socket(self, socket_arg: socket.socket) -> bool:
-        if not isinstance(socket_arg,(socket.socket,type(None))):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_register_client_communication_socket"))
-            print(
-                "The argument you put into this function is not type socket.socket or None. Not doing anything")
-            return False
-        self.client_communication_socket = socket_arg
-        return True
-
-    def interpret_message(self,message: str) -> None:
-        """
-        Message is supposed to be a string. 
-        The result is a list of tuples. Each tuple has the form 
-        ("function name",argument)
-        """
-
-        # This should not be needed anymore, because we do not emit these messages anymore
-        #if (message == "Done") or (message == ""):
-        #    return None # This is because somehow socketserver.py sends these things.
-        # TODO: improve the socket server class
-
-        myJSONread = JSONread()
-        interpretation_result = myJSONread.parse_JSON_message(message)
-        # the line above produces a list of tuples form the JSON-RPC message
-
-        # IMPORTANT! Be careful with this because this is where the functions from the received
-        #JSON-RPC message get called, but they are not explicitly written with their names
-        # we use metaprogramming here all over the place with setattr and getattr functions
-
-        # the first element of the tuple is always the string name of the function to call
-        # the second element is always the parameter to feed into the function
-        for res in interpretation_result:
-            function_to_call = getattr(self,res[0],self.nofunction)
-            type(function_to_call)
-            function_to_call(res[1])
-        self.message_processed = True
-
-
-    def nofunction(self,verbatim_message: str) -> None:
-        print("Function interpreter.message_interpreter could not determine which function to call based on analyzing the transmitted message. Not calling any function. Here is the message that you transmitted (verbatim): {} \n".format(verbatim_message))
-
     # TODO: Get rid of this function and button correctly. They are registered immediately as they come in.
     def _register_available_curves(self) -> None:
         self.PlotNumberChoice.clear()
@@ -354,75 +321,50 @@ class MainWindow(QtGui.QMainWindow):
 
 
     def process_makefit_button(self) -> bool:
+        return self.perform_fit(int(self.PlotNumberChoice.currentText()))
+
+    def _make_fit(self, current_curve_number: int) -> bool:
 
         # If we are going to do the fit, we should close the prefit dialog window no matter what
         if self.prefitDialogWindow:
             self.prefitDialogWindow.close()
+        return super()._make_fit(current_curve_number)
 
-        current_curve_number = int(self.PlotNumberChoice.currentText())
-        # the next is the stringname of the current fit_model in use, this
-        # is then used in conjunction with getattr, setattr, etc.
-        fitmodel_instance_stringname = self.fitmodel_instance_name+"{:d}".format(current_curve_number)
-
-        # this is mostly for manual fitting, because then there is no remote commant sent "set_curve_number". so this needs to be done here
-        if not hasattr(self,fitmodel_instance_stringname):
-            self.set_curve_number(current_curve_number)
-        
-        # Now comes the fitting part
-        # 1) Create a fitter instance
-        currentFitter = GeneralFitter1D(getattr(self,fitmodel_instance_stringname))
-        # 2) setup fit
-        result_setupfit = currentFitter.setup_fit()
-
-        if result_setupfit is True:
-            # 3) perform the fit
-            result_dofit = currentFitter.do_fit()
-            if getattr(self,fitmodel_instance_stringname).result_objectivefunction == -1:
-                result_regularplot = False
-            else:
-                result_regularplot = True
-        else:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "process_makefit_button"))
-            print("setup_fit() function from the fitter class returned False. Fitting impossible. Not doing anything \n")
-            return False
-
-        if (result_dofit is True) and (result_regularplot is True):
+    def _show_fit_result(self, curvenumber: int, is_regular_result: bool) -> None:
+        """ Plots the fit through the points of the curve, and writes its result into the text box below the plot """
+        fitmodel_instance_stringname = self.fitmodel_instance_name+"{:d}".format(curvenumber)
+        if is_regular_result is True:
             # 4) If the fit result is good, according to the fitter message, we want to plot it
             if getattr(self,fitmodel_instance_stringname).is_fit_successful is True:
                 # Now we remove the original line connecting the points but replot
                 #the points themselves, and then plot the dashed line for the fit
                 #through the same point, in the same color as the points
-                measured_data_array = self.convert_to_numpy(
-                        getattr(self,self.xaxis_name+"{:d}".format(current_curve_number)),
-                            getattr(self,self.yaxis_name+"{:d}".format(current_curve_number)))
-
                 # clear the original plot
-                getattr(self,self.plot_line_name+"{:d}".format(current_curve_number)).clear()
+                getattr(self,self.plot_line_name+"{:d}".format(curvenumber)).clear()
                 # and make sure to clear the legend otherwise it will be repeated with every fit
-                getattr(self,self.legend_item_name).removeItem(getattr(self,self.plot_line_name+"{:d}".format(current_curve_number)))
+                getattr(self,self.legend_item_name).removeItem(getattr(self,self.plot_line_name+"{:d}".format(curvenumber)))
 
                 # set the data plotter to have no pen, so draw no line itself
-                setattr(self,self.plot_line_name+"{:d}".format(current_curve_number),
+                setattr(self,self.plot_line_name+"{:d}".format(curvenumber),
                         self.graphWidget.plot(symbol="o",
                         pen=pg.mkPen(None),
-                        name=self.legend_label_dict["curve{:d}".format(current_curve_number)],
-                        symbolBrush = pg.mkBrush(self.colorpalette[current_curve_number])))
+                        name=self.legend_label_dict["curve{:d}".format(curvenumber)],
+                        symbolBrush = pg.mkBrush(self.colorpalette[curvenumber])))
 
-                # replot the measured data points
-                # this setData below is a method of PlotDataItem
-                getattr(self,self.plot_line_name+"{:d}".format(current_curve_number)).setData(*measured_data_array[0:2])
+                # replot the measured data points, decimated as usual by the next redraw of the curve
+                self.render_scheduler.mark_dirty(curvenumber)
 
                 # if the fit plot aleady exists, clear it, because we don't want
                 #multiple plots piling up on each other
-                if hasattr(self,self.fitplot_line_name+"{:d}".format(current_curve_number)):
-                    getattr(self,self.fitplot_line_name+"{:d}".format(current_curve_number)).clear()
+                if hasattr(self,self.fitplot_line_name+"{:d}".format(curvenumber)):
+                    getattr(self,self.fitplot_line_name+"{:d}".format(curvenumber)).clear()
 
                 # finally make a fit plot line and plot the data to it
-                setattr(self,self.fitplot_line_name+"{:d}".format(current_curve_number),
+                setattr(self,self.fitplot_line_name+"{:d}".format(curvenumber),
                     self.graphWidget.plot(symbol=None,
-                        pen=getattr(self,"pen{:d}".format(current_curve_number)),
+                        pen=getattr(self,"pen{:d}".format(curvenumber)),
                         symbolBrush = pg.mkBrush(None)))
-                getattr(self,self.fitplot_line_name+"{:d}".format(current_curve_number)).setData(*self._generate_fit_dataset(fitmodel_instance_stringname))
+                getattr(self,self.fitplot_line_name+"{:d}".format(curvenumber)).setData(*self._generate_fit_dataset(fitmodel_instance_stringname))
 
                 #============= Ok by here we should be done with the actual plotting of the fit
 
@@ -431,54 +373,46 @@ class MainWindow(QtGui.QMainWindow):
                 self.TextBoxForOutput.setCurrentFont(QtGui.QFont("Helvetica",
                         pointSize=10,
                         weight = QtGui.QFont.Bold))
-                self.TextBoxForOutput.append("Curve {:d} {} fit results:".format(current_curve_number,
-                                            self.legend_label_dict["curve{:d}".format(current_curve_number)]))
+                self.TextBoxForOutput.append("Curve {:d} {} fit results:".format(curvenumber,
+                                            self.legend_label_dict["curve{:d}".format(curvenumber)]))
                 # Write a warning message if the error bars were wrong (so at least one was 0)
-                if getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).are_errorbars_correct is False:
-                    self.TextBoxForOutput.append("WARNING! Curve {:d} {}: you supplied wrong error bars! One of the error bars was 0. Error bars were ignored in the fit".format(current_curve_number,
-                        self.legend_label_dict["curve{:d}".format(current_curve_number)]))
-                for (key,val) in getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).result_paramdict.items():
+                if getattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber)).are_errorbars_correct is False:
+                    self.TextBoxForOutput.append("WARNING! Curve {:d} {}: you supplied wrong error bars! One of the error bars was 0. Error bars were ignored in the fit".format(curvenumber,
+                        self.legend_label_dict["curve{:d}".format(curvenumber)]))
+                for (key,val) in getattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber)).result_paramdict.items():
                     self.TextBoxForOutput.setCurrentFont(QtGui.QFont("Helvetica",
                         pointSize=10,
                         weight=QtGui.QFont.Normal))
                     self.TextBoxForOutput.append(key+" : "+"{:.06f}".format(val))
                 self.TextBoxForOutput.append("Objective function result" + " : " + \
-                    "{:.06f}".format(getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).result_objectivefunction))
-                return True
+                    "{:.06f}".format(getattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber)).result_objectivefunction))
             else:
                 self.TextBoxForOutput.setCurrentFont(QtGui.QFont("Helvetica",
                                                                  pointSize=10,
                                                                  weight=QtGui.QFont.Bold))
                 self.TextBoxForOutput.append(
-                    "Curve {:d} {} : Fit failed".format(current_curve_number,
-                                    self.legend_label_dict["curve{:d}".format(current_curve_number)]))
-                return True
-        elif (result_dofit is True) and (result_regularplot is False):
+                    "Curve {:d} {} : Fit failed".format(curvenumber,
+                                    self.legend_label_dict["curve{:d}".format(curvenumber)]))
+        else:
             # Now let's write the results of the fitting to an output
             #text box below the main plotting window
             self.TextBoxForOutput.setCurrentFont(QtGui.QFont("Helvetica",
                     pointSize=10,
                     weight = QtGui.QFont.Bold))
-            self.TextBoxForOutput.append("Curve {:d} {} fit results:".format(current_curve_number,
-                                        self.legend_label_dict["curve{:d}".format(current_curve_number)]))
-            for (key,val) in getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).result_paramdict.items():
+            self.TextBoxForOutput.append("Curve {:d} {} fit results:".format(curvenumber,
+                                        self.legend_label_dict["curve{:d}".format(curvenumber)]))
+            for (key,val) in getattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber)).result_paramdict.items():
                 self.TextBoxForOutput.setCurrentFont(QtGui.QFont("Helvetica",
                     pointSize=10,
                     weight=QtGui.QFont.Normal))
                 self.TextBoxForOutput.append(key+" : "+"{}".format(val))
-            return True
-        #this else condition will be used if the fit result is not a success
-        else:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "process_makefit_button"))
-            print("do_fit function failed in the fitter. Check other error messages")
-            return False
 
     # TODO Somehow prefit seems to not accept it when the initial parameter is set to 0. Check that out
     def process_prefit_button(self) -> bool:
         # get the current name of the fit function and the curve number to fit
         this_fitfunction_name = self.FitFunctionChoice.currentText()
         this_curve_number = int(self.PlotNumberChoice.currentText())
-        if not (hasattr(self,self.xaxis_name+"{:d}".format(this_curve_number)) and hasattr(self,self.yaxis_name+"{:d}".format(this_curve_number))):
+        if this_curve_number not in self.curvestore:
             print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "process_prefit_button"))
             print("The data for the curve that you are asking to prefit does not exist. You probably deleted it already. Not doing anything \n")
             return False
@@ -530,22 +464,6 @@ class MainWindow(QtGui.QMainWindow):
     def showdata(self,data):
         print(data)
 
-    def convert_to_numpy(self,*args,doSort=True):
-        """
-        This is a helper function which simply takes a list of arguments, 
-        where the inner lists are supposed to be convertible to numpy arrays, 
-        and converts them to numpy arrays, returning a list of numpy arrays 
-        """
-        if doSort: 
-            arr0 = np.array(args[0])
-            arr0_arguments = np.argsort(arr0)
-            result = [np.array(arg,dtype=float)[arr0_arguments] for arg in args]
-            return result
-        else:
-            result = [np.array(arg) for arg in args]
-            return result
-
-
     def _create_plotline(self,curvenumber: int) -> bool:
         """
         Just a helper function in order to create the plot line if it doesn't already
@@ -560,9 +478,7 @@ class MainWindow(QtGui.QMainWindow):
             self.legend_label_dict["curve{:d}".format(curvenumber)] = "c{:d}".format(curvenumber)
 
         # Now set all the attributes to make sure that the corresponding curve exists
-        setattr(self, self.xaxis_name + "{:d}".format(curvenumber),[])
-        setattr(self, self.yaxis_name + "{:d}".format(curvenumber),[])
-        setattr(self, self.err_name + "{:d}".format(curvenumber),[])
+        self.curvestore.create_curve(curvenumber)
         setattr(self, self.pen_name + "{:d}".format(curvenumber), 
                 pg.mkPen(color=self.colorpalette[curvenumber],
                 style=QtCore.Qt.DashLine))
@@ -580,6 +496,37 @@ class MainWindow(QtGui.QMainWindow):
         return True
         # TODO: Make sure to delete PlotNumberChoice entry when the clear command is issued
 
+    def _create_curve(self, curvenumber: int) -> None:
+        self._create_plotline(curvenumber)
+
+    def _show_curve(self, curvenumber: int) -> None:
+        self.render_scheduler.mark_dirty(curvenumber)
+
+    def _hold_display(self) -> None:
+        self.render_scheduler.hold()
+
+    def _release_display(self) -> None:
+        self.render_scheduler.release()
+
+    def _start_shared_memory_polling(self) -> None:
+        if not self.shared_memory_timer.isActive():
+            self.shared_memory_timer.start(self.SHARED_MEMORY_POLL_INTERVAL)
+
+    def _stop_shared_memory_polling(self) -> None:
+        self.shared_memory_timer.stop()
+
+    def _select_fit_function(self, fit_function_name: str) -> None:
+        self.FitFunctionChoice.setCurrentText(fit_function_name)
+
+    def _selected_fit_function(self) -> str:
+        return self.FitFunctionChoice.currentText()
+
+    def _select_fit_curve(self, curvenumber: int) -> None:
+        self.PlotNumberChoice.setCurrentText("{:d}".format(curvenumber))
+
+    def _selected_fit_curve(self) -> Optional[int]:
+        return int(self.PlotNumberChoice.currentText())
+
     def _clear_curve_data(self,curvenumber: int) -> bool:
         """
         This list self.all_instance_attribute_names should contain the string 
@@ -590,134 +537,80 @@ class MainWindow(QtGui.QMainWindow):
         # it cannot be removed just with delattr
         if hasattr(self,self.plot_line_name+"{:d}".format(curvenumber)):
             getattr(self,self.legend_item_name).removeItem(getattr(self,self.plot_line_name+"{:d}".format(curvenumber)))
+        # the plot items must also be taken out of the plot, otherwise they stay in the scene forever
+        for entry in [self.plot_line_name, self.fitplot_line_name, self.errorbar_item_name]:
+            if hasattr(self,entry+"{:d}".format(curvenumber)):
+                self.graphWidget.removeItem(getattr(self,entry+"{:d}".format(curvenumber)))
         for entry in self.all_instance_attribute_names:
             if hasattr(self,entry+"{:d}".format(curvenumber)):
                 delattr(self,entry+"{:d}".format(curvenumber))
-        return True
+        self.render_scheduler.discard(curvenumber)
+        return super()._clear_curve_data(curvenumber)
+
+
+    def _redraw_curve(self, curvenumber: int) -> None:
+        """
+        Gives the current data of the curve (and its error bars, if there are any) to the plot items
+        This is called by self.render_scheduler, not directly when the data come in
+
+        Curves with many more points than there are pixels are only drawn around the visible 
+        range, and if that range still has too many points, as the min/max per pixel column
+        """
+        if (curvenumber not in self.curvestore) or (not hasattr(self,self.plot_line_name+"{:d}".format(curvenumber))):
+            return # the curve was cleared after it was scheduled for redrawing
+        this_curve = self.curvestore[curvenumber]
+        # The curve store keeps every curve sorted by x, so no sorting is needed here
+        (xvals, yvals, yerrs) = (this_curve.x, this_curve.y, this_curve.err)
+        num_columns = int(self._num_pixel_columns() * (1. + 2.*self.DECIMATION_MARGIN))
+        if len(this_curve) > 2*num_columns:
+            (view_xmin, view_xmax) = self.graphWidget.getViewBox().viewRange()[0]
+            view_margin = self.DECIMATION_MARGIN * (view_xmax - view_xmin)
+            decimated_data = this_curve.decimated(view_xmin - view_margin, view_xmax + view_margin, num_columns)
+            if decimated_data is not None:
+                # the first and last points are always drawn so that auto-ranging still sees the whole curve
+                getattr(self, self.plot_line_name + "{:d}".format(curvenumber)).setData(
+                    np.concatenate([xvals[:1], decimated_data[0], xvals[-1:]]),
+                    np.concatenate([yvals[:1], decimated_data[1], yvals[-1:]]))
+                # error bars of millions of points cannot be seen anyway, they come back when zooming in
+                if hasattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)):
+                    getattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)).setVisible(False)
+                return
+            # Few enough points are visible to draw them as they are, together with one point on each
+            # side (so that the line goes on beyond the plot) and the first and last points of the curve
+            index_range = np.searchsorted(xvals, [view_xmin - view_margin, view_xmax + view_margin])
+            drawn_indices = np.unique(np.concatenate([[0, len(xvals) - 1],
+                np.arange(max(index_range[0] - 1, 0), min(index_range[1] + 1, len(xvals)))]))
+            xvals = xvals[drawn_indices]
+            yvals = yvals[drawn_indices]
+            if yerrs is not None:
+                yerrs = yerrs[drawn_indices]
+        # This is the case when the points come with error bars
+        if yerrs is not None:
+            # Every curve owns one single ErrorBarItem (which paints all its bars as one path).
+            # It is created with the first error bar and afterwards only updated with setData
+            if not hasattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)):
+                setattr(self, self.errorbar_item_name + "{:d}".format(curvenumber),
+                        pg.ErrorBarItem(x=xvals, y=yvals, top=yerrs, bottom=yerrs,
+                                        pen=getattr(self, self.errorbar_pen_name + "{:d}".format(curvenumber))))
+                self.graphWidget.addItem(getattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)))
+            else:
+                getattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)).setData(x=xvals, y=yvals, top=yerrs, bottom=yerrs)
+                getattr(self, self.errorbar_item_name + "{:d}".format(curvenumber)).setVisible(True)
+        getattr(self, self.plot_line_name + "{:d}".format(curvenumber)).setData(xvals, yvals)
 
+    def _num_pixel_columns(self) -> int:
+        """ The width of the plotting area in pixels, which is the number of columns for decimation """
+        return max(int(self.graphWidget.getViewBox().width()), 100)
 
-    # The next function is for real-time plotting of data points, 
-    #just as they come in through TCP/IP
-    # this is called directly from interpreter basically!
-    def plot_single_datapoint(self,plot_single_datapoint_arg: dict) -> bool:
+    def _process_view_range_change(self, *args) -> None:
         """
-        Plots a data point as it comes in from the client
-        
-        This function is for real-time plotting of data points, 
-        just as they come in through TCP/IP.
-        This is called directly from the signal-slot mechanism, and the function in 
-        JSONinterpreter.py that calls it is __parse_addData_message()
-                
-        Parameters
-        ----------
-        plot_single_datapoint_arg: dict
-            Required key-value pairs for each plot_single_datapoint_arg: 
-                "curvenumber":int (integer defining to which curve we will add the incoming point) 
-                "xval":float,int (the x-coordinate of the incoming point)
-                "yval":float,int (the y-coordinate of the incoming point)
-            Optional key-value pairs for each plot_single_datapoint_arg: 
-                "xerr":float,int (the horizontal error bar for the incoming point)
-                "yerr":float,int (the vertical error bar for the incoming point)
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
+        Schedules a redraw of all curves that might be decimated, because which 
+        points are drawn depends on the visible range
         """
-        
-        # =============== Data format check ================================
-        # We first have to check if the data format for this data point dictionary is correct
-        # if it is not, we don't plot anything
-        possible_datapoint_keys = ["curveNumber", "xval", "yval", "yerr", "xerr"]
-        critical_keys = ["curveNumber", "xval", "yval"]
-        if isinstance(plot_single_datapoint_arg,dict):
-            # First check that all keys supplied are legal
-            if not all([key in possible_datapoint_keys for key in plot_single_datapoint_arg.keys()]):
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("Some of the keys you supplied to dataPoint are not in the legal key list. Here is the legal key list: {}. Not doing anything".format(possible_datapoint_keys))
-                return False
-            # Now check that we have the absolutely necessary keys for plotting the point
-            if not all([crit_key in plot_single_datapoint_arg for crit_key in critical_keys]):
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("You must provide at least all of these keys {} to plot a point, but you didn't. Not plotting anything".format(
-                        critical_keys))
-                return False
-            # Now check that the curve number is an integer
-            if not isinstance(plot_single_datapoint_arg["curveNumber"],int):
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("You put a curve number that is not an integer. This is not allowed")
-                return False
-            # Now check that there are not more curves trying to be registered than the max allowed number
-            if plot_single_datapoint_arg["curveNumber"] >= self.MAX_NUM_CURVES:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("You put a curve number which is greater than MAX_NUM_CURVES, which is now set to {:d}. This is not allowed".format(self.MAX_NUM_CURVES))
-                return False
-
-            # Now check that the xval is either an intereg or a float
-            if not isinstance(plot_single_datapoint_arg["xval"],(int,float)):
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("Your xval is not numeric. This is not allowed")
-                return False
-            # Now check that the yval is either an integer or a float
-            if not isinstance(plot_single_datapoint_arg["yval"],(int,float)):
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                print("Your yval is not numeric. This is not allowed")
-                return False
-            # Now check if xerr, if it is given, is an integer or a float
-            if "xerr" in plot_single_datapoint_arg:
-                if not isinstance(plot_single_datapoint_arg["xerr"],(int,float)):
-                    print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                    print("Your xerr is not numeric. This is not allowed")
-                    return False
-                is_this_xerr_given = True
-            else:
-                is_this_xerr_given = False
-            # Now check if yerr, if it is given, is an integer or a float
-            if "yerr" in plot_single_datapoint_arg:
-                if not isinstance(plot_single_datapoint_arg["yerr"],(int,float)):
-                    print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-                    print("Your yerr is not numeric. This is not allowed")
-                    return False
-                is_this_yerr_given = True
-            else:
-                is_this_yerr_given = False
-
-            # ======= Done with syntax checking for the message =============
-            # If we made it to here, it means that the message into plot_single_datapoint is correct
-
-            this_curvenumber = plot_single_datapoint_arg["curveNumber"]
-            # This is the case when the plot line already exists
-            if not hasattr(self,self.plot_line_name+"{:d}".format(this_curvenumber)):
-                self._create_plotline(this_curvenumber)
-
-            getattr(self, self.xaxis_name + "{:d}".format(this_curvenumber)).append(plot_single_datapoint_arg["xval"])
-            getattr(self, self.yaxis_name + "{:d}".format(this_curvenumber)).append(plot_single_datapoint_arg["yval"])
-            # This is the case when the points come with error bars
-            if is_this_yerr_given is True:
-                getattr(self, self.err_name + "{:d}".format(this_curvenumber)).append(
-                    plot_single_datapoint_arg["yerr"])
-                arrays_toplot = self.convert_to_numpy(getattr(self,self.xaxis_name + "{:d}".format(this_curvenumber)),
-                                                      getattr(self,self.yaxis_name + "{:d}".format(this_curvenumber)),
-                                                      getattr(self,self.err_name + "{:d}".format(this_curvenumber)))
-                setattr(self, self.errorbar_item_name + "{:d}".format(this_curvenumber),
-                        pg.ErrorBarItem(x=arrays_toplot[0], y=arrays_toplot[1],
-                                        top=arrays_toplot[2], bottom=arrays_toplot[2],
-                                        pen=getattr(self, self.errorbar_pen_name + "{:d}".format(this_curvenumber))))
-                self.graphWidget.addItem(getattr(self, self.errorbar_item_name + "{:d}".format(this_curvenumber)))
-                getattr(self, self.plot_line_name + "{:d}".format(this_curvenumber)).setData(*arrays_toplot[0:2])
-            else:
-                arrays_toplot = self.convert_to_numpy(
-                    getattr(self, self.xaxis_name + "{:d}".format(this_curvenumber)),
-                    getattr(self, self.yaxis_name + "{:d}".format(this_curvenumber)))
-                getattr(self, self.plot_line_name + "{:d}".format(this_curvenumber)).setData(*arrays_toplot[0:2])
-            return True
-
-        else:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "plot_single_datapoint"))
-            print("You supplied something other than a dictionary as the function argument. Not doing anything")
-            return False
+        num_pixel_columns = self._num_pixel_columns()
+        for curvenumber in self.curvestore.curve_numbers():
+            if len(self.curvestore[curvenumber]) > 2*num_pixel_columns:
+                self.render_scheduler.mark_dirty(curvenumber)
 
 
     #========= Functions associated with doClear method
@@ -739,69 +632,11 @@ class MainWindow(QtGui.QMainWindow):
 
         """
         # NOTE: This function seems to work
-
-        # we first check that the argument is correct
-        if not isinstance(dummyargument,str):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_everything"))
-            print("You supplied something other than a string as the function argument. Not doing anything \n")
+        if not super().clear_everything(dummyargument):
             return False
-        # this is now to be able to receive the "all" option from the 
-        # GUI without causing errors
-        if dummyargument == "all": 
-            dummyargument = ""
-        if len(dummyargument.strip()) > 0: 
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_everything"))
-            print("You supplied a non-empty sring as the function argument. Not doing anything. You must supply an empty string for this to work \n")
-            return False
-        self.clear_data("all")
-        self.clear_config("all")
         self.graphWidget.clear()
         return True
 
-    def clear_data(self,clear_data_arg: Union[int,str]) -> bool:
-        """
-        Remove a particular unit of data from memory. By definition this also clears the plot, otherwise it would be weird to clear the data from memory but retain the plot corresponding to those data
-        
-        Clears whatever curve is asked, meaning the original data, fits. It also runs _register_available_curves
-        at the end so as to make sure that the remaining curves are correctly registered and available for 
-        further processing 
-        
-        Parameters
-        ----------
-        clear_data_arg: int, str
-            If str, it must be "all", which will clear all curves
-            If int, it's the curve number that one wants to clear
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-        if not isinstance(clear_data_arg, (int,str)):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_data"))
-            print("You supplied something other than an integer or string as the function argument. Not doing anything \n")
-            return False
-
-        if clear_data_arg == "all":
-            self.clear_plot(clear_data_arg) # We first have to clear the plots in this case
-            for idx in range(self.MAX_NUM_CURVES):
-                self._clear_curve_data(idx)
-            self._register_available_curves() # This has to be called anytime curves are deleted
-            #self.graphWidget.autoRange() # TODO Not sure if this works
-            return True
-
-        if not isinstance(clear_data_arg,int):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_data"))
-            print(
-                "You supplied something other than all or integer into clear_data. This command cannot be performed \n")
-            return False
-        self.clear_plot(clear_data_arg)
-        self._clear_curve_data(clear_data_arg)
-        self._register_available_curves() # This will clear out the plot number choice box, and then register again what's left
-        return True
-
     def clear_plot(self,clear_plot_arg: Union[int,str]):
         """
         
@@ -831,6 +666,7 @@ class MainWindow(QtGui.QMainWindow):
         # all of these have to be cleared appropriately
         if clear_plot_arg == "all": 
             for idx in range(self.MAX_NUM_CURVES):
+                self.render_scheduler.discard(idx)
                 if hasattr(self,self.plot_line_name+"{:d}".format(idx)):
                     getattr(self,self.plot_line_name+"{:d}".format(idx)).clear()
                 if hasattr(self,self.fitplot_line_name+"{:d}".format(idx)):
@@ -846,6 +682,7 @@ class MainWindow(QtGui.QMainWindow):
             return False
         
         # if we made it to here, this means that the clear_plot_arg is an integer
+        self.render_scheduler.discard(clear_plot_arg)
         if hasattr(self,self.plot_line_name+"{:d}".format(clear_plot_arg)):
             getattr(self,self.plot_line_name+"{:d}".format(clear_plot_arg)).clear()
         else:
@@ -885,9 +722,10 @@ class MainWindow(QtGui.QMainWindow):
         if clear_replot_arg == "all":
             for idx in range(self.MAX_NUM_CURVES):
                 if hasattr(self,self.plot_line_name+"{:d}".format(idx)):
-                    getattr(self,self.plot_line_name+"{:d}".format(idx)).setData(*self.convert_to_numpy(getattr(self,self.xaxis_name+"{:d}".format(idx)),getattr(self,self.yaxis_name+"{:d}".format(idx))))
+                    # the points are drawn by the next redraw, decimated if there are too many
+                    self.render_scheduler.mark_dirty(idx)
                 if hasattr(self,self.fitplot_line_name+"{:d}".format(idx)):
-                    getattr(self,self.fitplot_line_name+"{:d}".format(idx)).setData(*self._generate_fit_dataset(fitmodel_instance_name+"{:d}".format(idx)))
+                    getattr(self,self.fitplot_line_name+"{:d}".format(idx)).setData(*self._generate_fit_dataset(self.fitmodel_instance_name+"{:d}".format(idx)))
                 if hasattr(self,self.errorbar_item_name+"{:d}".format(idx)):
                     getattr(self,self.errorbar_item_name+"{:d}".format(idx)).setData(pen=getattr(self,self.errorbar_pen_name+"{:d}".format(idx))) 
 
@@ -901,51 +739,17 @@ class MainWindow(QtGui.QMainWindow):
         
         # if we made it to here, this means that the clear_replot_arg is an integer
         if hasattr(self,self.plot_line_name+"{:d}".format(clear_replot_arg)):
-            getattr(self,self.plot_line_name+"{:d}".format(clear_replot_arg)).setData(*self.convert_to_numpy(getattr(self,self.xaxis_name+"{:d}".format(clear_replot_arg)),getattr(self,self.yaxis_name+"{:d}".format(clear_replot_arg))))
+            self.render_scheduler.mark_dirty(clear_replot_arg)
         else:
             print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "clear_replot"))
             print("You requested to clear a non-existing plot. Doing nothing \n")
         if hasattr(self,self.fitplot_line_name+"{:d}".format(clear_replot_arg)):
-            getattr(self,self.fitplot_line_name+"{:d}".format(clear_replot_arg)).setData(*self._generate_fit_dataset(fitmodel_instance_name+"{:d}".format(clear_replot_arg)))
+            getattr(self,self.fitplot_line_name+"{:d}".format(clear_replot_arg)).setData(*self._generate_fit_dataset(self.fitmodel_instance_name+"{:d}".format(clear_replot_arg)))
         if hasattr(self,self.errorbar_item_name+"{:d}".format(clear_replot_arg)):
             getattr(self,self.errorbar_item_name+"{:d}".format(clear_replot_arg)).setData(pen=getattr(self,self.errorbar_pen_name+"{:d}".format(clear_replot_arg))) 
         
         return True
 
-    def clear_config(self,clear_config_arg: str) -> bool:
-        """
-        Removes plot configurations
-        
-        Parameters
-        ----------
-        clear_config_arg: str
-            If str is "all", it will clear the axis labels and the plot title
-            
-            In the future, the goal is to implement clearing axis labels and title separately
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-        if not isinstance(clear_config_arg, str):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_config"))
-            print("You supplied something other than a string as the function argument. Not doing anything \n")
-            return False
-        if clear_config_arg == "all":
-            for entry in self.all_config_names:
-                getattr(self,"set_"+helperfunctions.replace_capitals_by_underscorelowercase(entry))("")
-            return True
-        elif clear_config_arg in self.all_config_names:
-            getattr(self,"set_"+helperfunctions.replace_capitals_by_underscorelowercase(entry))("")
-            return True
-        else:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_config"))
-            print("Your argument into this function is not all or a name of the configuration that can be cleared, such as plotTitle, or axisLabels. Not doing anything \n")
-            return False
-
     #End of functions associated with doClear
     #=========================================          
 
@@ -1055,48 +859,17 @@ class MainWindow(QtGui.QMainWindow):
             print("The parameter that you gave into set_plot_legend is not a dictionary. This is not allowed, not doing anything \n")
             return False
 
-    def set_fit_function(self,fit_function_name: str) -> bool:
+    def set_max_frames_per_second(self,max_fps_arg: Union[int,float]) -> bool:
         """
-        Sets the fit function to use in case fitting is called, based on its string name. 
-        The fit function must be defined in fitmodels.py
-                
-        Parameters
-        ----------
-        fit_function_name: str
-            For example it could be "gaussian" or "sinewave", etc. 
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
+        Sets the maximum number of times per second that the curves are redrawn. 
+        If drawing takes longer than the time available for one frame, the actual
+        frame rate goes down automatically, and it comes back up to this maximum
+        when drawing is fast again
         
-        """
-        if isinstance(fit_function_name,str):
-            if fit_function_name in self.DEFINED_FITFUNCTIONS:
-                self.FitFunctionChoice.setCurrentText(fit_function_name)
-                #current_curvenumber = int(self.PlotNumberChoice.currentText())
-                #current_fitmodel = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber))
-                #current_fitmodel.fitfunction_name = fit_function_name
-                return True
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_function"))
-                print("Fit function name {} is not defined \n".format(fit_function_name))
-                return False
-        else: #else the fit function name is not a string, this doesn't work
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_function"))
-            print("You set a fit function name which is not a string. This is not allowed \n")
-            return False
-
-    def set_curve_number(self,curvenumber_arg: int) -> bool:
-        """
-        Sets the curve number to be used in this particular iteration of doFit. 
-        This will then determine the curve which is fitted, and consequently for which 
-        the fit parameters will be given, also possibly cropping, etc. 
-                
         Parameters
         ----------
-        curvenumber_arg: int
+        max_fps_arg: int, float
+            The maximum frame rate, must be at least RenderScheduler.MIN_FPS
             
         Returns
         -------
@@ -1105,381 +878,7 @@ class MainWindow(QtGui.QMainWindow):
             Check error messages for explanations of errors
         
         """
-        
-        # The goal of this function is to check if the corresponding
-        # curve number exists, and if it does, then it will 
-        # make an instance of Fitmodel class and fill in x values, 
-        # y values, and possibly the error bar values in that instance
-
-
-        # First, we check if the curve number is sensible
-        if not isinstance(curvenumber_arg,int):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
-            print("The curve number parameter must be an integer. What you supplied is this: {}. Not setting curve number".format(curvenumber_arg))
-            return False
-        if curvenumber_arg < 0:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
-            print("You supplied a negative curve number: {}. This is not allowed, not setting any curve number".format(curvenumber_arg))
-            return False
-        if not hasattr(self,self.xaxis_name+"{:d}".format(curvenumber_arg)):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
-            print("You are asking for curve number {} which does not exist in the data. Fitting is impossible".format(
-                curvenumber_arg))
-            return False
-
-        self.PlotNumberChoice.setCurrentText("{:d}".format(curvenumber_arg))
-        setattr(self,
-                self.fitmodel_instance_name + "{:d}".format(curvenumber_arg),
-                Fitmodel(fitfunction_name=self.FitFunctionChoice.currentText(),
-                         x_axis_vals=getattr(self, self.xaxis_name + "{:d}".format(curvenumber_arg)),
-                         measured_data=getattr(self, self.yaxis_name + "{:d}".format(curvenumber_arg)),
-                         errorbars_data=getattr(self, self.err_name + "{:d}".format(curvenumber_arg), None)
-                         )
-                )
-        return True
-
-    def set_starting_parameters(self,supplied_startparams_dict: dict) -> bool:
-        """
-        Sets the starting parameters for the fitter to be called in this iteration of doFit.  
-                
-        Parameters
-        ----------
-        supplied_startparams_dict: dict
-            The key:value pairs are always in the form str:float,int where the key 
-            is exactly the string name of the parameter defined in the fitting function 
-            in fitmodels.py, and the value is the number giving the starting values of that 
-            parameter for the fitter.
-            
-            Whatever parameters from the fit model are not specified will be handled 
-            by the automatic parameter estimation routine (which, OK, could be good or bad)
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-    
-        # Check if the supplied starting parameters is a dictionary
-        if not isinstance(supplied_startparams_dict, dict):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters"))
-            print("You put something other than a dictionary for the starting parameters. This is not allowed \n")
-            return False
-        # Check if the values in this dictionary are all numbers (int or float) 
-        if not all([isinstance(val,(int,float)) for val in supplied_startparams_dict.values()]):
-            print("Message from Class {} function {}".format(self.__class__.__name__, "set_starting_parameters"))
-            print("You supplied something other than numbers for startparameters values. This is not allowed \n")
-            return False
-
-        # this current_curvenumber should have been registered before with the curve number parameter
-        # TODO: Check this bug. Apparently it crashes when the fit model has not been registered
-        current_curvenumber = int(self.PlotNumberChoice.currentText())
-        for (key,value) in supplied_startparams_dict.items():
-            if key in getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict.keys():
-                getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict[key] = value
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters"))
-                print("Warning: your supplied key {} is not among the model parameter keys \n".format(key))
-        return True
-   
-    def set_starting_parameters_limits(self, supplied_startparams_lim_dict: dict) -> bool:
-        """
-        Sets the limits on teh starting parameters for the fitter to be 
-        called in this iteration of doFit.  
-                
-        Parameters
-        ----------
-        supplied_startparams_lim_dict: dict
-            The key:value pairs are always in the form str:list where the key 
-            is exactly the string name of the parameter defined in the fitting function 
-            in fitmodels.py, and the value is a list of two either numbers (can be float
-            or integer)
-            
-            Whatever limits are not specified will be filled in by the automatic estimation 
-            routine
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-        # check if all startparam limits are dictionaries
-        if not isinstance(supplied_startparams_lim_dict, dict):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
-            print("You put something other than a dictionary for the starting parameters limits. This is not allowed")
-            return False
-        # check if all values in these dictionaries are lists
-        if not all([isinstance(val,list) for val in supplied_startparams_lim_dict.values()]):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
-            print("You supplied something other than lists for start param limit values. This is not allowed")
-            return False
-        # check if 
-        if not all([(len(val) == 2) for val in supplied_startparams_lim_dict.values()]):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
-            print("Some of your supplied lists for start param limits are not of length 2.")
-            return False
-        
-        # this current_curvenumber should have been registered before with the curve number parameter
-        current_curvenumber = int(self.PlotNumberChoice.currentText())
-        current_startparamdict = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict
-        for (key,value) in supplied_startparams_lim_dict.items():
-            # Check if the key is in param dict for model and if
-            # the values in the list are numbers
-            if (key in current_startparamdict) and all([isinstance(q,(int,float)) for q in value]):
-                if (value[0] <= current_startparamdict[key]) and (value[1] >= current_startparamdict[key]):
-                    getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_bounds_paramdict[key] = value
-                else:
-                    print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
-                    print("The lower bound must be below the initial value and the upper bounds must be above the initial value. It's not the case now. Not setting this supplied key-value pair for bounds: {}".format((key,value)))
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
-                print("Your supplied key is not among the model parameter keys or your put something other than numbers as the values for limits. Not setting this key-value pair for bounds: {}".format((key,value)))
-        return True
-
-
-    def set_crop_limits(self,croplimits_arg: list) -> bool: 
-        """
-        Sets the crop tuple that will be used as limits for fitting. Remember that this
-        will not remove the points from the plot! This will only make sure that the 
-        points beyond the cropping region are not counted in the fit
-                
-        Parameters
-        ----------
-        croplimits_arg: list
-            The list of two values (numbers, so int or float). Remember to always specify two values. 
-            The left one must be smaller than the right one. Also, one can specify -inf or inf for the 
-            left and right limit respectively in order to basically not cut off any data for sure. 
-            
-            This entry is optional, if one doesn't give it, all data for a give curve 
-            are used
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-
-        # make sure that croplimits is a list
-        if not isinstance(croplimits_arg, list):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
-            print("You put something other than a list as crop limits. This is not allowed, not setting any crop limits \n")
-            return False
-        # Check if the list contains two elements and if they are numbers
-
-        croplimits_arg = [np.inf if q == "inf" else q for q in croplimits_arg]
-        croplimits_arg = [-np.inf if q == "-inf" else q for q in croplimits_arg]
-
-        if not (len(croplimits_arg) == 2 and all([isinstance(q,(int,float)) for q in croplimits_arg])):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
-            print("Either the length of your crop limits argument is not 2 or the values you put in are not numbers. This is not allowed, not setting any crop limits. Here is what you put in: {}".format(croplimits_arg))
-            return False
-        # Make sure that the first crop limit is strictly smaller than 
-        # the second one
-        if not croplimits_arg[0] < croplimits_arg[1]:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
-            print("The first crop limit must always be smaller than the second crop limit. It's not the case now, not setting any crop limits. Here is what you put in: {}".format(croplimits_arg))
-            return False
-
-        # this curve number should be registered by now
-        current_curve_number = int(self.PlotNumberChoice.currentText())
-        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).crop_bounds_list = croplimits_arg
-        return True
-    
-    def set_fit_method(self,fitmethod_arg: str) -> bool:
-        """
-        Sets the minimization method from scipy.optimize library that will be used for fitting. 
-        
-        
-        Refer to the documentation of scipy.optimize for details. Have a look also in fitterclass.py
-        to see what exactly has been implemented at any given time, because this data is used in 
-        the do_fit() method of GeneralFitter1D class
-        
-        This function does not check whether the supplied fit (minimization)
-        method actually exists in scipy.optimize! It's up to the user 
-        to make sure to not supply nonsense fit methods, or to check 
-        this further downstream in fitting
-                
-        Parameters
-        ----------
-        fitmethod_arg: str
-            The name of the fitting method to use. It wraps the scipy.optimize methods 
-            Currently we have "minimize", "least_squares", "basinhopping", "differential_evolution", 
-            "shgo", "dual_annealing". "brute_force" is not implemented            
-            
-            If not given, it will default to "least_squares"
-            
-            This function does not check whether the supplied fit (minimization)
-            method actually exists in scipy.optimize! It's up to the user 
-            to make sure to not supply nonsense fit methods, or to check 
-            this further downstream in fitting
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-        # we check that the fit method is actually a string
-        if not isinstance(fitmethod_arg, str):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_method"))
-            print("You put something other than a string for fit method. This is not allowed. If other settings are OK, the fitter used will be least_squares")
-            return False
-        
-        current_curve_number = int(self.PlotNumberChoice.currentText())
-        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).minimization_method_str = fitmethod_arg
-        return True
-
-    def set_fitter_options(self,fitteroptions_arg: dict) -> bool:      
-        """
-        Feeds the options (as keyword arguments) to scipy.optimize algorithm
-        
-        Refer to the documentation of scipy.optimize for details. Note that this program does not check 
-        whether these options actually make sense for the given scipy.optimize algorithm, it's 
-        up to the user to check that out
-                        
-        Parameters
-        ----------
-        fitteroptions_arg: dict
-            The dictionary is passed directly to the scipy.optimize method as keyword arguments. 
-            
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-        
-        """
-        
-        # we check that the fit method is actually a dictionary
-        if not isinstance(fitteroptions_arg, dict):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fitter_options"))
-            print("You put something other than a dictionary for fitter options. This is not allowed. Not setting any fitter options")
-            return False
-        
-        current_curve_number = int(self.PlotNumberChoice.currentText())
-        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).fitter_options_dict = fitteroptions_arg
-        return True
-        
-    def set_monte_carlo_runs(self,montecarloruns_dict_arg: dict) -> bool:
-        """
-        This sets up the self.monte_carlo_inputs dictionary for the fitmodel 
-        and it has to be then 
-        processed with GeneralFitter1D, I think
-        """
-        # make sure that montecarloruns_dict_arg is a dict
-        if not isinstance(montecarloruns_dict_arg, dict):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
-            print("You put something other than a dict to specify Monte Carlo runs. This is not allowed, not doing any Monte Carlo in fitting")
-            return False
-        
-        current_curve_number = int(self.PlotNumberChoice.currentText())                
-        start_paramdict_fitmodel = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).start_paramdict
-        
-        for suppliedkey in montecarloruns_dict_arg.keys():
-            # check if the parameters supplied for Monte Carlo fitting correspond to the parameter names for the fit model
-            # If not, ignore those parameters
-            if suppliedkey not in start_paramdict_fitmodel.keys():
-                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
-                print("The parameter name {} that you supplied is not among the parameter names for this fitmodel. Ignoring this parameter".format(suppliedkey))
-                continue
-            # check if for each parameter, the number of Monte Carlo runs is an integer
-            if not isinstance(montecarloruns_dict_arg[suppliedkey], int):
-                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
-                print("For parameter {} in Monte Carlo, you supplied a non-integer number of runs. This is not allowed, ignoring this parameter".format(suppliedkey))
-                continue
-            # Check if for each parameter, the number of Monte Carlo runs is not less than 1 (it's meaningless to have less than 1 Monte Carlo run)
-            if montecarloruns_dict_arg[suppliedkey] < 1:
-                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
-                print("For parameter {} in Monte Carlo, the number of runs you supplied is less than 1. This is not allowed, ignoring this parameter".format(suppliedkey))
-                continue
-            # If we made it to here, everything is good, and we can save the Monte Carlo setting for this fit parameter    
-            getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).monte_carlo_inputs[suppliedkey] = montecarloruns_dict_arg[suppliedkey]
-        return True
-
-    # This function does the fitting
-    def set_perform_fitting(self,emptystring: str) -> bool:
-        """
-        Runs the fitter
-
-        Parameters
-        ----------
-        emptystring: str
-            As specified, this must be an empty string, and it is ignored. It's here
-            only for consistency with all other functions
-
-        Returns
-        -------
-        bool
-            True if the function finished correctly, False, if there was an error
-            Check error messages for explanations of errors
-
-        """
-        self.process_makefit_button()
-        return True
-
-    def get_fit_result(self, arg_int: int) -> bool:
-        
-        if not isinstance(arg_int, int):
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-            print(
-                "Your curve number is not an integer. This is not allowed. Not returning any results \n")
-            if self.client_communication_socket is not None:
-                error_string_back = helperfunctions.create_JSONRPC_errormessage(-32602,"Curve number not an integer")
-                helperfunctions.send_TCPIP_message(self.client_communication_socket,error_string_back,True)
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-                print(
-                    "Client communication socket unavailable. Not sending any results to the client \n")
-            return False
-
-        if not hasattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)):
-            if self.client_communication_socket is not None:
-                error_string_back = helperfunctions.create_JSONRPC_errormessage(-32602,"Curve does not have a fitmodel")
-                helperfunctions.send_TCPIP_message(self.client_communication_socket,error_string_back,True)
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-                print(
-                    "Client communication socket unavailable. Not sending any results to the client \n")
-            return False
-
-        if getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).is_fit_done is False:
-            if self.client_communication_socket is not None:
-                error_string_back = helperfunctions.create_JSONRPC_errormessage(-32000,"Fit not done")
-                helperfunctions.send_TCPIP_message(self.client_communication_socket,error_string_back,True)
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-                print(
-                    "Client communication socket unavailable. Not sending any results to the client \n")
-            return False
-
-        if getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).is_fit_successful is False:
-            if self.client_communication_socket is not None:
-                error_string_back = helperfunctions.create_JSONRPC_errormessage(-32000,"Fit not successful")
-                helperfunctions.send_TCPIP_message(self.client_communication_socket,error_string_back,True)
-            else:
-                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-                print(
-                    "Client communication socket unavailable. Not sending any results to the client \n")
-            return False
-
-        results_dict = getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).result_paramdict
-        results_dict["costfunction"] = getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).result_objectivefunction
-        result_string_back = helperfunctions.create_JSONRPC_responsemessage(results_dict)
-        if self.client_communication_socket is not None:
-            helperfunctions.send_TCPIP_message(self.client_communication_socket, result_string_back, True)
-            return True
-        else:
-            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
-            print(
-                "Client communication socket unavailable. Not sending any results to the client \n")
-            return False
-
+        return self.render_scheduler.set_max_fps(max_fps_arg)
 
     def buttonHandler(self,textmessage="blahblahblah"): # we can get the arguments in using functools.partial, or better take no arguments
         print(textmessage)
@@ -1487,6 +886,7 @@ class MainWindow(QtGui.QMainWindow):
     def closeEvent(self,event):
         if self.prefitDialogWindow:
             self.prefitDialogWindow.close()
+        self.release_resources()
 
 def runPlotter(sysargs):
 
@@ -1495,7 +895,15 @@ def runPlotter(sysargs):
     
     # this is the server for one-way communication, no responses
     PORT = 5757
-    myServer = TCPIPserver(HOST,PORT)
+    # with --jsoncodec=<name>, the JSON codec is chosen instead of the fastest one installed (see jsoncodec.py)
+    for sysarg in sysargs:
+        if sysarg.startswith("--jsoncodec="):
+            jsoncodec.set_default_codec(sysarg[len("--jsoncodec="):])
+    # with --async, many clients can be connected at the same time
+    if "--async" in sysargs:
+        myServer = AsyncTCPIPserver(HOST,PORT)
+    else:
+        myServer = TCPIPserver(HOST,PORT)
     myServer.reportedLengthMessage = True
     
     # We want to call this server for two-way communication to send back
@@ -1508,6 +916,12 @@ def runPlotter(sysargs):
     app = QtWidgets.QApplication(sysargs)
     #w = MainWindow(myServer,myServerTwoway)
     w = MainWindow(myServer)
+    # with --queuepolicy=<block, coalesce or drop> and --queuesize=<number>, the command queue is configured
+    for sysarg in sysargs:
+        if sysarg.startswith("--queuepolicy="):
+            w.command_queue.set_policy(sysarg[len("--queuepolicy="):])
+        if sysarg.startswith("--queuesize="):
+            w.command_queue.set_policy(w.command_queue.policy, int(sysarg[len("--queuesize="):]))
     #w.show()
     app.exec_()
     if w.prefitDialogWindow:
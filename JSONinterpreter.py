@@ -6,7 +6,7 @@ Created on Mon Aug 24 14:27:15 2020
 """
 
 import re
-import json
+import jsoncodec
 from typing import Union, Optional, Tuple, List, Any
 from helperfunctions import replace_capitals_by_underscorelowercase as repcap
 
@@ -21,7 +21,7 @@ class JSONread():
     # method = STRING data, or config, or getresult, or something else
     # params = DICT with keys being for example which function needs to be called or what sort of data it is, and the value is the corresponding 
 
-    method_keys = ["doClear","setConfig","addData","doFit","getFitResult","getConfig"]
+    method_keys = ["doClear","setConfig","addData","doFit","getFitResult","getConfig","subscribe","unsubscribe"]
     # There are the possible values to go with the "method" key in JSON
 
     """
@@ -40,10 +40,15 @@ class JSONread():
     # options to put as params keys for setConfig method
     setConfig_message_keys = ["axisLabels",
         "plotTitle",
-        "plotLegend"]
+        "plotLegend",
+        "maxFramesPerSecond",
+        "retention",
+        "ramBudget",
+        "compressionThreshold",
+        "sharedMemoryRing"]
 
     # options to put as params keys for addData method
-    addData_message_keys = ["dataPoint","pointList"]
+    addData_message_keys = ["dataPoint","pointList","columns"]
 
     # options to put as params keys for doFit method
     # Order is important!
@@ -62,7 +67,13 @@ class JSONread():
     getFitResult_message_keys = ["curveNumber"]
 
     # options to put as params keys for getConfig method
-    getConfig_message_keys = [] # this is not defined yet
+    getConfig_message_keys = ["commandQueue","compression"] # the value of each key is ignored
+
+    # options to put as params keys for subscribe method, events is required
+    subscribe_message_keys = ["events","curveNumbers"]
+
+    # options to put as params keys for unsubscribe method, without events the connection is unsubscribed from all events
+    unsubscribe_message_keys = ["events"]
 
     error_return = [("nofunction","")]
 
@@ -82,9 +93,38 @@ class JSONread():
         if at any step the processing fails, the thing sends error_return defined above downstream. That's just designed to not
         let the program crash, but rather to send a well-defined error input that will be appropriately ignored further
 
+        The message can also be a JSON-RPC 2.0 batch, so an array of requests. Then the output is
+        ("begin_batch", number of requests), and for each request ("begin_request", id of the request)
+        followed by the commands of that request, and at the end ("end_batch", ""). The main program
+        applies all of them in one go, and answers with one batch response
+        """
+        return self.parse_JSON_request(message)[1]
+
+    def parse_JSON_request(self,message: str) -> Tuple[Optional[int],List[Tuple[str,Optional[Any]]]]:
+        """
+        The same as parse_JSON_message, but also returns the id of the request, so that the
+        response can be tagged with it. The id is None for a batch (each of its requests
+        has its id in its begin_request) and for a message that is not a correct request
+        """
+        message_object = jsoncodec.loads(message)
+        if isinstance(message_object, list):
+            return (None, self.__parse_batch(message_object))
+        request_id = message_object.get("id") if isinstance(message_object, dict) else None
+        if not isinstance(request_id, int):
+            request_id = None
+        return (request_id, self.__parse_message_object(message_object, self.__check_JSON_object(message_object), message))
+
+    def __parse_message_object(self, message_object: Any, check_result: Tuple[bool,Optional[dict]],
+                               message: Optional[str] = None) -> List[Tuple[str,Optional[Any]]]:
+        """
+        Steps 2 and 3 of parse_JSON_message, for one single request that was already decoded and
+        checked with __check_JSON_object. message is the received string, if there is one; the
+        requests of a batch do not have their own, so theirs is only made for the error message
         """
-        (success,dictresult) = self.__check_JSON(message)
+        (success,dictresult) = check_result
         if success is False:
+            if message is None:
+                message = jsoncodec.dumps(message_object)
             print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
                 self.__class__.__name__,"parse_JSON_message"))
             print("Your message apparently does not conform to JSON-RPC 2.0 format. Here is the message that you sent, verbatim: {:s}. Sending nofunction downstread".format(message))
@@ -102,14 +142,38 @@ class JSONread():
         result_for_downstream = callable_for_downstream(dictresult)
         return result_for_downstream
 
+    def __parse_batch(self, batch: list) -> List[Tuple[str,Optional[Any]]]:
+        """
+        Parses every request of a JSON-RPC 2.0 batch. A request that is not correct gives
+        ("begin_request", None) and nofunction, so it is answered with an error, as the standard says
+        """
+        if len(batch) == 0:
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                self.__class__.__name__,"__parse_batch"))
+            print("Your batch is an empty array. Sending nofunction downstream")
+            return JSONread.error_return
+        output = [("begin_batch",len(batch))]
+        for message_object in batch:
+            check_result = self.__check_JSON_object(message_object)
+            (success,dictresult) = check_result
+            output.append(("begin_request",dictresult["id"] if success else None))
+            output.extend(self.__parse_message_object(message_object, check_result))
+        output.append(("end_batch",""))
+        return output
+
     def __check_JSON(self, message: str) -> Tuple[bool,Optional[dict]]:
-        message_dictionary = json.loads(message)
         """
         Get a message string in JSON format and check if it conforms with JSON-RPC 2.0 standard
         Return tuple, first element is True/False, second element is dictionary parsed from JSON
         """
+        return self.__check_JSON_object(jsoncodec.loads(message))
+
+    def __check_JSON_object(self, message_dictionary: Any) -> Tuple[bool,Optional[dict]]:
+        """ The same as __check_JSON, for a message that was already decoded """
         # first we check that everything conforms to json_prc 2.0 standard
-        if set(message_dictionary.keys()) != set(JSONread.jsonrpc2_keys):
+        if not isinstance(message_dictionary,dict):
+            return (False,None)
+        elif set(message_dictionary.keys()) != set(JSONread.jsonrpc2_keys):
             return (False,None)
         elif message_dictionary["jsonrpc"] != "2.0":
             return (False,None)
@@ -193,7 +257,10 @@ class JSONread():
         Note! This does not check params in the exact sequence as defined in addData_message_keys
         
         The first element in the output tuple (so the name of the function to call) 
-        is "plot_single_datapoint"
+        is "plot_single_datapoint" for a dataPoint, and "plot_point_batch" for a pointList. 
+        The whole pointList goes into one single call, so that it is checked in one pass
+        and every curve is redrawn only once. The columns key gives "plot_columns", 
+        with the dictionary of the columns passed as is
         """
         params_dict = messagedict["params"] # the input that came via JSON
         #output = [] # The output list of tuples that will be returned
@@ -216,7 +283,9 @@ class JSONread():
         if params_dict.get("dataPoint"): # if this evaluates to True, is means that this key is given, so we are sending a single data point
             return [("plot_single_datapoint",params_dict["dataPoint"])]
         elif params_dict.get("pointList"):
-            return [("plot_single_datapoint",single_dict) for single_dict in params_dict["pointList"]]
+            return [("plot_point_batch",params_dict["pointList"])]
+        elif params_dict.get("columns"):
+            return [("plot_columns",params_dict["columns"])]
         else:
             print("Something is really strange in Module {:s}; we should not have come to this line".format(__name__))
             return JSONread.error_return
@@ -270,6 +339,73 @@ class JSONread():
                     list(params_dict.keys())))
         return output
 
+    def __parse_getConfig_message(self,messagedict: dict) -> List[Tuple[str,Any]]:
+        params_dict = messagedict["params"]  # the input that came via JSON
+        output = []  # The output list of tuples that will be returned
+        for keystring in JSONread.getConfig_message_keys:  # check out the list of all possible keys to get
+            if keystring in params_dict.keys():
+                output.append(("get_"+repcap(keystring), params_dict[keystring]))
+                params_dict.pop(keystring)
+        if not output:  # this will evaluate to False if output is empty
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                                                                                self.__class__.__name__,
+                                                                                "__parse_getConfig_message"))
+            print("Parsed configuration message is empty. Calling nofunction")
+            output = JSONread.error_return
+        if params_dict:  # this will evaluate to True if params_dict is not empty
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                                                                                self.__class__.__name__,
+                                                                                "__parse_getConfig_message"))
+            print(
+                """There were keys sent via JSON in params dictionary that are not understood. 
+                Here's that was not understood: {}""".format(
+                    list(params_dict.keys())))
+        return output
+
+    def __parse_subscribe_message(self,messagedict: dict) -> List[Tuple[str,Any]]:
+        """
+        Unlike the other methods, all keys go to one function call, subscribe, as a dictionary,
+        because the curve numbers belong to the events that are subscribed to
+        """
+        params_dict = messagedict["params"]  # the input that came via JSON
+        subscribe_arg = {}
+        for keystring in JSONread.subscribe_message_keys:
+            if keystring in params_dict.keys():
+                subscribe_arg[keystring] = params_dict.pop(keystring)
+        if "events" not in subscribe_arg:
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                                                                                self.__class__.__name__,
+                                                                                "__parse_subscribe_message"))
+            print("The events to subscribe to are missing. Calling nofunction")
+            output = JSONread.error_return
+        else:
+            output = [("subscribe", subscribe_arg)]
+        if params_dict:  # this will evaluate to True if params_dict is not empty
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                                                                                self.__class__.__name__,
+                                                                                "__parse_subscribe_message"))
+            print(
+                """There were keys sent via JSON in params dictionary that are not understood. 
+                Here's that was not understood: {}""".format(
+                    list(params_dict.keys())))
+        return output
+
+    def __parse_unsubscribe_message(self,messagedict: dict) -> List[Tuple[str,Any]]:
+        params_dict = messagedict["params"]  # the input that came via JSON
+        unsubscribe_arg = {}
+        for keystring in JSONread.unsubscribe_message_keys:
+            if keystring in params_dict.keys():
+                unsubscribe_arg[keystring] = params_dict.pop(keystring)
+        if params_dict:  # this will evaluate to True if params_dict is not empty
+            print("Message from Module {:s}, Class {:s} function {:s} :".format(__name__,
+                                                                                self.__class__.__name__,
+                                                                                "__parse_unsubscribe_message"))
+            print(
+                """There were keys sent via JSON in params dictionary that are not understood. 
+                Here's that was not understood: {}""".format(
+                    list(params_dict.keys())))
+        return [("unsubscribe", unsubscribe_arg)]
+
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio version of the TCP/IP server, which serves many clients at the same time.
+
+TCPIPserver stays in clientsocket_parser until its client sends 00000000, so a
+second client that connects in the meantime has to wait. AsyncTCPIPserver runs
+an asyncio event loop on its own thread, with one stream reader per connection,
+so any number of long-lived connections are read at the same time. The parsed
+messages go into a bounded, thread-safe queue.Queue, and listener_function_Qt (which runs
+in the TCP_IP_Worker thread, as for TCPIPserver) takes them out of the queue and
+emits them to the GUI with the usual worker signals.
+
+The message format is the same as for TCPIPserver: an 8 character preamble with
+the length of the JSON message, binary array frames, compressed frames, and 00000000
+to end the session, or the binary framing of framing.py after the hello preamble.
+"""
+import asyncio
+import concurrent.futures
+import jsoncodec
+import compression
+import framing
+import queue
+from threading import Thread, Event
+from typing import Optional
+from socketserver import TCPIPserver
+from helperfunctions import create_JSONRPC_errormessage, BINARY_FRAME_MARKER, MAX_BINARY_FRAME_POINTS
+
+
+class AsyncConnection():
+    """
+    Stands in for the client socket in the GUI: the GUI sends the fit results
+    with sendall, and the data are written to the connection by the event loop thread.
+    As sendall of a socket, sendall waits until the data are written (until the buffer
+    of the connection drained), so a client that reads slowly slows down the sender
+    instead of making the buffer grow without limit
+    """
+    DRAIN_POLL_INTERVAL = 0.5 # seconds between two looks whether the event loop still runs
+
+    def __init__(self, writer: asyncio.StreamWriter, event_loop: asyncio.AbstractEventLoop):
+        self.writer = writer
+        self.event_loop = event_loop
+
+    def sendall(self, data: bytes) -> None:
+        """ Raises an OSError (ConnectionError) if the connection was lost while writing """
+        if self.event_loop.is_closed():
+            return
+        written = asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self.event_loop)
+        while True:
+            try:
+                return written.result(timeout=self.DRAIN_POLL_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                # when the server stops, the event loop does not run the write anymore
+                if self.event_loop.is_closed() or not self.event_loop.is_running():
+                    written.cancel()
+                    return
+
+    def is_closing(self) -> bool:
+        return self.event_loop.is_closed() or self.writer.is_closing()
+
+    async def _write(self, data: bytes) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(data)
+            await self.writer.drain()
+
+
+class AsyncTCPIPserver(TCPIPserver):
+    NUM_BYTES_PREAMBLE = 8
+    # when this many parsed messages wait for listener_function_Qt, the connections are not read
+    # until there is space again, so that the clients are slowed down by TCP
+    MESSAGE_QUEUE_SIZE = 64
+
+    def __init__(self,HOST,PORT,buffersize=65536,numconnections=5):
+        super().__init__(HOST,PORT,buffersize=buffersize,numconnections=numconnections)
+        # each entry is (name of the worker signal, connection, argument), None makes listener_function_Qt return.
+        # set_client_communication_socket entries carry the connection that was closed
+        self.message_queue = queue.Queue(maxsize=self.MESSAGE_QUEUE_SIZE)
+        # set by listener_function_Qt when it takes an entry while connections wait for space in the queue
+        self.queue_has_space: Optional[asyncio.Event] = None
+        self.num_waiting_puts = 0
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.event_loop_thread: Optional[Thread] = None
+        self.num_open_connections = 0
+
+    def start(self) -> None:
+        """ Starts the event loop thread, which accepts and reads all connections """
+        if self.event_loop_thread is not None:
+            return
+        self.serversocket.listen(self.numconnections)
+        self.serversocket.setblocking(False)
+        self.event_loop = asyncio.new_event_loop()
+        self.queue_has_space = asyncio.Event()
+        is_serving = Event()
+        self.event_loop_thread = Thread(target=self._run_event_loop, args=(is_serving,), daemon=True)
+        self.event_loop_thread.start()
+        is_serving.wait()
+
+    def stop(self) -> None:
+        """ Closes all connections, stops the event loop thread and makes listener_function_Qt return """
+        if self.event_loop_thread is not None:
+            self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+            self.event_loop_thread.join()
+            self.event_loop_thread = None
+        self.message_queue.put(None)
+
+    def _run_event_loop(self, is_serving: Event) -> None:
+        asyncio.set_event_loop(self.event_loop)
+        server = self.event_loop.run_until_complete(
+            asyncio.start_server(self._connection_handler, sock=self.serversocket))
+        is_serving.set()
+        self.event_loop.run_forever()
+        # we get here after stop(): the connections still open are cancelled
+        server.close()
+        pending_tasks = asyncio.all_tasks(self.event_loop)
+        for task in pending_tasks:
+            task.cancel()
+        self.event_loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
+        self.event_loop.close()
+
+    async def _connection_handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        print("Received connection from port {}".format(writer.get_extra_info("peername")))
+        connection = AsyncConnection(writer, self.event_loop)
+        self.num_open_connections += 1
+        try:
+            if self.reportedLengthMessage is True:
+                isParserSuccess = await self._stream_parser(reader, connection)
+            else:
+                # the client closes the connection after sending the full message
+                message_bytes = await reader.read()
+                await self._put_message(("newdata", None, message_bytes.decode(encoding = "utf-8")))
+                isParserSuccess = True
+            if isParserSuccess is False:
+                print(
+                    """
+                    Message from Class {:s} function _connection_handler:
+                    _stream_parser returned False.
+                    Check the messages that you are sending to it via TCP/IP.
+                    """.format(self.__class__.__name__)
+                )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            print("Message from Class {:s} function _connection_handler: the client closed the connection in the middle of a message".format(
+                self.__class__.__name__))
+        finally:
+            self.num_open_connections -= 1
+            writer.close()
+
+    async def _stream_parser(self, reader: asyncio.StreamReader, connection: AsyncConnection, encoding = "utf-8") -> bool:
+        """
+        Reads the messages of one connection until the client sends 00000000,
+        the same way as clientsocket_parser, and puts them into the message queue
+        """
+        while True:
+            try:
+                preamble_str = (await reader.readexactly(self.NUM_BYTES_PREAMBLE)).decode(encoding = encoding)
+                # Binary array frames have a letter instead of the first digit
+                if preamble_str.startswith(BINARY_FRAME_MARKER):
+                    header_bytes = await reader.readexactly(int(preamble_str[1:]))
+                    header_dict = jsoncodec.loads(header_bytes.decode(encoding = encoding))
+                    if not self._check_binary_frame_header(header_dict, MAX_BINARY_FRAME_POINTS):
+                        raise ValueError("Illegal binary frame")
+                    payload = await reader.readexactly(self._binary_frame_payload_length(header_dict))
+                    await self._put_message(("newarrays", connection, self._binary_frame_columns(header_dict, payload)))
+                    continue
+                # The hello preamble switches the connection to the binary framing for the rest of the session
+                if preamble_str.startswith(framing.HELLO_MARKER):
+                    frame_version = framing.negotiated_version(preamble_str)
+                    if frame_version is None:
+                        raise ValueError("Illegal hello preamble")
+                    connection.writer.write(framing.hello_preamble(frame_version).encode(encoding = encoding))
+                    self.response_framings[connection] = frame_version
+                    return await self._framed_stream_parser(reader, connection, frame_version, encoding)
+                # Compressed frames have the marker of their codec instead of the first digit
+                compressor = compression.get_compressor_for_marker(preamble_str[0])
+                if compressor is not None:
+                    compressed_bytes = await reader.readexactly(int(preamble_str[1:]))
+                    message_string = compressor.decompress(compressed_bytes).decode(encoding = encoding)
+                    self.response_compressions[connection] = compressor.name
+                    await self._put_message(("newdata", connection, message_string))
+                    continue
+                message_length = int(preamble_str)
+            except (ValueError, UnicodeDecodeError):
+                print(
+                    """Message from Class {:s} function _stream_parser:
+                    number of bytes of message cannot be converted to integer.
+                    Not reading any messages and not doing anything.""".format(self.__class__.__name__))
+                # we are on the event loop thread here, so the error message is written directly
+                connection.writer.write(self._preamble_message(create_JSONRPC_errormessage(-32000, "Illegal preamble"), encoding))
+                await connection.writer.drain()
+                await self._put_message(("set_client_communication_socket", connection, None))
+                return False
+            if message_length == 0: # this signifies that communication is finished in this session
+                await self._put_message(("set_client_communication_socket", connection, None))
+                return True
+            message_bytes = await reader.readexactly(message_length)
+            await self._put_message(("newdata", connection, message_bytes.decode(encoding = encoding)))
+
+    async def _framed_stream_parser(self, reader: asyncio.StreamReader, connection: AsyncConnection,
+                                    frame_version: int, encoding = "utf-8") -> bool:
+        """ Reads the frames of framing.py until the end frame, the same way as framed_parser """
+        message_assembler = framing.MessageAssembler()
+        while True:
+            try:
+                header = framing.unpack_header(await reader.readexactly(framing.HEADER_NBYTES))
+                (payload, compression_name) = framing.decompress_payload(header, await reader.readexactly(header.length))
+                if compression_name is not None:
+                    self.response_compressions[connection] = compression_name
+                message = message_assembler.add(header, payload)
+                if message is None: # more chunks of the message are to come
+                    continue
+                if message[0] == framing.FRAME_TYPE_END:
+                    await self._put_message(("set_client_communication_socket", connection, None))
+                    return True
+                (signal_name, argument) = self._frame_entry(message[0], message[1], encoding)
+            except (ValueError, UnicodeDecodeError) as error:
+                print("Message from Class {:s} function _framed_stream_parser: the frame is not correct ({}). Not reading any more frames.".format(
+                    self.__class__.__name__, error))
+                error_encoded = create_JSONRPC_errormessage(-32000, "Illegal frame").encode(encoding = encoding)
+                connection.writer.write(framing.pack_header(framing.FRAME_TYPE_MESSAGE, len(error_encoded), version = frame_version) + error_encoded)
+                await connection.writer.drain()
+                await self._put_message(("set_client_communication_socket", connection, None))
+                return False
+            await self._put_message((signal_name, connection, argument))
+
+    async def _put_message(self, queue_entry: tuple) -> None:
+        """
+        Puts the entry into the message queue. While the queue is full, this waits until
+        listener_function_Qt takes an entry, and the other connections are read in the meantime
+        """
+        while True:
+            try:
+                self.message_queue.put_nowait(queue_entry)
+                return
+            except queue.Full:
+                pass
+            # counted before trying again, so that an entry taken after this try sets the event
+            self.num_waiting_puts += 1
+            self.queue_has_space.clear()
+            try:
+                self.message_queue.put_nowait(queue_entry)
+                return
+            except queue.Full:
+                await self.queue_has_space.wait()
+            finally:
+                self.num_waiting_puts -= 1
+
+    def _notify_queue_has_space(self) -> None:
+        """ Wakes up the connections that wait in _put_message, called by listener_function_Qt """
+        if self.num_waiting_puts == 0:
+            return
+        try:
+            self.event_loop.call_soon_threadsafe(self.queue_has_space.set)
+        except RuntimeError:
+            pass # the event loop is closed already
+
+    def _preamble_message(self, message_string: str, encoding = "utf-8") -> bytes:
+        message_encoded = message_string.encode(encoding = encoding)
+        return "{:08d}".format(len(message_encoded)).encode(encoding = encoding) + message_encoded
+
+    def listener_function_Qt(self,workersignals):
+        """
+        Starts the event loop thread, and then emits the messages from all connections
+        in the order in which they were parsed, until stop() is called
+        """
+        self.start()
+        print("TCPIP server waiting for connections")
+        last_emitted_connection = None
+        while True:
+            queue_entry = self.message_queue.get()
+            self._notify_queue_has_space()
+            if queue_entry is None:
+                return
+            (signal_name, connection, argument) = queue_entry
+            if signal_name == "set_client_communication_socket":
+                # a connection was closed: the responses go nowhere now, unless another connection
+                # sent the last message, whose client then still gets them
+                if connection is last_emitted_connection:
+                    workersignals.set_client_communication_socket.emit(None)
+                    last_emitted_connection = None
+                continue
+            # the responses to messages whose origin is not known go back to the client that sent the last message
+            if connection is not last_emitted_connection:
+                workersignals.set_client_communication_socket.emit(connection)
+                last_emitted_connection = connection
+            if signal_name == "newdata":
+                # the parsing is done here, on the worker thread, and not on the event loop thread
+                self._emit_message(argument, workersignals, connection)
+            else:
+                self._emit_columns(argument, workersignals, connection)
+
+    def __del__(self):
+        if (self.event_loop_thread is not None) and (self.event_loop is not None) and (not self.event_loop.is_closed()):
+            self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+        self.serversocket.close()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the TCP/IP servers with many producers that are connected at the same time.
+
+NUM_PRODUCERS local clients connect at once, and each of them sends NUM_MESSAGES
+addData messages and then 00000000. The server is run without the GUI, the worker
+signals only count what was emitted. For each server we print the total time, the
+message rate, and how long the slowest producer waited until its first message was
+delivered (with TCPIPserver, the producers are served one after the other).
+
+Run with: python benchmark_asyncserver.py [num_producers] [num_messages]
+"""
+import sys
+import json
+import socket
+import threading
+import time
+from socketserver import TCPIPserver
+from asyncserver import AsyncTCPIPserver
+from helperfunctions import send_TCPIP_message
+
+NUM_PRODUCERS = 32
+NUM_MESSAGES = 500
+NUM_POINTS_PER_MESSAGE = 10
+MAX_WAIT_AFTER_PRODUCERS = 5. # seconds
+
+
+class CountingSignal():
+    def __init__(self, on_emit = None):
+        self.num_emitted = 0
+        self.on_emit = on_emit
+    def emit(self, value):
+        self.num_emitted += 1
+        if self.on_emit is not None:
+            self.on_emit(value)
+
+class CountingWorkerSignals():
+    def __init__(self, on_newdata):
+        self.newdata = CountingSignal(on_newdata)
+        self.newarrays = CountingSignal()
+        self.set_client_communication_socket = CountingSignal()
+
+
+def make_message(producer_number: int, message_number: int) -> str:
+    point_list = [{"curveNumber": producer_number % 50, "xval": message_number + 0.1*idx, "yval": float(idx)}
+                  for idx in range(NUM_POINTS_PER_MESSAGE)]
+    return json.dumps({"jsonrpc": "2.0", "method": "addData", "params": {"pointList": point_list},
+                       "id": producer_number})
+
+def run_producer(address, producer_number: int, num_messages: int, start_barrier: threading.Barrier):
+    messages = [make_message(producer_number, message_number) for message_number in range(num_messages)]
+    start_barrier.wait()
+    client = socket.create_connection(address)
+    try:
+        for message in messages:
+            send_TCPIP_message(client, message, True)
+        client.sendall(b"00000000")
+    except OSError as error:
+        print("Producer {:d} could not send all its messages: {}".format(producer_number, error))
+    client.close()
+
+def run_benchmark(TCPIPserverclass, num_producers: int, num_messages: int) -> None:
+    aTCPIPserver = TCPIPserverclass("127.0.0.1", 0, numconnections=num_producers)
+    address = aTCPIPserver.serversocket.getsockname()
+    first_delivery_times = {}
+    all_delivered = threading.Event()
+    num_expected = num_producers * num_messages
+    def on_newdata(message):
+        try:
+            producer_number = json.loads(message)["id"]
+        except json.JSONDecodeError: # a message that was cut because it was not received completely
+            producer_number = None
+        if producer_number not in first_delivery_times:
+            first_delivery_times[producer_number] = time.perf_counter()
+        if signals.newdata.num_emitted == num_expected:
+            all_delivered.set()
+    signals = CountingWorkerSignals(on_newdata)
+    if isinstance(aTCPIPserver, AsyncTCPIPserver):
+        aTCPIPserver.start()
+    threading.Thread(target=aTCPIPserver.listener_function_Qt, args=(signals,), daemon=True).start()
+
+    start_barrier = threading.Barrier(num_producers + 1)
+    producers = [threading.Thread(target=run_producer, args=(address, producer_number, num_messages, start_barrier))
+                 for producer_number in range(num_producers)]
+    for producer in producers:
+        producer.start()
+    start_barrier.wait()
+    start_time = time.perf_counter()
+    for producer in producers:
+        producer.join()
+    # messages that are lost (for example after an illegal preamble) never arrive
+    all_delivered.wait(timeout = MAX_WAIT_AFTER_PRODUCERS)
+    total_time = time.perf_counter() - start_time
+    num_delivered = signals.newdata.num_emitted
+    slowest_first_delivery = max(first_delivery_times.values()) - start_time if first_delivery_times else float("nan")
+    print("{:s}: {:d} producers x {:d} messages, {:d} delivered in {:.3f} s, {:.0f} messages/s, slowest first delivery after {:.3f} s".format(
+        TCPIPserverclass.__name__, num_producers, num_messages, num_delivered, total_time, num_delivered / total_time, slowest_first_delivery))
+    if isinstance(aTCPIPserver, AsyncTCPIPserver):
+        aTCPIPserver.stop()
+
+
+if __name__ == "__main__":
+    num_producers = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_PRODUCERS
+    num_messages = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_MESSAGES
+    run_benchmark(TCPIPserver, num_producers, num_messages)
+    run_benchmark(AsyncTCPIPserver, num_producers, num_messages)
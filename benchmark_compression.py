@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of compressed message frames (see compression.py) against plain ones.
+
+addData messages with a pointList of random points, of sizes from 256 bytes to
+2 MB, are sent through a TCP connection to TCPIPserver.clientsocket_parser, once
+uncompressed and once with every codec of compression.py. This is done directly
+on localhost, and through a relay thread that forwards the bytes at a limited rate,
+like a slow lab link. For each size, the time per message is printed, and for
+each link the smallest size from which on compressing is faster (the break-even).
+Pass this size as compression_threshold to send_TCPIP_message.
+
+Run with: python benchmark_compression.py [link rate in Mbit/s ...]
+"""
+import sys
+import json
+import random
+import socket
+import threading
+import time
+import compression
+from socketserver import TCPIPserver
+from helperfunctions import send_TCPIP_message
+
+MESSAGE_SIZES = [256, 1024, 4096, 16384, 65536, 262144, 1024**2, 2*1024**2]
+TOTAL_BYTES_PER_MEASUREMENT = 2*1024**2 # so that slow links do not take forever
+LINK_RATES = [100., 10.] # Mbit/s, besides localhost without limit
+RELAY_CHUNK_SIZE = 16384
+
+
+class CountingSignal():
+    def __init__(self):
+        self.num_emitted = 0
+    def emit(self, value = None):
+        self.num_emitted += 1
+
+class CountingWorkerSignals():
+    def __init__(self):
+        self.newdata = CountingSignal()
+        self.newarrays = CountingSignal()
+        self.newcommands = CountingSignal()
+        self.commandsavailable = CountingSignal()
+        self.set_client_communication_socket = CountingSignal()
+
+
+def make_message(message_size: int) -> str:
+    """ An addData message with a pointList of random points, of about message_size bytes """
+    point_list = []
+    message = ""
+    while len(message) < message_size:
+        point_list.extend([{"curveNumber": 0, "xval": len(point_list) + idx*1e-3, "yval": random.gauss(0., 1.), "yerr": 0.1}
+                           for idx in range(max(1, (message_size - len(message)) // 80))])
+        message = json.dumps({"jsonrpc": "2.0", "method": "addData", "params": {"pointList": point_list}, "id": 1})
+    return message
+
+def loopback_pair():
+    """ Two connected TCP sockets on localhost """
+    listening_socket = socket.create_server(("127.0.0.1", 0))
+    client_end = socket.create_connection(listening_socket.getsockname())
+    (server_end, address) = listening_socket.accept()
+    listening_socket.close()
+    return (server_end, client_end)
+
+def relay(socket_from, socket_to, link_rate: float) -> None:
+    """ Forwards everything from socket_from to socket_to at link_rate Mbit/s """
+    bytes_per_second = link_rate * 1e6 / 8
+    start_time = time.perf_counter()
+    num_forwarded = 0
+    while True:
+        data = socket_from.recv(RELAY_CHUNK_SIZE)
+        if len(data) == 0:
+            socket_to.close()
+            return
+        num_forwarded += len(data)
+        time_to_wait = start_time + num_forwarded / bytes_per_second - time.perf_counter()
+        if time_to_wait > 0:
+            time.sleep(time_to_wait)
+        socket_to.sendall(data)
+
+def measure(aTCPIPserver, message: str, num_messages: int, compression_name, link_rate) -> float:
+    """ Returns the time per message, in seconds, until the server has parsed it """
+    (server_end, client_end) = loopback_pair()
+    if link_rate is not None:
+        (relay_end, sending_end) = loopback_pair()
+        threading.Thread(target=relay, args=(relay_end, client_end, link_rate), daemon=True).start()
+    else:
+        sending_end = client_end
+    def send_function():
+        for idx in range(num_messages):
+            send_TCPIP_message(sending_end, message, True, compression_name=compression_name, compression_threshold=0)
+        sending_end.sendall(b"00000000")
+    sender = threading.Thread(target=send_function)
+    start_time = time.perf_counter()
+    sender.start()
+    aTCPIPserver.clientsocket_parser(server_end, CountingWorkerSignals())
+    total_time = time.perf_counter() - start_time
+    sender.join()
+    sending_end.close()
+    return total_time / num_messages
+
+
+if __name__ == "__main__":
+    link_rates = [float(arg) for arg in sys.argv[1:]] if len(sys.argv) > 1 else LINK_RATES
+    aTCPIPserver = TCPIPserver("127.0.0.1", 0)
+    messages = {message_size: make_message(message_size) for message_size in MESSAGE_SIZES}
+    for link_rate in [None] + link_rates:
+        print("localhost" if link_rate is None else "loopback throttled to {:.1f} Mbit/s".format(link_rate))
+        break_even_sizes = {}
+        for (message_size, message) in messages.items():
+            num_messages = max(1, TOTAL_BYTES_PER_MEASUREMENT // len(message))
+            plain_time = measure(aTCPIPserver, message, num_messages, None, link_rate)
+            print("    {:>8d} bytes: plain {:9.3f} ms".format(len(message), 1e3*plain_time), end = "")
+            for compression_name in compression.available_compressors():
+                compressed_time = measure(aTCPIPserver, message, num_messages, compression_name, link_rate)
+                ratio = len(message) / len(compression.get_compressor(compression_name).compress(message.encode("utf-8")))
+                print(", {:s} {:9.3f} ms (ratio {:.1f})".format(compression_name, 1e3*compressed_time, ratio), end = "")
+                if (compressed_time < plain_time) and (compression_name not in break_even_sizes):
+                    break_even_sizes[compression_name] = len(message)
+                elif compressed_time >= plain_time:
+                    break_even_sizes.pop(compression_name, None)
+            print("")
+        for compression_name in compression.available_compressors():
+            if compression_name in break_even_sizes:
+                print("    break-even for {:s}: about {:d} bytes".format(compression_name, break_even_sizes[compression_name]))
+            else:
+                print("    break-even for {:s}: compressing is not faster for any of these sizes".format(compression_name))
+    aTCPIPserver.serversocket.close()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the JSON codecs that are installed on this machine (see jsoncodec.py).
+
+The payloads are built like the messages in send_JSON_client.py: addData messages
+with a pointList of generated points with error bars, the same points in the
+columns format, and a doFit message with starting parameters and limits. For
+every codec, the time to decode (as done by JSONread) and to encode (as done by
+the clients and for the fit results) each payload is printed, and at the end
+the fastest codec for decoding addData messages, which is what the plotter does
+most. Start the plotter with --jsoncodec=<name> to use a codec that is not the
+default one.
+
+Run with: python benchmark_jsoncodec.py [num_points]
+"""
+import sys
+import time
+import random
+import numpy as np
+import jsoncodec
+
+NUM_POINTS = 10000
+NUM_REPEATS = 20
+
+
+def make_payloads(num_points: int) -> dict:
+    xr = np.linspace(0, 50, num_points)
+    datapts_Gaussian = [{"curveNumber": 2, "xval": float(x),
+                         "yval": float(np.exp(-np.power(x-25., 2)/10) + (random.random()-0.5)), "yerr": 0.05} for x in xr]
+    payloads = {}
+    payloads["addData pointList"] = {"jsonrpc": "2.0", "method": "addData",
+                                     "params": {"pointList": datapts_Gaussian}, "id": 1}
+    payloads["addData columns"] = {"jsonrpc": "2.0", "method": "addData",
+                                   "params": {"columns": {"curveNumber": 2,
+                                                          "x": [point["xval"] for point in datapts_Gaussian],
+                                                          "y": [point["yval"] for point in datapts_Gaussian],
+                                                          "yerr": [point["yerr"] for point in datapts_Gaussian]}},
+                                   "id": 1}
+    payloads["doFit"] = {"jsonrpc": "2.0", "method": "doFit",
+                         "params": {"fitFunction": "sinewave", "curveNumber": 2,
+                                    "startingParameters": {"frequency": 1/6e-6, "amplitude": 0.3, "phase": 0., "offset": 0.5},
+                                    "startingParametersLimits": {"frequency": [1/1e-5, 1/1e-6], "amplitude": [0., 1.],
+                                                                 "phase": [-np.pi, np.pi], "offset": [0., 1.]},
+                                    "cropLimits": [0., 2e-5], "fitMethod": "least_squares", "performFitting": ""},
+                         "id": 1}
+    return payloads
+
+def measure(function, argument) -> float:
+    """ Returns the best time of NUM_REPEATS calls, in seconds """
+    best_time = float("inf")
+    for idx in range(NUM_REPEATS):
+        start_time = time.perf_counter()
+        function(argument)
+        best_time = min(best_time, time.perf_counter() - start_time)
+    return best_time
+
+
+if __name__ == "__main__":
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_POINTS
+    payloads = make_payloads(num_points)
+    messages = {payload_name: jsoncodec.JSONCodec().dumps(payload) for (payload_name, payload) in payloads.items()}
+    addData_decode_times = {}
+    print("{:d} points per addData message, default codec: {:s}".format(num_points, jsoncodec.default_codec.name))
+    for codec in jsoncodec.available_codecs():
+        for (payload_name, payload) in payloads.items():
+            decode_time = measure(codec.loads, messages[payload_name])
+            encode_time = measure(codec.dumps, payload)
+            print("{:8s} {:20s} {:9.3f} ms decode {:9.3f} ms encode {:8.1f} MB/s decode".format(
+                codec.name, payload_name, 1e3*decode_time, 1e3*encode_time, len(messages[payload_name]) / decode_time / 1024**2))
+        addData_decode_times[codec.name] = measure(codec.loads, messages["addData pointList"])
+    print("Fastest codec for decoding addData messages: {:s}".format(min(addData_decode_times, key=addData_decode_times.get)))
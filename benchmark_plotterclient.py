@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of plotterclient.Plotter against one connection per point.
+
+The points go to a TCPIPserver without the GUI, which builds the commands from
+the messages as MainWindow does, and counts the points in them. We measure the
+time until the server has all points, for:
+
+    one connection per point: connect, send one addData dataPoint message, 00000000,
+        close, as socketclient.py does
+    one message per point: one persistent connection, one dataPoint message per point
+    Plotter, single points: add_points with one point at a time
+    Plotter, arrays: add_points with ARRAY_SIZE points at a time
+    Plotter, binary frames: the same with use_binary_frames
+
+Run with: python benchmark_plotterclient.py [num_points]
+"""
+import os
+import sys
+import json
+import contextlib
+import socket
+import threading
+import time
+import numpy as np
+from socketserver import TCPIPserver
+from commandbuilder import CommandBuilder
+from helperfunctions import send_TCPIP_message
+from plotterclient import Plotter
+
+NUM_POINTS = 200000
+NUM_POINTS_PER_CONNECTION = 2000 # the pattern with one connection per point gets fewer points, it is too slow
+ARRAY_SIZE = 1000
+MAX_WAIT = 60. # seconds
+
+
+class PointCountingSignal():
+    def __init__(self, on_points):
+        self.on_points = on_points
+    def emit(self, value = None):
+        if isinstance(value, dict): # the columns of a binary frame
+            self.on_points(len(value["x"]))
+            return
+        for command in value.commands:
+            if command.function_name == "plot_single_datapoint":
+                self.on_points(1)
+            elif command.function_name == "plot_checked_columns":
+                self.on_points(len(command.argument["x"]))
+
+class IgnoringSignal():
+    def emit(self, value = None):
+        pass
+
+class PointCountingWorkerSignals():
+    def __init__(self, on_points):
+        self.newdata = IgnoringSignal()
+        self.newarrays = PointCountingSignal(on_points)
+        self.newcommands = PointCountingSignal(on_points)
+        self.set_client_communication_socket = IgnoringSignal()
+
+
+class PointCounter():
+    def __init__(self):
+        self.num_points = 0
+        self.condition = threading.Condition()
+    def add(self, num_points: int) -> None:
+        with self.condition:
+            self.num_points += num_points
+            self.condition.notify_all()
+    def wait_for(self, num_points: int) -> bool:
+        with self.condition:
+            return self.condition.wait_for(lambda: self.num_points >= num_points, timeout = MAX_WAIT)
+
+
+def make_point_message(xval: float, yval: float) -> str:
+    return json.dumps({"jsonrpc": "2.0", "method": "addData",
+                       "params": {"dataPoint": {"curveNumber": 0, "xval": xval, "yval": yval}}, "id": 0})
+
+def send_one_connection_per_point(address, xvals, yvals) -> None:
+    for (xval, yval) in zip(xvals, yvals):
+        client = socket.create_connection(address)
+        send_TCPIP_message(client, make_point_message(float(xval), float(yval)), True)
+        client.sendall(b"00000000")
+        client.close()
+
+def send_one_message_per_point(address, xvals, yvals) -> None:
+    client = socket.create_connection(address)
+    for (xval, yval) in zip(xvals, yvals):
+        send_TCPIP_message(client, make_point_message(float(xval), float(yval)), True)
+    client.sendall(b"00000000")
+    client.close()
+
+def send_single_points_with_plotter(address, xvals, yvals, use_binary_frames = False) -> None:
+    with Plotter(*address, use_binary_frames=use_binary_frames) as plotter:
+        for (xval, yval) in zip(xvals, yvals):
+            plotter.add_points(0, xval, yval)
+
+def send_arrays_with_plotter(address, xvals, yvals, use_binary_frames = False) -> None:
+    with Plotter(*address, use_binary_frames=use_binary_frames) as plotter:
+        for start in range(0, len(xvals), ARRAY_SIZE):
+            plotter.add_points(0, xvals[start:start + ARRAY_SIZE], yvals[start:start + ARRAY_SIZE])
+
+def measure(address, point_counter: PointCounter, send_function, num_points: int, **kwargs) -> float:
+    """ Returns the number of points per second that arrived at the server """
+    xvals = np.arange(float(num_points))
+    yvals = np.sin(xvals)
+    num_points_before = point_counter.num_points
+    start_time = time.perf_counter()
+    send_function(address, xvals, yvals, **kwargs)
+    if not point_counter.wait_for(num_points_before + num_points):
+        print("    not all points arrived")
+    return num_points / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_POINTS
+    aTCPIPserver = TCPIPserver("127.0.0.1", 0, numconnections=64)
+    aTCPIPserver.message_parser = CommandBuilder(max_num_curves=10).build_request
+    aTCPIPserver.serversocket.listen(64)
+    point_counter = PointCounter()
+    threading.Thread(target=aTCPIPserver.listener_function_Qt, args=(PointCountingWorkerSignals(point_counter.add),), daemon=True).start()
+    address = aTCPIPserver.serversocket.getsockname()
+    # the server prints a line for every connection, which would be most of the time of the first measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = [("one connection per point", measure(address, point_counter, send_one_connection_per_point, min(num_points, NUM_POINTS_PER_CONNECTION))),
+                   ("one message per point", measure(address, point_counter, send_one_message_per_point, num_points)),
+                   ("Plotter, single points", measure(address, point_counter, send_single_points_with_plotter, num_points)),
+                   ("Plotter, arrays of {:d}".format(ARRAY_SIZE), measure(address, point_counter, send_arrays_with_plotter, num_points)),
+                   ("Plotter, arrays of {:d}, binary frames".format(ARRAY_SIZE),
+                    measure(address, point_counter, send_arrays_with_plotter, num_points, use_binary_frames=True))]
+    for (name, points_per_second) in results:
+        print("{:40s} {:12.0f} points/s, {:8.1f} times one connection per point".format(name, points_per_second, points_per_second / results[0][1]))
+    aTCPIPserver.serversocket.close()
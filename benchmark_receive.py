@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of the receive path of TCPIPserver.clientsocket_parser.
+
+Messages of 1 KB, 1 MB and 100 MB are sent through a local socket pair, and
+the receive rate in MB/s is printed. For comparison, the old way of receiving
+(full_message_bytes += data_bytes in chunks of 2048 bytes) is measured too,
+except for 100 MB where it would take far too long.
+
+Run with: python benchmark_receive.py [buffersize]
+"""
+import sys
+import socket
+import threading
+import time
+from socketserver import TCPIPserver
+from helperfunctions import send_TCPIP_message
+
+# (message size in bytes, number of messages)
+# the 8 digit preamble allows at most 99999999 bytes, so this is the "100 MB" message
+MESSAGE_SIZES = [(1024, 10000), (1024**2, 50), (99999999, 2)]
+OLD_CHUNK_SIZE = 2048
+
+
+class CountingSignal():
+    def __init__(self):
+        self.num_emitted = 0
+    def emit(self, value):
+        self.num_emitted += 1
+
+class CountingWorkerSignals():
+    def __init__(self):
+        self.newdata = CountingSignal()
+        self.newarrays = CountingSignal()
+        self.set_client_communication_socket = CountingSignal()
+
+
+def receive_by_concatenation(socket_in, num_messages: int) -> None:
+    """ The receive loop as it was before the recv_into rewrite """
+    for idx in range(num_messages):
+        message_length = int(socket_in.recv(8).decode("utf-8"))
+        full_message_bytes = "".encode("utf-8")
+        while message_length > 0:
+            data_bytes = socket_in.recv(min(message_length, OLD_CHUNK_SIZE))
+            full_message_bytes += data_bytes
+            message_length -= len(data_bytes)
+        full_message_bytes.decode("utf-8")
+
+def measure(receive_function, message_size: int, num_messages: int) -> float:
+    """ Returns the receive rate in MB/s """
+    (server_end, client_end) = socket.socketpair()
+    message = "x" * message_size
+    def send_function():
+        for idx in range(num_messages):
+            send_TCPIP_message(client_end, message, True)
+        client_end.sendall(b"00000000")
+    sender = threading.Thread(target=send_function)
+    start_time = time.perf_counter()
+    sender.start()
+    receive_function(server_end, num_messages)
+    total_time = time.perf_counter() - start_time
+    sender.join()
+    client_end.close()
+    server_end.close()
+    return message_size * num_messages / total_time / 1024**2
+
+
+if __name__ == "__main__":
+    buffersize = int(sys.argv[1]) if len(sys.argv) > 1 else 65536
+    aTCPIPserver = TCPIPserver("127.0.0.1", 0, buffersize=buffersize)
+    def receive_with_parser(socket_in, num_messages):
+        aTCPIPserver.clientsocket_parser(socket_in, CountingWorkerSignals())
+    for (message_size, num_messages) in MESSAGE_SIZES:
+        rate = measure(receive_with_parser, message_size, num_messages)
+        print("message size {:>11d} bytes: recv_into {:8.1f} MB/s".format(message_size, rate), end = "")
+        if message_size <= 1024**2:
+            old_rate = measure(receive_by_concatenation, message_size, num_messages)
+            print(", concatenation {:8.1f} MB/s".format(old_rate))
+        else:
+            print(", concatenation not measured")
+    aTCPIPserver.serversocket.close()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of shardedplotter.py with different numbers of shards.
+
+NUM_CURVES curves are fed with noisy gaussians, in arrays of ARRAY_SIZE points, and
+each curve is fitted every FIT_EVERY arrays and at the end, as when dozens of curves are measured
+and fitted at the same time. At the end, the fit results of all curves are collected
+with ShardedPlotter.fit_results. We measure the time until then, for 1 shard and for
+up to as many shards as there are cores (at least 2).
+
+Run with: python benchmark_shardedplotter.py [num_arrays_per_curve]
+"""
+import os
+import sys
+import socket
+import time
+import numpy as np
+import shardedplotter
+from plotterclient import ShardedPlotter
+
+NUM_CURVES = 40
+NUM_ARRAYS_PER_CURVE = 20
+ARRAY_SIZE = 500
+FIT_EVERY = 5 # arrays
+FIRST_PORT = 5857 # the shards get the first free block of ports from here on
+MAX_WAIT = 30. # seconds for the shards to start listening
+
+
+def find_free_ports(num_ports: int, first_port: int) -> int:
+    """ The first port of num_ports consecutive ports that can be bound, the ports of the last run may still be in use """
+    while True:
+        test_sockets = []
+        try:
+            for port in range(first_port, first_port + num_ports):
+                test_sockets.append(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+                test_sockets[-1].bind(("127.0.0.1", port))
+            return first_port
+        except OSError:
+            first_port = port + 1
+        finally:
+            for test_socket in test_sockets:
+                test_socket.close()
+
+def wait_for_shards(ports) -> bool:
+    """ The shards are ready when they accept connections. Connecting to a TCPIPserver needs the 00000000 to end """
+    start_time = time.perf_counter()
+    for port in ports:
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1.) as connection:
+                    connection.sendall(b"00000000")
+                break
+            except OSError:
+                if time.perf_counter() - start_time > MAX_WAIT:
+                    return False
+                time.sleep(0.1)
+    return True
+
+def feed_and_fit(plotter: ShardedPlotter, num_arrays_per_curve: int) -> dict:
+    rng = np.random.default_rng(0)
+    for array_index in range(num_arrays_per_curve):
+        for curvenumber in range(NUM_CURVES):
+            xvals = rng.uniform(0., 10., ARRAY_SIZE)
+            yvals = np.exp(-0.5*np.square(xvals - 5.)) + 0.05*rng.standard_normal(ARRAY_SIZE)
+            plotter.add_points(curvenumber, xvals, yvals)
+        if ((array_index + 1) % FIT_EVERY == 0) or (array_index == num_arrays_per_curve - 1):
+            plotter.flush()
+            for curvenumber in range(NUM_CURVES):
+                plotter.send_message("doFit", {"fitFunction": "gaussian", "curveNumber": curvenumber, "performFitting": ""})
+    plotter.flush()
+    return plotter.fit_results()
+
+def measure(num_shards: int, num_arrays_per_curve: int) -> float:
+    """ Points per second, including the fits """
+    first_port = find_free_ports(num_shards, FIRST_PORT)
+    shard_processes = shardedplotter.start_shards(num_shards, first_port, [])
+    try:
+        ports = range(first_port, first_port + num_shards)
+        if not wait_for_shards(ports):
+            print("    the shards did not start")
+            return 0.
+        start_time = time.perf_counter()
+        with ShardedPlotter("127.0.0.1", ports) as plotter:
+            fit_results = feed_and_fit(plotter, num_arrays_per_curve)
+        elapsed_time = time.perf_counter() - start_time
+        if len(fit_results) != NUM_CURVES:
+            print("    only {:d} out of {:d} curves have a fit result".format(len(fit_results), NUM_CURVES))
+    finally:
+        for shard_process in shard_processes:
+            shard_process.terminate()
+            shard_process.join()
+    return NUM_CURVES * num_arrays_per_curve * ARRAY_SIZE / elapsed_time
+
+
+if __name__ == "__main__":
+    num_arrays_per_curve = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_ARRAYS_PER_CURVE
+    max_num_shards = max(os.cpu_count() or 1, 2)
+    shard_numbers = sorted(set([1, 2, max_num_shards // 2, max_num_shards]) - {0})
+    results = []
+    for num_shards in shard_numbers:
+        results.append((num_shards, measure(num_shards, num_arrays_per_curve)))
+    for (num_shards, points_per_second) in results:
+        print("{:3d} shards {:12.0f} points/s, {:6.2f} times 1 shard".format(num_shards, points_per_second, points_per_second / results[0][1]))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Turns the JSON-RPC messages into commands that are ready to be applied by MainWindow.
+
+JSONread gives a list of (function name, argument) tuples. CommandBuilder additionally
+checks the data points and converts all data into numpy arrays, so that this work can
+be done on the network worker thread. The GUI thread then only adds the arrays to the
+curves and schedules the redraws.
+
+CommandBuilder does not import anything from Qt, so it can be used in any thread.
+"""
+
+import numpy as np
+import jsoncodec
+from typing import Any, Dict, List, NamedTuple, Optional
+from JSONinterpreter import JSONread
+
+
+class Command(NamedTuple):
+    """
+    One call of a MainWindow function. It is a tuple, so it compares equal to
+    the ("function name", argument) tuples that JSONread produces
+    """
+    function_name: str
+    argument: Any
+
+
+class Request(NamedTuple):
+    """
+    The commands of one message, together with the connection it came from (anything with
+    a sendall method, or None if unknown) and the id of the JSON-RPC request. The responses
+    to the request are sent to origin and tagged with request_id
+    """
+    origin: Any
+    request_id: Optional[int]
+    commands: List[Command]
+
+
+class CommandBuilder():
+    possible_datapoint_keys = ["curveNumber", "xval", "yval", "yerr", "xerr"]
+    critical_datapoint_keys = ["curveNumber", "xval", "yval"]
+    possible_columns_keys = ["curveNumber", "x", "y", "yerr"]
+    critical_columns_keys = ["curveNumber", "x", "y"]
+
+    def __init__(self, max_num_curves: int):
+        self.max_num_curves = max_num_curves
+        self.JSONreader = JSONread()
+
+    def build_commands(self, message: str) -> List[Command]:
+        """
+        Parses the message with JSONread, and replaces the pointList and columns
+        commands by plot_checked_columns commands with numpy arrays, one per curve
+        """
+        return self.build_request(message).commands
+
+    def build_request(self, message: str, origin: Any = None) -> Request:
+        """ The same as build_commands, but also keeps where the message came from and its request id """
+        try:
+            (request_id, interpretation_result) = self.JSONreader.parse_JSON_request(message)
+        except (ValueError, AttributeError, TypeError):
+            # not JSON at all, or not a JSON object
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "build_commands"))
+            print("Your message is not a JSON-RPC 2.0 object. Sending nofunction downstream")
+            return Request(origin, None, [Command("nofunction", message)])
+
+        commands = []
+        for (function_name, argument) in interpretation_result:
+            if function_name == "plot_point_batch":
+                grouped_columns = self.points_to_columns(argument, "plot_point_batch")
+                if grouped_columns is not None:
+                    commands.extend([Command("plot_checked_columns", columns) for columns in grouped_columns.values()])
+            elif function_name == "plot_columns":
+                columns = self.convert_columns(argument, "plot_columns")
+                if columns is not None:
+                    commands.append(Command("plot_checked_columns", columns))
+            else:
+                commands.append(Command(function_name, argument))
+        return Request(origin, request_id, commands)
+
+    def build_point_list_request(self, point_list: list, origin: Any = None) -> Request:
+        """
+        The request for the points of a part of a pointList, which streamingdecoder.PointListStreamDecoder
+        decoded while the message was still being received. It has no request id, the id belongs to the rest of the message
+        """
+        grouped_columns = self.points_to_columns(point_list, "plot_point_batch")
+        if grouped_columns is None:
+            return Request(origin, None, [])
+        return Request(origin, None, [Command("plot_checked_columns", columns) for columns in grouped_columns.values()])
+
+    def check_curvenumber(self, curvenumber: Any, function_name: str) -> bool:
+        # Now check that the curve number is an integer
+        if not isinstance(curvenumber,int):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You put a curve number that is not an integer. This is not allowed")
+            return False
+        # Now check that there are not more curves trying to be registered than the max allowed number
+        if curvenumber >= self.max_num_curves:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You put a curve number which is greater than MAX_NUM_CURVES, which is now set to {:d}. This is not allowed".format(self.max_num_curves))
+            return False
+        return True
+
+    def check_datapoint(self, datapoint_arg: dict, function_name: str) -> bool:
+        """
+        Checks that a single data point dictionary has the format described in
+        MainWindow.plot_single_datapoint. Prints why it does not, in the name of the function function_name
+        """
+        if not isinstance(datapoint_arg,dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You supplied something other than a dictionary as the data point. Not doing anything")
+            return False
+        # First check that all keys supplied are legal
+        if not all([key in self.possible_datapoint_keys for key in datapoint_arg.keys()]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("Some of the keys you supplied to dataPoint are not in the legal key list. Here is the legal key list: {}. Not doing anything".format(self.possible_datapoint_keys))
+            return False
+        # Now check that we have the absolutely necessary keys for plotting the point
+        if not all([crit_key in datapoint_arg for crit_key in self.critical_datapoint_keys]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You must provide at least all of these keys {} to plot a point, but you didn't. Not plotting anything".format(
+                    self.critical_datapoint_keys))
+            return False
+        if not self.check_curvenumber(datapoint_arg["curveNumber"], function_name):
+            return False
+        # Now check that the xval, yval, and if given, xerr and yerr are either integers or floats
+        for key in ["xval", "yval", "xerr", "yerr"]:
+            if (key in datapoint_arg) and (not isinstance(datapoint_arg[key],(int,float))):
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+                print("Your {:s} is not numeric. This is not allowed".format(key))
+                return False
+        return True
+
+    def points_to_columns(self, point_list: list, function_name: str) -> Optional[Dict[int, dict]]:
+        """
+        Checks all points of a pointList in one pass and groups them by their curve number.
+        Returns for each curve number a columns dictionary (as for convert_columns) with
+        numpy arrays, or None if point_list is not a list. Points that fail the checks
+        are skipped, the others are kept
+        """
+        if not isinstance(point_list,list):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You supplied something other than a list as the function argument. Not doing anything")
+            return None
+
+        # For each curve number: lists of x values, y values, error bars, and whether any error bar was given
+        grouped_points = {}
+        num_skipped = 0
+        for datapoint in point_list:
+            if not self.check_datapoint(datapoint, function_name):
+                num_skipped += 1
+                continue
+            if datapoint["curveNumber"] not in grouped_points:
+                grouped_points[datapoint["curveNumber"]] = ([],[],[],[False])
+            (xvals, yvals, yerrs, is_yerr_given) = grouped_points[datapoint["curveNumber"]]
+            xvals.append(datapoint["xval"])
+            yvals.append(datapoint["yval"])
+            if "yerr" in datapoint:
+                yerrs.append(datapoint["yerr"])
+                is_yerr_given[0] = True
+            else:
+                yerrs.append(0.)
+        if num_skipped > 0:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("{:d} out of {:d} points were not correct and were skipped".format(num_skipped, len(point_list)))
+
+        grouped_columns = {}
+        for (curvenumber, (xvals, yvals, yerrs, is_yerr_given)) in grouped_points.items():
+            grouped_columns[curvenumber] = {"curveNumber": curvenumber,
+                                            "x": np.array(xvals, dtype=np.float64),
+                                            "y": np.array(yvals, dtype=np.float64)}
+            if is_yerr_given[0]:
+                grouped_columns[curvenumber]["yerr"] = np.array(yerrs, dtype=np.float64)
+        return grouped_columns
+
+    def convert_columns(self, columns_arg: dict, function_name: str) -> Optional[dict]:
+        """
+        Checks a columns dictionary (see MainWindow.plot_columns) and returns a copy of it
+        where the columns are float64 numpy arrays. Returns None if the columns are not correct
+        """
+        if not isinstance(columns_arg,dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You supplied something other than a dictionary as the function argument. Not doing anything")
+            return None
+        if not all([key in self.possible_columns_keys for key in columns_arg.keys()]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("Some of the keys you supplied to columns are not in the legal key list. Here is the legal key list: {}. Not doing anything".format(self.possible_columns_keys))
+            return None
+        if not all([crit_key in columns_arg for crit_key in self.critical_columns_keys]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("You must provide at least all of these keys {} to plot columns, but you didn't. Not plotting anything".format(self.critical_columns_keys))
+            return None
+        if not self.check_curvenumber(columns_arg["curveNumber"], function_name):
+            return None
+
+        # the conversion fails if any of the entries is not a number
+        try:
+            columns = {"curveNumber": columns_arg["curveNumber"],
+                       "x": jsoncodec.array_from_json(columns_arg["x"]),
+                       "y": jsoncodec.array_from_json(columns_arg["y"])}
+            if "yerr" in columns_arg:
+                columns["yerr"] = jsoncodec.array_from_json(columns_arg["yerr"])
+        except (TypeError, ValueError):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("Some of the values in your columns are not numeric. This is not allowed, not plotting anything")
+            return None
+        if (columns["x"].ndim != 1) or (columns["x"].shape != columns["y"].shape) or \
+                (("yerr" in columns) and (columns["yerr"].shape != columns["x"].shape)):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, function_name))
+            print("Your columns must be flat lists of the same length. Not plotting anything")
+            return None
+        return columns
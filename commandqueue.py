@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded queue of the requests that go from the network worker thread to MainWindow.
+
+Without it, every message is a queued Qt signal, and Qt keeps all of them in memory
+while the GUI thread is busy (for example with a fit), however fast the producers are.
+CommandQueue holds at most max_size requests. What happens when it is full is set by
+the policy:
+
+    "block": the network thread waits until the GUI took requests out of the queue.
+        It then does not read from the socket, so TCP slows down the producer
+    "coalesce": consecutive addData requests are merged into one request per curve,
+        so a queue full of data takes one entry. If the queue is full of other
+        requests, the network thread waits as for "block"
+    "drop": the request is thrown away and counted in the metrics
+
+The network thread only emits a signal when the queue was empty before, so there is
+at most one pending signal, and MainWindow takes all queued requests at once.
+
+CommandQueue does not import anything from Qt, so it can be used in any thread.
+"""
+
+import time
+import numpy as np
+from collections import deque
+from threading import Condition
+from typing import Dict, List, Optional
+from commandbuilder import Command, Request
+
+
+class _QueueEntry():
+    """ A request in the queue, with the time it was put in """
+    def __init__(self, request: Request, put_time: float):
+        self.request = request
+        self.put_time = put_time
+        # For requests that only add data: for each curve number, the columns of all
+        # requests that were merged into this one. None if the request cannot be merged
+        self.columns_by_curve: Optional[Dict[int, List[dict]]] = None
+
+
+class CommandQueue():
+    POLICIES = ["block", "coalesce", "drop"]
+
+    def __init__(self, max_size: int = 1000, policy: str = "block"):
+        self.max_size = max_size
+        self.policy = policy
+        self.entries = deque()
+        self.condition = Condition()
+        self.is_closed = False
+        # True from the moment a put needs the consumer to be notified, until take_all is called
+        self.is_consumer_notified = False
+
+        self.num_put = 0
+        self.num_taken = 0
+        self.num_dropped = 0
+        self.num_coalesced = 0
+        self.max_depth = 0
+        self.total_blocked_time = 0. # seconds that the producers waited because the queue was full
+        self.total_wait_time = 0. # seconds that the taken requests waited in the queue
+        self.max_wait_time = 0.
+
+    def set_policy(self, policy: str, max_size: Optional[int] = None) -> bool:
+        """ Sets the policy, and the maximum size if it is given. Returns False if one of them is not allowed """
+        if policy not in self.POLICIES:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_policy"))
+            print("The policy {} is not known. Here are the known policies: {}. Not doing anything".format(policy, self.POLICIES))
+            return False
+        if (max_size is not None) and ((not isinstance(max_size, int)) or (max_size < 1)):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_policy"))
+            print("The maximum size of the queue must be a positive integer. Not doing anything")
+            return False
+        with self.condition:
+            self.policy = policy
+            if max_size is not None:
+                self.max_size = max_size
+            # a producer that waits may be able to continue now
+            self.condition.notify_all()
+        return True
+
+    def put(self, request: Request) -> bool:
+        """
+        Puts the request into the queue, or drops it, depending on the policy.
+        Returns True if the consumer has to be notified that there are requests in the queue
+        """
+        with self.condition:
+            if self.is_closed:
+                return False
+            self.num_put += 1
+            if (self.policy == "coalesce") and self._coalesce(request):
+                self.num_coalesced += 1
+                return self._notify_consumer()
+            if len(self.entries) >= self.max_size:
+                if self.policy == "drop":
+                    self.num_dropped += 1
+                    return False
+                start_time = time.perf_counter()
+                while (len(self.entries) >= self.max_size) and (not self.is_closed) and (self.policy != "drop"):
+                    self.condition.wait()
+                self.total_blocked_time += time.perf_counter() - start_time
+                if self.is_closed:
+                    return False
+                if len(self.entries) >= self.max_size: # the policy was changed to drop while waiting
+                    self.num_dropped += 1
+                    return False
+            entry = _QueueEntry(request, time.perf_counter())
+            if (self.policy == "coalesce") and self._is_data_only(request):
+                entry.columns_by_curve = {}
+                for command in request.commands:
+                    entry.columns_by_curve.setdefault(command.argument["curveNumber"], []).append(command.argument)
+            self.entries.append(entry)
+            self.max_depth = max(self.max_depth, len(self.entries))
+            return self._notify_consumer()
+
+    def take_all(self) -> List[Request]:
+        """ Takes all requests out of the queue, in the order in which they were put in """
+        with self.condition:
+            self.is_consumer_notified = False
+            entries = list(self.entries)
+            self.entries.clear()
+            self.condition.notify_all()
+        take_time = time.perf_counter()
+        requests = []
+        for entry in entries:
+            wait_time = take_time - entry.put_time
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            if entry.columns_by_curve is None:
+                requests.append(entry.request)
+            else:
+                commands = [Command("plot_checked_columns", self._concatenate_columns(columns_list))
+                            for columns_list in entry.columns_by_curve.values()]
+                requests.append(Request(entry.request.origin, entry.request.request_id, commands))
+        self.num_taken += len(requests)
+        return requests
+
+    def close(self) -> None:
+        """ Lets all producers that wait return. Nothing can be put into the queue afterwards """
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def metrics(self) -> dict:
+        """ The depth of the queue, the numbers of requests, and the wait times in seconds """
+        with self.condition:
+            return {"policy": self.policy,
+                    "maxSize": self.max_size,
+                    "depth": len(self.entries),
+                    "maxDepth": self.max_depth,
+                    "numPut": self.num_put,
+                    "numTaken": self.num_taken,
+                    "numDropped": self.num_dropped,
+                    "numCoalesced": self.num_coalesced,
+                    "totalBlockedTime": self.total_blocked_time,
+                    "meanWaitTime": self.total_wait_time / self.num_taken if self.num_taken > 0 else 0.,
+                    "maxWaitTime": self.max_wait_time}
+
+    def _notify_consumer(self) -> bool:
+        if self.is_consumer_notified:
+            return False
+        self.is_consumer_notified = True
+        return True
+
+    def _is_data_only(self, request: Request) -> bool:
+        return (len(request.commands) > 0) and all([command.function_name == "plot_checked_columns" for command in request.commands])
+
+    def _coalesce(self, request: Request) -> bool:
+        """ Merges the request into the last one in the queue, if both only add data """
+        if (len(self.entries) == 0) or (self.entries[-1].columns_by_curve is None) or (not self._is_data_only(request)):
+            return False
+        columns_by_curve = self.entries[-1].columns_by_curve
+        for command in request.commands:
+            columns_by_curve.setdefault(command.argument["curveNumber"], []).append(command.argument)
+        return True
+
+    def _concatenate_columns(self, columns_list: List[dict]) -> dict:
+        if len(columns_list) == 1:
+            return columns_list[0]
+        columns = {"curveNumber": columns_list[0]["curveNumber"],
+                   "x": np.concatenate([columns_part["x"] for columns_part in columns_list]),
+                   "y": np.concatenate([columns_part["y"] for columns_part in columns_list])}
+        if any(["yerr" in columns_part for columns_part in columns_list]):
+            columns["yerr"] = np.concatenate([columns_part["yerr"] if "yerr" in columns_part else np.zeros_like(columns_part["x"])
+                                              for columns_part in columns_list])
+        return columns
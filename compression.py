@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+The compression codecs for compressed message frames.
+
+A compressed frame starts with the marker of its codec instead of the first digit
+of the usual 8 character preamble. The remaining 7 characters give the length of
+the compressed message, which is the compressed UTF-8 encoded JSON message. So a
+frame can be at most MAX_COMPRESSED_LENGTH bytes long, longer messages are sent
+uncompressed. A compressed frame must not decompress to more than
+MAX_DECOMPRESSED_LENGTH bytes, the longest message that can be sent uncompressed,
+so that a small frame cannot make the receiver allocate gigabytes.
+
+Only zlib is there for now. Another codec is added by writing a class with a name,
+a marker (a letter that is neither BINARY_FRAME_MARKER nor framing.HELLO_MARKER) and the compress and decompress
+methods, and putting it into COMPRESSOR_CLASSES.
+
+Compressing only pays off for large messages and slow links, so messages shorter
+than the threshold given to send_TCPIP_message are never compressed.
+benchmark_compression.py measures where the break-even is.
+"""
+
+import zlib
+from typing import Dict, List, Optional
+
+MAX_COMPRESSED_LENGTH = 9999999 # the 7 digits of the preamble
+MAX_DECOMPRESSED_LENGTH = 99999999 # the 8 digits of the preamble of an uncompressed message
+# bytes, shorter messages are not compressed. Clients only compress when their link is slow,
+# and then zlib pays off from about 1 KB on (see benchmark_compression.py)
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+
+
+class ZlibCompressor():
+    name = "zlib"
+    marker = "Z"
+    # the lowest level is the fastest, and JSON with numbers compresses well already with it
+    level = 1
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes, max_length: int = MAX_DECOMPRESSED_LENGTH) -> bytes:
+        """
+        Raises a ValueError (zlib.error) if the data are not correct, or if they
+        decompress to more than max_length bytes
+        """
+        decompressor = zlib.decompressobj()
+        try:
+            decompressed = decompressor.decompress(data, max_length)
+        except zlib.error as error:
+            raise ValueError(str(error))
+        if len(decompressor.unconsumed_tail) > 0:
+            raise ValueError("The data decompress to more than {:d} bytes".format(max_length))
+        if not decompressor.eof:
+            raise ValueError("The compressed data are incomplete")
+        return decompressed
+
+
+COMPRESSOR_CLASSES: Dict[str, type] = {"zlib": ZlibCompressor}
+
+
+def get_compressor(name: str) -> Optional[ZlibCompressor]:
+    """ Returns the codec with this name, or None if it is not known """
+    if name not in COMPRESSOR_CLASSES:
+        return None
+    return COMPRESSOR_CLASSES[name]()
+
+def get_compressor_for_marker(marker: str) -> Optional[ZlibCompressor]:
+    """ Returns the codec whose frames start with marker, or None if there is none """
+    for compressor_class in COMPRESSOR_CLASSES.values():
+        if compressor_class.marker == marker:
+            return compressor_class()
+    return None
+
+def available_compressors() -> List[str]:
+    return list(COMPRESSOR_CLASSES.keys())
@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+"""
+Storage for the numerical data of every curve in the plotter.
+
+Each curve keeps its x values, y values and y error bars in preallocated
+float64 numpy columns. When a column runs out of space, its capacity is
+multiplied by GROWTH_FACTOR, so appending a point is O(1) amortized and
+there is no Python float object behind any of the stored values.
+
+The points of a curve are always kept sorted by their x value. The columns
+are gap buffers: the free space (the gap) sits at the position where the
+last point was inserted. When x increases monotonically (a sweep), the gap
+stays at the end and every point is a plain append. A point that comes out
+of order is placed with a binary search (np.searchsorted) and the gap is
+moved there, which only shifts the points between the old and the new gap
+position.
+
+The x, y and err properties return views into the columns (no copy), which
+can be fed directly to pyqtgraph for plotting and to Fitmodel for fitting.
+For drawing very large curves, decimated() gives a min/max per pixel column
+version of the curve (see levelofdetail.py).
+
+A retention policy (maximum number of points, maximum age, or maximum
+x window) bounds the memory of a curve that is streamed for a long time.
+Old points are dropped from the beginning of the columns by moving a head
+offset forward. The columns are not a wrapping ring buffer, so the x, y and
+err views stay contiguous; instead, the points are moved back to the start
+of the columns when the columns are full and at most half of them is used.
+
+With a RAM budget (see CurveStore.set_ram_budget), the curves that were
+modified least recently are spilled to disk when the budget is exceeded: their
+columns become np.memmap files in a session directory, one file per column.
+The files only ever grow at their end, and the x, y and err views of a
+spilled curve are views into the memmaps, so plotting (through decimated())
+and fitting read the data straight from the files.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from typing import Optional, Dict, List, Tuple
+from levelofdetail import MinMaxPyramid, decimate_minmax
+
+
+class CurveData:
+    """
+    The data of one single curve: three float64 columns (x, y, err), sorted
+    by x, and the number of points that are actually filled in.
+
+    The filled-in points are at the positions [head, gap_start) and
+    [gap_end, capacity) of each column, the gap is in between. Points are
+    only removed from the beginning of the curve (see set_retention), which
+    just moves head forward.
+
+    The error column is always kept at the same length as x and y. Points
+    that come without an error bar get an error bar of 0, which Fitmodel
+    then recognizes as an unphysical error bar (see are_errorbars_correct)
+    """
+    INITIAL_CAPACITY = 256
+    GROWTH_FACTOR = 2
+    DTYPE = np.float64
+
+    def __init__(self, initial_capacity: int = INITIAL_CAPACITY):
+        self.capacity = max(int(initial_capacity), 1)
+        self.num_points = 0
+        self.head = 0
+        self.gap_start = 0
+        self.gap_end = self.capacity
+        self.are_errorbars_given = False # becomes True as soon as one point comes with an error bar
+        # all points before this index are unchanged since the last update of the min/max pyramid
+        self.lowest_modified_index = 0
+        self.minmax_pyramid = None # made only when the curve has to be decimated for the first time
+        # the retention policy, None means no limit (see set_retention)
+        self.max_points = None
+        self.max_age = None
+        self.max_xwindow = None
+        self.last_modified_time = time.monotonic()
+        # the beginning of the paths of the memmap files, None as long as the curve is in RAM
+        self.spill_path_prefix = None
+        self.column_names = ["_x", "_y", "_err"] # "_t" is added when the arrival times are needed
+        self._x = np.empty(self.capacity, dtype=self.DTYPE)
+        self._y = np.empty(self.capacity, dtype=self.DTYPE)
+        self._err = np.empty(self.capacity, dtype=self.DTYPE)
+
+    def __len__(self) -> int:
+        return self.num_points
+
+    @property
+    def x(self) -> np.ndarray:
+        """ View (not a copy) of the x values that are filled in, sorted """
+        self._move_gap(self.num_points)
+        return self._x[self.head:self.head+self.num_points]
+
+    @property
+    def y(self) -> np.ndarray:
+        """ View (not a copy) of the y values that are filled in, sorted by x """
+        self._move_gap(self.num_points)
+        return self._y[self.head:self.head+self.num_points]
+
+    @property
+    def err(self) -> Optional[np.ndarray]:
+        """
+        View (not a copy) of the error bars, or None if no point
+        of this curve came with an error bar
+        """
+        if self.are_errorbars_given is False:
+            return None
+        self._move_gap(self.num_points)
+        return self._err[self.head:self.head+self.num_points]
+
+    @property
+    def nbytes(self) -> int:
+        """ The number of bytes allocated for this curve, including the unused capacity """
+        return sum(getattr(self, column_name).nbytes for column_name in self.column_names)
+
+    @property
+    def used_nbytes(self) -> int:
+        """ The number of bytes that hold actual data points """
+        return len(self.column_names) * self.num_points * self._x.itemsize
+
+    @property
+    def is_spilled(self) -> bool:
+        """ True if the columns of this curve are memmap files instead of arrays in RAM """
+        return self.spill_path_prefix is not None
+
+    def _columns(self) -> List[np.ndarray]:
+        return [getattr(self, column_name) for column_name in self.column_names]
+
+    def _column_path(self, column_name: str) -> str:
+        return self.spill_path_prefix + column_name + ".bin"
+
+    def _allocate_column(self, column_name: str, capacity: int) -> np.ndarray:
+        """
+        Returns a column that can hold capacity values. For a spilled curve, this is
+        the memmap of the column file, which is made longer if needed. The values
+        that were already in the file keep their position
+        """
+        if self.spill_path_prefix is None:
+            return np.empty(capacity, dtype=self.DTYPE)
+        with open(self._column_path(column_name), "ab") as column_file:
+            column_file.truncate(capacity * np.dtype(self.DTYPE).itemsize)
+        return np.memmap(self._column_path(column_name), dtype=self.DTYPE, mode="r+", shape=(capacity,))
+
+    def _delete_column_file(self, column_name: str) -> None:
+        try:
+            os.remove(self._column_path(column_name))
+        except FileNotFoundError:
+            pass
+
+    def spill_to_disk(self, path_prefix: str) -> None:
+        """
+        Moves the columns of this curve into memmap files whose paths start with path_prefix.
+        Does nothing if the curve is already spilled
+        """
+        if self.spill_path_prefix is not None:
+            return
+        self.spill_path_prefix = path_prefix
+        for column_name in self.column_names:
+            self._delete_column_file(column_name) # leftovers of an earlier curve with the same number
+            old_column = getattr(self, column_name)
+            new_column = self._allocate_column(column_name, self.capacity)
+            new_column[self.head:self.gap_start] = old_column[self.head:self.gap_start]
+            new_column[self.gap_end:] = old_column[self.gap_end:]
+            setattr(self, column_name, new_column)
+
+    def release_files(self) -> None:
+        """ Deletes the memmap files of a spilled curve. The curve is empty and back in RAM afterwards """
+        if self.spill_path_prefix is None:
+            return
+        self.capacity = self.INITIAL_CAPACITY
+        self.clear()
+        for column_name in self.column_names:
+            setattr(self, column_name, np.empty(self.capacity, dtype=self.DTYPE))
+            self._delete_column_file(column_name)
+        self.spill_path_prefix = None
+
+    def _ensure_capacity(self, needed_num_points: int) -> None:
+        """
+        Makes sure that the gap can hold needed_num_points points in total.
+        If points were removed from the beginning and at least half of the capacity
+        would stay free, the points are moved back to the beginning of the columns
+        instead. Otherwise the capacity grows geometrically. Both keep appending
+        O(1) amortized, and with a retention policy the memory stays flat
+        """
+        if needed_num_points - self.num_points <= self.gap_end - self.gap_start:
+            return
+        num_before_gap = self.gap_start - self.head
+        if (self.head > 0) and (2*needed_num_points <= self.capacity):
+            for column in self._columns():
+                column[:num_before_gap] = column[self.head:self.gap_start]
+            self.gap_start = num_before_gap
+            self.head = 0
+            return
+        # after points were removed from the beginning, the new columns are made large enough
+        # that the next time they are full, the points can be moved back instead
+        target_capacity = needed_num_points if self.head == 0 else 2*needed_num_points
+        new_capacity = self.capacity
+        while new_capacity < target_capacity:
+            new_capacity *= self.GROWTH_FACTOR
+        num_after_gap = self.capacity - self.gap_end
+        for column_name in self.column_names:
+            old_column = getattr(self, column_name)
+            new_column = self._allocate_column(column_name, new_capacity)
+            if self.spill_path_prefix is None:
+                new_column[:num_before_gap] = old_column[self.head:self.gap_start]
+            else:
+                # the file just got longer, the old values are still at the beginning of it
+                old_column = new_column[:self.capacity]
+                if self.head > 0:
+                    new_column[:num_before_gap] = old_column[self.head:self.gap_start]
+            new_column[new_capacity-num_after_gap:] = old_column[self.gap_end:]
+            setattr(self, column_name, new_column)
+        self.head = 0
+        self.gap_start = num_before_gap
+        self.gap_end = new_capacity - num_after_gap
+        self.capacity = new_capacity
+
+    def _move_gap(self, position: int) -> None:
+        """
+        Moves the gap such that it starts right after the first 'position' points.
+        Only the points between the old and the new gap position are shifted
+        """
+        new_gap_start = self.head + position
+        if new_gap_start == self.gap_start:
+            return
+        if new_gap_start < self.gap_start:
+            # the points [position, gap_start) go to just before the end of the gap
+            num_moved = self.gap_start - new_gap_start
+            for column in self._columns():
+                column[self.gap_end-num_moved:self.gap_end] = column[new_gap_start:self.gap_start]
+            self.gap_start -= num_moved
+            self.gap_end -= num_moved
+        else:
+            # the first points after the gap go to the beginning of the gap
+            num_moved = new_gap_start - self.gap_start
+            for column in self._columns():
+                column[self.gap_start:new_gap_start] = column[self.gap_end:self.gap_end+num_moved]
+            self.gap_start += num_moved
+            self.gap_end += num_moved
+
+    def _find_position(self, xval: float, side: str = "right") -> int:
+        """
+        Returns the (logical) index at which a point with the x value xval has to be
+        inserted to keep the curve sorted. With side="right", points with equal x values 
+        stay in the order in which they arrived
+        """
+        if (self.gap_start > self.head) and (xval <= self._x[self.gap_start-1]):
+            return int(np.searchsorted(self._x[self.head:self.gap_start], xval, side=side))
+        return self.gap_start - self.head + int(np.searchsorted(self._x[self.gap_end:], xval, side=side))
+
+    def append(self, xval: float, yval: float, yerr: Optional[float] = None) -> None:
+        """
+        Adds a single point to the curve, at the position given by its x value.
+        If the point comes after all other points and the gap is at the end,
+        this is a simple append
+        """
+        self._ensure_capacity(self.num_points + 1)
+        is_fast_path = (self.gap_end == self.capacity) and \
+            ((self.gap_start == self.head) or (xval >= self._x[self.gap_start-1]))
+        if not is_fast_path:
+            self._move_gap(self._find_position(xval))
+        self.lowest_modified_index = min(self.lowest_modified_index, self.gap_start - self.head)
+        idx = self.gap_start
+        self._x[idx] = xval
+        self._y[idx] = yval
+        if yerr is None:
+            self._err[idx] = 0.
+        else:
+            self._err[idx] = yerr
+            self.are_errorbars_given = True
+        if self.max_age is not None:
+            self._t[idx] = time.monotonic()
+        self.gap_start += 1
+        self.num_points += 1
+        self.last_modified_time = time.monotonic()
+        self._apply_retention()
+
+    def extend(self, xvals, yvals, yerrs=None) -> None:
+        """
+        Adds many points at once. xvals, yvals (and yerrs if given) must be
+        1D sequences or numpy arrays of the same length
+
+        If the new points are sorted and come after all existing points, they
+        are simply copied at the end. Otherwise they are sorted and merged
+        with the existing points, which costs O(n + k log k) for k new points
+        """
+        xvals = np.asarray(xvals, dtype=self.DTYPE)
+        yvals = np.asarray(yvals, dtype=self.DTYPE)
+        if yerrs is None:
+            yerrs = np.zeros(len(xvals), dtype=self.DTYPE)
+        else:
+            yerrs = np.asarray(yerrs, dtype=self.DTYPE)
+            self.are_errorbars_given = True
+        num_new = len(xvals)
+        if num_new == 0:
+            return
+        self._ensure_capacity(self.num_points + num_new)
+        self._move_gap(self.num_points)
+        new_columns = [xvals, yvals, yerrs]
+        if self.max_age is not None:
+            new_columns.append(np.full(num_new, time.monotonic(), dtype=self.DTYPE))
+        (start, stop) = (self.num_points, self.num_points + num_new)
+        (head_start, head_stop) = (self.head + start, self.head + stop)
+
+        is_new_chunk_sorted = bool(np.all(xvals[1:] >= xvals[:-1]))
+        if is_new_chunk_sorted and ((start == 0) or (xvals[0] >= self._x[head_start-1])):
+            for (column, newvals) in zip(self._columns(), new_columns):
+                column[head_start:head_stop] = newvals
+            self.lowest_modified_index = min(self.lowest_modified_index, start)
+        else:
+            sort_indices = np.argsort(xvals, kind="stable")
+            insert_indices = np.searchsorted(self._x[self.head:head_start], xvals[sort_indices], side="right")
+            self.lowest_modified_index = min(self.lowest_modified_index, int(insert_indices[0]))
+            # x is merged last, because the insert indices were computed from it
+            for (column, newvals) in list(zip(self._columns(), new_columns))[::-1]:
+                column[self.head:head_stop] = np.insert(column[self.head:head_start], insert_indices, newvals[sort_indices])
+        self.gap_start = head_stop
+        self.num_points = stop
+        self.last_modified_time = time.monotonic()
+        self._apply_retention()
+
+    def clear(self) -> None:
+        """ Forgets all points, but keeps the allocated memory """
+        self.num_points = 0
+        self.head = 0
+        self.gap_start = 0
+        self.gap_end = self.capacity
+        self.are_errorbars_given = False
+        self.lowest_modified_index = 0
+
+    def set_retention(self, max_points: Optional[int] = None, max_age: Optional[float] = None,
+                      max_xwindow: Optional[float] = None) -> None:
+        """
+        Limits which points are kept. None means no limit. The oldest points are removed from the
+        beginning of the curve, which is O(1). Note that the beginning of the curve is where the 
+        smallest x values are, so the removed points are the oldest ones when x grows with time
+
+        max_points: at most this many points are kept
+        max_age: points that arrived more than this many seconds ago are removed
+        max_xwindow: only the points with x larger than (largest x - max_xwindow) are kept
+        """
+        self.max_points = max_points
+        self.max_xwindow = max_xwindow
+        if (max_age is not None) and ("_t" not in self.column_names):
+            # the points that are already there are counted as having arrived now
+            self._t = self._allocate_column("_t", self.capacity)
+            self._t[:] = time.monotonic()
+            self.column_names.append("_t")
+        elif (max_age is None) and ("_t" in self.column_names):
+            self.column_names.remove("_t")
+            del self._t
+            if self.spill_path_prefix is not None:
+                self._delete_column_file("_t")
+        self.max_age = max_age
+        self._apply_retention()
+
+    def remove_first_points(self, num_removed: int) -> None:
+        """ Removes the num_removed points with the smallest x values """
+        num_removed = min(int(num_removed), self.num_points)
+        if num_removed <= 0:
+            return
+        if self.gap_start - self.head < num_removed:
+            self._move_gap(num_removed)
+        self.head += num_removed
+        self.num_points -= num_removed
+        self.lowest_modified_index = 0 # every point has a new index now
+        if self.num_points == 0:
+            self.clear()
+
+    def _apply_retention(self) -> None:
+        if self.num_points == 0:
+            return
+        num_removed = 0
+        if self.max_points is not None:
+            num_removed = max(num_removed, self.num_points - self.max_points)
+        if self.max_xwindow is not None:
+            largest_x = self._x[self.capacity-1] if self.gap_end < self.capacity else self._x[self.gap_start-1]
+            num_removed = max(num_removed, self._find_position(largest_x - self.max_xwindow, side="left"))
+        if self.max_age is not None:
+            num_removed = max(num_removed, self._count_leading_older_than(time.monotonic() - self.max_age))
+        self.remove_first_points(num_removed)
+
+    def _count_leading_older_than(self, oldest_time: float) -> int:
+        """
+        Counts how many points at the beginning of the curve arrived before oldest_time. 
+        The arrival times are checked in growing chunks, so this costs about as much
+        as the number of points that are too old
+        """
+        self._move_gap(self.num_points)
+        arrival_times = self._t[self.head:self.head+self.num_points]
+        num_old = 0
+        chunk_size = 16
+        while num_old < self.num_points:
+            is_recent = arrival_times[num_old:num_old+chunk_size] >= oldest_time
+            if np.any(is_recent):
+                return num_old + int(np.argmax(is_recent))
+            num_old += len(is_recent)
+            chunk_size *= 2
+        return num_old
+
+    def decimated(self, xmin: float, xmax: float, num_columns: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the x and y values to draw the part of the curve between xmin and xmax 
+        with num_columns pixel columns, as the min and max of each column. 
+        Returns None if that part has few enough points to be drawn as it is
+        """
+        xvals = self.x
+        index_range = np.searchsorted(xvals, [xmin, xmax], side="left")
+        if index_range[1] - index_range[0] <= 2*num_columns:
+            return None
+        if self.minmax_pyramid is None:
+            self.minmax_pyramid = MinMaxPyramid()
+        if (self.lowest_modified_index < self.num_points) or (self.minmax_pyramid.num_points != self.num_points):
+            self.minmax_pyramid.update(self.y, self.lowest_modified_index)
+            self.lowest_modified_index = self.num_points
+        return decimate_minmax(xvals, self.y, self.minmax_pyramid, xmin, xmax, num_columns)
+
+
+class CurveStore:
+    """
+    Container of CurveData instances, indexed by the curve number
+    """
+    def __init__(self, initial_capacity: int = CurveData.INITIAL_CAPACITY):
+        self.initial_capacity = initial_capacity
+        self.curves: Dict[int, CurveData] = {}
+        # the retention policy of a curve number is kept when the curve is removed,
+        # and applied again when a curve with that number is created
+        self.retention_policies: Dict[int, dict] = {}
+        # above this many bytes of curve data in RAM, curves are spilled to disk, None means no limit
+        self.ram_budget: Optional[int] = None
+        self.spill_directory: Optional[str] = None # where the session directory is made, None is the system default
+        self.session_directory: Optional[str] = None # made when the first curve is spilled
+
+    def __contains__(self, curvenumber: int) -> bool:
+        return curvenumber in self.curves
+
+    def __getitem__(self, curvenumber: int) -> CurveData:
+        return self.curves[curvenumber]
+
+    def __len__(self) -> int:
+        return len(self.curves)
+
+    def curve_numbers(self) -> List[int]:
+        return sorted(self.curves.keys())
+
+    def create_curve(self, curvenumber: int) -> CurveData:
+        """ Creates an empty curve, or returns the existing one if it is already there """
+        if curvenumber not in self.curves:
+            self.curves[curvenumber] = CurveData(self.initial_capacity)
+            if curvenumber in self.retention_policies:
+                self.curves[curvenumber].set_retention(**self.retention_policies[curvenumber])
+        return self.curves[curvenumber]
+
+    def set_retention(self, curvenumber: int, max_points: Optional[int] = None,
+                      max_age: Optional[float] = None, max_xwindow: Optional[float] = None) -> None:
+        """ Sets the retention policy of a curve (see CurveData.set_retention), also for the future """
+        policy = {"max_points": max_points, "max_age": max_age, "max_xwindow": max_xwindow}
+        if all(value is None for value in policy.values()):
+            self.retention_policies.pop(curvenumber, None)
+        else:
+            self.retention_policies[curvenumber] = policy
+        if curvenumber in self.curves:
+            self.curves[curvenumber].set_retention(**policy)
+
+    def clear_retention(self) -> None:
+        """ Removes the retention policies of all curves """
+        for curvenumber in list(self.retention_policies.keys()):
+            self.set_retention(curvenumber)
+
+    def remove_curve(self, curvenumber: int) -> bool:
+        """ Deletes the curve and releases its memory. Returns False if the curve did not exist """
+        if curvenumber not in self.curves:
+            return False
+        self.curves[curvenumber].release_files()
+        del self.curves[curvenumber]
+        return True
+
+    def clear(self) -> None:
+        for curve in self.curves.values():
+            curve.release_files()
+        self.curves = {}
+
+    def set_ram_budget(self, ram_budget: Optional[int], spill_directory: Optional[str] = None) -> None:
+        """
+        Sets how many bytes of curve data may be held in RAM (None means no limit).
+        The memmap files of spilled curves go into a new session directory inside
+        spill_directory, or inside the system temporary directory if it is None
+        """
+        self.ram_budget = ram_budget
+        if spill_directory is not None:
+            self.spill_directory = spill_directory
+        self.enforce_ram_budget()
+
+    def enforce_ram_budget(self) -> List[int]:
+        """
+        Spills curves to disk, the least recently modified first, until the curves
+        left in RAM fit into the RAM budget. Returns the numbers of the spilled curves
+        """
+        if self.ram_budget is None:
+            return []
+        curves_in_ram = [curvenumber for (curvenumber, curve) in self.curves.items() if not curve.is_spilled]
+        ram_nbytes = sum(self.curves[curvenumber].nbytes for curvenumber in curves_in_ram)
+        spilled_curve_numbers = []
+        for curvenumber in sorted(curves_in_ram, key=lambda curvenumber: self.curves[curvenumber].last_modified_time):
+            if ram_nbytes <= self.ram_budget:
+                break
+            if self.session_directory is None:
+                self.session_directory = tempfile.mkdtemp(prefix="realtimeplotter_", dir=self.spill_directory)
+            ram_nbytes -= self.curves[curvenumber].nbytes
+            self.curves[curvenumber].spill_to_disk(os.path.join(self.session_directory, "curve{:d}".format(curvenumber)))
+            spilled_curve_numbers.append(curvenumber)
+        return spilled_curve_numbers
+
+    def close(self) -> None:
+        """ Deletes all curves and the session directory with the memmap files """
+        self.clear()
+        if self.session_directory is not None:
+            shutil.rmtree(self.session_directory, ignore_errors=True)
+            self.session_directory = None
+
+    @property
+    def nbytes(self) -> int:
+        """ Total number of bytes allocated by all curves """
+        return sum(curve.nbytes for curve in self.curves.values())
+
+    @property
+    def ram_nbytes(self) -> int:
+        """ Number of bytes allocated in RAM by the curves that are not spilled to disk """
+        return sum(curve.nbytes for curve in self.curves.values() if not curve.is_spilled)
+
+    @property
+    def used_nbytes(self) -> int:
+        """ Total number of bytes holding actual data points in all curves """
+        return sum(curve.used_nbytes for curve in self.curves.values())
+
+    def memory_report(self) -> Dict[int, dict]:
+        """
+        Returns for each curve number a dictionary with the number of points,
+        the capacity, and the allocated and used bytes
+        """
+        return {curvenumber: {"numPoints": curve.num_points,
+                              "capacity": curve.capacity,
+                              "nbytes": curve.nbytes,
+                              "usedNbytes": curve.used_nbytes}
+                for (curvenumber, curve) in self.curves.items()}
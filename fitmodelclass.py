@@ -80,9 +80,10 @@ class Fitmodel:
         """
         # First we try to convert the data into numpy arrays, and if it fails, we
         # return False
+        # np.asarray does not copy the data if they are already numpy arrays (like the views from the curve store)
         try:
-            self.xvals_orig = np.array(self.xvals_orig)
-            self.yvals_orig = np.array(self.yvals_orig)
+            self.xvals_orig = np.asarray(self.xvals_orig)
+            self.yvals_orig = np.asarray(self.yvals_orig)
 
             # make sure that error bars are correctly formatted, have the correct length, etc
             if self.errorbars_orig is None:
@@ -90,7 +91,7 @@ class Fitmodel:
                 self.are_errorbars_correct = True
                 self.errorbars_orig = np.ones(self.xvals_orig.shape, dtype=float)
             else:
-                self.errorbars_orig = np.array(self.errorbars_orig)
+                self.errorbars_orig = np.asarray(self.errorbars_orig)
                 #TODELETE
                 #print(np.any(self.errorbars_orig <= np.abs(self.errorbars_orig)/self.MAX_ERROR_RESOLUTION))
                 if np.any(self.errorbars_orig <= np.abs(self.errorbars_orig)/self.MAX_ERROR_RESOLUTION): # this means that at least one of the errors is 0
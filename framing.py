@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+The versioned binary framing, which a client can switch to at the start of a connection.
+
+The usual 8 character preamble gives the length of a message as 8 decimal digits, so a
+message can be at most 99999999 bytes long, and there is no room for a message type,
+flags or a protocol version. A client that wants the binary framing sends the hello
+preamble HELLO_MARKER + 7 digits with the highest framing version that it knows (as the
+first preamble of the connection). The server answers with a hello preamble with the
+version that both use, which is the lower one of the two, and from then on both sides
+send frames only. A server that does not know the binary framing answers with an
+"Illegal preamble" error instead, and the client then has to connect again and use
+the usual preamble. Clients that never send the hello are not affected.
+
+A frame is a HEADER_STRUCT header, followed by length bytes of payload:
+
+    magic    4 bytes, MAGIC
+    version  uint8, the negotiated version
+    type     uint8, one of the FRAME_TYPE_ values
+    flags    uint16, FLAG_ values combined with |
+    length   uint64, the length of the payload
+
+All numbers are little-endian. The payload of a FRAME_TYPE_MESSAGE frame is a UTF-8 JSON
+message. The payload of a FRAME_TYPE_ARRAYS frame is the same as after the preamble
+of a binary array frame (see helperfunctions.send_TCPIP_array_frame), but the length
+of the JSON header is a uint32 in front of it, and the JSON header is padded with
+spaces so that the float64 blocks start at a multiple of 8 bytes. FRAME_TYPE_END ends
+the session, like 00000000.
+
+With FLAG_COMPRESSED, the first byte of the payload is the marker of a codec of
+compression.py, and the rest is compressed with it. With FLAG_MORE, the frame is a chunk
+of a message and more chunks of the same message follow; the chunks are joined after
+they were decompressed. So a message of any length can be sent as a stream of chunks,
+each of at most MAX_FRAME_LENGTH bytes.
+"""
+
+import struct
+import compression
+from typing import List, NamedTuple, Optional
+
+HELLO_MARKER = "F"
+VERSION = 1 # the highest version that this side knows
+MAGIC = b"RTPF"
+HEADER_STRUCT = struct.Struct("<4sBBHQ")
+HEADER_NBYTES = HEADER_STRUCT.size # 16
+
+FRAME_TYPE_MESSAGE = 1
+FRAME_TYPE_ARRAYS = 2
+FRAME_TYPE_END = 3
+FRAME_TYPES = [FRAME_TYPE_MESSAGE, FRAME_TYPE_ARRAYS, FRAME_TYPE_END]
+
+FLAG_COMPRESSED = 0x0001
+FLAG_MORE = 0x0002
+KNOWN_FLAGS = FLAG_COMPRESSED | FLAG_MORE
+
+# bytes, longer messages are sent in several chunks, so that the receiver never
+# has to allocate one buffer for a frame whose length it cannot check
+MAX_FRAME_LENGTH = 2**30
+ARRAYS_HEADER_LENGTH_STRUCT = struct.Struct("<I")
+
+
+class FrameHeader(NamedTuple):
+    version: int
+    frame_type: int
+    flags: int
+    length: int
+
+
+def hello_preamble(version: int = VERSION) -> str:
+    return "{:s}{:07d}".format(HELLO_MARKER, version)
+
+def negotiated_version(hello_preamble_str: str) -> Optional[int]:
+    """ The version that both sides use after this hello preamble was received, or None if it is not a correct hello """
+    try:
+        version = int(hello_preamble_str[1:])
+    except ValueError:
+        return None
+    if (not hello_preamble_str.startswith(HELLO_MARKER)) or (version < 1):
+        return None
+    return min(version, VERSION)
+
+def pack_header(frame_type: int, length: int, flags: int = 0, version: int = VERSION) -> bytes:
+    return HEADER_STRUCT.pack(MAGIC, version, frame_type, flags, length)
+
+def unpack_header(header_bytes: bytes) -> FrameHeader:
+    """ Raises a ValueError if the header is not a correct header of a known version """
+    (magic, version, frame_type, flags, length) = HEADER_STRUCT.unpack(header_bytes)
+    if magic != MAGIC:
+        raise ValueError("The frame does not start with {}".format(MAGIC))
+    if (version < 1) or (version > VERSION):
+        raise ValueError("The framing version {:d} is not known".format(version))
+    if (frame_type not in FRAME_TYPES) or (flags & ~KNOWN_FLAGS):
+        raise ValueError("The frame type {:d} or the flags {:#x} are not known".format(frame_type, flags))
+    if length > MAX_FRAME_LENGTH:
+        raise ValueError("The frame is {:d} bytes long, longer than {:d} bytes".format(length, MAX_FRAME_LENGTH))
+    return FrameHeader(version, frame_type, flags, length)
+
+def arrays_header(header_encoded: bytes) -> bytes:
+    """ The length and the padded JSON header at the start of the payload of a FRAME_TYPE_ARRAYS frame """
+    num_padding = -(ARRAYS_HEADER_LENGTH_STRUCT.size + len(header_encoded)) % 8
+    header_encoded = header_encoded + b" " * num_padding
+    return ARRAYS_HEADER_LENGTH_STRUCT.pack(len(header_encoded)) + header_encoded
+
+def split_arrays_payload(payload) -> tuple:
+    """ (JSON header bytes, memoryview of the float64 blocks) of the payload of a FRAME_TYPE_ARRAYS frame """
+    payload_view = memoryview(payload)
+    if len(payload_view) < ARRAYS_HEADER_LENGTH_STRUCT.size:
+        raise ValueError("The frame is too short for an arrays frame")
+    (header_length,) = ARRAYS_HEADER_LENGTH_STRUCT.unpack_from(payload_view)
+    blocks_start = ARRAYS_HEADER_LENGTH_STRUCT.size + header_length
+    if blocks_start > len(payload_view):
+        raise ValueError("The JSON header is longer than the frame")
+    return (bytes(payload_view[ARRAYS_HEADER_LENGTH_STRUCT.size:blocks_start]), payload_view[blocks_start:])
+
+def decompress_payload(header: FrameHeader, payload) -> tuple:
+    """
+    (payload, name of the codec or None) of a frame, decompressed if it has FLAG_COMPRESSED.
+    Raises a ValueError if the codec is not known or the data are not correct
+    """
+    if not (header.flags & FLAG_COMPRESSED):
+        return (payload, None)
+    compressor = compression.get_compressor_for_marker(chr(payload[0])) if len(payload) > 0 else None
+    if compressor is None:
+        raise ValueError("The compressed frame does not start with the marker of a known codec")
+    # the chunks are compressed one by one, so none is longer than MAX_FRAME_LENGTH when decompressed
+    return (compressor.decompress(bytes(memoryview(payload)[1:]), MAX_FRAME_LENGTH), compressor.name)
+
+def split_into_chunks(parts: list, max_length: int = MAX_FRAME_LENGTH) -> List[list]:
+    """
+    Splits the parts (bytes-like objects) of a payload into chunks of at most max_length bytes.
+    Each chunk is a list of memoryviews of the parts, so nothing is copied
+    """
+    chunks = [[]]
+    chunk_length = 0
+    for part in parts:
+        part_view = memoryview(part).cast("B")
+        while len(part_view) > 0:
+            if chunk_length == max_length:
+                chunks.append([])
+                chunk_length = 0
+            num_taken = min(len(part_view), max_length - chunk_length)
+            chunks[-1].append(part_view[:num_taken])
+            chunk_length += num_taken
+            part_view = part_view[num_taken:]
+    return chunks
+
+
+class MessageAssembler():
+    """ Joins the chunks of a chunked message, on the receiving side """
+    def __init__(self):
+        self.frame_type: Optional[int] = None
+        self.chunks = []
+
+    def add(self, header: FrameHeader, payload) -> Optional[tuple]:
+        """
+        Adds the (decompressed) payload of a frame. Returns (frame type, payload of the whole message)
+        when the message is complete, and None while more chunks are to come.
+        Raises a ValueError if a chunk has another type than the chunks before it
+        """
+        if (self.frame_type is not None) and (header.frame_type != self.frame_type):
+            raise ValueError("A chunk of type {:d} came in the middle of a message of type {:d}".format(header.frame_type, self.frame_type))
+        if header.flags & FLAG_MORE:
+            self.frame_type = header.frame_type
+            self.chunks.append(payload)
+            return None
+        if self.frame_type is None:
+            # the usual case, a message in one frame
+            return (header.frame_type, payload)
+        self.chunks.append(payload)
+        message_payload = bytearray().join(self.chunks)
+        self.frame_type = None
+        self.chunks = []
+        return (header.frame_type, message_payload)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the plotter server without Qt and without a display, for example on compute nodes.
+
+HeadlessPlotter is a PlotterCore (see plottercore.py): the clients send the same
+JSON-RPC messages as to the GUI, the points go into the curve store, the fits are
+made, and getFitResult, getConfig, subscribe, etc. are answered. The commands that
+only change how the plot looks are accepted and ignored.
+
+As in MainWindow, the TCP/IP server listens on a worker thread, and all commands are
+applied on the main thread. The worker signals of GUI.WorkerSignals are replaced by
+HeadlessSignal objects, which queue the calls of their slots for the main thread in
+the order in which they are emitted, like the queued connections of Qt do.
+
+    python headlessplotter.py [--async] [--host=<address>] [--port=<number>]
+        [--jsoncodec=<name>] [--queuepolicy=<block, coalesce or drop>] [--queuesize=<number>]
+"""
+
+import queue
+import sys
+import threading
+import time
+import traceback
+from socketserver import TCPIPserver
+from asyncserver import AsyncTCPIPserver
+from plottercore import PlotterCore
+import jsoncodec
+from typing import Any, Callable, Optional
+
+
+class HeadlessSignal():
+    """ Stands in for a pyqtSignal: emit calls the slot on the main thread of the HeadlessPlotter, later """
+    def __init__(self, pending_calls: queue.Queue, slot: Callable):
+        self.pending_calls = pending_calls
+        self.slot = slot
+
+    def emit(self, *args) -> None:
+        self.pending_calls.put((self.slot, args))
+
+
+class HeadlessWorkerSignals():
+    """ The signals of GUI.WorkerSignals that the TCP/IP servers emit, connected to the slots of the HeadlessPlotter """
+    def __init__(self, plotter: "HeadlessPlotter"):
+        self.error = HeadlessSignal(plotter.pending_calls, plotter._print_listener_error)
+        self.set_client_communication_socket = HeadlessSignal(plotter.pending_calls, plotter._register_client_communication_socket)
+        self.newdata = HeadlessSignal(plotter.pending_calls, plotter.interpret_message)
+        self.newarrays = HeadlessSignal(plotter.pending_calls, plotter.plot_columns)
+        self.newcommands = HeadlessSignal(plotter.pending_calls, plotter.apply_request)
+        self.commandsavailable = HeadlessSignal(plotter.pending_calls, plotter.apply_queued_requests)
+
+
+class HeadlessPlotter(PlotterCore):
+
+    def __init__(self, aTCPIPserver: Any):
+        super().__init__()
+        # the calls of the slots that the worker signals queued for the main thread
+        self.pending_calls = queue.Queue()
+        self.is_running = False
+        # while shared-memory rings are attached, the loop looks into them every SHARED_MEMORY_POLL_INTERVAL
+        self.is_polling_shared_memory = False
+        self.last_shared_memory_poll_time = 0.
+
+        self.attach_server(aTCPIPserver)
+        self.signals = HeadlessWorkerSignals(self)
+        # Note that this listener_function_Qt is the one that has the while True loop to keep listening
+        self.listener_thread = threading.Thread(target=self._run_listener,
+                                                args=(aTCPIPserver.listener_function_Qt,), daemon=True)
+
+    def run(self) -> None:
+        """ Starts listening, and applies the commands until stop is called """
+        self.is_running = True
+        if not self.listener_thread.is_alive():
+            self.listener_thread.start()
+        while self.is_running:
+            self.process_pending_calls(self._time_to_next_poll())
+            if self.is_polling_shared_memory and (self._time_to_next_poll() == 0.):
+                self.last_shared_memory_poll_time = time.monotonic()
+                self._poll_shared_memory_rings()
+        self.release_resources()
+
+    def stop(self) -> None:
+        """ Can be called from any thread, run returns after the calls that were queued before """
+        self.pending_calls.put((self._stop_running, ()))
+
+    def process_pending_calls(self, timeout: Optional[float] = None) -> int:
+        """
+        Calls the slots of all signals that were emitted, waiting at most timeout seconds
+        (forever if None) for the first one. Returns the number of calls
+        """
+        try:
+            calls = [self.pending_calls.get(timeout=timeout)]
+        except queue.Empty:
+            return 0
+        while True:
+            try:
+                calls.append(self.pending_calls.get_nowait())
+            except queue.Empty:
+                break
+        for (slot, args) in calls:
+            # a command that fails must not stop the server for all other clients
+            try:
+                slot(*args)
+            except Exception:
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "process_pending_calls"))
+                print("Calling {:s} failed, going on with the next call".format(getattr(slot, "__name__", repr(slot))))
+                traceback.print_exc()
+                # the responses to the next requests must not go to the request that failed
+                self.current_request = None
+                if self.batch_responses is not None:
+                    self._abort_batch([])
+        return len(calls)
+
+    def _time_to_next_poll(self) -> Optional[float]:
+        """ In seconds, None if no shared-memory ring is attached """
+        if not self.is_polling_shared_memory:
+            return None
+        return max(self.last_shared_memory_poll_time + 0.001*self.SHARED_MEMORY_POLL_INTERVAL - time.monotonic(), 0.)
+
+    def _stop_running(self) -> None:
+        self.is_running = False
+
+    def _start_shared_memory_polling(self) -> None:
+        self.is_polling_shared_memory = True
+
+    def _stop_shared_memory_polling(self) -> None:
+        self.is_polling_shared_memory = False
+
+    def _run_listener(self, listener_fn: Callable) -> None:
+        try:
+            listener_fn(self.signals)
+        except: # Ok this is if something doesn't work, error message
+            traceback.print_exc()
+            exctype, value = sys.exc_info()[:2]
+            self.signals.error.emit((exctype, value, traceback.format_exc()))
+
+    def _print_listener_error(self, error_tuple: tuple) -> None:
+        print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_run_listener"))
+        print("The TCP/IP server stopped listening because of {}: {}".format(error_tuple[0].__name__, error_tuple[1]))
+
+
+def runHeadlessPlotter(sysargs):
+
+    HOST = "127.0.0.1"
+    PORT = 5757
+    for sysarg in sysargs:
+        # on a compute node, --host=0.0.0.0 accepts the clients from the other machines
+        if sysarg.startswith("--host="):
+            HOST = sysarg[len("--host="):]
+        if sysarg.startswith("--port="):
+            PORT = int(sysarg[len("--port="):])
+        # with --jsoncodec=<name>, the JSON codec is chosen instead of the fastest one installed (see jsoncodec.py)
+        if sysarg.startswith("--jsoncodec="):
+            jsoncodec.set_default_codec(sysarg[len("--jsoncodec="):])
+    # with --async, many clients can be connected at the same time
+    if "--async" in sysargs:
+        myServer = AsyncTCPIPserver(HOST,PORT)
+    else:
+        myServer = TCPIPserver(HOST,PORT)
+    myServer.reportedLengthMessage = True
+
+    plotter = HeadlessPlotter(myServer)
+    # with --queuepolicy=<block, coalesce or drop> and --queuesize=<number>, the command queue is configured
+    for sysarg in sysargs:
+        if sysarg.startswith("--queuepolicy="):
+            plotter.command_queue.set_policy(sysarg[len("--queuepolicy="):])
+        if sysarg.startswith("--queuesize="):
+            plotter.command_queue.set_policy(plotter.command_queue.policy, int(sysarg[len("--queuesize="):]))
+    try:
+        plotter.run()
+    except KeyboardInterrupt:
+        plotter.release_resources()
+    print("done with the plotter")
+
+
+if __name__ == "__main__":
+    runHeadlessPlotter(sys.argv)
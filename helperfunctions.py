@@ -1,4 +1,8 @@
-import json
+import jsoncodec
+import compression
+import framing
+import numpy as np
+from typing import Optional
 
 colorpalette = [(255,0,0),(0,255,0),(0,0,255),
                 (255,255,0),(0,255,255),
@@ -10,7 +14,7 @@ colorpalette = [(255,0,0),(0,255,0),(0,0,255),
 
 def create_JSONRPC_errormessage(code_arg: int, message_arg: str, data_arg = None, id_arg = None) -> str:
     """
-    It's not quite clear how to deal with IDs yet, so we will always send ID null for now.
+    id_arg is the id of the request that this is the answer to, or None (null) if it is not known
     """
     data_dict = {
         "jsonrpc": "2.0",
@@ -21,7 +25,7 @@ def create_JSONRPC_errormessage(code_arg: int, message_arg: str, data_arg = None
         },
         "id": id_arg
     }
-    return json.dumps(data_dict)
+    return jsoncodec.dumps(data_dict)
 
 def create_JSONRPC_responsemessage(result_arg: dict, id_arg = None) -> str:
     """
@@ -32,12 +36,39 @@ def create_JSONRPC_responsemessage(result_arg: dict, id_arg = None) -> str:
         "result":result_arg,
         "id": id_arg
     }
-    return json.dumps(data_dict)
+    return jsoncodec.dumps(data_dict)
 
-def send_TCPIP_message(socket_to_send,message_string,isPreamblePresent,encoding = "utf-8"):
-    if isPreamblePresent is True:
+def create_JSONRPC_batchmessage(message_strings: list) -> str:
+    """
+    Puts the already encoded responses to the requests of a batch into one JSON array
+    """
+    return "[" + ",".join(message_strings) + "]"
+
+def send_TCPIP_message(socket_to_send,message_string,isPreamblePresent,encoding = "utf-8",
+                       compression_name = None, compression_threshold = compression.DEFAULT_COMPRESSION_THRESHOLD,
+                       frame_version = None):
+    """
+    Sends the message with its 8 digit preamble, or without it if isPreamblePresent is False.
+    If compression_name is the name of a codec in compression.py, messages of at least 
+    compression_threshold bytes are sent as a compressed frame (see compression.py), 
+    as long as this makes them shorter.
+    If frame_version is given, the connection uses the binary framing of framing.py 
+    with this version, and the message is sent as a message frame instead
+    """
+    if frame_version is not None:
+        message_encoded = message_string.encode(encoding = encoding)
+        send_TCPIP_frame(socket_to_send, framing.FRAME_TYPE_MESSAGE, [message_encoded], frame_version,
+                         compression_name = compression_name, compression_threshold = compression_threshold)
+    elif isPreamblePresent is True:
         message_encoded = message_string.encode(encoding = encoding)
         message_len = len(message_encoded)
+        if (compression_name is not None) and (message_len >= compression_threshold):
+            compressor = compression.get_compressor(compression_name)
+            message_compressed = compressor.compress(message_encoded) if compressor is not None else message_encoded
+            if len(message_compressed) < min(message_len, compression.MAX_COMPRESSED_LENGTH + 1):
+                preamble_str = "{:s}{:07d}".format(compressor.marker, len(message_compressed))
+                socket_to_send.sendall(preamble_str.encode(encoding = encoding) + message_compressed)
+                return
         preamble_str = "{:08d}".format(message_len)
         preamble_encoded = preamble_str.encode(encoding = encoding)
         full_msg_encoded = preamble_encoded + message_encoded
@@ -46,6 +77,168 @@ def send_TCPIP_message(socket_to_send,message_string,isPreamblePresent,encoding
         message_encoded = message_string.encode(encoding = encoding)
         socket_to_send.sendall(message_encoded)
 
+def receive_TCPIP_message(socket_in, encoding = "utf-8", frame_version = None) -> str:
+    """
+    Receives one message sent with send_TCPIP_message with preamble, compressed or not.
+    Returns "" if the other side sent 00000000 or closed the connection.
+    If frame_version is given, the connection uses the binary framing of framing.py, 
+    then array frames are skipped, and "" is also returned for the end frame
+    """
+    if frame_version is not None:
+        return _receive_TCPIP_framed_message(socket_in, encoding)
+    preamble_bytes = _receive_exactly(socket_in, 8)
+    if preamble_bytes is None:
+        return ""
+    preamble_str = preamble_bytes.decode(encoding = encoding)
+    compressor = compression.get_compressor_for_marker(preamble_str[0])
+    message_length = int(preamble_str[1:]) if compressor is not None else int(preamble_str)
+    if message_length == 0:
+        return ""
+    message_bytes = _receive_exactly(socket_in, message_length)
+    if message_bytes is None:
+        return ""
+    if compressor is not None:
+        message_bytes = compressor.decompress(message_bytes)
+    return message_bytes.decode(encoding = encoding)
+
+def _receive_TCPIP_framed_message(socket_in, encoding = "utf-8") -> str:
+    message_assembler = framing.MessageAssembler()
+    while True:
+        header_bytes = _receive_exactly(socket_in, framing.HEADER_NBYTES)
+        if header_bytes is None:
+            return ""
+        header = framing.unpack_header(header_bytes)
+        payload = _receive_exactly(socket_in, header.length)
+        if payload is None:
+            return ""
+        message = message_assembler.add(header, framing.decompress_payload(header, payload)[0])
+        if message is None:
+            continue
+        (frame_type, message_payload) = message
+        if frame_type == framing.FRAME_TYPE_END:
+            return ""
+        if frame_type == framing.FRAME_TYPE_MESSAGE:
+            return bytes(message_payload).decode(encoding = encoding)
+
+def negotiate_TCPIP_framing(socket_to_send, version = framing.VERSION) -> Optional[int]:
+    """
+    Asks the server to use the binary framing of framing.py on this connection. Returns the 
+    version that both sides use from now on, or None if the server does not know the binary 
+    framing. In that case the server closes the connection, and a new one has to be made
+    """
+    socket_to_send.sendall(framing.hello_preamble(version).encode("utf-8"))
+    answer_bytes = _receive_exactly(socket_to_send, 8)
+    if answer_bytes is None:
+        return None
+    return framing.negotiated_version(answer_bytes.decode("utf-8", errors = "replace"))
+
+def send_TCPIP_frame(socket_to_send, frame_type: int, payload_parts: list, frame_version = framing.VERSION,
+                     compression_name = None, compression_threshold = compression.DEFAULT_COMPRESSION_THRESHOLD) -> None:
+    """
+    Sends the payload, which is given in parts (bytes-like objects), as one frame of framing.py,
+    or as several chunks if it is longer than framing.MAX_FRAME_LENGTH. The header and the parts
+    are given to sendmsg together, so they are never copied into one bytes object.
+    Each chunk is compressed if compression_name is given, it is at least compression_threshold
+    bytes long and compressing makes it shorter
+    """
+    compressor = compression.get_compressor(compression_name) if compression_name is not None else None
+    chunks = framing.split_into_chunks(payload_parts, framing.MAX_FRAME_LENGTH)
+    for (chunk_number, chunk_parts) in enumerate(chunks):
+        flags = framing.FLAG_MORE if chunk_number < len(chunks) - 1 else 0
+        chunk_length = sum([len(part) for part in chunk_parts])
+        if (compressor is not None) and (chunk_length >= compression_threshold):
+            chunk_compressed = compressor.compress(b"".join(chunk_parts))
+            if len(chunk_compressed) + 1 < chunk_length:
+                chunk_parts = [compressor.marker.encode("utf-8"), chunk_compressed]
+                chunk_length = len(chunk_compressed) + 1
+                flags |= framing.FLAG_COMPRESSED
+        header = framing.pack_header(frame_type, chunk_length, flags, frame_version)
+        _send_buffers(socket_to_send, [header] + chunk_parts)
+
+def send_TCPIP_end(socket_to_send, frame_version = None) -> None:
+    """ Ends the session: 00000000, or the end frame if the connection uses the binary framing """
+    if frame_version is None:
+        socket_to_send.sendall(b"00000000")
+    else:
+        send_TCPIP_frame(socket_to_send, framing.FRAME_TYPE_END, [], frame_version)
+
+def _send_buffers(socket_to_send, buffers: list) -> None:
+    """
+    Sends all buffers with sendmsg (scatter-gather), which may send only a part of them, 
+    so it is called again for the rest. Without sendmsg (on Windows, or for 
+    asyncserver.AsyncConnection), the buffers are sent one after the other
+    """
+    if not hasattr(socket_to_send, "sendmsg"):
+        for buffer in buffers:
+            socket_to_send.sendall(buffer)
+        return
+    buffer_views = [memoryview(buffer).cast("B") for buffer in buffers if len(buffer) > 0]
+    while len(buffer_views) > 0:
+        num_sent = socket_to_send.sendmsg(buffer_views)
+        while (len(buffer_views) > 0) and (num_sent >= len(buffer_views[0])):
+            num_sent -= len(buffer_views[0])
+            buffer_views.pop(0)
+        if num_sent > 0:
+            buffer_views[0] = buffer_views[0][num_sent:]
+
+def _receive_exactly(socket_in, num_bytes: int):
+    """ Receives num_bytes bytes, or returns None if the connection was closed before """
+    buffer = bytearray(num_bytes)
+    with memoryview(buffer) as buffer_view:
+        num_received = 0
+        while num_received < num_bytes:
+            num_new = socket_in.recv_into(buffer_view[num_received:], num_bytes - num_received)
+            if num_new == 0:
+                return None
+            num_received += num_new
+    return bytes(buffer)
+
+# A binary array frame starts with this character instead of the first digit of the
+# usual 8 character preamble. The remaining 7 characters give the length of the JSON header
+BINARY_FRAME_MARKER = "B"
+BINARY_FRAME_DTYPE = np.dtype("<f8") # little-endian float64
+# the points of a binary array frame after the 8 character preamble, so that the frame is not longer
+# than the longest message with a reported length. More points are sent in several frames
+MAX_BINARY_FRAME_POINTS = 99999999 // (3 * BINARY_FRAME_DTYPE.itemsize)
+
+def send_TCPIP_array_frame(socket_to_send, curvenumber: int, xvals, yvals, yerrs = None, encoding = "utf-8", frame_version = None):
+    """
+    Sends the points of one curve as a binary array frame, so that the values
+    do not have to be formatted as text on this side and parsed on the server side. 
+
+    The frame is: "B" + 7 digits giving the length of the JSON header, the JSON header 
+    {"curveNumber": int, "numPoints": int, "hasErrors": bool}, and then the raw 
+    little-endian float64 blocks of the x values, y values and (if hasErrors) the y error bars.
+    If frame_version is given, the connection uses the binary framing of framing.py, 
+    and the same is sent as an arrays frame. Otherwise, more than MAX_BINARY_FRAME_POINTS
+    points are sent in several frames
+    """
+    blocks = [np.ascontiguousarray(xvals, dtype=BINARY_FRAME_DTYPE),
+              np.ascontiguousarray(yvals, dtype=BINARY_FRAME_DTYPE)]
+    if yerrs is not None:
+        blocks.append(np.ascontiguousarray(yerrs, dtype=BINARY_FRAME_DTYPE))
+    if any([block.shape != blocks[0].shape for block in blocks]) or (blocks[0].ndim != 1):
+        print("Message from function send_TCPIP_array_frame: x values, y values and error bars must be 1D and have the same length. Not sending anything")
+        return False
+    if (frame_version is None) and (len(blocks[0]) > MAX_BINARY_FRAME_POINTS):
+        for start in range(0, len(blocks[0]), MAX_BINARY_FRAME_POINTS):
+            part = [block[start:start + MAX_BINARY_FRAME_POINTS] for block in blocks]
+            send_TCPIP_array_frame(socket_to_send, curvenumber, part[0], part[1], part[2] if len(part) > 2 else None, encoding = encoding)
+        return True
+    header_dict = {"curveNumber": curvenumber,
+                   "numPoints": len(blocks[0]),
+                   "hasErrors": yerrs is not None}
+    header_encoded = jsoncodec.dumps(header_dict).encode(encoding = encoding)
+    if frame_version is not None:
+        send_TCPIP_frame(socket_to_send, framing.FRAME_TYPE_ARRAYS, [framing.arrays_header(header_encoded)] + blocks, frame_version)
+        return True
+    preamble_encoded = "{:s}{:07d}".format(BINARY_FRAME_MARKER, len(header_encoded)).encode(encoding = encoding)
+    socket_to_send.sendall(preamble_encoded + header_encoded)
+    for block in blocks:
+        # memoryview makes sure that the array is sent without making a bytes copy of it
+        socket_to_send.sendall(memoryview(block).cast("B"))
+    return True
+
 def replace_capitals_by_underscorelowercase(keystring: str) -> str:
     """
     This function replaces uppercase letters by lowercase ones 
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+The JSON codec used for all messages of the plotter.
+
+Everything that encodes or decodes JSON (JSONread, the JSON-RPC response and
+error messages in helperfunctions, the headers of binary frames) goes through
+loads() and dumps() of this module. They use the fastest codec that is installed,
+in the order of JSON_CODEC_PREFERENCE, and fall back to the json module of the
+standard library. A codec can be chosen by name with set_default_codec, and
+benchmark_jsoncodec.py measures which one is the fastest on a given machine.
+
+numpy arrays and numpy numbers can be encoded by every codec. Decoded arrays are
+turned into numpy arrays with JSONCodec.array_from_json, which a codec that can
+decode straight into numpy overrides.
+
+All codecs give the same result for the same message:
+- JSON has no NaN and infinity, so they are encoded as null, and the NaN and
+  Infinity of the json module are not accepted when decoding
+- dictionary keys that are numbers, True, False or None are encoded as strings
+- null is not a number, so array_from_json raises a ValueError for it
+"""
+
+import json
+import importlib
+import numpy as np
+from typing import Any, Dict, List, Optional, Union
+
+JSON_CODEC_PREFERENCE = ["orjson", "json"]
+
+
+def _numpy_to_builtin(obj: Any) -> Any:
+    """ For the codecs that cannot encode numpy types themselves """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError("Object of type {:s} is not JSON serializable".format(obj.__class__.__name__))
+
+def _nonfinite_to_none(obj: Any) -> Any:
+    """ A copy of obj where NaN and infinity are None, for the json module, which would write NaN """
+    if isinstance(obj, dict):
+        return {key: _nonfinite_to_none(value) for (key, value) in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nonfinite_to_none(value) for value in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return _nonfinite_to_none(_numpy_to_builtin(obj))
+    if isinstance(obj, float) and (not np.isfinite(obj)):
+        return None
+    return obj
+
+def _reject_constant(name: str) -> None:
+    raise ValueError("{:s} is not valid JSON".format(name))
+
+
+class JSONCodec():
+    """ The json module of the standard library. All other codecs behave the same way """
+    name = "json"
+
+    def loads(self, message: Union[str, bytes, bytearray]) -> Any:
+        """ Raises a ValueError if the message is not valid JSON """
+        return json.loads(message, parse_constant=_reject_constant)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return json.dumps(obj, default=_numpy_to_builtin, allow_nan=False)
+        except ValueError:
+            # only the messages with NaN or infinity in them are copied
+            return json.dumps(_nonfinite_to_none(obj), allow_nan=False)
+
+    def array_from_json(self, values: Any) -> np.ndarray:
+        """
+        Turns a decoded JSON array of numbers into a float64 numpy array. Raises a ValueError
+        if there is a null in it: decoded JSON has no NaN, so every NaN of the array was a null
+        """
+        array = np.asarray(values, dtype=np.float64)
+        if np.isnan(array).any():
+            raise ValueError("null is not a number")
+        return array
+
+
+class OrjsonCodec(JSONCodec):
+    """ orjson works on bytes, and encodes numpy arrays natively """
+    name = "orjson"
+
+    def __init__(self):
+        self.orjson = importlib.import_module("orjson")
+        self.dumps_options = self.orjson.OPT_SERIALIZE_NUMPY | self.orjson.OPT_NON_STR_KEYS
+
+    def loads(self, message: Union[str, bytes, bytearray]) -> Any:
+        return self.orjson.loads(message)
+
+    def dumps(self, obj: Any) -> str:
+        return self.orjson.dumps(obj, default=_numpy_to_builtin, option=self.dumps_options).decode("utf-8")
+
+
+CODEC_CLASSES: Dict[str, type] = {"orjson": OrjsonCodec, "json": JSONCodec}
+
+
+def get_codec(name: str) -> Optional[JSONCodec]:
+    """ Returns the codec with this name, or None if it is unknown or its module is not installed """
+    if name not in CODEC_CLASSES:
+        return None
+    try:
+        return CODEC_CLASSES[name]()
+    except ImportError:
+        return None
+
+def available_codecs() -> List[JSONCodec]:
+    """ All codecs that can be used on this machine, in the order of JSON_CODEC_PREFERENCE """
+    codecs = [get_codec(name) for name in JSON_CODEC_PREFERENCE]
+    return [codec for codec in codecs if codec is not None]
+
+default_codec: JSONCodec = available_codecs()[0]
+
+def set_default_codec(name: str) -> bool:
+    """ Makes the codec with this name the one used by loads and dumps. Returns False if it is not available """
+    global default_codec
+    codec = get_codec(name)
+    if codec is None:
+        print("Message from Module {:s} function {:s}".format(__name__, "set_default_codec"))
+        print("The JSON codec {} is not known or not installed. Still using {:s}".format(name, default_codec.name))
+        return False
+    default_codec = codec
+    return True
+
+def loads(message: Union[str, bytes, bytearray]) -> Any:
+    return default_codec.loads(message)
+
+def dumps(obj: Any) -> str:
+    return default_codec.dumps(obj)
+
+def array_from_json(values: Any) -> np.ndarray:
+    return default_codec.array_from_json(values)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Level-of-detail decimation for drawing very large curves.
+
+A plot is only a few thousand pixels wide, so a curve with millions of
+points is drawn as the minimum and the maximum of the points that fall into
+each pixel column. To find these quickly, every large curve keeps a
+MinMaxPyramid: level k holds the min and max of consecutive blocks of
+BLOCK_FACTOR**k points. A query then reduces only a few blocks per pixel
+column, so its cost depends on the width of the plot and not on the number
+of points.
+
+The pyramid is updated incrementally: only the blocks from the first
+modified point onwards are recomputed, so appending points at the end of
+a curve costs only as much as the new points.
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+
+class MinMaxPyramid:
+    BLOCK_FACTOR = 4 # number of blocks of one level that make one block of the next level
+
+    def __init__(self):
+        self.level_mins = [] # self.level_mins[k-1] holds the mins of blocks of BLOCK_FACTOR**k points
+        self.level_maxs = []
+        self.level_lengths = []
+        self.num_points = 0
+
+    def update(self, yvals: np.ndarray, first_modified_index: int) -> None:
+        """
+        Brings the pyramid up to date with yvals, when all values before
+        first_modified_index are the same as in the previous update
+        """
+        factor = self.BLOCK_FACTOR
+        start = min(max(int(first_modified_index), 0), self.num_points)
+        source_mins, source_maxs = yvals, yvals
+        level = 0
+        while len(source_mins) > 1:
+            num_blocks = -(-len(source_mins) // factor) # this is the ceiling of the division
+            block_start = start // factor
+            if level == len(self.level_mins):
+                self.level_mins.append(np.empty(0, dtype=yvals.dtype))
+                self.level_maxs.append(np.empty(0, dtype=yvals.dtype))
+                self.level_lengths.append(0)
+            if len(self.level_mins[level]) < num_blocks:
+                # geometric growth, as for the curve data
+                new_capacity = max(2*len(self.level_mins[level]), num_blocks)
+                for level_list in (self.level_mins, self.level_maxs):
+                    new_array = np.empty(new_capacity, dtype=yvals.dtype)
+                    new_array[:block_start] = level_list[level][:block_start]
+                    level_list[level] = new_array
+            reduce_indices = np.arange(0, len(source_mins) - block_start*factor, factor)
+            self.level_mins[level][block_start:num_blocks] = np.minimum.reduceat(source_mins[block_start*factor:], reduce_indices)
+            self.level_maxs[level][block_start:num_blocks] = np.maximum.reduceat(source_maxs[block_start*factor:], reduce_indices)
+            self.level_lengths[level] = num_blocks
+            source_mins = self.level_mins[level][:num_blocks]
+            source_maxs = self.level_maxs[level][:num_blocks]
+            start = block_start
+            level += 1
+        # the curve might have become shorter, so some upper levels are not needed anymore
+        del self.level_mins[level:], self.level_maxs[level:], self.level_lengths[level:]
+        self.num_points = len(yvals)
+
+    def column_minmax(self, yvals: np.ndarray, index_boundaries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the min and the max of yvals for each column, where column c holds
+        the points index_boundaries[c] to index_boundaries[c+1] (not included).
+        The boundaries must be increasing. The level is chosen such that every column
+        spans at least two blocks, so a column borrows at most one block from its neighbors
+        """
+        column_widths = np.diff(index_boundaries)
+        narrowest_column = max(int(column_widths.min()), 1) if len(column_widths) > 0 else 1
+        level = 0
+        while (level < len(self.level_mins)) and (2 * self.BLOCK_FACTOR**(level+1) <= narrowest_column):
+            level += 1
+        if level == 0:
+            source_mins, source_maxs, block_size = yvals, yvals, 1
+        else:
+            source_mins = self.level_mins[level-1][:self.level_lengths[level-1]]
+            source_maxs = self.level_maxs[level-1][:self.level_lengths[level-1]]
+            block_size = self.BLOCK_FACTOR**level
+        # the blocks after the last column must not be part of the last column
+        end_block = -(-int(index_boundaries[-1]) // block_size)
+        block_starts = index_boundaries[:-1] // block_size
+        return (np.minimum.reduceat(source_mins[:end_block], block_starts),
+                np.maximum.reduceat(source_maxs[:end_block], block_starts))
+
+
+def decimate_minmax(xvals: np.ndarray, yvals: np.ndarray, pyramid: MinMaxPyramid,
+                    xmin: float, xmax: float, num_columns: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the x and y values to draw for the range [xmin, xmax] split into num_columns
+    pixel columns: two points per column, at the first x value of the column, with the
+    min and the max y value of the column. xvals must be sorted.
+
+    Returns None if the range holds so few points that they can be drawn as they are
+    """
+    index_range = np.searchsorted(xvals, [xmin, xmax], side="left")
+    if index_range[1] - index_range[0] <= 2*num_columns:
+        return None
+    column_edges = np.linspace(xmin, xmax, num_columns + 1)
+    index_boundaries = np.searchsorted(xvals, column_edges, side="left")
+    # empty columns (gaps in the data) are not drawn
+    index_boundaries = np.unique(index_boundaries)
+    (column_mins, column_maxs) = pyramid.column_minmax(yvals, index_boundaries)
+    column_xvals = xvals[index_boundaries[:-1]]
+    xvals_to_draw = np.repeat(column_xvals, 2)
+    yvals_to_draw = np.empty(len(xvals_to_draw), dtype=yvals.dtype)
+    yvals_to_draw[0::2] = column_mins
+    yvals_to_draw[1::2] = column_maxs
+    return (xvals_to_draw, yvals_to_draw)
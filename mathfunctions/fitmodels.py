@@ -2,7 +2,6 @@ import numpy as np
 import scipy.signal as spsig
 from scipy.ndimage import gaussian_filter1d
 import scipy.stats as stats
-import matplotlib.pyplot as plt
 
 """
 _prefit functions are called from fitmodelclass.do_prefit(). They are called with sorted array values on the x-axis.
@@ -52,6 +52,15 @@ def generate_experimental_datalist(path,column):
     errorvar = dataset[:,column+1]
     result = list(zip(independentvar,dependentvar,errorvar))
     return result
+
+def generate_experimental_columns(path,column,curvenumber):
+    # the columnar addData format: one list per quantity instead of one dictionary per point
+    dataset = np.loadtxt(path + "/probCorrByIon.dat",skiprows=5)
+    result = {"curveNumber":curvenumber,
+              "x":dataset[:,0].tolist(),
+              "y":dataset[:,column].tolist(),
+              "yerr":dataset[:,column+1].tolist()}
+    return result
     
 
 def generate_addData_message(datadict_list: list):
@@ -83,12 +92,12 @@ if __name__ == "__main__":
     datapts_list = []
     dictionary_list = []
     for (idx,val) in enumerate(commandlineargs[2:]):
-        exp_points = generate_experimental_datalist(path,int(val))
-        datapts = [{"curveNumber":idx,"xval":x[0],
-                            "yval":x[1],"yerr":x[2]} for x in exp_points]
+        #exp_points = generate_experimental_datalist(path,int(val))
+        #datapts = [{"curveNumber":idx,"xval":x[0],
+        #                    "yval":x[1],"yerr":x[2]} for x in exp_points]
         #datapts_list.append(datapts)
         mymethod = "addData"
-        myparams = {"pointList":datapts}
+        myparams = {"columns":generate_experimental_columns(path,int(val),idx)}
         mymessagedict = {"jsonrpc":"2.0", 
                          "method":mymethod,
                          "params":myparams,
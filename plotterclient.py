@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+Client library for sending data to the plotter.
+
+Plotter keeps its TCP/IP connections open for the whole session, instead of opening
+a new one for every point. The points given to add_points are collected per curve,
+and a background thread sends the points of a curve as one addData message when
+there are flush_num_points of them, or when the oldest of them waited flush_interval
+seconds. So many single points cost about as much as a few large messages.
+
+    with Plotter("127.0.0.1", 5757) as plotter:
+        plotter.set_config(plotTitle = "scan")
+        for x in xvals:
+            plotter.add_points(0, x, measure(x))
+        print(plotter.request("getConfig", {"commandQueue": ""}))
+
+With use_framing, the connections switch to the binary framing of framing.py, which
+has no limit on the length of a message. If the plotter does not know it, the
+usual preamble is used.
+
+With num_connections > 1, the curves are spread over several connections. This is
+only useful with the asyncio server (GUI.py --async), since TCPIPserver reads one
+connection at a time until it sends 00000000. The points of a curve, and the messages
+and requests about it (doFit, getFitResult with its curveNumber, ...), go on the same
+connection, so the plotter gets them in the order in which they were sent. The messages
+that are not about one curve go on the first connection, and the plotter may get them
+before the points that were sent on the other connections, even after flush().
+
+benchmark_plotterclient.py compares this with one connection per point.
+
+ShardedPlotter is the client of shardedplotter.py, where several plotter processes
+each own a part of the curves. It has one Plotter per shard and sends everything
+about a curve to the shard that owns it:
+
+    with ShardedPlotter("127.0.0.1", range(5757, 5757 + 4)) as plotter:
+        plotter.add_points(5, xvals, yvals)
+        plotter.flush()
+        plotter.send_message("doFit", {"fitFunction": "gaussian", "curveNumber": 5, "performFitting": ""})
+        print(plotter.fit_results())
+"""
+
+import socket
+import threading
+import time
+import numpy as np
+import jsoncodec
+import helperfunctions
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class _CurveBuffer():
+    """ The points of one curve that were not sent yet """
+    def __init__(self):
+        self.xval_parts: List[np.ndarray] = []
+        self.yval_parts: List[np.ndarray] = []
+        self.yerr_parts: List[Optional[np.ndarray]] = []
+        self.num_points = 0
+        self.first_point_time = 0.
+
+    def append(self, xvals: np.ndarray, yvals: np.ndarray, yerrs: Optional[np.ndarray]) -> None:
+        if self.num_points == 0:
+            self.first_point_time = time.monotonic()
+        self.xval_parts.append(xvals)
+        self.yval_parts.append(yvals)
+        self.yerr_parts.append(yerrs)
+        self.num_points += len(xvals)
+
+    def columns(self, curvenumber: int) -> dict:
+        """ The columns dictionary of an addData message, with all buffered points """
+        columns_dict = {"curveNumber": curvenumber,
+                        "x": np.concatenate(self.xval_parts),
+                        "y": np.concatenate(self.yval_parts)}
+        if any([yerrs is not None for yerrs in self.yerr_parts]):
+            columns_dict["yerr"] = np.concatenate([yerrs if yerrs is not None else np.zeros_like(xvals)
+                                                   for (xvals, yerrs) in zip(self.xval_parts, self.yerr_parts)])
+        return columns_dict
+
+
+class Plotter():
+    FLUSH_NUM_POINTS = 10000 # the points of a curve are sent when there are this many of them
+    FLUSH_INTERVAL = 0.05 # seconds, the points are sent at the latest after this time
+    CONNECT_TIMEOUT = 5. # seconds
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5757, num_connections: int = 1,
+                 flush_num_points: int = FLUSH_NUM_POINTS, flush_interval: float = FLUSH_INTERVAL,
+                 use_binary_frames: bool = False, compression_name: Optional[str] = None, use_framing: bool = False):
+        """
+        Connects to the plotter and starts the background thread that sends the points.
+        With use_binary_frames, the points are sent as binary array frames instead of JSON.
+        With compression_name (see compression.py), the JSON messages are compressed.
+        With use_framing, the binary framing of framing.py is used if the plotter knows it
+        """
+        self.flush_num_points = flush_num_points
+        self.flush_interval = flush_interval
+        self.use_binary_frames = use_binary_frames
+        self.compression_name = compression_name
+        # the version of the binary framing that the connections use, None for the usual preamble
+        self.frame_version: Optional[int] = None
+        self.connections = [self._connect(host, port) for idx in range(num_connections)]
+        if use_framing:
+            frame_versions = [helperfunctions.negotiate_TCPIP_framing(connection) for connection in self.connections]
+            if None in frame_versions:
+                # the plotter answered with an error and closes the connections, so they are made again
+                for connection in self.connections:
+                    connection.close()
+                self.connections = [self._connect(host, port) for idx in range(num_connections)]
+            else:
+                self.frame_version = min(frame_versions)
+        # one lock per connection, so that the background thread and request() do not mix their messages
+        self.connection_locks = [threading.Lock() for connection in self.connections]
+        self.next_request_id = 1
+
+        self.buffers: Dict[int, _CurveBuffer] = {}
+        self.condition = threading.Condition()
+        self.is_closing = False
+        self.is_flush_requested = False
+        self.num_flushing = 0 # the number of curves whose points were taken out of the buffers, but are not sent yet
+        self.send_error: Optional[BaseException] = None
+        self.num_points_sent = 0
+        self.num_messages_sent = 0
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def __enter__(self) -> "Plotter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def add_points(self, curvenumber: int, xvals, yvals, yerrs = None) -> bool:
+        """
+        Adds points to a curve. xvals, yvals and yerrs can be single numbers or arrays of the
+        same length. The points are sent later by the background thread. Returns False if the
+        points were not added. Raises ConnectionError if sending earlier points failed
+        """
+        self._raise_send_error()
+        # np.array copies the values, so that the caller can change its arrays afterwards
+        xvals = np.array(xvals, dtype=np.float64, ndmin=1).ravel()
+        yvals = np.array(yvals, dtype=np.float64, ndmin=1).ravel()
+        if yerrs is not None:
+            yerrs = np.array(yerrs, dtype=np.float64, ndmin=1).ravel()
+        if (xvals.shape != yvals.shape) or ((yerrs is not None) and (yerrs.shape != xvals.shape)):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "add_points"))
+            print("x values, y values and error bars must have the same length. Not adding anything")
+            return False
+        with self.condition:
+            if self.is_closing:
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "add_points"))
+                print("The connections to the plotter are closed. Not adding anything")
+                return False
+            if curvenumber not in self.buffers:
+                self.buffers[curvenumber] = _CurveBuffer()
+            curve_buffer = self.buffers[curvenumber]
+            curve_buffer.append(xvals, yvals, yerrs)
+            if curve_buffer.num_points >= self.flush_num_points:
+                self.condition.notify_all()
+        return True
+
+    def flush(self) -> None:
+        """ Sends all buffered points now, and returns when they are sent """
+        with self.condition:
+            self.is_flush_requested = True
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: ((len(self.buffers) == 0) and (self.num_flushing == 0)) or (self.send_error is not None))
+        self._raise_send_error()
+
+    def send_message(self, method: str, params: dict, connection_number: Optional[int] = None) -> int:
+        """
+        Sends a JSON-RPC message and returns its id, without waiting for the response (see
+        receive_response). Without connection_number, a message about one curve goes on the
+        connection of its points, and any other message on the first connection
+        """
+        if connection_number is None:
+            connection_number = self.connection_for(params)
+        request_id = self._new_request_id()
+        # the id before the params, so that the points of a large pointList are plotted while they arrive (see streamingdecoder.py)
+        message = {"jsonrpc": "2.0", "method": method, "id": request_id, "params": params}
+        self._send(connection_number, jsoncodec.dumps(message))
+        return request_id
+
+    def request(self, method: str, params: dict, connection_number: Optional[int] = None) -> dict:
+        """
+        Sends a JSON-RPC message after all buffered points, waits for its response and returns
+        it, so the caller finds either "result" or "error" in it. The connection is chosen as
+        for send_message
+        """
+        if connection_number is None:
+            connection_number = self.connection_for(params)
+        self.flush()
+        with self.connection_locks[connection_number]:
+            request_id = self._new_request_id()
+            message = {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+            helperfunctions.send_TCPIP_message(self.connections[connection_number], jsoncodec.dumps(message), True,
+                                               compression_name=self.compression_name, frame_version=self.frame_version)
+            return self._receive_response(request_id, connection_number)
+
+    def receive_response(self, request_id: int, connection_number: int) -> dict:
+        """
+        Waits for the response to the message that send_message sent on this connection and
+        returned request_id for. The responses to other messages that come first are skipped,
+        so it has to be called before the next request on the same connection
+        """
+        with self.connection_locks[connection_number]:
+            return self._receive_response(request_id, connection_number)
+
+    def connection_for(self, params: dict) -> int:
+        """ The number of the connection for a message with these params, see send_message """
+        curvenumber = curvenumber_of_params(params)
+        if curvenumber is None:
+            return 0
+        return curvenumber % len(self.connections)
+
+    def set_config(self, **params) -> int:
+        """ For example set_config(plotTitle = "scan", axisLabels = ["x", "y"]) """
+        self.flush()
+        return self.send_message("setConfig", params)
+
+    def clear(self, **params) -> int:
+        """ For example clear(data = "all") or clear(everything = "") """
+        self.flush()
+        return self.send_message("doClear", params)
+
+    def close(self) -> None:
+        """ Sends the points that are still buffered, ends the session and closes the connections """
+        if self.is_closing:
+            return
+        try:
+            self.flush()
+        finally:
+            with self.condition:
+                self.is_closing = True
+                self.condition.notify_all()
+            self.flush_thread.join()
+            for (connection, connection_lock) in zip(self.connections, self.connection_locks):
+                with connection_lock:
+                    try:
+                        helperfunctions.send_TCPIP_end(connection, self.frame_version)
+                    except OSError:
+                        pass
+                    connection.close()
+
+    def _flush_loop(self) -> None:
+        """ The background thread: sends the buffers that are full or old enough """
+        while True:
+            with self.condition:
+                if not (self.is_flush_requested or self.is_closing):
+                    self.condition.wait(timeout = self._time_to_next_flush())
+                if self.is_closing:
+                    return
+                if self.is_flush_requested:
+                    # flush() waits for all buffers, otherwise only the full or old ones are sent
+                    due_curvenumbers = list(self.buffers.keys())
+                    self.is_flush_requested = False
+                else:
+                    due_time = time.monotonic() - self.flush_interval
+                    due_curvenumbers = [curvenumber for (curvenumber, curve_buffer) in self.buffers.items()
+                                        if (curve_buffer.num_points >= self.flush_num_points) or (curve_buffer.first_point_time <= due_time)]
+                due_buffers = [(curvenumber, self.buffers.pop(curvenumber)) for curvenumber in due_curvenumbers]
+                self.num_flushing = len(due_buffers)
+            try:
+                for (curvenumber, curve_buffer) in due_buffers:
+                    self._send_columns(curve_buffer.columns(curvenumber))
+                    self.num_points_sent += curve_buffer.num_points
+            except Exception as error:
+                # any error, so that flush() raises it instead of waiting for this thread forever
+                self.send_error = error
+            with self.condition:
+                self.num_flushing = 0
+                self.condition.notify_all()
+
+    def _time_to_next_flush(self) -> float:
+        """ Seconds until the oldest buffered points have to be sent """
+        if len(self.buffers) == 0:
+            return self.flush_interval
+        first_point_time = min([curve_buffer.first_point_time for curve_buffer in self.buffers.values()])
+        return max(0., first_point_time + self.flush_interval - time.monotonic())
+
+    def _send_columns(self, columns_dict: dict) -> None:
+        connection_number = columns_dict["curveNumber"] % len(self.connections)
+        if self.use_binary_frames:
+            with self.connection_locks[connection_number]:
+                helperfunctions.send_TCPIP_array_frame(self.connections[connection_number], columns_dict["curveNumber"],
+                                                       columns_dict["x"], columns_dict["y"], columns_dict.get("yerr"),
+                                                       frame_version=self.frame_version)
+        else:
+            message = {"jsonrpc": "2.0", "method": "addData", "params": {"columns": columns_dict}, "id": self._new_request_id()}
+            self._send(connection_number, jsoncodec.dumps(message))
+        self.num_messages_sent += 1
+
+    def _send(self, connection_number: int, message_string: str) -> None:
+        with self.connection_locks[connection_number]:
+            helperfunctions.send_TCPIP_message(self.connections[connection_number], message_string, True,
+                                               compression_name=self.compression_name, frame_version=self.frame_version)
+
+    def _connect(self, host: str, port: int) -> socket.socket:
+        connection = socket.create_connection((host, port), timeout=self.CONNECT_TIMEOUT)
+        connection.settimeout(None)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def _receive_response(self, request_id: int, connection_number: int) -> dict:
+        """ Waits for the response with this id on the connection, the caller holds its lock """
+        # responses to earlier messages that nobody waited for are skipped, and so are the notifications
+        # of subscriptions and the errors without id, which cannot be the response to this request
+        while True:
+            response_string = helperfunctions.receive_TCPIP_message(self.connections[connection_number], frame_version=self.frame_version)
+            if response_string == "":
+                raise ConnectionError("The plotter closed the connection before it answered")
+            response = jsoncodec.loads(response_string)
+            if isinstance(response, dict) and (response.get("id") == request_id):
+                return response
+
+    def _new_request_id(self) -> int:
+        with self.condition:
+            request_id = self.next_request_id
+            self.next_request_id += 1
+        return request_id
+
+    def _raise_send_error(self) -> None:
+        """ Raises ConnectionError if sending failed because of the connection, otherwise the error of the background thread """
+        if self.send_error is None:
+            return
+        if isinstance(self.send_error, (OSError, ValueError)):
+            raise ConnectionError("Sending to the plotter failed: {}".format(self.send_error)) from self.send_error
+        raise self.send_error
+
+
+def curvenumber_of_params(params: dict) -> Optional[int]:
+    """ The curve that a message is about, or None if it is about no curve or about several curves """
+    # curveNumber of doFit and getFitResult, and the curve to clear with doClear
+    for key in ["curveNumber", "data", "plot", "replot"]:
+        if isinstance(params.get(key), int):
+            return params[key]
+    for key in ["dataPoint", "columns"]:
+        if isinstance(params.get(key), dict) and isinstance(params[key].get("curveNumber"), int):
+            return params[key]["curveNumber"]
+    return None
+
+def shard_of_curve(curvenumber: int, num_shards: int) -> int:
+    """ The shard of shardedplotter.py that owns the curve. Consecutive curve numbers are owned by different shards """
+    return curvenumber % num_shards
+
+
+class ShardedPlotter():
+    """
+    One Plotter per shard of shardedplotter.py. The points and the messages about one curve go
+    to the shard that owns the curve (see shard_of_curve), the messages that are not about one
+    curve, like setConfig or doClear with "all", go to all shards
+    """
+    def __init__(self, host: str = "127.0.0.1", ports: Sequence[int] = (5757,), **plotter_options):
+        """ ports are the ports of the shards, in the order of the shards. plotter_options are passed on to Plotter """
+        self.shards = [Plotter(host, port, **plotter_options) for port in ports]
+
+    def __enter__(self) -> "ShardedPlotter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def shard_for(self, curvenumber: int) -> Plotter:
+        return self.shards[shard_of_curve(curvenumber, len(self.shards))]
+
+    def add_points(self, curvenumber: int, xvals, yvals, yerrs = None) -> bool:
+        """ See Plotter.add_points """
+        return self.shard_for(curvenumber).add_points(curvenumber, xvals, yvals, yerrs)
+
+    def flush(self) -> None:
+        """ Sends all buffered points of all shards now, and returns when they are sent """
+        for shard in self.shards:
+            shard.flush()
+
+    def send_message(self, method: str, params: dict) -> List[int]:
+        """
+        Sends a JSON-RPC message to the shards that it is about, without waiting for the responses.
+        The points of a pointList are sent to the shards that own their curves. Returns the ids of
+        the message in the shards that it was sent to
+        """
+        return [shard.send_message(method, shard_params) for (shard, shard_params) in self._split_params(params)]
+
+    def request(self, method: str, params: dict) -> dict:
+        """
+        Sends a JSON-RPC message about one curve to the shard that owns it, and returns its response
+        (see Plotter.request). Raises ValueError if the message is not about one curve, use request_all then
+        """
+        curvenumber = curvenumber_of_params(params)
+        if curvenumber is None:
+            raise ValueError("The params {} are not about one curve, so it is not known which shard has to answer".format(params))
+        return self.shard_for(curvenumber).request(method, params)
+
+    def request_all(self, method: str, params: dict) -> List[dict]:
+        """ Sends the message to all shards, and returns their responses in the order of the shards """
+        # all shards get the message before the first response is awaited, so that they work on it at the same time
+        request_ids = []
+        for shard in self.shards:
+            shard.flush()
+            request_ids.append(shard.send_message(method, params, connection_number=0))
+        return [shard.receive_response(request_id, 0) for (shard, request_id) in zip(self.shards, request_ids)]
+
+    def fit_results(self) -> Dict[str, dict]:
+        """
+        The results of the successful fits of all curves, from all shards, under the keys "curve0",
+        "curve1", etc. (see PlotterCore.all_fit_results)
+        """
+        all_results = {}
+        for response in self.request_all("getFitResult", {"curveNumber": "all"}):
+            all_results.update(response.get("result", {}))
+        return dict(sorted(all_results.items(), key=lambda item: int(item[0][len("curve"):])))
+
+    def set_config(self, **params) -> List[int]:
+        """ See Plotter.set_config. The configuration goes to all shards """
+        self.flush()
+        return self.send_message("setConfig", params)
+
+    def clear(self, **params) -> List[int]:
+        """ See Plotter.clear. Clearing one curve goes to the shard that owns it, everything else to all shards """
+        self.flush()
+        return self.send_message("doClear", params)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    def _split_params(self, params: dict) -> List[Tuple[Plotter, dict]]:
+        """ The shards that the message is about, with the params of the message for each of them """
+        curvenumber = curvenumber_of_params(params)
+        if curvenumber is not None:
+            return [(self.shard_for(curvenumber), params)]
+        if isinstance(params.get("pointList"), list):
+            shard_points = {}
+            for point in params["pointList"]:
+                # a point without a correct curve number goes to the first shard, which tells what is wrong with it
+                is_curvenumber_correct = isinstance(point, dict) and isinstance(point.get("curveNumber"), int)
+                shard_index = shard_of_curve(point["curveNumber"], len(self.shards)) if is_curvenumber_correct else 0
+                shard_points.setdefault(shard_index, []).append(point)
+            return [(self.shards[shard_index], dict(params, pointList=points)) for (shard_index, points) in sorted(shard_points.items())]
+        return [(shard, params) for shard in self.shards]
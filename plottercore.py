@@ -0,0 +1,1431 @@
+# -*- coding: utf-8 -*-
+"""
+The plotter without a display: the curve store, the dispatch of the JSON-RPC
+commands and the fitter.
+
+PlotterCore holds all the state that the commands change, and has a method for
+every command that CommandBuilder makes out of a message (set_curve_number,
+plot_checked_columns, get_fit_result, ...), so it serves the clients of the
+TCP/IP servers completely on its own. It does not import anything from Qt.
+
+A front end shows what happens by overriding the hooks below (_create_curve,
+_show_curve, _show_fit_result, ...), which do nothing here, and the commands that
+only change the plot (set_axis_labels, clear_plot, ...), which are accepted and
+ignored here. MainWindow in GUI.py is such a front end, and headlessplotter.py runs
+PlotterCore on machines without a display.
+"""
+
+import numpy as np
+import socket
+import weakref
+from commandbuilder import Command, CommandBuilder, Request
+from commandqueue import CommandQueue
+from sharedmemoryring import SharedMemoryRingReader
+from fitterclass import GeneralFitter1D
+from fitmodelclass import Fitmodel
+from curvestore import CurveStore
+from subscriptions import SubscriptionManager, EVENTS
+import helperfunctions
+import compression
+from typing import Optional, List, Any, Union
+
+
+class PlotterCore():
+
+    # These are class variables, or effetively constants for our purposes
+    DEFINED_FITFUNCTIONS = ["sinewave","damped_sinewave","gaussian","curvepeak","linearfit","parabolicfit","resonancetrackingzero"]
+    MAX_NUM_CURVES = 50 # This is a large upper limit on the max number of curves that
+                        # can be plotted at the same time
+    COMMAND_QUEUE_SIZE = 1000 # at most this many requests from the network wait for the thread that applies them
+    COMMAND_QUEUE_POLICY = "block" # what to do when the command queue is full, see commandqueue.py
+    COMPRESSION_THRESHOLD = compression.DEFAULT_COMPRESSION_THRESHOLD # bytes, shorter responses are never compressed
+    SHARED_MEMORY_POLL_INTERVAL = 5 # milliseconds between two looks into the shared-memory rings of the producers
+    # a curveAppended notification has the points of at most this many of the appended points, the last ones
+    MAX_NOTIFIED_POINTS = 10000
+
+    def __init__(self):
+        """
+        self.curvestore : the CurveStore instance holding the numerical data (x values,
+            y values and error bars) of every curve, indexed by the curve number
+        self.fitmodel_instance_name : this is a string holding the name of the fitmodel instance, which will have the data and the fit function in one data structure.
+            we need a fitmodel_instance_name for every curve
+        """
+        # The numerical data inputs
+        self.curvestore = CurveStore()
+        # Turns the incoming messages into commands, this is also used on the network worker thread
+        self.command_builder = CommandBuilder(self.MAX_NUM_CURVES)
+        self.fitmodel_instance_name = "fitmodel"
+        # the fit function and the curve that the fit commands are for
+        self.fit_function_name = self.DEFINED_FITFUNCTIONS[0]
+        self.fit_curve_number = None
+
+        self.all_config_names = ["axisLabels",
+                "plotTitle",
+                "retention",
+                "ramBudget",
+                "compressionThreshold",
+                "sharedMemoryRing"] # we don't put the legends here because they kind of belong to individual curves
+
+        # While a JSON-RPC batch is applied, this is the list of the responses to its requests, otherwise None
+        self.batch_responses = None
+        # While the commands of a message from the network are applied, this is its Request, so that
+        # the responses go back to the connection that sent it, with its id. Otherwise None
+        self.current_request = None
+
+        # the requests from the network wait in a bounded queue until they are applied
+        self.command_queue = CommandQueue(self.COMMAND_QUEUE_SIZE, self.COMMAND_QUEUE_POLICY)
+        # the server fills this in with the connections that sent compressed frames, the responses to them are compressed too
+        self.response_compressions = weakref.WeakKeyDictionary()
+        # and with the connections that switched to the binary framing of framing.py, the responses to them are frames
+        self.response_framings = weakref.WeakKeyDictionary()
+        self.compression_threshold = self.COMPRESSION_THRESHOLD
+        # The connections that subscribed to events (see subscriptions.py), each with its own queue
+        # and sender thread, so that the notifications never wait for a slow client
+        self.subscriptions = SubscriptionManager(self._send_to_connection)
+        # The shared-memory rings of producers on this machine (see sharedmemoryring.py), by their names
+        self.shared_memory_rings = {}
+        self.client_communication_socket = None # This will be the socket to use for sending data to the client
+
+    def attach_server(self, aTCPIPserver) -> None:
+        """
+        Lets the server parse the messages on its worker thread, put them into the command queue,
+        and tell which connections use compression and framing
+        """
+        # the messages are parsed, checked and converted to numpy arrays on the worker thread
+        aTCPIPserver.message_parser = self.command_builder.build_request
+        # and the points of large pointList messages are plotted while the rest of the message is still coming
+        aTCPIPserver.point_list_parser = self.command_builder.build_point_list_request
+        aTCPIPserver.command_queue = self.command_queue
+        aTCPIPserver.response_compressions = self.response_compressions
+        aTCPIPserver.response_framings = self.response_framings
+
+    def release_resources(self) -> None:
+        """ Deletes the files of the spilled curves, and stops the command queue, the subscriber threads and the shared-memory rings """
+        # deletes the files of the curves that were spilled to disk
+        self.curvestore.close()
+        # the network thread must not wait for space in the queue anymore
+        self.command_queue.close()
+        self.subscriptions.close()
+        self.set_shared_memory_ring("")
+
+    #========= What a front end shows. There is no display here, MainWindow overrides these
+
+    def _create_curve(self, curvenumber: int) -> None:
+        """ Called before the first points of a curve are added """
+        self.curvestore.create_curve(curvenumber)
+
+    def _show_curve(self, curvenumber: int) -> None:
+        """ Called when the points of the curve changed """
+        return None
+
+    def _show_fit_result(self, curvenumber: int, is_regular_result: bool) -> None:
+        """ Called after the fit of the curve was done, also if it was not successful """
+        return None
+
+    def _register_available_curves(self) -> None:
+        """ Called after curves were cleared """
+        return None
+
+    def _hold_display(self) -> None:
+        """ Called before the commands of a batch are applied """
+        return None
+
+    def _release_display(self) -> None:
+        """ Called after the commands of a batch were applied """
+        return None
+
+    def _start_shared_memory_polling(self) -> None:
+        """ Called when a shared-memory ring was attached, the front end then has to call _poll_shared_memory_rings regularly """
+        return None
+
+    def _stop_shared_memory_polling(self) -> None:
+        """ Called when the last shared-memory ring was detached """
+        return None
+
+    def _select_fit_function(self, fit_function_name: str) -> None:
+        self.fit_function_name = fit_function_name
+
+    def _selected_fit_function(self) -> str:
+        return self.fit_function_name
+
+    def _select_fit_curve(self, curvenumber: int) -> None:
+        self.fit_curve_number = curvenumber
+
+    def _selected_fit_curve(self) -> Optional[int]:
+        return self.fit_curve_number
+
+    #========= Dispatch of the commands and the responses to the clients
+
+    def _register_client_communication_socket(self, socket_arg: socket.socket) -> bool:
+        # the async server gives an AsyncConnection instead of a socket, it also has sendall
+        if not ((socket_arg is None) or hasattr(socket_arg,"sendall")):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_register_client_communication_socket"))
+            print(
+                "The argument you put into this function is not a socket (or something else with a sendall method) or None. Not doing anything")
+            return False
+        self.client_communication_socket = socket_arg
+        return True
+
+    def interpret_message(self,message: str) -> None:
+        """
+        Message is supposed to be a string. 
+        The result is a list of tuples. Each tuple has the form 
+        ("function name",argument)
+        """
+
+        # This should not be needed anymore, because we do not emit these messages anymore
+        #if (message == "Done") or (message == ""):
+        #    return None # This is because somehow socketserver.py sends these things.
+        # TODO: improve the socket server class
+
+        self.apply_commands(self.command_builder.build_commands(message))
+
+    def apply_request(self,request: Request) -> None:
+        """
+        Applies the commands of a request that came via TCP/IP. The responses to it are sent
+        to the connection that sent it and tagged with its id, so that a client can send many
+        requests without waiting for each response
+        """
+        self.current_request = request
+        try:
+            self.apply_commands(request.commands)
+        finally:
+            self.current_request = None
+
+    def apply_queued_requests(self) -> None:
+        """
+        Applies all requests that are in the command queue. Requests that are put into the
+        queue in the meantime are applied with the next commandsavailable signal
+        """
+        for request in self.command_queue.take_all():
+            self.apply_request(request)
+
+    def apply_commands(self,commands: List[Command]) -> None:
+        """
+        Calls the functions of the commands, with their arguments. The commands come 
+        from CommandBuilder.build_commands, which is called directly by interpret_message, 
+        or on the network worker thread for the messages that come via TCP/IP
+        """
+        # IMPORTANT! Be careful with this because this is where the functions from the received
+        #JSON-RPC message get called, but they are not explicitly written with their names
+        # we use metaprogramming here all over the place with setattr and getattr functions
+
+        # the first element of the tuple is always the string name of the function to call
+        # the second element is always the parameter to feed into the function
+        for (command_index, res) in enumerate(commands):
+            function_to_call = getattr(self,res[0],self.nofunction)
+            is_applied = False
+            try:
+                result = function_to_call(res[1])
+                is_applied = True
+            finally:
+                # if a command of a batch raised, the batch must not stay open: the display would stay
+                # held and all later responses would go into it. The batch is answered right away instead
+                if (not is_applied) and (self.batch_responses is not None):
+                    self._abort_batch(commands[command_index + 1:])
+            # inside a batch, remember which requests failed so that they are answered with an error
+            if (self.batch_responses is not None) and (len(self.batch_responses) > 0) and \
+                    ((result is False) or (function_to_call == self.nofunction)):
+                self.batch_responses[-1]["isSuccess"] = False
+        self.message_processed = True
+
+    def _abort_batch(self, remaining_commands: List[Command]) -> None:
+        """
+        Ends the current batch after one of its commands raised. The request of that command and
+        all requests of the batch that were not applied yet are answered with an error
+        """
+        if len(self.batch_responses) > 0:
+            self.batch_responses[-1]["isSuccess"] = False
+        for res in remaining_commands:
+            if res[0] == "end_batch":
+                break
+            if res[0] == "begin_request":
+                self.batch_responses.append({"id": res[1], "isSuccess": False, "response": None})
+        self.end_batch("")
+
+    def begin_batch(self, num_requests: int) -> None:
+        """
+        Starts a JSON-RPC 2.0 batch of num_requests requests. Until end_batch, no curve is
+        redrawn and the responses are collected, so that the whole batch is answered at once
+        """
+        self._hold_display()
+        self.batch_responses = []
+
+    def begin_request(self, request_id: Optional[int]) -> None:
+        """
+        The following commands belong to the request with this id in the current batch.
+        request_id is None if the request was not correct
+        """
+        if self.batch_responses is None:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "begin_request"))
+            print("There is no batch that was started. Not doing anything")
+            return None
+        self.batch_responses.append({"id": request_id, "isSuccess": request_id is not None, "response": None})
+
+    def end_batch(self, dummy_arg: Any) -> bool:
+        """
+        Sends one batch response with a response for each request of the batch, in the same order,
+        and redraws all curves that were changed by the batch at once
+
+        Parameters
+        ----------
+        dummy_arg : Any
+            Not used
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        """
+        if self.batch_responses is None:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "end_batch"))
+            print("There is no batch that was started. Not doing anything")
+            return False
+        response_strings = []
+        for request in self.batch_responses:
+            if request["response"] is not None:
+                # a response that a function like get_fit_result gave
+                response_strings.append(request["response"])
+            elif request["isSuccess"]:
+                response_strings.append(helperfunctions.create_JSONRPC_responsemessage(True, request["id"]))
+            else:
+                response_strings.append(helperfunctions.create_JSONRPC_errormessage(-32000, "Request failed", id_arg=request["id"]))
+        self.batch_responses = None
+        self._release_display()
+        return self._send_to_client(helperfunctions.create_JSONRPC_batchmessage(response_strings))
+
+    def _send_to_client(self, message_string: str) -> bool:
+        """
+        Sends a response to the connection that sent the request being applied, or if it is not
+        known, to the last registered client communication socket. While a batch is being applied,
+        the response is kept for the batch response instead. Returns False if there is nowhere to send it
+        """
+        if (self.batch_responses is not None) and (len(self.batch_responses) > 0):
+            self.batch_responses[-1]["response"] = message_string
+            return True
+        socket_to_send = self._current_connection()
+        if socket_to_send is None:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_send_to_client"))
+            print("Client communication socket unavailable. Not sending any results to the client \n")
+            return False
+        # the sender thread of a subscribed connection also writes to it, so the response goes through its queue
+        subscriber = self.subscriptions.subscriber_for(socket_to_send)
+        if subscriber is not None:
+            subscriber.put_response(message_string)
+            return True
+        self._send_to_connection(socket_to_send, message_string)
+        return True
+
+    def _send_to_connection(self, socket_to_send: Any, message_string: str) -> None:
+        """ Sends the message with the compression and framing that the connection uses. Also called by the sender threads of the subscribers """
+        helperfunctions.send_TCPIP_message(socket_to_send, message_string, True,
+                                           compression_name=self.response_compressions.get(socket_to_send),
+                                           compression_threshold=self.compression_threshold,
+                                           frame_version=self.response_framings.get(socket_to_send))
+
+    def _current_connection(self) -> Any:
+        """ The connection that sent the request being applied, or if it is not known, the last registered client communication socket """
+        if (self.current_request is not None) and (self.current_request.origin is not None):
+            return self.current_request.origin
+        return self.client_communication_socket
+
+    def _current_request_id(self) -> Optional[int]:
+        """ The id of the request being applied (inside a batch, of the current request of the batch), or None """
+        if (self.batch_responses is not None) and (len(self.batch_responses) > 0):
+            return self.batch_responses[-1]["id"]
+        if self.current_request is not None:
+            return self.current_request.request_id
+        return None
+
+    def nofunction(self,verbatim_message: str) -> None:
+        print("Function interpreter.message_interpreter could not determine which function to call based on analyzing the transmitted message. Not calling any function. Here is the message that you transmitted (verbatim): {} \n".format(verbatim_message))
+
+    #========= Fitting
+
+    def perform_fit(self, curvenumber: int) -> bool:
+        """ Fits the curve, and notifies the subscribers of fitCompleted. Returns the result of _make_fit """
+        is_fit_done = self._make_fit(curvenumber)
+        self._publish_fit_completed(curvenumber)
+        return is_fit_done
+
+    def _make_fit(self, current_curve_number: int) -> bool:
+        # the next is the stringname of the current fit_model in use, this
+        # is then used in conjunction with getattr, setattr, etc.
+        fitmodel_instance_stringname = self.fitmodel_instance_name+"{:d}".format(current_curve_number)
+
+        # this is mostly for manual fitting, because then there is no remote commant sent "set_curve_number". so this needs to be done here
+        if not hasattr(self,fitmodel_instance_stringname):
+            self.set_curve_number(current_curve_number)
+        else:
+            # the fit model holds views of the curve data, which have to be refreshed
+            # because points might have arrived since the fit model was created
+            self._load_curve_into_fitmodel(current_curve_number)
+
+        # Now comes the fitting part
+        # 1) Create a fitter instance
+        currentFitter = GeneralFitter1D(getattr(self,fitmodel_instance_stringname))
+        # 2) setup fit
+        result_setupfit = currentFitter.setup_fit()
+
+        if result_setupfit is True:
+            # 3) perform the fit
+            result_dofit = currentFitter.do_fit()
+            if getattr(self,fitmodel_instance_stringname).result_objectivefunction == -1:
+                result_regularplot = False
+            else:
+                result_regularplot = True
+        else:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_make_fit"))
+            print("setup_fit() function from the fitter class returned False. Fitting impossible. Not doing anything \n")
+            return False
+
+        if result_dofit is True:
+            # 4) the front end shows the result, if the fit was successful, and also if it was not
+            self._show_fit_result(current_curve_number, result_regularplot)
+            return True
+        #this else condition will be used if the fit result is not a success
+        else:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_make_fit"))
+            print("do_fit function failed in the fitter. Check other error messages")
+            return False
+
+    def _publish_fit_completed(self, curvenumber: int) -> None:
+        """ Notifies the subscribers of fitCompleted of the result of the fit of the curve, the same result as get_fit_result gives """
+        if not self.subscriptions.is_watched("fitCompleted", curvenumber):
+            return
+        fitmodel_instance_stringname = self.fitmodel_instance_name+"{:d}".format(curvenumber)
+        params = {"curveNumber": curvenumber, "isSuccessful": False, "result": None}
+        if hasattr(self,fitmodel_instance_stringname) and (getattr(self,fitmodel_instance_stringname).is_fit_successful is True):
+            params["isSuccessful"] = True
+            params["result"] = dict(getattr(self,fitmodel_instance_stringname).result_paramdict,
+                                    costfunction=getattr(self,fitmodel_instance_stringname).result_objectivefunction)
+        self.subscriptions.publish("fitCompleted", curvenumber, params)
+
+    #========= The data of the curves
+
+    def _clear_curve_data(self,curvenumber: int) -> bool:
+        """ Deletes the data and the fit model of the curve, and notifies the subscribers of curveCleared """
+        if hasattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber)):
+            delattr(self,self.fitmodel_instance_name+"{:d}".format(curvenumber))
+        is_curve_stored = curvenumber in self.curvestore
+        self.curvestore.remove_curve(curvenumber)
+        if is_curve_stored:
+            self.subscriptions.publish("curveCleared", curvenumber, {"curveNumber": curvenumber})
+        return True
+
+    # The next function is for real-time plotting of data points, 
+    #just as they come in through TCP/IP
+    # this is called directly from interpreter basically!
+    def plot_single_datapoint(self,plot_single_datapoint_arg: dict) -> bool:
+        """
+        Plots a data point as it comes in from the client
+        
+        This function is for real-time plotting of data points, 
+        just as they come in through TCP/IP.
+        This is called directly from the signal-slot mechanism, and the function in 
+        JSONinterpreter.py that calls it is __parse_addData_message()
+                
+        Parameters
+        ----------
+        plot_single_datapoint_arg: dict
+            Required key-value pairs for each plot_single_datapoint_arg: 
+                "curvenumber":int (integer defining to which curve we will add the incoming point) 
+                "xval":float,int (the x-coordinate of the incoming point)
+                "yval":float,int (the y-coordinate of the incoming point)
+            Optional key-value pairs for each plot_single_datapoint_arg: 
+                "xerr":float,int (the horizontal error bar for the incoming point)
+                "yerr":float,int (the vertical error bar for the incoming point)
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        
+        if not self.command_builder.check_datapoint(plot_single_datapoint_arg, "plot_single_datapoint"):
+            return False
+        # If we made it to here, it means that the message into plot_single_datapoint is correct
+
+        this_curvenumber = plot_single_datapoint_arg["curveNumber"]
+        # This is the case when the plot line already exists
+        if this_curvenumber not in self.curvestore:
+            self._create_curve(this_curvenumber)
+
+        self.curvestore[this_curvenumber].append(plot_single_datapoint_arg["xval"],
+                                                 plot_single_datapoint_arg["yval"],
+                                                 plot_single_datapoint_arg.get("yerr"))
+        self.curvestore.enforce_ram_budget()
+        self._show_curve(this_curvenumber)
+        if self.subscriptions.is_watched("curveAppended", this_curvenumber):
+            yerr = plot_single_datapoint_arg.get("yerr")
+            self._publish_curve_appended(this_curvenumber, 1, [plot_single_datapoint_arg["xval"]], [plot_single_datapoint_arg["yval"]],
+                                         [yerr] if yerr is not None else None)
+        return True
+
+    def plot_point_batch(self,plot_point_batch_arg: list) -> bool:
+        """
+        Plots a whole list of data points at once, as they come in with the 
+        pointList key of the addData method
+
+        All points are checked in one pass, grouped by their curve number, and 
+        each group is added to its curve in one go. Every curve that received 
+        points is then redrawn exactly once. Points that fail the checks are 
+        skipped, the others are plotted. 
+        
+        Messages that come from the TCP/IP server are already converted on the
+        network worker thread (see CommandBuilder), and go to plot_checked_columns directly
+                
+        Parameters
+        ----------
+        plot_point_batch_arg: list
+            List of dictionaries, each of them with the same key-value pairs as
+            the argument of plot_single_datapoint
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        grouped_columns = self.command_builder.points_to_columns(plot_point_batch_arg, "plot_point_batch")
+        if grouped_columns is None:
+            return False
+        for columns in grouped_columns.values():
+            self.plot_checked_columns(columns)
+        return True
+
+    def plot_columns(self,plot_columns_arg: dict) -> bool:
+        """
+        Plots many points of one curve that come in columnar format, with the 
+        columns key of the addData method. The columns are converted directly 
+        into numpy arrays and added to the curve in one go, no dictionary per
+        point is ever made
+                
+        Parameters
+        ----------
+        plot_columns_arg: dict
+            Required key-value pairs: 
+                "curveNumber":int (the curve to which the points are added)
+                "x":list of float,int (the x-coordinates of the points)
+                "y":list of float,int (the y-coordinates of the points)
+            Optional key-value pairs: 
+                "yerr":list of float,int (the vertical error bars of the points)
+            All lists must have the same length
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        columns = self.command_builder.convert_columns(plot_columns_arg, "plot_columns")
+        if columns is None:
+            return False
+        return self.plot_checked_columns(columns)
+
+    def plot_checked_columns(self,columns_arg: dict) -> bool:
+        """
+        Adds columns that were already checked and converted to float64 numpy arrays 
+        by CommandBuilder.convert_columns to their curve. This is the only part of 
+        plotting columns that has to run on the thread that applies the commands
+                
+        Parameters
+        ----------
+        columns_arg: dict
+            The same keys as for plot_columns, with numpy arrays as the columns
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        this_curvenumber = columns_arg["curveNumber"]
+        if this_curvenumber not in self.curvestore:
+            self._create_curve(this_curvenumber)
+        self.curvestore[this_curvenumber].extend(columns_arg["x"], columns_arg["y"], columns_arg.get("yerr"))
+        self.curvestore.enforce_ram_budget()
+        self._show_curve(this_curvenumber)
+        if self.subscriptions.is_watched("curveAppended", this_curvenumber):
+            # only the points that go into the notification are made into lists
+            notified = slice(-self.MAX_NOTIFIED_POINTS, None)
+            yerr = columns_arg.get("yerr")
+            self._publish_curve_appended(this_curvenumber, len(columns_arg["x"]), columns_arg["x"][notified].tolist(),
+                                         columns_arg["y"][notified].tolist(), yerr[notified].tolist() if yerr is not None else None)
+        return True
+
+    def _publish_curve_appended(self, curvenumber: int, num_points: int, x: list, y: list, yerr: Optional[list]) -> None:
+        """
+        Notifies the subscribers of curveAppended of the points that were just added to the curve.
+        num_points is the number of points that were added, x, y and yerr are the last MAX_NOTIFIED_POINTS of them
+        """
+        params = {"curveNumber": curvenumber, "numPoints": num_points, "x": x, "y": y}
+        if yerr is not None:
+            params["yerr"] = yerr
+        self.subscriptions.publish("curveAppended", curvenumber, params)
+
+    #========= Functions associated with doClear method
+    # so far defined: "clear_data","clear_config","clear_everything","clear_plot","clear_replot"
+    def clear_everything(self,dummyargument: str) -> bool:
+        """
+        Gets rid of all data that has been send to the fitter and plotter server
+
+        Parameters
+        ----------
+        dummyargument: str
+            Must be an empty string
+
+        Returns
+        -------
+        bool
+            True if it's all good
+            False if an error occurred
+
+        """
+        # we first check that the argument is correct
+        if not isinstance(dummyargument,str):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_everything"))
+            print("You supplied something other than a string as the function argument. Not doing anything \n")
+            return False
+        # this is now to be able to receive the "all" option from the
+        # GUI without causing errors
+        if dummyargument == "all":
+            dummyargument = ""
+        if len(dummyargument.strip()) > 0:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_everything"))
+            print("You supplied a non-empty sring as the function argument. Not doing anything. You must supply an empty string for this to work \n")
+            return False
+        self.clear_data("all")
+        self.clear_config("all")
+        return True
+
+    def clear_data(self,clear_data_arg: Union[int,str]) -> bool:
+        """
+        Remove a particular unit of data from memory. By definition this also clears the plot, otherwise it would be weird to clear the data from memory but retain the plot corresponding to those data
+        
+        Clears whatever curve is asked, meaning the original data, fits. It also runs _register_available_curves
+        at the end so as to make sure that the remaining curves are correctly registered and available for 
+        further processing 
+        
+        Parameters
+        ----------
+        clear_data_arg: int, str
+            If str, it must be "all", which will clear all curves
+            If int, it's the curve number that one wants to clear
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if not isinstance(clear_data_arg, (int,str)):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_data"))
+            print("You supplied something other than an integer or string as the function argument. Not doing anything \n")
+            return False
+
+        if clear_data_arg == "all":
+            self.clear_plot(clear_data_arg) # We first have to clear the plots in this case
+            for idx in range(self.MAX_NUM_CURVES):
+                self._clear_curve_data(idx)
+            self._register_available_curves() # This has to be called anytime curves are deleted
+            return True
+
+        if not isinstance(clear_data_arg,int):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_data"))
+            print(
+                "You supplied something other than all or integer into clear_data. This command cannot be performed \n")
+            return False
+        self.clear_plot(clear_data_arg)
+        self._clear_curve_data(clear_data_arg)
+        self._register_available_curves() # This will clear out the plot number choice box, and then register again what's left
+        return True
+
+    def clear_plot(self,clear_plot_arg: Union[int,str]) -> bool:
+        """ There is no plot to clear here. MainWindow overrides this """
+        return True
+
+    def clear_replot(self,clear_replot_arg: Union[int,str]) -> bool:
+        """ There is no plot to redraw here. MainWindow overrides this """
+        return True
+
+    def clear_config(self,clear_config_arg: str) -> bool:
+        """
+        Removes plot configurations
+        
+        Parameters
+        ----------
+        clear_config_arg: str
+            If str is "all", it will clear the axis labels and the plot title
+            
+            In the future, the goal is to implement clearing axis labels and title separately
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if not isinstance(clear_config_arg, str):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_config"))
+            print("You supplied something other than a string as the function argument. Not doing anything \n")
+            return False
+        if clear_config_arg == "all":
+            for entry in self.all_config_names:
+                getattr(self,"set_"+helperfunctions.replace_capitals_by_underscorelowercase(entry))("")
+            return True
+        elif clear_config_arg in self.all_config_names:
+            getattr(self,"set_"+helperfunctions.replace_capitals_by_underscorelowercase(entry))("")
+            return True
+        else:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "clear_config"))
+            print("Your argument into this function is not all or a name of the configuration that can be cleared, such as plotTitle, or axisLabels. Not doing anything \n")
+            return False
+
+    #End of functions associated with doClear
+    #=========================================
+
+    # The commands below that only change how the plot looks are accepted and ignored here,
+    # so that the same clients work with and without a display. MainWindow overrides them
+
+    def set_axis_labels(self,axis_labels_arg: Union[str,List[str]]) -> bool:
+        return True
+
+    def set_plot_title(self,plot_title_arg: str) -> bool:
+        return True
+
+    def set_plot_legend(self,set_plot_legend_arg: dict) -> bool:
+        return True
+
+    def set_max_frames_per_second(self,max_fps_arg: Union[int,float]) -> bool:
+        return True
+
+    def set_retention(self,retention_arg: Union[str,dict]) -> bool:
+        """
+        Limits how many points each curve keeps, so that the memory stays bounded
+        when data are streamed for a long time. The points with the smallest x values
+        are removed first. The policy of a curve stays in place when the curve is cleared
+        
+        Parameters
+        ----------
+        retention_arg: dict, or a single empty string
+            For each entry: 
+            key: "curve0" or "curve1", or etc. (so the word "curve" with the number 
+                the curve given as a string)
+            value: dict with any of the keys
+                "maxPoints": int, the maximum number of points of the curve
+                "maxAge": int or float, the number of seconds after which a point is removed
+                "maxXWindow": int or float, only the points with x larger than 
+                    (largest x of the curve - maxXWindow) are kept
+                An empty dict removes the policy of this curve
+            Alternatively a single empty string removes the policies of all curves
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if isinstance(retention_arg,str) and (len(retention_arg.strip()) == 0):
+            self.curvestore.clear_retention()
+            return True
+        if not isinstance(retention_arg,dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_retention"))
+            print("The parameter is not a dictionary or an empty string. Not doing anything \n")
+            return False
+
+        possible_policy_keys = {"maxPoints":"max_points", "maxAge":"max_age", "maxXWindow":"max_xwindow"}
+        policies = {}
+        for (key, policy_arg) in retention_arg.items():
+            if (not isinstance(key,str)) or (not key.startswith("curve")) or (not key[len("curve"):].isdigit()) \
+                    or (int(key[len("curve"):]) >= self.MAX_NUM_CURVES):
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_retention"))
+                print("The key {} is not of the form curve0, curve1, etc. with a curve number below {:d}. Not doing anything \n".format(key, self.MAX_NUM_CURVES))
+                return False
+            if (not isinstance(policy_arg,dict)) or (not all([policy_key in possible_policy_keys for policy_key in policy_arg])):
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_retention"))
+                print("The policy of {:s} must be a dictionary with the keys {}. Not doing anything \n".format(key, list(possible_policy_keys.keys())))
+                return False
+            for (policy_key, value) in policy_arg.items():
+                is_valid = (isinstance(value,int) and (value > 0)) if (policy_key == "maxPoints") else \
+                    (isinstance(value,(int,float)) and (value > 0))
+                if isinstance(value,bool) or (not is_valid):
+                    print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_retention"))
+                    print("The value of {:s} for {:s} must be a positive number (an integer for maxPoints). Not doing anything \n".format(policy_key, key))
+                    return False
+            policies[int(key[len("curve"):])] = {possible_policy_keys[policy_key]: value for (policy_key, value) in policy_arg.items()}
+
+        for (curvenumber, policy) in policies.items():
+            self.curvestore.set_retention(curvenumber, **policy)
+            if curvenumber in self.curvestore:
+                self._show_curve(curvenumber)
+        return True
+
+    def set_ram_budget(self,ram_budget_arg: Union[int,float,str]) -> bool:
+        """
+        Sets how much curve data may be held in RAM. When there is more, the curves 
+        that received data least recently are moved into memory-mapped files in a 
+        session directory in the temporary directory of the system. Spilled curves 
+        are plotted and fitted directly from these files. Clearing a curve deletes its files
+        
+        Parameters
+        ----------
+        ram_budget_arg: int, float or a single empty string
+            The RAM budget in megabytes, or an empty string to remove the budget
+            (the curves that are already spilled stay on disk)
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if isinstance(ram_budget_arg,str) and (len(ram_budget_arg.strip()) == 0):
+            self.curvestore.set_ram_budget(None)
+            return True
+        if isinstance(ram_budget_arg,bool) or (not isinstance(ram_budget_arg,(int,float))) or (ram_budget_arg < 0):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_ram_budget"))
+            print("The RAM budget must be a non-negative number of megabytes, or an empty string. Not doing anything \n")
+            return False
+        self.curvestore.set_ram_budget(int(ram_budget_arg * 1024**2))
+        return True
+
+    def set_compression_threshold(self,compression_threshold_arg: Union[int,str]) -> bool:
+        """
+        Sets from which size on the responses are compressed. Only the responses to clients
+        that sent compressed frames themselves are compressed, see compression.py
+        
+        Parameters
+        ----------
+        compression_threshold_arg: int or a single empty string
+            The size in bytes, or an empty string to go back to COMPRESSION_THRESHOLD
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if isinstance(compression_threshold_arg,str) and (len(compression_threshold_arg.strip()) == 0):
+            self.compression_threshold = self.COMPRESSION_THRESHOLD
+            return True
+        if isinstance(compression_threshold_arg,bool) or (not isinstance(compression_threshold_arg,int)) or (compression_threshold_arg < 0):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_compression_threshold"))
+            print("The compression threshold must be a non-negative integer number of bytes, or an empty string. Not doing anything \n")
+            return False
+        self.compression_threshold = compression_threshold_arg
+        return True
+
+    def set_shared_memory_ring(self,ring_name_arg: str) -> bool:
+        """
+        Starts to read the points from the shared-memory ring of a producer on the same machine
+        (see sharedmemoryring.py). The ring is read until the producer closes it
+        
+        Parameters
+        ----------
+        ring_name_arg: str
+            The name of the shared memory of the ring, or an empty string to stop reading all rings
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if not isinstance(ring_name_arg,str):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_shared_memory_ring"))
+            print("The name of the shared-memory ring must be a string. Not doing anything \n")
+            return False
+        if len(ring_name_arg.strip()) == 0:
+            for ring_name in list(self.shared_memory_rings.keys()):
+                self._detach_shared_memory_ring(ring_name)
+            return True
+        if ring_name_arg in self.shared_memory_rings:
+            return True
+        try:
+            self.shared_memory_rings[ring_name_arg] = SharedMemoryRingReader(ring_name_arg)
+        except (FileNotFoundError, ValueError) as error:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_shared_memory_ring"))
+            print("Could not attach to the shared-memory ring {:s}: {}. Not doing anything \n".format(ring_name_arg, error))
+            return False
+        self._start_shared_memory_polling()
+        return True
+
+    def _poll_shared_memory_rings(self) -> None:
+        """ Puts the points that are in the shared-memory rings into their curves """
+        for (ring_name, ring_reader) in list(self.shared_memory_rings.items()):
+            ring_reader.drain(self._plot_shared_memory_columns)
+            if ring_reader.is_finished:
+                self._detach_shared_memory_ring(ring_name)
+
+    def _plot_shared_memory_columns(self, columns_arg: dict) -> None:
+        # the curve number was stored as a float64 in the ring
+        curvenumber = columns_arg["curveNumber"]
+        if (not float(curvenumber).is_integer()) or (curvenumber < 0) or (curvenumber >= self.MAX_NUM_CURVES):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "_plot_shared_memory_columns"))
+            print("The curve number {} in the shared-memory ring is not allowed. Skipping these points".format(curvenumber))
+            return None
+        columns_arg["curveNumber"] = int(curvenumber)
+        self.plot_checked_columns(columns_arg)
+
+    def _detach_shared_memory_ring(self, ring_name: str) -> None:
+        self.shared_memory_rings.pop(ring_name).close()
+        if len(self.shared_memory_rings) == 0:
+            self._stop_shared_memory_polling()
+
+    def set_fit_function(self,fit_function_name: str) -> bool:
+        """
+        Sets the fit function to use in case fitting is called, based on its string name. 
+        The fit function must be defined in fitmodels.py
+                
+        Parameters
+        ----------
+        fit_function_name: str
+            For example it could be "gaussian" or "sinewave", etc. 
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        if isinstance(fit_function_name,str):
+            if fit_function_name in self.DEFINED_FITFUNCTIONS:
+                self._select_fit_function(fit_function_name)
+                #current_curvenumber = self._selected_fit_curve()
+                #current_fitmodel = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber))
+                #current_fitmodel.fitfunction_name = fit_function_name
+                return True
+            else:
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_function"))
+                print("Fit function name {} is not defined \n".format(fit_function_name))
+                return False
+        else: #else the fit function name is not a string, this doesn't work
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_function"))
+            print("You set a fit function name which is not a string. This is not allowed \n")
+            return False
+
+    def set_curve_number(self,curvenumber_arg: int) -> bool:
+        """
+        Sets the curve number to be used in this particular iteration of doFit. 
+        This will then determine the curve which is fitted, and consequently for which 
+        the fit parameters will be given, also possibly cropping, etc. 
+                
+        Parameters
+        ----------
+        curvenumber_arg: int
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        
+        # The goal of this function is to check if the corresponding
+        # curve number exists, and if it does, then it will 
+        # make an instance of Fitmodel class and fill in x values, 
+        # y values, and possibly the error bar values in that instance
+
+
+        # First, we check if the curve number is sensible
+        if not isinstance(curvenumber_arg,int):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
+            print("The curve number parameter must be an integer. What you supplied is this: {}. Not setting curve number".format(curvenumber_arg))
+            return False
+        if curvenumber_arg < 0:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
+            print("You supplied a negative curve number: {}. This is not allowed, not setting any curve number".format(curvenumber_arg))
+            return False
+        if curvenumber_arg not in self.curvestore:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_curve_number"))
+            print("You are asking for curve number {} which does not exist in the data. Fitting is impossible".format(
+                curvenumber_arg))
+            return False
+
+        self._select_fit_curve(curvenumber_arg)
+        # The data are given as views of the curve store columns, so no copy is made here
+        setattr(self,
+                self.fitmodel_instance_name + "{:d}".format(curvenumber_arg),
+                Fitmodel(fitfunction_name=self._selected_fit_function(),
+                         x_axis_vals=self.curvestore[curvenumber_arg].x,
+                         measured_data=self.curvestore[curvenumber_arg].y,
+                         errorbars_data=self.curvestore[curvenumber_arg].err
+                         )
+                )
+        return True
+
+    def _load_curve_into_fitmodel(self, curvenumber_arg: int) -> bool:
+        """
+        Gives the existing fit model of a curve the current data of that curve, 
+        so that the points that arrived after the fit model was created are also fitted
+        """
+        this_fitmodel = getattr(self, self.fitmodel_instance_name + "{:d}".format(curvenumber_arg), None)
+        if (this_fitmodel is None) or (curvenumber_arg not in self.curvestore):
+            return False
+        this_fitmodel.xvals_orig = self.curvestore[curvenumber_arg].x
+        this_fitmodel.yvals_orig = self.curvestore[curvenumber_arg].y
+        this_fitmodel.errorbars_orig = self.curvestore[curvenumber_arg].err
+        return True
+
+    def set_starting_parameters(self,supplied_startparams_dict: dict) -> bool:
+        """
+        Sets the starting parameters for the fitter to be called in this iteration of doFit.  
+                
+        Parameters
+        ----------
+        supplied_startparams_dict: dict
+            The key:value pairs are always in the form str:float,int where the key 
+            is exactly the string name of the parameter defined in the fitting function 
+            in fitmodels.py, and the value is the number giving the starting values of that 
+            parameter for the fitter.
+            
+            Whatever parameters from the fit model are not specified will be handled 
+            by the automatic parameter estimation routine (which, OK, could be good or bad)
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+    
+        # Check if the supplied starting parameters is a dictionary
+        if not isinstance(supplied_startparams_dict, dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters"))
+            print("You put something other than a dictionary for the starting parameters. This is not allowed \n")
+            return False
+        # Check if the values in this dictionary are all numbers (int or float) 
+        if not all([isinstance(val,(int,float)) for val in supplied_startparams_dict.values()]):
+            print("Message from Class {} function {}".format(self.__class__.__name__, "set_starting_parameters"))
+            print("You supplied something other than numbers for startparameters values. This is not allowed \n")
+            return False
+
+        # this current_curvenumber should have been registered before with the curve number parameter
+        # TODO: Check this bug. Apparently it crashes when the fit model has not been registered
+        current_curvenumber = self._selected_fit_curve()
+        for (key,value) in supplied_startparams_dict.items():
+            if key in getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict.keys():
+                getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict[key] = value
+            else:
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters"))
+                print("Warning: your supplied key {} is not among the model parameter keys \n".format(key))
+        return True
+
+    def set_starting_parameters_limits(self, supplied_startparams_lim_dict: dict) -> bool:
+        """
+        Sets the limits on teh starting parameters for the fitter to be 
+        called in this iteration of doFit.  
+                
+        Parameters
+        ----------
+        supplied_startparams_lim_dict: dict
+            The key:value pairs are always in the form str:list where the key 
+            is exactly the string name of the parameter defined in the fitting function 
+            in fitmodels.py, and the value is a list of two either numbers (can be float
+            or integer)
+            
+            Whatever limits are not specified will be filled in by the automatic estimation 
+            routine
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        # check if all startparam limits are dictionaries
+        if not isinstance(supplied_startparams_lim_dict, dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
+            print("You put something other than a dictionary for the starting parameters limits. This is not allowed")
+            return False
+        # check if all values in these dictionaries are lists
+        if not all([isinstance(val,list) for val in supplied_startparams_lim_dict.values()]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
+            print("You supplied something other than lists for start param limit values. This is not allowed")
+            return False
+        # check if 
+        if not all([(len(val) == 2) for val in supplied_startparams_lim_dict.values()]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
+            print("Some of your supplied lists for start param limits are not of length 2.")
+            return False
+        
+        # this current_curvenumber should have been registered before with the curve number parameter
+        current_curvenumber = self._selected_fit_curve()
+        current_startparamdict = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_paramdict
+        for (key,value) in supplied_startparams_lim_dict.items():
+            # Check if the key is in param dict for model and if
+            # the values in the list are numbers
+            if (key in current_startparamdict) and all([isinstance(q,(int,float)) for q in value]):
+                if (value[0] <= current_startparamdict[key]) and (value[1] >= current_startparamdict[key]):
+                    getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curvenumber)).start_bounds_paramdict[key] = value
+                else:
+                    print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
+                    print("The lower bound must be below the initial value and the upper bounds must be above the initial value. It's not the case now. Not setting this supplied key-value pair for bounds: {}".format((key,value)))
+            else:
+                print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_starting_parameters_limits"))
+                print("Your supplied key is not among the model parameter keys or your put something other than numbers as the values for limits. Not setting this key-value pair for bounds: {}".format((key,value)))
+        return True
+
+    def set_crop_limits(self,croplimits_arg: list) -> bool: 
+        """
+        Sets the crop tuple that will be used as limits for fitting. Remember that this
+        will not remove the points from the plot! This will only make sure that the 
+        points beyond the cropping region are not counted in the fit
+                
+        Parameters
+        ----------
+        croplimits_arg: list
+            The list of two values (numbers, so int or float). Remember to always specify two values. 
+            The left one must be smaller than the right one. Also, one can specify -inf or inf for the 
+            left and right limit respectively in order to basically not cut off any data for sure. 
+            
+            This entry is optional, if one doesn't give it, all data for a give curve 
+            are used
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+
+        # make sure that croplimits is a list
+        if not isinstance(croplimits_arg, list):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
+            print("You put something other than a list as crop limits. This is not allowed, not setting any crop limits \n")
+            return False
+        # Check if the list contains two elements and if they are numbers
+
+        croplimits_arg = [np.inf if q == "inf" else q for q in croplimits_arg]
+        croplimits_arg = [-np.inf if q == "-inf" else q for q in croplimits_arg]
+
+        if not (len(croplimits_arg) == 2 and all([isinstance(q,(int,float)) for q in croplimits_arg])):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
+            print("Either the length of your crop limits argument is not 2 or the values you put in are not numbers. This is not allowed, not setting any crop limits. Here is what you put in: {}".format(croplimits_arg))
+            return False
+        # Make sure that the first crop limit is strictly smaller than 
+        # the second one
+        if not croplimits_arg[0] < croplimits_arg[1]:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_crop_limits"))
+            print("The first crop limit must always be smaller than the second crop limit. It's not the case now, not setting any crop limits. Here is what you put in: {}".format(croplimits_arg))
+            return False
+
+        # this curve number should be registered by now
+        current_curve_number = self._selected_fit_curve()
+        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).crop_bounds_list = croplimits_arg
+        return True
+
+    def set_fit_method(self,fitmethod_arg: str) -> bool:
+        """
+        Sets the minimization method from scipy.optimize library that will be used for fitting. 
+        
+        
+        Refer to the documentation of scipy.optimize for details. Have a look also in fitterclass.py
+        to see what exactly has been implemented at any given time, because this data is used in 
+        the do_fit() method of GeneralFitter1D class
+        
+        This function does not check whether the supplied fit (minimization)
+        method actually exists in scipy.optimize! It's up to the user 
+        to make sure to not supply nonsense fit methods, or to check 
+        this further downstream in fitting
+                
+        Parameters
+        ----------
+        fitmethod_arg: str
+            The name of the fitting method to use. It wraps the scipy.optimize methods 
+            Currently we have "minimize", "least_squares", "basinhopping", "differential_evolution", 
+            "shgo", "dual_annealing". "brute_force" is not implemented            
+            
+            If not given, it will default to "least_squares"
+            
+            This function does not check whether the supplied fit (minimization)
+            method actually exists in scipy.optimize! It's up to the user 
+            to make sure to not supply nonsense fit methods, or to check 
+            this further downstream in fitting
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        # we check that the fit method is actually a string
+        if not isinstance(fitmethod_arg, str):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fit_method"))
+            print("You put something other than a string for fit method. This is not allowed. If other settings are OK, the fitter used will be least_squares")
+            return False
+        
+        current_curve_number = self._selected_fit_curve()
+        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).minimization_method_str = fitmethod_arg
+        return True
+
+    def set_fitter_options(self,fitteroptions_arg: dict) -> bool:      
+        """
+        Feeds the options (as keyword arguments) to scipy.optimize algorithm
+        
+        Refer to the documentation of scipy.optimize for details. Note that this program does not check 
+        whether these options actually make sense for the given scipy.optimize algorithm, it's 
+        up to the user to check that out
+                        
+        Parameters
+        ----------
+        fitteroptions_arg: dict
+            The dictionary is passed directly to the scipy.optimize method as keyword arguments. 
+            
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        
+        """
+        
+        # we check that the fit method is actually a dictionary
+        if not isinstance(fitteroptions_arg, dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_fitter_options"))
+            print("You put something other than a dictionary for fitter options. This is not allowed. Not setting any fitter options")
+            return False
+        
+        current_curve_number = self._selected_fit_curve()
+        getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).fitter_options_dict = fitteroptions_arg
+        return True
+
+    def set_monte_carlo_runs(self,montecarloruns_dict_arg: dict) -> bool:
+        """
+        This sets up the self.monte_carlo_inputs dictionary for the fitmodel 
+        and it has to be then 
+        processed with GeneralFitter1D, I think
+        """
+        # make sure that montecarloruns_dict_arg is a dict
+        if not isinstance(montecarloruns_dict_arg, dict):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
+            print("You put something other than a dict to specify Monte Carlo runs. This is not allowed, not doing any Monte Carlo in fitting")
+            return False
+        
+        current_curve_number = self._selected_fit_curve()
+        start_paramdict_fitmodel = getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).start_paramdict
+        
+        for suppliedkey in montecarloruns_dict_arg.keys():
+            # check if the parameters supplied for Monte Carlo fitting correspond to the parameter names for the fit model
+            # If not, ignore those parameters
+            if suppliedkey not in start_paramdict_fitmodel.keys():
+                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
+                print("The parameter name {} that you supplied is not among the parameter names for this fitmodel. Ignoring this parameter".format(suppliedkey))
+                continue
+            # check if for each parameter, the number of Monte Carlo runs is an integer
+            if not isinstance(montecarloruns_dict_arg[suppliedkey], int):
+                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
+                print("For parameter {} in Monte Carlo, you supplied a non-integer number of runs. This is not allowed, ignoring this parameter".format(suppliedkey))
+                continue
+            # Check if for each parameter, the number of Monte Carlo runs is not less than 1 (it's meaningless to have less than 1 Monte Carlo run)
+            if montecarloruns_dict_arg[suppliedkey] < 1:
+                print("Warning from Class {:s} function {:s}".format(self.__class__.__name__, "set_monte_carlo_runs"))
+                print("For parameter {} in Monte Carlo, the number of runs you supplied is less than 1. This is not allowed, ignoring this parameter".format(suppliedkey))
+                continue
+            # If we made it to here, everything is good, and we can save the Monte Carlo setting for this fit parameter    
+            getattr(self,self.fitmodel_instance_name+"{:d}".format(current_curve_number)).monte_carlo_inputs[suppliedkey] = montecarloruns_dict_arg[suppliedkey]
+        return True
+
+    # This function does the fitting
+    def set_perform_fitting(self,emptystring: str) -> bool:
+        """
+        Runs the fitter
+
+        Parameters
+        ----------
+        emptystring: str
+            As specified, this must be an empty string, and it is ignored. It's here
+            only for consistency with all other functions
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+
+        """
+        self.perform_fit(self._selected_fit_curve())
+        return True
+
+    def get_compression(self, dummy_arg: Any) -> bool:
+        """
+        Sends the names of the compression codecs that can be used for compressed frames,
+        and the threshold from which size on the responses are compressed. A client sends 
+        this before it sends compressed frames, a plotter that cannot read them answers with an error
+
+        Parameters
+        ----------
+        dummy_arg : Any
+            Not used
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        """
+        result_dict = {"codecs": compression.available_compressors(), "threshold": self.compression_threshold}
+        return self._send_to_client(helperfunctions.create_JSONRPC_responsemessage(result_dict, id_arg=self._current_request_id()))
+
+    def get_command_queue(self, dummy_arg: Any) -> bool:
+        """
+        Sends the state of the command queue to the client: its policy and maximum size, how many
+        requests are in it, were put into it, dropped and coalesced, and how long they waited (in seconds)
+
+        Parameters
+        ----------
+        dummy_arg : Any
+            Not used
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        """
+        return self._send_to_client(helperfunctions.create_JSONRPC_responsemessage(self.command_queue.metrics(),
+                                                                                   id_arg=self._current_request_id()))
+
+    def get_fit_result(self, arg_int: Union[int,str]) -> bool:
+        """
+        Sends the result of the fit of curve arg_int to the client that asked for it, as
+        a JSON-RPC response with the id of its request, or an error message if there is no result.
+        With arg_int "all", the result is a dictionary with the results of all curves that have a
+        successful fit, under the keys "curve0", "curve1", etc. (see all_fit_results)
+        """
+        if arg_int == "all":
+            return self._send_to_client(helperfunctions.create_JSONRPC_responsemessage(self.all_fit_results(),
+                                                                                       id_arg=self._current_request_id()))
+
+        if not isinstance(arg_int, int):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "get_fit_result"))
+            print(
+                "Your curve number is not an integer. This is not allowed. Not returning any results \n")
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32602,"Curve number not an integer",
+                                                                             id_arg=self._current_request_id()))
+            return False
+
+        if not hasattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)):
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32602,"Curve does not have a fitmodel",
+                                                                             id_arg=self._current_request_id()))
+            return False
+
+        if getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).is_fit_done is False:
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32000,"Fit not done",
+                                                                             id_arg=self._current_request_id()))
+            return False
+
+        if getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).is_fit_successful is False:
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32000,"Fit not successful",
+                                                                             id_arg=self._current_request_id()))
+            return False
+
+        results_dict = getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).result_paramdict
+        results_dict["costfunction"] = getattr(self,self.fitmodel_instance_name+"{:d}".format(arg_int)).result_objectivefunction
+        result_string_back = helperfunctions.create_JSONRPC_responsemessage(results_dict, id_arg=self._current_request_id())
+        return self._send_to_client(result_string_back)
+
+    def all_fit_results(self) -> dict:
+        """
+        The fit parameters and the cost function of every curve whose fit was successful, under the
+        keys "curve0", "curve1", etc. The shards of shardedplotter.py own different curves, so their
+        results are merged by joining these dictionaries
+        """
+        all_results = {}
+        for curvenumber in range(self.MAX_NUM_CURVES):
+            this_fitmodel = getattr(self, self.fitmodel_instance_name+"{:d}".format(curvenumber), None)
+            if (this_fitmodel is None) or (this_fitmodel.is_fit_done is False) or (this_fitmodel.is_fit_successful is False):
+                continue
+            all_results["curve{:d}".format(curvenumber)] = dict(this_fitmodel.result_paramdict,
+                                                                costfunction=this_fitmodel.result_objectivefunction)
+        return all_results
+
+    def subscribe(self, subscribe_arg: dict) -> bool:
+        """
+        Subscribes the connection that sent the request to events, which are then pushed to it
+        as JSON-RPC notifications (see subscriptions.py). The response is the subscription of the
+        connection after this request. The connection has to stay open to receive the notifications,
+        so with TCPIPserver no other client can connect in the meantime, use --async for that
+
+        Parameters
+        ----------
+        subscribe_arg : dict
+            Required key-value pairs:
+                "events": str or list of str, out of "fitCompleted", "curveAppended", "curveCleared"
+            Optional key-value pairs:
+                "curveNumbers": int or list of int, the curves whose events are sent. Without it, the events of all curves are sent
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        """
+        connection = self._current_connection()
+        event_names = subscribe_arg["events"] if isinstance(subscribe_arg["events"], list) else [subscribe_arg["events"]]
+        curvenumbers = subscribe_arg.get("curveNumbers")
+        if (curvenumbers is not None) and (not isinstance(curvenumbers, list)):
+            curvenumbers = [curvenumbers]
+        if connection is None:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "subscribe"))
+            print("Client communication socket unavailable. There is nothing to subscribe \n")
+            return False
+        if (curvenumbers is not None) and not all([self.command_builder.check_curvenumber(curvenumber, "subscribe") for curvenumber in curvenumbers]):
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32602,"Curve number not correct",
+                                                                             id_arg=self._current_request_id()))
+            return False
+        if not self.subscriptions.subscribe(connection, event_names, curvenumbers):
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32602,"Event not known, the events are {}".format(EVENTS),
+                                                                             id_arg=self._current_request_id()))
+            return False
+        return self._send_to_client(helperfunctions.create_JSONRPC_responsemessage(self.subscriptions.subscription_of(connection),
+                                                                                   id_arg=self._current_request_id()))
+
+    def unsubscribe(self, unsubscribe_arg: dict) -> bool:
+        """
+        Unsubscribes the connection that sent the request from events. The response is the
+        subscription of the connection after this request
+
+        Parameters
+        ----------
+        unsubscribe_arg : dict
+            Optional key-value pairs:
+                "events": str or list of str, the events to unsubscribe from. Without it, from all events
+
+        Returns
+        -------
+        bool
+            True if the function finished correctly, False, if there was an error
+            Check error messages for explanations of errors
+        """
+        connection = self._current_connection()
+        event_names = unsubscribe_arg.get("events")
+        if (event_names is not None) and (not isinstance(event_names, list)):
+            event_names = [event_names]
+        if not self.subscriptions.unsubscribe(connection, event_names):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "unsubscribe"))
+            print("The client is not subscribed to any events. Not doing anything \n")
+            self._send_to_client(helperfunctions.create_JSONRPC_errormessage(-32000,"Not subscribed",
+                                                                             id_arg=self._current_request_id()))
+            return False
+        return self._send_to_client(helperfunctions.create_JSONRPC_responsemessage(self.subscriptions.subscription_of(connection),
+                                                                                   id_arg=self._current_request_id()))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+The popup window of the Prefit button, where the starting parameters of a fit are
+tried out on the plot of the data before fitting.
+
+This is separate from fitterclass.py, so that the fitter does not import anything
+from Qt and runs on machines without a display (see headlessplotter.py).
+"""
+import numpy as np
+import pyqtgraph as pg
+import mathfunctions.fitmodels as fitmodels
+from PyQt5 import QtWidgets
+from PyQt5 import QtGui, QtCore
+import helperfunctions
+
+
+class PrefitterDialog(QtWidgets.QWidget):
+    def __init__(self, fitmodel_instance,curvenumber):
+        super().__init__()
+        self.NUMPOINTS_CURVE = 350
+        self.fitmodel = fitmodel_instance       
+        is_preprocess_good = fitmodel_instance.preprocess_data()
+        if is_preprocess_good:
+            is_prefit_good = fitmodel_instance.do_prefit()
+        else:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "__init__"))
+            print("Data preprocessing failed. Apparently something was wrong with the data points sent into the fit model. Not doing prefitting \n")
+            return None
+        if is_prefit_good is False:
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "__init__"))
+            print("Prefit failed. Cannot do any further prefitting \n")
+            return None
+            
+        # not sure here yet...
+        self.preplotdotsymbol = "o"
+        self.preplotcolorpalette = helperfunctions.colorpalette[curvenumber% len(
+            helperfunctions.colorpalette)]  # This is just modulo in colors so that if there are too many plots, they start repeating colors
+        self.preplotsymbolbrush = pg.mkBrush(self.preplotcolorpalette)
+
+        # set window title, layout, and pyqtgraph plotting widget
+        self.setWindowTitle("Prefit dialog")
+        dialoglayout = QtWidgets.QVBoxLayout()
+        self.prefitGraphWidget = pg.PlotWidget()
+        self.prefitGraphWidget.setBackground('w')
+        dialoglayout.addWidget(self.prefitGraphWidget)
+        controlfields_layout = QtWidgets.QGridLayout()
+        self.datastring_fields = []
+        self.datastring_labels = []
+        # Here we set up the prefit GUI by filling 
+        # out the grid of dictionary names and values for a
+        # particular plot
+        for (line_idx,(key, val)) in enumerate(self.fitmodel.start_paramdict.items()):
+            label = QtGui.QLabel(key)
+            field = QtGui.QLineEdit()
+            field.setText(str("{:.06f}".format(val)))
+            field.textEdited.connect(self.update_paramdict)
+            self.datastring_labels.append(label)  # the dictionary labels
+            self.datastring_fields.append(field)
+            controlfields_layout.addWidget(label, line_idx, 0)
+            controlfields_layout.addWidget(field, line_idx, 1)
+
+        dialoglayout.addLayout(controlfields_layout)
+        self.setLayout(dialoglayout)
+
+        # datapointsplot stands for just the data 
+        self.datapointsplot = self.prefitGraphWidget.plot(symbol=self.preplotdotsymbol,
+                                                     symbolBrush=self.preplotsymbolbrush,
+                                                     pen=pg.mkPen(None))
+        self.datapointsplot.setData(self.fitmodel.xvals,
+                                    self.fitmodel.yvals)
+        if self.fitmodel.errorbars is not None:
+            self.errorbars_plot = pg.ErrorBarItem(x=self.fitmodel.xvals, y=self.fitmodel.yvals,
+                                                  top=self.fitmodel.errorbars,
+                                                  bottom=self.fitmodel.errorbars,
+                                                  pen=pg.mkPen(color=self.preplotcolorpalette,
+                                                               style=QtCore.Qt.DashLine))
+            self.prefitGraphWidget.addItem(self.errorbars_plot)
+
+        # curveplot is the plot of the actual curve with whatever
+        # prefit parameters are in there at the moment
+        self.plotcurve = self.prefitGraphWidget.plot(pen=pg.mkPen(self.preplotcolorpalette,
+                                                             style=QtCore.Qt.SolidLine))
+
+        self.makeplot()
+
+    def makeplot(self):
+        paramlist = list(self.fitmodel.start_paramdict.values())
+        aXvalsDense = np.linspace(self.fitmodel.xvals[0], self.fitmodel.xvals[-1], self.NUMPOINTS_CURVE)
+        # NOTE! This is not necessarily good, I just assume here that dictionary order does not change. This may be wrong
+        aYvalsDense = getattr(fitmodels,self.fitmodel.fitfunction_name_string+"_base")(paramlist, aXvalsDense)
+        self.plotcurve.clear()
+        self.plotcurve.setData(aXvalsDense, aYvalsDense)
+
+    def update_paramdict(self, atext):
+
+        # we go though the list of the data fields and check what 
+        # the new values are and set them into the prefit dictionary
+        for idx in range(len(self.datastring_labels)):
+            # if we deleted everything from some line, then it should not plot anything and wait until we inserted a valid parameter guess
+            if self.datastring_fields[idx].text().strip() == "":
+                return None
+            try:
+                input_float = float(self.datastring_fields[idx].text())
+                self.fitmodel.start_paramdict[self.datastring_labels[idx].text()] = input_float
+                self.makeplot()
+            except:
+                print(
+                    "Message from Class {:s} function update_paramdict".format(self.__class__.__name__))
+                print("You typed in value {} as one of the parameters. This is not a numeric input, this is not allowed. Clearing the value \n".format(self.datastring_fields[idx].text()))
+                self.datastring_fields[idx].setText("")
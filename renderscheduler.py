@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Frame-rate limited redrawing of the curves.
+
+Incoming data only mark a curve as dirty. A QTimer then redraws all dirty
+curves at most max_fps times per second, so the cost of drawing depends on
+the screen refresh and not on how fast the messages arrive.
+"""
+
+import time
+from PyQt5 import QtCore
+from typing import Callable, Set
+
+
+class RenderScheduler(QtCore.QObject):
+    """
+    Collects the curve numbers that need to be redrawn and calls
+    redraw_function(curvenumber) for each of them on every frame.
+
+    If drawing a frame takes longer than the frame budget (1/fps), the frame
+    rate is lowered, down to MIN_FPS, so that the GUI thread still has time
+    to process incoming data. When frames are fast again, the frame rate
+    goes back up to max_fps
+    """
+    MIN_FPS = 2.
+    SLOWDOWN_FACTOR = 1.5 # by how much the fps are divided when a frame overruns its budget
+    SPEEDUP_FACTOR = 1.1 # by how much the fps are multiplied when a frame takes less than half of its budget
+
+    def __init__(self, redraw_function: Callable[[int], None], max_fps: float = 30., parent = None):
+        super().__init__(parent)
+        self.redraw_function = redraw_function
+        self.max_fps = float(max_fps)
+        self.current_fps = float(max_fps)
+        self.dirty_curves: Set[int] = set()
+        self.last_frame_duration = 0.
+        self.num_frames = 0
+        self.is_held = False # while held, curves are only marked dirty, and drawn after release()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def set_max_fps(self, max_fps: float) -> bool:
+        if (not isinstance(max_fps, (int, float))) or (max_fps < self.MIN_FPS):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "set_max_fps"))
+            print("The maximum frame rate must be a number not smaller than {}. Not changing anything".format(self.MIN_FPS))
+            return False
+        self.max_fps = float(max_fps)
+        self.current_fps = float(max_fps)
+        return True
+
+    def mark_dirty(self, curvenumber: int) -> None:
+        """ Schedules the curve to be redrawn with the next frame """
+        self.dirty_curves.add(curvenumber)
+        if (not self.is_held) and (not self.timer.isActive()):
+            self.timer.start(int(1000. / self.current_fps))
+
+    def hold(self) -> None:
+        """ Stops redrawing until release(), for example while a batch of commands is applied """
+        self.is_held = True
+        self.timer.stop()
+
+    def release(self) -> None:
+        """ Redraws all curves that became dirty while the scheduler was held, in one single frame """
+        self.is_held = False
+        self.flush()
+
+    def discard(self, curvenumber: int) -> None:
+        """ Forgets about a pending redraw, for example because the curve was cleared """
+        self.dirty_curves.discard(curvenumber)
+
+    def flush(self) -> None:
+        """ Redraws all dirty curves now, and adapts the frame rate to how long that took """
+        if self.is_held or (not self.dirty_curves):
+            return
+        curves_to_draw = self.dirty_curves
+        self.dirty_curves = set()
+        start_time = time.perf_counter()
+        for curvenumber in sorted(curves_to_draw):
+            self.redraw_function(curvenumber)
+        self.last_frame_duration = time.perf_counter() - start_time
+        self.num_frames += 1
+
+        frame_budget = 1. / self.current_fps
+        if self.last_frame_duration > frame_budget:
+            self.current_fps = max(self.current_fps / self.SLOWDOWN_FACTOR, self.MIN_FPS)
+        elif self.last_frame_duration < 0.5 * frame_budget:
+            self.current_fps = min(self.current_fps * self.SPEEDUP_FACTOR, self.max_fps)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Serves the curves from several processes, so that receiving, parsing, storing and
+fitting are not limited by the GIL of one Python process.
+
+Each shard is a process running a HeadlessPlotter (see headlessplotter.py) with its own
+TCP/IP listener, shard number i on the port PORT + i. The curves are divided among the
+shards by plotterclient.shard_of_curve, and each shard owns its curves: the points, the
+fits and the fit results of a curve are all in the shard that owns it. The clients use
+plotterclient.ShardedPlotter, which sends everything about a curve to its shard, sends
+the configuration to all shards, and fans the queries about all curves (fit_results,
+request_all) out to all shards and merges the answers.
+
+    python shardedplotter.py [--shards=<number, default: number of cores>] [--port=<first port>]
+        and the options of headlessplotter.py, which are passed on to all shards
+
+benchmark_shardedplotter.py compares the throughput with different numbers of shards.
+"""
+
+import multiprocessing
+import os
+import sys
+import headlessplotter
+from typing import List
+
+
+def shard_sysargs(sysargs: List[str], shard_index: int, first_port: int) -> List[str]:
+    """ The command line options for a shard: those of the sharded plotter, with the port of this shard """
+    return [sysarg for sysarg in sysargs if not sysarg.startswith(("--shards=", "--port="))] + \
+        ["--port={:d}".format(first_port + shard_index)]
+
+def start_shards(num_shards: int, first_port: int, sysargs: List[str]) -> List[multiprocessing.Process]:
+    """ Starts the processes of the shards, shard i listens on first_port + i """
+    shard_processes = [multiprocessing.Process(target=headlessplotter.runHeadlessPlotter,
+                                               args=(shard_sysargs(sysargs, shard_index, first_port),),
+                                               name="shard{:d}".format(shard_index))
+                       for shard_index in range(num_shards)]
+    for shard_process in shard_processes:
+        shard_process.start()
+    return shard_processes
+
+def runShardedPlotter(sysargs):
+
+    PORT = 5757
+    num_shards = os.cpu_count() or 1
+    for sysarg in sysargs:
+        if sysarg.startswith("--port="):
+            PORT = int(sysarg[len("--port="):])
+        if sysarg.startswith("--shards="):
+            num_shards = int(sysarg[len("--shards="):])
+    if num_shards < 1:
+        print("Message from function {:s}".format("runShardedPlotter"))
+        print("The number of shards must be at least 1, you gave {:d}. Not starting anything".format(num_shards))
+        return None
+
+    shard_processes = start_shards(num_shards, PORT, sysargs)
+    print("{:d} shards listen on the ports {:d} to {:d}".format(num_shards, PORT, PORT + num_shards - 1))
+    try:
+        for shard_process in shard_processes:
+            shard_process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the shards too, so they end by themselves after releasing their resources
+        for shard_process in shard_processes:
+            shard_process.join(timeout=5.)
+            if shard_process.is_alive():
+                shard_process.terminate()
+    print("done with the sharded plotter")
+
+
+if __name__ == "__main__":
+    runShardedPlotter(sys.argv)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Shared-memory transport for producers that run on the same machine as the plotter.
+
+Each producer makes its own SharedMemoryRingWriter, which is a ring buffer of
+float64 records (curve number, x value, y value, y error bar or NaN if the producer
+gave none) in a block of
+multiprocessing.shared_memory, and tells the plotter its name with
+register(socket), which sends setConfig {"sharedMemoryRing": name}. The plotter
+attaches a SharedMemoryRingReader to it and polls it, and the records go from the
+ring straight into the curve storage, without JSON, sockets or Python lists.
+
+There is exactly one writer (the producer) and one reader (the plotter) per ring,
+so no lock is needed. The writer only changes the write index, the reader only
+changes the read index, and both only ever grow; the position in the ring is the
+index modulo the capacity. The writer fills the records before it moves the write
+index, and the reader copies the records before it moves the read index. numpy has
+no memory barriers, so this relies on stores becoming visible in program order,
+as they do on x86.
+
+The data of the ring and the JSON messages of the same producer are not ordered
+with respect to each other.
+
+The producer may close its ring before the plotter attached to it, for example right
+after register and write. So closing the writer does not free the shared memory: the
+side that closes last frees it. That is the reader once the writer closed the ring, or
+the writer if the reader already detached. Each side stores its own flag in the header
+and then loads the flag of the other side. If both see the flag of the other one, both
+free the shared memory, which is harmless. numpy has no atomic operations to make one
+owner word of the two flags, and even x86 may load before the store of the same side is
+visible, so if both sides close at the same moment, neither may see the other flag, and
+the ring is not freed. Such a ring, and a ring that no reader ever attaches to, stays in
+/dev/shm until the machine restarts, or until it is attached and read.
+"""
+
+import time
+import numpy as np
+import jsoncodec
+import helperfunctions
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+RING_MAGIC = 0x474e4952 # "RING"
+RECORD_NUM_VALUES = 4 # curve number, x value, y value, y error bar (NaN if not given)
+RECORD_DTYPE = np.dtype("<f8")
+# the header is three cache lines of int64, so that the indices of the writer
+# and the reader are not in the same cache line
+HEADER_NUM_VALUES = 24
+HEADER_NBYTES = HEADER_NUM_VALUES * 8
+MAGIC_POSITION = 0
+CAPACITY_POSITION = 1
+IS_CLOSED_POSITION = 2
+READER_STATE_POSITION = 3
+WRITE_INDEX_POSITION = 8
+READ_INDEX_POSITION = 16
+
+# the values of the reader state in the header
+READER_NOT_ATTACHED = 0
+READER_ATTACHED = 1
+READER_DETACHED = 2
+
+# the names of the rings that were made by this process
+_names_of_written_rings = set()
+
+
+def _unregister_from_resource_tracker(a_shared_memory: shared_memory.SharedMemory) -> None:
+    """ Without this, the resource tracker of this process deletes the shared memory when the process exits """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(a_shared_memory._name, "shared_memory")
+    except (ImportError, AttributeError):
+        pass
+
+def _unlink(a_shared_memory: shared_memory.SharedMemory) -> None:
+    """ Frees a shared memory that this process is not registered for anymore, unlink unregisters it again """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(a_shared_memory._name, "shared_memory")
+    except (ImportError, AttributeError):
+        pass
+    try:
+        a_shared_memory.unlink()
+    except FileNotFoundError:
+        # the other side freed it at the same time
+        _unregister_from_resource_tracker(a_shared_memory)
+
+
+class SharedMemoryRing():
+    """ The layout of the ring in the shared memory, which is the same for the writer and the reader """
+    def __init__(self, a_shared_memory: shared_memory.SharedMemory):
+        self.shared_memory = a_shared_memory
+        self.header = np.ndarray((HEADER_NUM_VALUES,), dtype=np.int64, buffer=self.shared_memory.buf)
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    @property
+    def capacity(self) -> int:
+        return int(self.header[CAPACITY_POSITION])
+
+    def __len__(self) -> int:
+        """ The number of records that were written and not read yet """
+        return int(self.header[WRITE_INDEX_POSITION] - self.header[READ_INDEX_POSITION])
+
+    def _map_records(self, capacity: int) -> None:
+        self.records = np.ndarray((capacity, RECORD_NUM_VALUES), dtype=RECORD_DTYPE,
+                                  buffer=self.shared_memory.buf, offset=HEADER_NBYTES)
+
+    @staticmethod
+    def _parts(ring_start: int, num_records: int, capacity: int, data_start: int = 0) -> list:
+        """ (start in the ring, number of records, start in the data) of the one or two parts of a range of the ring """
+        num_first = min(num_records, capacity - ring_start)
+        parts = [(ring_start, num_first, data_start)]
+        if num_records > num_first:
+            parts.append((0, num_records - num_first, data_start + num_first))
+        return parts
+
+    def _release(self) -> None:
+        # the numpy arrays must not use the buffer anymore when the shared memory is closed
+        self.header = None
+        self.records = None
+        self.shared_memory.close()
+
+
+class SharedMemoryRingWriter(SharedMemoryRing):
+    """ The producer side: makes the ring and writes the points into it """
+    WAIT_INTERVAL = 0.0005 # seconds between two looks whether there is space in a full ring
+
+    def __init__(self, capacity: int = 2**20, name: Optional[str] = None):
+        super().__init__(shared_memory.SharedMemory(name=name, create=True,
+                                                    size=HEADER_NBYTES + capacity * RECORD_NUM_VALUES * RECORD_DTYPE.itemsize))
+        self.header[:] = 0
+        self.header[MAGIC_POSITION] = RING_MAGIC
+        self.header[CAPACITY_POSITION] = capacity
+        self._map_records(capacity)
+        _names_of_written_rings.add(self.name)
+
+    def write(self, curvenumber: int, xvals, yvals, yerrs = None, timeout: Optional[float] = None) -> int:
+        """
+        Writes the points of one curve into the ring. If the ring is full, this waits until the
+        reader made space, at most timeout seconds if timeout is given. Returns the number of points written
+        """
+        xvals = np.ravel(np.asarray(xvals, dtype=RECORD_DTYPE))
+        yvals = np.ravel(np.asarray(yvals, dtype=RECORD_DTYPE))
+        # without error bars, the reader gives the points without the yerr column
+        yerrs = np.full_like(xvals, np.nan) if yerrs is None else np.ravel(np.asarray(yerrs, dtype=RECORD_DTYPE))
+        if (yvals.shape != xvals.shape) or (yerrs.shape != xvals.shape):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "write"))
+            print("x values, y values and error bars must have the same length. Not writing anything")
+            return 0
+        capacity = self.capacity
+        num_points = len(xvals)
+        num_written = 0
+        start_time = time.perf_counter()
+        while num_written < num_points:
+            write_index = int(self.header[WRITE_INDEX_POSITION])
+            num_free = capacity - (write_index - int(self.header[READ_INDEX_POSITION]))
+            if num_free == 0:
+                if (timeout is not None) and (time.perf_counter() - start_time > timeout):
+                    break
+                time.sleep(self.WAIT_INTERVAL)
+                continue
+            num_new = min(num_free, num_points - num_written)
+            # the free space can go over the end of the ring, then it is written in two parts
+            for (ring_start, num_part, data_start) in self._parts(write_index % capacity, num_new, capacity, num_written):
+                block = self.records[ring_start:ring_start + num_part]
+                block[:, 0] = curvenumber
+                block[:, 1] = xvals[data_start:data_start + num_part]
+                block[:, 2] = yvals[data_start:data_start + num_part]
+                block[:, 3] = yerrs[data_start:data_start + num_part]
+            num_written += num_new
+            # only now the reader can see the new records
+            self.header[WRITE_INDEX_POSITION] = write_index + num_new
+        return num_written
+
+    def register(self, socket_to_send) -> None:
+        """ Tells the plotter on the other end of the socket to read this ring """
+        message = {"jsonrpc": "2.0", "method": "setConfig", "params": {"sharedMemoryRing": self.name}, "id": 0}
+        helperfunctions.send_TCPIP_message(socket_to_send, jsoncodec.dumps(message), True)
+
+    def close(self) -> None:
+        """
+        Tells the reader that nothing more comes. The reader still reads the records that
+        are in the ring, also if it attaches only later, and then frees the shared memory.
+        If the reader already detached, nobody reads the ring anymore and it is freed here
+        """
+        self.header[IS_CLOSED_POSITION] = 1
+        is_reader_detached = (self.header[READER_STATE_POSITION] == READER_DETACHED)
+        _names_of_written_rings.discard(self.name)
+        self._release()
+        if is_reader_detached:
+            _unlink(self.shared_memory)
+        else:
+            # the ring must outlive this process until the reader has read it
+            _unregister_from_resource_tracker(self.shared_memory)
+
+
+class SharedMemoryRingReader(SharedMemoryRing):
+    """ The plotter side: attaches to the ring of a producer and takes the records out of it """
+    def __init__(self, name: str):
+        a_shared_memory = shared_memory.SharedMemory(name=name)
+        # The writer owns the shared memory until it closes the ring. Without this, the
+        # resource tracker of this process would delete it when the plotter exits
+        if name not in _names_of_written_rings:
+            _unregister_from_resource_tracker(a_shared_memory)
+        super().__init__(a_shared_memory)
+        if self.header[MAGIC_POSITION] != RING_MAGIC:
+            self._release()
+            raise ValueError("The shared memory {:s} is not a ring of SharedMemoryRingWriter".format(name))
+        self._map_records(self.capacity)
+        self.header[READER_STATE_POSITION] = READER_ATTACHED
+
+    @property
+    def is_finished(self) -> bool:
+        """ True if the writer closed the ring and everything was read """
+        return bool(self.header[IS_CLOSED_POSITION]) and (len(self) == 0)
+
+    def drain(self, columns_function: Callable[[dict], None], max_records: Optional[int] = None) -> int:
+        """
+        Gives all records in the ring (at most max_records) to columns_function, as columns
+        dictionaries {"curveNumber": float, "x": array, "y": array, "yerr": array}, one for
+        each curve and contiguous part of the ring. "yerr" is left out if none of the points
+        has an error bar, and the points without one have 0 if others have one. The arrays are
+        views of the ring, so columns_function must copy them (CurveData.extend does).
+        Returns the number of records
+        """
+        read_index = int(self.header[READ_INDEX_POSITION])
+        num_records = int(self.header[WRITE_INDEX_POSITION]) - read_index
+        if max_records is not None:
+            num_records = min(num_records, max_records)
+        if num_records <= 0:
+            return 0
+        capacity = self.capacity
+        for (ring_start, num_part, data_start) in self._parts(read_index % capacity, num_records, capacity):
+            block = self.records[ring_start:ring_start + num_part]
+            curvenumbers = block[:, 0]
+            if np.all(curvenumbers == curvenumbers[0]):
+                # the usual case, all points of the part belong to the same curve
+                columns_function(self._columns(curvenumbers[0], block))
+                continue
+            for curvenumber in np.unique(curvenumbers):
+                columns_function(self._columns(curvenumber, block[curvenumbers == curvenumber]))
+        # only now the writer can overwrite the records
+        self.header[READ_INDEX_POSITION] = read_index + num_records
+        return num_records
+
+    @staticmethod
+    def _columns(curvenumber: float, block: np.ndarray) -> dict:
+        columns = {"curveNumber": curvenumber, "x": block[:, 1], "y": block[:, 2]}
+        is_yerr_missing = np.isnan(block[:, 3])
+        if not np.all(is_yerr_missing):
+            columns["yerr"] = np.where(is_yerr_missing, 0., block[:, 3]) if np.any(is_yerr_missing) else block[:, 3]
+        return columns
+
+    def close(self) -> None:
+        """ Detaches from the ring. If the writer closed it already, nobody uses it anymore and it is freed """
+        self.header[READER_STATE_POSITION] = READER_DETACHED
+        is_writer_closed = bool(self.header[IS_CLOSED_POSITION])
+        self._release()
+        if is_writer_closed:
+            _unlink(self.shared_memory)
@@ -5,14 +5,30 @@ Created on Fri Aug 21 12:31:46 2020
 @author: Oleksiy
 """
 import socket 
+import weakref
+import jsoncodec
+import compression
+import framing
+import numpy as np
 from threading import Thread, Lock
 from functools import partial
 from helperfunctions import create_JSONRPC_errormessage, send_TCPIP_message
+from helperfunctions import BINARY_FRAME_MARKER, BINARY_FRAME_DTYPE, MAX_BINARY_FRAME_POINTS
+from commandbuilder import Command, Request
+from streamingdecoder import PointListStreamDecoder
+from typing import Optional
 
 
 class TCPIPserver():
-    def __init__(self,HOST,PORT,buffersize=2048,numconnections=5):
-        self.buffersize = buffersize
+    # messages up to this size are received into one bytearray that is reused for all messages,
+    # larger messages get their own bytearray, so that it is freed after the message
+    MAX_REUSED_BUFFER_SIZE = 16*1024**2
+    # messages of at least this size are decoded while they are received, if there is a point_list_parser
+    STREAMING_MESSAGE_LENGTH = 4*1024**2
+    STREAM_CHUNK_SIZE = 1024**2
+
+    def __init__(self,HOST,PORT,buffersize=65536,numconnections=5):
+        self.buffersize = buffersize # the maximum number of bytes asked from the socket in one recv_into call
         self.numconnections = numconnections
         self.serversocket = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
         self.serversocket.bind((HOST,PORT))
@@ -20,6 +36,24 @@ class TCPIPserver():
         self.reportedLengthMessage = True
 
         self.received_msg_str = ""
+        self.receive_buffer = bytearray(self.buffersize)
+        # if this is set (to a function that takes the message string and the connection it came from, and
+        # returns a commandbuilder.Request), the messages are parsed on the worker thread and emitted with
+        # newcommands instead of newdata
+        self.message_parser = None
+        # if this is set to a commandqueue.CommandQueue, the parsed requests are put into it instead
+        # of being emitted one by one, and workersignals.commandsavailable tells the GUI to take them
+        self.command_queue = None
+        # if this is set (to a function that takes a list of points and the connection they came from, and
+        # returns a commandbuilder.Request), the points of large pointList messages are emitted in batches
+        # while the message is still being received, see streamingdecoder.py
+        self.point_list_parser = None
+        # the connections that sent compressed frames, with the name of the codec they used.
+        # The responses to them are compressed the same way
+        self.response_compressions = weakref.WeakKeyDictionary()
+        # the connections that switched to the binary framing of framing.py, with the negotiated
+        # version. The responses to them are sent as frames too
+        self.response_framings = weakref.WeakKeyDictionary()
 
         #self.lock_for_transmission = Lock() # this is basically in order to get results
         # from the fitter without something else happening in the meantime
@@ -43,18 +77,48 @@ class TCPIPserver():
             NUM_BYTES_PREAMBLE = 8 # Preamble is a string of exactly 8 characters, just at the beginning of the main message
             # those characters are converted into an integer, which determines how many bytes will be read
             # Remember that in this case the socket is basically hanging in the while True loop until 00000000 is received
+            is_socket_registered = False
             while True:
 
                 try:
-                    preamble_bytes = socket_in.recv(NUM_BYTES_PREAMBLE)
-                    preamble_str = preamble_bytes.decode(encoding=encoding)
-                    # If the communication has finished or we got an illegal preamble, we send error message back
-                    # If the preamble is not convertible to an integer: "Illegal preamble"
-                    message_length = int(preamble_str)
-                    if message_length == 0: # this signifies that communication is finished in this session
-                        socket_in.close()
-                        workersignals.set_client_communication_socket.emit(None) # This is done to reset the client communication socket
-                        return True
+                    preamble_str = self._receive_message_string(socket_in, NUM_BYTES_PREAMBLE, encoding)
+                    # Binary array frames have a letter instead of the first digit 
+                    if preamble_str.startswith(BINARY_FRAME_MARKER):
+                        if self.binary_frame_parser(socket_in, int(preamble_str[1:]), workersignals, encoding) is False:
+                            raise ValueError("Illegal binary frame")
+                        if not is_socket_registered:
+                            workersignals.set_client_communication_socket.emit(socket_in)
+                            is_socket_registered = True
+                        continue
+                    # The hello preamble switches the connection to the binary framing for the rest of the session
+                    if preamble_str.startswith(framing.HELLO_MARKER):
+                        frame_version = framing.negotiated_version(preamble_str)
+                        if frame_version is None:
+                            raise ValueError("Illegal hello preamble")
+                        socket_in.sendall(framing.hello_preamble(frame_version).encode(encoding = encoding))
+                        self.response_framings[socket_in] = frame_version
+                        return self.framed_parser(socket_in, frame_version, workersignals, encoding)
+                    # Compressed frames have the marker of their codec instead of the first digit
+                    compressor = compression.get_compressor_for_marker(preamble_str[0])
+                    if compressor is not None:
+                        result = self._receive_compressed_message(socket_in, int(preamble_str[1:]), compressor, encoding)
+                        self.response_compressions[socket_in] = compressor.name
+                    else:
+                        # If the communication has finished or we got an illegal preamble, we send error message back
+                        # If the preamble is not convertible to an integer: "Illegal preamble"
+                        message_length = int(preamble_str)
+                        if message_length == 0: # this signifies that communication is finished in this session
+                            socket_in.close()
+                            workersignals.set_client_communication_socket.emit(None) # This is done to reset the client communication socket
+                            return True
+                        # the message is received as a whole, even if the socket gives it in several pieces
+                        result = self._receive_message(socket_in, message_length, workersignals, encoding)
+                except ConnectionError:
+                    print("Message from Class {:s} function clientsocket_parser: the client closed the connection without sending 00000000".format(
+                        self.__class__.__name__))
+                    socket_in.close()
+                    workersignals.set_client_communication_socket.emit(None)
+                    return False
                 except:
                     print(
                         """Message from Class {:s} function clientsocket_parser: 
@@ -65,44 +129,249 @@ class TCPIPserver():
                     socket_in.close()
                     workersignals.set_client_communication_socket.emit(None)
                     return False
-                
-                full_message_bytes = "".encode("utf-8")
-
-                # this loop receives the message in chunks, of length at most self.buffersize
-                while True:
-                    # if message length is less than buffersize, read it in one chunk and leave the loop
-                    if (message_length <= self.buffersize):
-                        data_bytes = socket_in.recv(message_length)
-                        full_message_bytes += data_bytes
-                        break
-                    # if message length is greater than buffersize, receive it in chunks
-                    else:
-                        data_bytes = socket_in.recv(self.buffersize)
-                        full_message_bytes += data_bytes
-                        message_length -= self.buffersize # we subtract the number of already received bytes
+
                 # Here the data is decoded into a string and sent to the main program via the emit() function, but
                 #note that the code is still sitting in the outer while True loop waiting for 00000000 to exit the function 
-                result = full_message_bytes.decode(encoding = encoding)
-                workersignals.set_client_communication_socket.emit(socket_in)
-                workersignals.newdata.emit(result)
+                # the socket only has to be registered once per session, not for every message
+                if not is_socket_registered:
+                    workersignals.set_client_communication_socket.emit(socket_in)
+                    is_socket_registered = True
+                self._emit_message(result, workersignals, socket_in)
 
         # TODO: Implement the case for messages without reported length
         # ======= The one without reported length messages is not yet implemented well
         # this is now the case when the message length is not reported in advance.
         # This is generally the preferred and cleaner way
         else:
-            # first create an empty string, to which we will be adding data to save the full message
-            full_message_bytes = "".encode("utf-8")
+            # the buffer is doubled whenever it is full, so receiving is linear in the message length
+            full_message_buffer = bytearray(self.buffersize)
+            num_received = 0
             while True:
-                data_bytes = socket_in.recv(self.buffersize)
-                if not data_bytes: # we stop receiving the message when the other side closed the connection
+                if num_received == len(full_message_buffer):
+                    full_message_buffer.extend(bytes(len(full_message_buffer)))
+                with memoryview(full_message_buffer) as buffer_view:
+                    num_new = socket_in.recv_into(buffer_view[num_received:], min(len(full_message_buffer) - num_received, self.buffersize))
+                if num_new == 0: # we stop receiving the message when the other side closed the connection
                     break
-                full_message_bytes += data_bytes
+                num_received += num_new
             socket_in.close()
-            result = full_message_bytes.decode(encoding = encoding)
-            workersignals.newdata.emit(result)
+            with memoryview(full_message_buffer) as buffer_view:
+                result = str(buffer_view[:num_received], encoding)
+            self._emit_message(result, workersignals)
             return True
 
+    def framed_parser(self, socket_in, frame_version: int, workersignals, encoding = "utf-8") -> bool:
+        """
+        Reads the frames of framing.py from a connection that sent the hello preamble, until the
+        end frame. Chunked messages are joined before they are emitted. A frame that is not
+        correct ends the session, since the start of the next frame cannot be found anymore
+        """
+        message_assembler = framing.MessageAssembler()
+        is_socket_registered = False
+        while True:
+            try:
+                header = framing.unpack_header(self._receive_exactly(socket_in, framing.HEADER_NBYTES))
+                if (header.frame_type == framing.FRAME_TYPE_MESSAGE) and (header.flags == 0) and (message_assembler.frame_type is None):
+                    # the usual case, a whole message that is not compressed: decoded straight from the receive buffer
+                    (signal_name, argument) = ("newdata", self._receive_message(socket_in, header.length, workersignals, encoding))
+                else:
+                    (payload, compression_name) = framing.decompress_payload(header, self._receive_exactly(socket_in, header.length))
+                    if compression_name is not None:
+                        self.response_compressions[socket_in] = compression_name
+                    message = message_assembler.add(header, payload)
+                    if message is None: # more chunks of the message are to come
+                        continue
+                    if message[0] == framing.FRAME_TYPE_END:
+                        socket_in.close()
+                        workersignals.set_client_communication_socket.emit(None)
+                        return True
+                    (signal_name, argument) = self._frame_entry(message[0], message[1], encoding)
+            except ConnectionError:
+                print("Message from Class {:s} function framed_parser: the client closed the connection without sending the end frame".format(
+                    self.__class__.__name__))
+                socket_in.close()
+                workersignals.set_client_communication_socket.emit(None)
+                return False
+            except (ValueError, UnicodeDecodeError) as error:
+                print("Message from Class {:s} function framed_parser: the frame is not correct ({}). Not reading any more frames.".format(
+                    self.__class__.__name__, error))
+                send_TCPIP_message(socket_in, create_JSONRPC_errormessage(-32000, "Illegal frame"), True, frame_version = frame_version)
+                socket_in.close()
+                workersignals.set_client_communication_socket.emit(None)
+                return False
+            if not is_socket_registered:
+                workersignals.set_client_communication_socket.emit(socket_in)
+                is_socket_registered = True
+            if signal_name == "newdata":
+                self._emit_message(argument, workersignals, socket_in)
+            else:
+                self._emit_columns(argument, workersignals, socket_in)
+
+    def _frame_entry(self, frame_type: int, payload, encoding = "utf-8") -> tuple:
+        """
+        (name of the worker signal, argument) for the whole payload of a message or arrays frame:
+        the message string, or the columns dictionary. Raises a ValueError if the payload is not correct
+        """
+        if frame_type == framing.FRAME_TYPE_MESSAGE:
+            return ("newdata", str(payload, encoding))
+        (header_bytes, blocks_view) = framing.split_arrays_payload(payload)
+        header_dict = jsoncodec.loads(header_bytes.decode(encoding = encoding))
+        if (not self._check_binary_frame_header(header_dict)) or (len(blocks_view) != self._binary_frame_payload_length(header_dict)):
+            raise ValueError("Illegal arrays frame")
+        return ("newarrays", self._binary_frame_columns(header_dict, blocks_view))
+
+    def _emit_message(self, message_string: Optional[str], workersignals, origin = None) -> None:
+        """
+        Emits the message, or the request parsed from it if there is a message_parser.
+        origin is the connection that the message came from, the responses go back to it.
+        message_string is None if nothing is left of a message whose points were emitted while it was received
+        """
+        if message_string is None:
+            return None
+        if self.message_parser is None:
+            workersignals.newdata.emit(message_string)
+        else:
+            self._emit_request(self.message_parser(message_string, origin), workersignals)
+
+    def _emit_columns(self, columns_dict: dict, workersignals, origin = None) -> None:
+        """ Emits the columns of a binary frame, or puts them into the command queue if there is one """
+        if self.command_queue is None:
+            workersignals.newarrays.emit(columns_dict)
+        else:
+            self._emit_request(Request(origin, None, [Command("plot_columns", columns_dict)]), workersignals)
+
+    def _emit_request(self, request: Request, workersignals) -> None:
+        """
+        Puts the request into the command queue, which may wait until there is space in it.
+        Without a command queue, the request is emitted straight away
+        """
+        if self.command_queue is None:
+            workersignals.newcommands.emit(request)
+        elif self.command_queue.put(request):
+            workersignals.commandsavailable.emit()
+
+
+    def _receive_into(self, socket_in, buffer_view: memoryview) -> None:
+        """
+        Fills buffer_view completely with bytes from the socket. recv_into writes directly 
+        into the buffer, and a partial read just continues where it stopped
+        """
+        num_bytes = len(buffer_view)
+        num_received = 0
+        while num_received < num_bytes:
+            num_new = socket_in.recv_into(buffer_view[num_received:], min(num_bytes - num_received, self.buffersize))
+            if num_new == 0:
+                raise ConnectionError("Connection closed in the middle of a message")
+            num_received += num_new
+
+    def _receive_message_string(self, socket_in, num_bytes: int, encoding = "utf-8") -> str:
+        """
+        Receives exactly num_bytes bytes and decodes them straight from the receive buffer.
+        The buffer is reused for the next message, since the decoded string is a copy anyway
+        """
+        if num_bytes > self.MAX_REUSED_BUFFER_SIZE:
+            buffer = bytearray(num_bytes)
+        else:
+            if len(self.receive_buffer) < num_bytes:
+                self.receive_buffer = bytearray(num_bytes)
+            buffer = self.receive_buffer
+            if num_bytes <= self.buffersize:
+                # short messages usually come in one piece, then the memoryview is not needed
+                num_new = socket_in.recv_into(buffer, num_bytes)
+                if num_new == num_bytes:
+                    return buffer[:num_bytes].decode(encoding = encoding)
+                if num_new == 0:
+                    raise ConnectionError("Connection closed in the middle of a message")
+                with memoryview(buffer) as buffer_view:
+                    self._receive_into(socket_in, buffer_view[num_new:num_bytes])
+                return buffer[:num_bytes].decode(encoding = encoding)
+        with memoryview(buffer) as buffer_view:
+            message_view = buffer_view[:num_bytes]
+            self._receive_into(socket_in, message_view)
+            message_string = str(message_view, encoding)
+            message_view.release()
+        return message_string
+
+    def _receive_message(self, socket_in, num_bytes: int, workersignals, encoding = "utf-8") -> Optional[str]:
+        """
+        Receives a message of num_bytes bytes. The points of a large pointList message are
+        emitted while it is received, then the message with the remaining points is returned,
+        or None if all points were emitted already
+        """
+        if (self.point_list_parser is None) or (num_bytes < self.STREAMING_MESSAGE_LENGTH):
+            return self._receive_message_string(socket_in, num_bytes, encoding)
+        decoder = PointListStreamDecoder()
+        chunk_buffer = bytearray(min(self.STREAM_CHUNK_SIZE, num_bytes))
+        num_received = 0
+        with memoryview(chunk_buffer) as chunk_view:
+            while num_received < num_bytes:
+                chunk_length = min(len(chunk_buffer), num_bytes - num_received)
+                self._receive_into(socket_in, chunk_view[:chunk_length])
+                num_received += chunk_length
+                point_list = decoder.feed(chunk_view[:chunk_length])
+                if point_list:
+                    self._emit_request(self.point_list_parser(point_list, socket_in), workersignals)
+        rest_message = decoder.finish()
+        if rest_message is None:
+            return None
+        return rest_message.decode(encoding = encoding)
+
+    def _receive_compressed_message(self, socket_in, num_bytes: int, compressor, encoding = "utf-8") -> str:
+        """ Receives a compressed frame of num_bytes bytes (after its preamble) and returns the message in it """
+        return compressor.decompress(self._receive_exactly(socket_in, num_bytes)).decode(encoding = encoding)
+
+    def _receive_exactly(self, socket_in, num_bytes: int) -> bytearray:
+        """
+        Receives exactly num_bytes bytes into a preallocated bytearray. 
+        recv_into writes directly into the buffer, so no intermediate bytes objects are made
+        """
+        buffer = bytearray(num_bytes)
+        with memoryview(buffer) as buffer_view:
+            self._receive_into(socket_in, buffer_view)
+        return buffer
+
+    def binary_frame_parser(self, socket_in, header_length: int, workersignals, encoding = "utf-8") -> bool:
+        """
+        Reads a binary array frame (see helperfunctions.send_TCPIP_array_frame) after
+        its preamble, and emits the columns to the main program via workersignals.newarrays
+
+        The x, y and error bar arrays are made with np.frombuffer, so they are views of 
+        the receive buffer and no copy of the data is made here
+        """
+        header_dict = jsoncodec.loads(self._receive_exactly(socket_in, header_length).decode(encoding = encoding))
+        if not self._check_binary_frame_header(header_dict, MAX_BINARY_FRAME_POINTS):
+            return False
+        payload = self._receive_exactly(socket_in, self._binary_frame_payload_length(header_dict))
+        self._emit_columns(self._binary_frame_columns(header_dict, payload), workersignals, socket_in)
+        return True
+
+    def _check_binary_frame_header(self, header_dict, max_num_points: Optional[int] = None) -> bool:
+        """
+        max_num_points is given when the buffer for the points is allocated before they are received,
+        so that one header cannot make the server allocate gigabytes
+        """
+        if not (isinstance(header_dict, dict) and isinstance(header_dict.get("numPoints"), int) 
+                and header_dict["numPoints"] >= 0 and isinstance(header_dict.get("hasErrors"), bool)
+                and ((max_num_points is None) or (header_dict["numPoints"] <= max_num_points))):
+            print("Message from Class {:s} function binary_frame_parser: the header of the binary frame is not correct. Here is what was received: {}".format(
+                self.__class__.__name__, header_dict))
+            return False
+        return True
+
+    def _binary_frame_payload_length(self, header_dict: dict) -> int:
+        num_blocks = 3 if header_dict["hasErrors"] else 2
+        return num_blocks * header_dict["numPoints"] * BINARY_FRAME_DTYPE.itemsize
+
+    def _binary_frame_columns(self, header_dict: dict, payload) -> dict:
+        """ Makes the columns dictionary of the plot_columns function out of the payload of a binary frame """
+        num_points = header_dict["numPoints"]
+        all_values = np.frombuffer(payload, dtype = BINARY_FRAME_DTYPE)
+        columns_dict = {"curveNumber": header_dict.get("curveNumber"),
+                        "x": all_values[0:num_points],
+                        "y": all_values[num_points:2*num_points]}
+        if header_dict["hasErrors"]:
+            columns_dict["yerr"] = all_values[2*num_points:3*num_points]
+        return columns_dict
 
     def listener_function_Qt(self,workersignals):
         self.serversocket.listen(self.numconnections)
@@ -127,7 +396,7 @@ class TCPIPserver():
     def __del__(self):
         self.serversocket.close()
 
-def run_TCPIPserver(TCPIPserverclass,host,port,buffersize = 2048,numconnections=5):
+def run_TCPIPserver(TCPIPserverclass,host,port,buffersize = 65536,numconnections=5):
     myServer = TCPIPserver(host,port,buffersize=buffersize,numconnections=numconnections)
     return None
 
@@ -135,7 +404,7 @@ def run_TCPIPserver(TCPIPserverclass,host,port,buffersize = 2048,numconnections=
 if __name__ == "__main__":
     HOST = "127.0.0.1"
     PORT = 5757
-    BUFFER_SIZE = 2048
+    BUFFER_SIZE = 65536
 
     myServer = TCPIPserver(HOST,PORT)
     myServer.listener_function()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental decoding of large addData messages with a pointList.
+
+Without it, a message has to be received completely and decoded as a whole before
+the first of its points can be plotted, and the whole message is in memory at once.
+PointListStreamDecoder is fed the message in chunks while it is received, and gives
+back the points that are complete after each chunk, so they can be plotted while
+the rest of the message is still on its way, and only a chunk is kept in memory.
+
+The part of the message before the list, up to "pointList": [ , is kept (it must be
+in the first MAX_PREFIX_LENGTH bytes). Since the points are plotted before the rest of
+the message is received, the whole envelope of the request must be in this prefix and
+correct: "jsonrpc": "2.0", "method": "addData", an integer "id", no other keys, and
+no other key of params before the pointList. So "id" must come before "params", as
+plotterclient.Plotter sends it. The points are flat JSON objects, so the last
+"}" of the bytes received so far ends a point, and everything before it is decoded
+in one call of jsoncodec.loads. When the message is complete, finish() gives the
+message with the points that are left, which is a correct message (with the id of
+the original one) and is handled as usual. If feed gave all points already, finish()
+gives None, because an addData message with an empty pointList is not correct.
+
+If the message is not an addData message with a pointList in this form (for example
+because "method" or "id" comes after "params", or the points are not flat objects), nothing
+is decoded on the way, and finish() gives the whole message, which is checked as usual.
+"""
+
+import re
+import jsoncodec
+from JSONinterpreter import JSONread
+from typing import Optional
+
+POINT_LIST_PATTERN = re.compile(rb'"pointList"\s*:\s*\[')
+SEPARATOR_BYTES = b", \t\r\n"
+
+
+class PointListStreamDecoder():
+    MAX_PREFIX_LENGTH = 4096 # bytes
+
+    def __init__(self):
+        self.prefix: Optional[bytes] = None # the message up to the [ of the pointList, once it is found
+        self.pending = bytearray() # the bytes that were received but not decoded yet
+        self.is_streaming: Optional[bool] = None # None as long as the prefix is not found
+        self.num_points_decoded = 0
+
+    def feed(self, data) -> Optional[list]:
+        """ Adds the next bytes of the message. Returns the points that are complete now, or None if there are none """
+        self.pending += data
+        if self.is_streaming is None:
+            self._find_prefix()
+        if not self.is_streaming:
+            return None
+        end = self.pending.rfind(b"}")
+        if end < 0:
+            return None
+        try:
+            point_list = jsoncodec.loads(b"[" + bytes(self.pending[:end + 1]).lstrip(SEPARATOR_BYTES) + b"]")
+        except ValueError:
+            # the list ends in these bytes, or the points are not flat: the rest is left to finish()
+            self.is_streaming = False
+            return None
+        del self.pending[:end + 1]
+        self.num_points_decoded += len(point_list)
+        return point_list
+
+    def finish(self) -> Optional[bytes]:
+        """
+        The message with the points that feed did not return, or None if feed returned all of them.
+        Call this after the last bytes were fed
+        """
+        if self.prefix is None:
+            return bytes(self.pending)
+        rest = bytes(self.pending).lstrip(SEPARATOR_BYTES)
+        if (self.num_points_decoded > 0) and rest.startswith(b"]"):
+            # only the end of the message is left, after the last point
+            return None
+        return self.prefix + b"[" + rest
+
+    def _find_prefix(self) -> None:
+        match = POINT_LIST_PATTERN.search(self.pending, 0, self.MAX_PREFIX_LENGTH + 64)
+        if match is None:
+            if len(self.pending) > self.MAX_PREFIX_LENGTH:
+                self.is_streaming = False
+            return
+        prefix = bytes(self.pending[:match.end() - 1])
+        # the prefix with an empty list and the missing closing braces must be a correct addData request
+        num_open_braces = prefix.count(b"{") - prefix.count(b"}")
+        try:
+            message_object = jsoncodec.loads(prefix + b"[]" + b"}" * num_open_braces)
+        except ValueError:
+            message_object = None
+        if not self._is_addData_envelope(message_object):
+            self.is_streaming = False
+            return
+        self.prefix = prefix
+        self.is_streaming = True
+        del self.pending[:match.end()]
+
+    @staticmethod
+    def _is_addData_envelope(message_object) -> bool:
+        """ True for {"jsonrpc": "2.0", "method": "addData", "params": {"pointList": []}, "id": <int>}, with the keys in any order """
+        return isinstance(message_object, dict) and (set(message_object.keys()) == set(JSONread.jsonrpc2_keys)) \
+            and (message_object["jsonrpc"] == "2.0") and (message_object["method"] == "addData") \
+            and isinstance(message_object["id"], int) and (message_object["params"] == {"pointList": []})
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Server-push notifications for the connections that subscribed to events.
+
+A client sends {"method": "subscribe", "params": {"events": [...], "curveNumbers": [...]}}
+to be notified of the EVENTS, for all curves or only for the given curve numbers.
+MainWindow publishes the events, and every subscriber whose subscription matches gets
+a JSON-RPC notification (a request without id), for example
+
+    {"jsonrpc": "2.0", "method": "fitCompleted", "params": {"curveNumber": 0, ...}}
+
+Every subscriber has its own bounded queue of outgoing messages and its own sender
+thread, so a subscriber that reads slowly (or not at all) only fills its own queue, and
+neither the GUI thread nor the other subscribers wait for its notifications. When the queue is full,
+new notifications for this subscriber are dropped and counted, and as soon as there is
+space again, it gets a "notificationsDropped" notification with their number.
+
+While a connection is subscribed, the responses to its requests go through its queue
+too, so that they are not written to the socket at the same time as a notification by
+the sender thread. Responses are never dropped: when max_queue_size responses wait in
+the queue, put_response waits until the sender thread sent one, as sendall on a socket
+whose client does not read waits. So a queue never holds more than max_queue_size
+notifications and max_queue_size responses.
+
+The sender thread waits in send_function until the message is written, also for an
+AsyncConnection (see asyncserver.py), so the queue of a slow subscriber fills up
+instead of the buffers of the connection.
+
+SubscriptionManager does not import anything from Qt. subscribe, unsubscribe and
+publish are called by the GUI thread only.
+"""
+
+import jsoncodec
+from collections import deque
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Optional
+
+EVENTS = ["fitCompleted", "curveAppended", "curveCleared"]
+DROPPED_NOTIFICATION_METHOD = "notificationsDropped"
+
+
+class Subscriber():
+    """ One subscribed connection: what it watches, its queue of outgoing messages and its sender thread """
+    def __init__(self, connection: Any, send_function: Callable[[Any, str], None], max_queue_size: int):
+        self.connection = connection
+        self.send_function = send_function
+        self.max_queue_size = max_queue_size
+        # for each event, the curve numbers that are watched, or None for all curves
+        self.watched_events: Dict[str, Optional[set]] = {}
+        # (message string, True for a response)
+        self.queue = deque()
+        self.num_queued_responses = 0
+        self.condition = Condition()
+        self.is_closed = False
+        self.num_sent = 0
+        self.num_dropped = 0
+        self.num_dropped_unreported = 0
+        self.sender_thread = Thread(target=self._send_loop, daemon=True)
+        self.sender_thread.start()
+
+    def watches(self, event_name: str, curvenumber: Optional[int]) -> bool:
+        if event_name not in self.watched_events:
+            return False
+        curvenumbers = self.watched_events[event_name]
+        return (curvenumbers is None) or (curvenumber in curvenumbers)
+
+    def put_notification(self, message_string: str) -> bool:
+        """ Puts the notification into the queue, or drops it if the queue is full. Returns False if it was dropped """
+        with self.condition:
+            if self.is_closed:
+                return False
+            if len(self.queue) >= self.max_queue_size:
+                self.num_dropped += 1
+                self.num_dropped_unreported += 1
+                return False
+            if self.num_dropped_unreported > 0:
+                self.queue.append((jsoncodec.dumps({"jsonrpc": "2.0", "method": DROPPED_NOTIFICATION_METHOD,
+                                                    "params": {"numDropped": self.num_dropped_unreported}}), False))
+                self.num_dropped_unreported = 0
+            self.queue.append((message_string, False))
+            self.condition.notify_all()
+            return True
+
+    def put_response(self, message_string: str) -> None:
+        """
+        Puts a response into the queue. Responses are never dropped: if max_queue_size responses
+        wait already, this waits until the sender thread sent one
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: (self.num_queued_responses < self.max_queue_size) or self.is_closed)
+            if not self.is_closed:
+                self.queue.append((message_string, True))
+                self.num_queued_responses += 1
+                self.condition.notify_all()
+
+    def close(self) -> None:
+        """ The sender thread sends what is still in the queue, and then ends """
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify_all()
+
+    def _send_loop(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: (len(self.queue) > 0) or self.is_closed)
+                if len(self.queue) == 0:
+                    return
+                (message_string, is_response) = self.queue.popleft()
+                if is_response:
+                    self.num_queued_responses -= 1
+                    # put_response may wait for this space
+                    self.condition.notify_all()
+            try:
+                self.send_function(self.connection, message_string)
+            except (OSError, ValueError):
+                # the connection is gone, so this subscriber is removed at the next publish
+                with self.condition:
+                    self.is_closed = True
+                    self.queue.clear()
+                    self.num_queued_responses = 0
+                    self.condition.notify_all()
+                return
+            self.num_sent += 1
+
+
+class SubscriptionManager():
+    MAX_QUEUE_SIZE = 1000 # messages per subscriber
+
+    def __init__(self, send_function: Callable[[Any, str], None], max_queue_size: int = MAX_QUEUE_SIZE):
+        """ send_function(connection, message_string) sends a message on the sender thread of the subscriber """
+        self.send_function = send_function
+        self.max_queue_size = max_queue_size
+        self.subscribers: Dict[Any, Subscriber] = {}
+
+    def subscribe(self, connection: Any, event_names: List[str], curvenumbers: Optional[List[int]] = None) -> bool:
+        """
+        Subscribes the connection to the events, for the given curves or for all curves if curvenumbers
+        is None. A second subscription of the same connection adds to the first one.
+        Returns False if an event is not known
+        """
+        if any([event_name not in EVENTS for event_name in event_names]):
+            print("Message from Class {:s} function {:s}".format(self.__class__.__name__, "subscribe"))
+            print("The events {} are not known. Here are the known events: {}. Not doing anything".format(event_names, EVENTS))
+            return False
+        self._remove_closed_subscribers()
+        if connection not in self.subscribers:
+            self.subscribers[connection] = Subscriber(connection, self.send_function, self.max_queue_size)
+        watched_events = self.subscribers[connection].watched_events
+        for event_name in event_names:
+            if (curvenumbers is None) or ((event_name in watched_events) and (watched_events[event_name] is None)):
+                watched_events[event_name] = None
+            else:
+                watched_events[event_name] = watched_events.get(event_name, set()) | set(curvenumbers)
+        return True
+
+    def unsubscribe(self, connection: Any, event_names: Optional[List[str]] = None) -> bool:
+        """
+        Unsubscribes the connection from the events, or from all events if event_names is None.
+        The subscriber stays until the connection is closed, so that the responses to the connection
+        still go through its queue, after the notifications that are in it
+        """
+        subscriber = self.subscriber_for(connection)
+        if subscriber is None:
+            return False
+        for event_name in (event_names if event_names is not None else EVENTS):
+            subscriber.watched_events.pop(event_name, None)
+        return True
+
+    def subscription_of(self, connection: Any) -> Dict[str, Optional[List[int]]]:
+        """ For each event that the connection is subscribed to, the sorted curve numbers, or None for all curves """
+        subscriber = self.subscriber_for(connection)
+        if subscriber is None:
+            return {}
+        return {event_name: (sorted(curvenumbers) if curvenumbers is not None else None)
+                for (event_name, curvenumbers) in subscriber.watched_events.items()}
+
+    def subscriber_for(self, connection: Any) -> Optional[Subscriber]:
+        subscriber = self.subscribers.get(connection)
+        if (subscriber is None) or subscriber.is_closed:
+            return None
+        return subscriber
+
+    def is_watched(self, event_name: str, curvenumber: Optional[int] = None) -> bool:
+        """ True if any subscriber watches the event for this curve, so the notification is worth making """
+        return any([subscriber.watches(event_name, curvenumber) for subscriber in self.subscribers.values()])
+
+    def publish(self, event_name: str, curvenumber: Optional[int], params: dict) -> int:
+        """
+        Sends the notification to all subscribers that watch the event for this curve. It is
+        encoded once for all of them, and not at all if nobody watches it. Returns the number
+        of subscribers it was queued for
+        """
+        self._remove_closed_subscribers()
+        subscribers = [subscriber for subscriber in self.subscribers.values() if subscriber.watches(event_name, curvenumber)]
+        if len(subscribers) == 0:
+            return 0
+        message_string = jsoncodec.dumps({"jsonrpc": "2.0", "method": event_name, "params": params})
+        return sum([subscriber.put_notification(message_string) for subscriber in subscribers])
+
+    def close(self) -> None:
+        for subscriber in self.subscribers.values():
+            subscriber.close()
+        self.subscribers = {}
+
+    def metrics(self) -> List[dict]:
+        """ For each subscriber: what it watches, and how many messages wait, were sent and were dropped """
+        return [{"events": self.subscription_of(connection),
+                 "depth": len(subscriber.queue),
+                 "numSent": subscriber.num_sent,
+                 "numDropped": subscriber.num_dropped}
+                for (connection, subscriber) in self.subscribers.items()]
+
+    def _remove_closed_subscribers(self) -> None:
+        """ Removes the subscribers whose sending failed or whose connection was closed by the server """
+        for connection in [connection for (connection, subscriber) in self.subscribers.items()
+                           if subscriber.is_closed or is_connection_closed(connection)]:
+            self.subscribers.pop(connection).close()
+
+
+def is_connection_closed(connection: Any) -> bool:
+    """ True for a socket.socket after close(), and for an AsyncConnection whose writer is closing """
+    if hasattr(connection, "is_closing"):
+        return connection.is_closing()
+    if hasattr(connection, "fileno"):
+        return connection.fileno() == -1
+    return False
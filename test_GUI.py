@@ -2,9 +2,13 @@ import GUI
 import pytest
 from pytestqt import qtbot
 import json
+import numpy as np
 import sys
 from PyQt5 import QtWidgets
 from socketserver import TCPIPserver
+import helperfunctions
+import sharedmemoryring
+import socket
 
 @pytest.fixture
 def myMainWindow(qtbot):
@@ -23,3 +27,223 @@ def test_Mainwindow_clear_data(myMainWindow,
         input_clear_data,
         expected_clear_data):
     assert myMainWindow.clear_data(input_clear_data) == expected_clear_data
+
+class NoNetworkServer():
+    """ Stands in for TCPIPserver, so that the main window can be tested without listening on a socket """
+    def listener_function_Qt(self, workersignals):
+        return None
+
+@pytest.fixture
+def myMainWindowNoNetwork(qtbot):
+    aMainWindow = GUI.MainWindow(NoNetworkServer())
+    qtbot.addWidget(aMainWindow)
+    return aMainWindow
+
+def test_Mainwindow_errorbar_items_do_not_pile_up(myMainWindowNoNetwork):
+    for idx in range(10):
+        myMainWindowNoNetwork.plot_single_datapoint({"curveNumber":0, "xval":float(idx), "yval":1., "yerr":0.1})
+    myMainWindowNoNetwork.render_scheduler.flush()
+    num_scene_items_start = len(myMainWindowNoNetwork.graphWidget.scene().items())
+    for idx in range(10, 10000):
+        myMainWindowNoNetwork.plot_single_datapoint({"curveNumber":0, "xval":float(idx), "yval":1., "yerr":0.1})
+        if idx % 100 == 0:
+            myMainWindowNoNetwork.render_scheduler.flush()
+    myMainWindowNoNetwork.render_scheduler.flush()
+    assert len(myMainWindowNoNetwork.graphWidget.scene().items()) == num_scene_items_start
+    assert len(myMainWindowNoNetwork.curvestore[0]) == 10000
+    assert myMainWindowNoNetwork.clear_data(0) is True
+    assert len(myMainWindowNoNetwork.graphWidget.scene().items()) < num_scene_items_start
+
+def test_Mainwindow_large_curve_is_decimated(myMainWindowNoNetwork):
+    xvals = np.arange(1000000.)
+    myMainWindowNoNetwork.plot_columns({"curveNumber":0, "x":xvals, "y":np.sin(xvals/1000.)})
+    myMainWindowNoNetwork.graphWidget.getViewBox().setXRange(0., 1e6, padding=0.)
+    myMainWindowNoNetwork.render_scheduler.flush()
+    num_drawn_points = len(myMainWindowNoNetwork.data_line0.xData)
+    assert num_drawn_points <= 2*myMainWindowNoNetwork._num_pixel_columns()*(1. + 2.*myMainWindowNoNetwork.DECIMATION_MARGIN) + 2
+    myMainWindowNoNetwork.graphWidget.getViewBox().setXRange(1000., 1010., padding=0.)
+    myMainWindowNoNetwork.render_scheduler.flush()
+    assert np.all(np.isin(np.arange(990., 1021.), myMainWindowNoNetwork.data_line0.xData))
+
+def test_Mainwindow_replot_is_decimated(myMainWindowNoNetwork):
+    xvals = np.arange(1000000.)
+    myMainWindowNoNetwork.plot_columns({"curveNumber":0, "x":xvals, "y":2.*xvals + 1.})
+    myMainWindowNoNetwork.graphWidget.getViewBox().setXRange(0., 1e6, padding=0.)
+    myMainWindowNoNetwork.render_scheduler.flush()
+    assert myMainWindowNoNetwork.clear_plot(0) is True
+    assert myMainWindowNoNetwork.clear_replot(0) is True
+    myMainWindowNoNetwork.render_scheduler.flush()
+    num_drawn_points = len(myMainWindowNoNetwork.data_line0.xData)
+    assert 0 < num_drawn_points <= 2*myMainWindowNoNetwork._num_pixel_columns()*(1. + 2.*myMainWindowNoNetwork.DECIMATION_MARGIN) + 2
+    # the points are drawn again after a fit, also decimated
+    myMainWindowNoNetwork.interpret_message(json.dumps({"jsonrpc": "2.0", "method": "doFit",
+        "params": {"fitFunction": "linearfit", "curveNumber": 0, "performFitting": ""}, "id": 1}))
+    myMainWindowNoNetwork.render_scheduler.flush()
+    assert hasattr(myMainWindowNoNetwork, "fit_line0")
+    assert 0 < len(myMainWindowNoNetwork.data_line0.xData) <= num_drawn_points
+
+class ResponseCatcher():
+    def __init__(self):
+        self.sent_bytes = b""
+    def sendall(self, message_bytes):
+        self.sent_bytes += message_bytes
+
+def test_Mainwindow_batch_is_answered_once(myMainWindowNoNetwork):
+    response_catcher = ResponseCatcher()
+    myMainWindowNoNetwork._register_client_communication_socket(response_catcher)
+    batch = [{"jsonrpc": "2.0", "method": "addData", "params": {"columns": {"curveNumber": 0, "x": [0., 1.], "y": [1., 2.]}}, "id": 1},
+             {"jsonrpc": "2.0", "method": "addData", "params": {"columns": {"curveNumber": 1, "x": [0.], "y": [3.]}}, "id": 2},
+             {"jsonrpc": "2.0", "method": "getFitResult", "params": {"curveNumber": 0}, "id": 3},
+             {"jsonrpc": "2.0", "method": "unknownMethod", "params": {}, "id": 4}]
+    myMainWindowNoNetwork.interpret_message(json.dumps(batch))
+    assert len(myMainWindowNoNetwork.curvestore[0]) == 2
+    assert len(myMainWindowNoNetwork.curvestore[1]) == 1
+    assert myMainWindowNoNetwork.batch_responses is None
+    assert myMainWindowNoNetwork.render_scheduler.is_held is False
+    assert int(response_catcher.sent_bytes[:8]) == len(response_catcher.sent_bytes) - 8
+    responses = json.loads(response_catcher.sent_bytes[8:])
+    assert [response["id"] for response in responses] == [1, 2, 3, 4]
+    assert responses[0]["result"] is True
+    assert responses[1]["result"] is True
+    assert responses[2]["error"]["message"] == "Curve does not have a fitmodel"
+    assert "error" in responses[3]
+
+def test_Mainwindow_batch_with_a_failing_command_is_answered(myMainWindowNoNetwork):
+    response_catcher = ResponseCatcher()
+    myMainWindowNoNetwork._register_client_communication_socket(response_catcher)
+    # fitting without a fit function raises
+    batch = [{"jsonrpc": "2.0", "method": "addData", "params": {"columns": {"curveNumber": 0, "x": [0., 1.], "y": [1., 2.]}}, "id": 1},
+             {"jsonrpc": "2.0", "method": "doFit", "params": {"performFitting": ""}, "id": 2},
+             {"jsonrpc": "2.0", "method": "addData", "params": {"columns": {"curveNumber": 1, "x": [0.], "y": [3.]}}, "id": 3}]
+    with pytest.raises(Exception):
+        myMainWindowNoNetwork.interpret_message(json.dumps(batch))
+    assert myMainWindowNoNetwork.batch_responses is None
+    assert myMainWindowNoNetwork.render_scheduler.is_held is False
+    responses = json.loads(response_catcher.sent_bytes[8:])
+    assert [response["id"] for response in responses] == [1, 2, 3]
+    assert responses[0]["result"] is True
+    assert "error" in responses[1]
+    assert "error" in responses[2]
+    assert 1 not in myMainWindowNoNetwork.curvestore.curve_numbers()
+    # the next response goes to the client again
+    response_catcher.sent_bytes = b""
+    message = json.dumps({"jsonrpc": "2.0", "method": "getFitResult", "params": {"curveNumber": 0}, "id": 4})
+    myMainWindowNoNetwork.apply_request(myMainWindowNoNetwork.command_builder.build_request(message, response_catcher))
+    assert json.loads(response_catcher.sent_bytes[8:])["id"] == 4
+
+def test_Mainwindow_responses_go_back_to_the_requesting_connection(myMainWindowNoNetwork):
+    last_registered = ResponseCatcher()
+    myMainWindowNoNetwork._register_client_communication_socket(last_registered)
+    connections = [ResponseCatcher(), ResponseCatcher()]
+    # requests from both connections are applied one after the other, without waiting for the responses
+    for request_id in range(10):
+        message = json.dumps({"jsonrpc": "2.0", "method": "getFitResult", "params": {"curveNumber": 0}, "id": request_id})
+        myMainWindowNoNetwork.apply_request(
+            myMainWindowNoNetwork.command_builder.build_request(message, connections[request_id % 2]))
+    assert last_registered.sent_bytes == b""
+    for (connection_number, connection) in enumerate(connections):
+        responses = []
+        sent_bytes = connection.sent_bytes
+        while len(sent_bytes) > 0:
+            message_length = int(sent_bytes[:8])
+            responses.append(json.loads(sent_bytes[8:8 + message_length]))
+            sent_bytes = sent_bytes[8 + message_length:]
+        assert [response["id"] for response in responses] == list(range(connection_number, 10, 2))
+    assert myMainWindowNoNetwork.current_request is None
+
+def test_Mainwindow_applies_queued_requests(myMainWindowNoNetwork):
+    response_catcher = ResponseCatcher()
+    builder = myMainWindowNoNetwork.command_builder
+    for idx in range(3):
+        message = json.dumps({"jsonrpc": "2.0", "method": "addData", "params": {"columns": {"curveNumber": 0, "x": [float(idx)], "y": [1.]}}, "id": idx})
+        myMainWindowNoNetwork.command_queue.put(builder.build_request(message, response_catcher))
+    message = json.dumps({"jsonrpc": "2.0", "method": "getConfig", "params": {"commandQueue": ""}, "id": 5})
+    myMainWindowNoNetwork.command_queue.put(builder.build_request(message, response_catcher))
+    myMainWindowNoNetwork.apply_queued_requests()
+    assert len(myMainWindowNoNetwork.curvestore[0]) == 3
+    response = json.loads(response_catcher.sent_bytes[8:])
+    assert response["id"] == 5
+    assert response["result"]["numPut"] == 4
+    assert response["result"]["policy"] == myMainWindowNoNetwork.COMMAND_QUEUE_POLICY
+
+def test_Mainwindow_compresses_responses_for_compressing_clients(myMainWindowNoNetwork):
+    response_catcher = ResponseCatcher()
+    myMainWindowNoNetwork.response_compressions[response_catcher] = "zlib"
+    assert myMainWindowNoNetwork.set_compression_threshold(0) is True
+    message = json.dumps({"jsonrpc": "2.0", "method": "getConfig", "params": {"compression": ""}, "id": 3})
+    myMainWindowNoNetwork.apply_request(myMainWindowNoNetwork.command_builder.build_request(message, response_catcher))
+    # a short response does not get shorter when it is compressed, so it is sent as it is
+    assert response_catcher.sent_bytes[:1] == b"0"
+    myMainWindowNoNetwork.current_request = GUI.Request(response_catcher, 4, [])
+    myMainWindowNoNetwork._send_to_client(helperfunctions.create_JSONRPC_responsemessage({"values": [1.5]*10000}, 4))
+    myMainWindowNoNetwork.current_request = None
+    (server_end, client_end) = socket.socketpair()
+    server_end.sendall(response_catcher.sent_bytes)
+    response = json.loads(helperfunctions.receive_TCPIP_message(client_end))
+    assert response == {"jsonrpc": "2.0", "result": {"codecs": ["zlib"], "threshold": 0}, "id": 3}
+    assert client_end.recv(1, socket.MSG_PEEK) == b"Z"
+    assert json.loads(helperfunctions.receive_TCPIP_message(client_end))["result"]["values"] == [1.5]*10000
+    assert myMainWindowNoNetwork.set_compression_threshold(-1) is False
+    myMainWindowNoNetwork.clear_config("all")
+    assert myMainWindowNoNetwork.compression_threshold == myMainWindowNoNetwork.COMPRESSION_THRESHOLD
+    server_end.close()
+    client_end.close()
+
+def test_Mainwindow_sends_frames_to_framing_clients(myMainWindowNoNetwork):
+    response_catcher = ResponseCatcher()
+    myMainWindowNoNetwork.response_framings[response_catcher] = 1
+    message = json.dumps({"jsonrpc": "2.0", "method": "getConfig", "params": {"compression": ""}, "id": 5})
+    myMainWindowNoNetwork.apply_request(myMainWindowNoNetwork.command_builder.build_request(message, response_catcher))
+    (server_end, client_end) = socket.socketpair()
+    server_end.sendall(response_catcher.sent_bytes)
+    assert client_end.recv(4, socket.MSG_PEEK) == b"RTPF"
+    assert json.loads(helperfunctions.receive_TCPIP_message(client_end, frame_version=1))["id"] == 5
+    server_end.close()
+    client_end.close()
+
+def test_Mainwindow_reads_shared_memory_ring(myMainWindowNoNetwork):
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=1000)
+    assert myMainWindowNoNetwork.set_shared_memory_ring(writer.name) is True
+    writer.write(2, np.arange(500.), np.ones(500))
+    writer.write(myMainWindowNoNetwork.MAX_NUM_CURVES, [1.], [1.])
+    myMainWindowNoNetwork._poll_shared_memory_rings()
+    assert len(myMainWindowNoNetwork.curvestore[2]) == 500
+    writer.close()
+    myMainWindowNoNetwork._poll_shared_memory_rings()
+    assert myMainWindowNoNetwork.shared_memory_rings == {}
+    assert myMainWindowNoNetwork.set_shared_memory_ring("no such ring") is False
+
+def test_Mainwindow_pushes_notifications_to_subscribers(myMainWindowNoNetwork):
+    subscriber_connection = ResponseCatcher()
+    other_connection = ResponseCatcher()
+    builder = myMainWindowNoNetwork.command_builder
+    message = json.dumps({"jsonrpc": "2.0", "method": "subscribe",
+                          "params": {"events": ["curveAppended", "curveCleared"], "curveNumbers": 1}, "id": 7})
+    myMainWindowNoNetwork.apply_request(builder.build_request(message, subscriber_connection))
+    for curvenumber in [0, 1]:
+        message = json.dumps({"jsonrpc": "2.0", "method": "addData",
+                              "params": {"columns": {"curveNumber": curvenumber, "x": [0., 1.], "y": [1., 2.]}}, "id": 8})
+        myMainWindowNoNetwork.apply_request(builder.build_request(message, other_connection))
+    myMainWindowNoNetwork.plot_single_datapoint({"curveNumber": 1, "xval": 2., "yval": 3., "yerr": 0.1})
+    myMainWindowNoNetwork.clear_data("all")
+    message = json.dumps({"jsonrpc": "2.0", "method": "unsubscribe", "params": {}, "id": 9})
+    myMainWindowNoNetwork.apply_request(builder.build_request(message, subscriber_connection))
+    myMainWindowNoNetwork.plot_single_datapoint({"curveNumber": 1, "xval": 2., "yval": 3.})
+    # the sender thread of the subscriber writes to the connection, and ends after the messages in the queue were sent
+    subscriber = myMainWindowNoNetwork.subscriptions.subscriber_for(subscriber_connection)
+    subscriber.close()
+    subscriber.sender_thread.join(timeout=5.)
+    messages = []
+    sent_bytes = subscriber_connection.sent_bytes
+    while len(sent_bytes) > 0:
+        message_length = int(sent_bytes[:8])
+        messages.append(json.loads(sent_bytes[8:8 + message_length]))
+        sent_bytes = sent_bytes[8 + message_length:]
+    assert messages[0] == {"jsonrpc": "2.0", "result": {"curveAppended": [1], "curveCleared": [1]}, "id": 7}
+    assert [message.get("method") for message in messages[1:]] == ["curveAppended", "curveAppended", "curveCleared", None]
+    assert messages[1]["params"] == {"curveNumber": 1, "numPoints": 2, "x": [0., 1.], "y": [1., 2.]}
+    assert messages[2]["params"] == {"curveNumber": 1, "numPoints": 1, "x": [2.], "y": [3.], "yerr": [0.1]}
+    assert messages[3]["params"] == {"curveNumber": 1}
+    assert messages[4] == {"jsonrpc": "2.0", "result": {}, "id": 9}
+    # the connection that did not subscribe gets no notifications
+    assert other_connection.sent_bytes == b""
@@ -162,3 +162,119 @@ def test_JSONread_parse_JSON_message():
                                                                              ("perform_fitting", "")]
     assert myJSONreader.parse_JSON_message(json.dumps(message_getFitResult_y1)) == [("get_fit_result",1)]
     assert myJSONreader.parse_JSON_message(json.dumps(message_getFitResult_n1)) == [("nofunction","")]
+
+def test_JSONread_parse_addData_pointList():
+    myJSONreader = JSONinterpreter.JSONread()
+    point_list = [{"curveNumber":1, "xval":0.1, "yval":0.5},
+                  {"curveNumber":2, "xval":0.2, "yval":0.7, "yerr":0.01}]
+    message_addData_pointList = {
+        "jsonrpc": "2.0",
+        "method": "addData",
+        "params": {"pointList":point_list},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_addData_pointList)) == [("plot_point_batch",point_list)]
+
+def test_JSONread_parse_addData_columns():
+    myJSONreader = JSONinterpreter.JSONread()
+    columns = {"curveNumber":3, "x":[0.1, 0.2], "y":[0.5, 0.7], "yerr":[0.01, 0.02]}
+    message_addData_columns = {
+        "jsonrpc": "2.0",
+        "method": "addData",
+        "params": {"columns":columns},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_addData_columns)) == [("plot_columns",columns)]
+
+def test_JSONread_parse_setConfig_maxFramesPerSecond():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_setConfig_fps = {
+        "jsonrpc": "2.0",
+        "method": "setConfig",
+        "params": {"maxFramesPerSecond":20},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_setConfig_fps)) == [("set_max_frames_per_second",20)]
+
+def test_JSONread_parse_setConfig_retention():
+    myJSONreader = JSONinterpreter.JSONread()
+    retention = {"curve0": {"maxPoints": 1000}, "curve2": {"maxAge": 60., "maxXWindow": 5.}}
+    message_setConfig_retention = {
+        "jsonrpc": "2.0",
+        "method": "setConfig",
+        "params": {"retention": retention},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_setConfig_retention)) == [("set_retention",retention)]
+
+def test_JSONread_parse_setConfig_ramBudget():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_setConfig_ramBudget = {
+        "jsonrpc": "2.0",
+        "method": "setConfig",
+        "params": {"ramBudget": 500},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_setConfig_ramBudget)) == [("set_ram_budget",500)]
+
+def test_JSONread_parse_batch():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_setConfig_fps = {
+        "jsonrpc": "2.0",
+        "method": "setConfig",
+        "params": {"maxFramesPerSecond":20},
+        "id": 1
+    }
+    message_addData_columns = {
+        "jsonrpc": "2.0",
+        "method": "addData",
+        "params": {"columns":{"curveNumber":0, "x":[0.1], "y":[0.5]}},
+        "id": 2
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps([message_setConfig_fps, message_addData_columns])) == [
+        ("begin_batch",2),
+        ("begin_request",1), ("set_max_frames_per_second",20),
+        ("begin_request",2), ("plot_columns",{"curveNumber":0, "x":[0.1], "y":[0.5]}),
+        ("end_batch","")]
+    # A request that is not correct is answered with an error, the others are still applied
+    assert myJSONreader.parse_JSON_message(json.dumps([1, message_setConfig_fps])) == [
+        ("begin_batch",2),
+        ("begin_request",None), ("nofunction",""),
+        ("begin_request",1), ("set_max_frames_per_second",20),
+        ("end_batch","")]
+    assert myJSONreader.parse_JSON_message(json.dumps([])) == [("nofunction","")]
+
+def test_JSONread_parse_getConfig_commandQueue():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_getConfig = {
+        "jsonrpc": "2.0",
+        "method": "getConfig",
+        "params": {"commandQueue": ""},
+        "id": 0
+    }
+    assert myJSONreader.parse_JSON_message(json.dumps(message_getConfig)) == [("get_command_queue","")]
+
+def test_JSONread_parse_compression_config():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_setConfig = {"jsonrpc": "2.0", "method": "setConfig", "params": {"compressionThreshold": 1000}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_setConfig)) == [("set_compression_threshold",1000)]
+    message_getConfig = {"jsonrpc": "2.0", "method": "getConfig", "params": {"compression": ""}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_getConfig)) == [("get_compression","")]
+
+def test_JSONread_parse_setConfig_sharedMemoryRing():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_setConfig = {"jsonrpc": "2.0", "method": "setConfig", "params": {"sharedMemoryRing": "ring0"}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_setConfig)) == [("set_shared_memory_ring","ring0")]
+
+def test_JSONread_parse_subscribe():
+    myJSONreader = JSONinterpreter.JSONread()
+    message_subscribe = {"jsonrpc": "2.0", "method": "subscribe",
+                         "params": {"events": ["fitCompleted", "curveCleared"], "curveNumbers": [0, 2]}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_subscribe)) == [
+        ("subscribe", {"events": ["fitCompleted", "curveCleared"], "curveNumbers": [0, 2]})]
+    message_subscribe = {"jsonrpc": "2.0", "method": "subscribe", "params": {"curveNumbers": [0]}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_subscribe)) == [("nofunction","")]
+    message_unsubscribe = {"jsonrpc": "2.0", "method": "unsubscribe", "params": {"events": "fitCompleted"}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_unsubscribe)) == [("unsubscribe", {"events": "fitCompleted"})]
+    message_unsubscribe = {"jsonrpc": "2.0", "method": "unsubscribe", "params": {}, "id": 0}
+    assert myJSONreader.parse_JSON_message(json.dumps(message_unsubscribe)) == [("unsubscribe", {})]
@@ -0,0 +1,172 @@
+import asyncserver
+import helperfunctions
+import numpy as np
+import socket
+import threading
+import json
+import pytest
+from test_socketserver import FakeWorkerSignals
+
+@pytest.fixture
+def myAsyncTCPIPserver():
+    aTCPIPserver = asyncserver.AsyncTCPIPserver("127.0.0.1", 0)
+    signals = FakeWorkerSignals()
+    aTCPIPserver.start()
+    listener = threading.Thread(target=aTCPIPserver.listener_function_Qt, args=(signals,))
+    listener.start()
+    yield (aTCPIPserver, signals)
+    aTCPIPserver.stop()
+    listener.join()
+    aTCPIPserver.serversocket.close()
+
+def connect_client(aTCPIPserver):
+    return socket.create_connection(aTCPIPserver.serversocket.getsockname())
+
+def receive_message(client):
+    preamble = client.recv(8)
+    message = b""
+    while len(message) < int(preamble):
+        message += client.recv(int(preamble) - len(message))
+    return json.loads(message.decode("utf-8"))
+
+def wait_until(condition):
+    for idx in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise TimeoutError
+
+def test_AsyncTCPIPserver_serves_clients_at_the_same_time(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    first_client = connect_client(aTCPIPserver)
+    second_client = connect_client(aTCPIPserver)
+    helperfunctions.send_TCPIP_message(first_client, "first", True)
+    # the second client is read while the first one is still connected
+    helperfunctions.send_TCPIP_message(second_client, "second", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 2)
+    helperfunctions.send_TCPIP_message(first_client, "third", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 3)
+    assert signals.newdata.emitted == ["first", "second", "third"]
+    first_client.sendall(b"00000000")
+    second_client.sendall(b"00000000")
+    wait_until(lambda: aTCPIPserver.num_open_connections == 0)
+    first_client.close()
+    second_client.close()
+
+def test_AsyncTCPIPserver_replies_to_the_sender(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    client = connect_client(aTCPIPserver)
+    helperfunctions.send_TCPIP_message(client, "message", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 1)
+    connection = signals.set_client_communication_socket.emitted[-1]
+    helperfunctions.send_TCPIP_message(connection, json.dumps({"result": 1}), True)
+    assert receive_message(client) == {"result": 1}
+    client.close()
+
+def test_AsyncTCPIPserver_sendall_waits_for_a_slow_client(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    client = connect_client(aTCPIPserver)
+    helperfunctions.send_TCPIP_message(client, "message", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 1)
+    connection = signals.set_client_communication_socket.emitted[-1]
+    num_sent = []
+    def send_to_client():
+        try:
+            for idx in range(100):
+                connection.sendall(b"x" * 2**20)
+                num_sent.append(idx)
+        except OSError:
+            pass
+    sender = threading.Thread(target=send_to_client, daemon=True)
+    sender.start()
+    # the client does not read, so sendall waits instead of filling the buffer of the connection
+    sender.join(timeout=1.)
+    assert sender.is_alive()
+    assert len(num_sent) < 100
+    assert connection.writer.transport.get_write_buffer_size() <= 2**21
+    client.close()
+    sender.join(timeout=10.)
+    assert not sender.is_alive()
+
+def test_AsyncTCPIPserver_binary_frame_and_illegal_preamble(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    client = connect_client(aTCPIPserver)
+    assert helperfunctions.send_TCPIP_array_frame(client, 2, np.arange(10.), np.arange(10.)**2) is True
+    client.sendall(b"blahblah")
+    assert receive_message(client)["error"]["message"] == "Illegal preamble"
+    assert len(signals.newarrays.emitted) == 1
+    assert signals.newarrays.emitted[0]["curveNumber"] == 2
+    assert np.array_equal(signals.newarrays.emitted[0]["y"], np.arange(10.)**2)
+    wait_until(lambda: signals.set_client_communication_socket.emitted[-1] is None)
+    client.close()
+
+def test_AsyncTCPIPserver_compressed_message(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    client = connect_client(aTCPIPserver)
+    message = "0123456789" * 10000
+    helperfunctions.send_TCPIP_message(client, message, True, compression_name="zlib")
+    wait_until(lambda: len(signals.newdata.emitted) == 1)
+    assert signals.newdata.emitted == [message]
+    assert list(aTCPIPserver.response_compressions.values()) == ["zlib"]
+    client.sendall(b"00000000")
+    wait_until(lambda: aTCPIPserver.num_open_connections == 0)
+    client.close()
+
+def test_AsyncTCPIPserver_framed_session(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    client = connect_client(aTCPIPserver)
+    assert helperfunctions.negotiate_TCPIP_framing(client) == 1
+    helperfunctions.send_TCPIP_message(client, "x"*100000, True, frame_version=1)
+    helperfunctions.send_TCPIP_array_frame(client, 1, np.arange(5.), np.arange(5.), frame_version=1)
+    wait_until(lambda: len(signals.newarrays.emitted) == 1)
+    assert signals.newdata.emitted == ["x"*100000]
+    # the responses to the client are frames too
+    connection = signals.set_client_communication_socket.emitted[-1]
+    helperfunctions.send_TCPIP_message(connection, json.dumps({"result": 1}), True,
+                                       frame_version=aTCPIPserver.response_framings[connection])
+    assert helperfunctions.receive_TCPIP_message(client, frame_version=1) == json.dumps({"result": 1})
+    helperfunctions.send_TCPIP_end(client, frame_version=1)
+    wait_until(lambda: aTCPIPserver.num_open_connections == 0)
+    client.close()
+
+def test_AsyncTCPIPserver_waits_for_space_in_the_queue(monkeypatch):
+    monkeypatch.setattr(asyncserver.AsyncTCPIPserver, "MESSAGE_QUEUE_SIZE", 2)
+    aTCPIPserver = asyncserver.AsyncTCPIPserver("127.0.0.1", 0)
+    signals = FakeWorkerSignals()
+    aTCPIPserver.start()
+    client = connect_client(aTCPIPserver)
+    for idx in range(10):
+        helperfunctions.send_TCPIP_message(client, "message{:d}".format(idx), True)
+    # nobody takes the messages out of the queue yet, so the connection waits for space
+    wait_until(lambda: aTCPIPserver.num_waiting_puts == 1)
+    assert aTCPIPserver.message_queue.full()
+    listener = threading.Thread(target=aTCPIPserver.listener_function_Qt, args=(signals,))
+    listener.start()
+    wait_until(lambda: len(signals.newdata.emitted) == 10)
+    assert signals.newdata.emitted == ["message{:d}".format(idx) for idx in range(10)]
+    assert aTCPIPserver.num_waiting_puts == 0
+    client.close()
+    aTCPIPserver.stop()
+    listener.join()
+    aTCPIPserver.serversocket.close()
+
+def test_AsyncTCPIPserver_closing_another_connection_keeps_the_current_one(myAsyncTCPIPserver):
+    (aTCPIPserver, signals) = myAsyncTCPIPserver
+    first_client = connect_client(aTCPIPserver)
+    second_client = connect_client(aTCPIPserver)
+    helperfunctions.send_TCPIP_message(first_client, "first", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 1)
+    helperfunctions.send_TCPIP_message(second_client, "second", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 2)
+    second_connection = signals.set_client_communication_socket.emitted[-1]
+    first_client.sendall(b"00000000")
+    wait_until(lambda: aTCPIPserver.num_open_connections == 1)
+    # the responses still go to the second client, which sent the last message
+    helperfunctions.send_TCPIP_message(second_client, "third", True)
+    wait_until(lambda: len(signals.newdata.emitted) == 3)
+    assert None not in signals.set_client_communication_socket.emitted
+    assert signals.set_client_communication_socket.emitted[-1] is second_connection
+    second_client.sendall(b"00000000")
+    wait_until(lambda: signals.set_client_communication_socket.emitted[-1] is None)
+    first_client.close()
+    second_client.close()
@@ -0,0 +1,77 @@
+import commandbuilder
+import json
+import numpy as np
+import pytest
+
+def make_message(method, params):
+    return json.dumps({"jsonrpc": "2.0", "method": method, "params": params, "id": 0})
+
+def test_CommandBuilder_point_list_becomes_columns_per_curve():
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    point_list = [{"curveNumber": 1, "xval": 1., "yval": 2.},
+                  {"curveNumber": 3, "xval": 5, "yval": 6, "yerr": 0.5},
+                  {"curveNumber": 1, "xval": 3., "yval": 4., "yerr": 0.1},
+                  {"curveNumber": 12, "xval": 0., "yval": 0.},
+                  {"curveNumber": 1, "xval": "a", "yval": 0.}]
+    commands = myCommandBuilder.build_commands(make_message("addData", {"pointList": point_list}))
+    assert [command.function_name for command in commands] == ["plot_checked_columns"]*2
+    (columns1, columns3) = [command.argument for command in commands]
+    assert columns1["curveNumber"] == 1
+    assert np.array_equal(columns1["x"], [1., 3.])
+    assert np.array_equal(columns1["y"], [2., 4.])
+    assert np.array_equal(columns1["yerr"], [0., 0.1])
+    assert columns3["x"].dtype == np.float64
+    assert np.array_equal(columns3["yerr"], [0.5])
+
+@pytest.mark.parametrize("columns,is_correct",[
+    ({"curveNumber": 0, "x": [1, 2], "y": [3., 4.]}, True),
+    ({"curveNumber": 0, "x": [1, 2], "y": [3., 4.], "yerr": [1., 1.]}, True),
+    ({"curveNumber": 0, "x": [1, 2], "y": [3.]}, False),
+    ({"curveNumber": 0, "x": [1, "a"], "y": [3., 4.]}, False),
+    ({"curveNumber": 0, "x": [1, 2], "y": [3., None]}, False),
+    ({"curveNumber": 0, "x": [1, 2]}, False),
+    ({"curveNumber": 99, "x": [1, 2], "y": [3., 4.]}, False),
+    ({"curveNumber": 0, "x": [1, 2], "y": [3., 4.], "z": [1, 1]}, False)
+    ])
+def test_CommandBuilder_columns(columns, is_correct):
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    commands = myCommandBuilder.build_commands(make_message("addData", {"columns": columns}))
+    if is_correct:
+        assert len(commands) == 1
+        assert commands[0].function_name == "plot_checked_columns"
+        assert isinstance(commands[0].argument["x"], np.ndarray)
+        assert np.array_equal(commands[0].argument["y"], columns["y"])
+    else:
+        assert commands == []
+
+def test_CommandBuilder_other_commands_are_tuples():
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    commands = myCommandBuilder.build_commands(make_message("setConfig", {"plotTitle": "title"}))
+    assert commands == [("set_plot_title", "title")]
+    assert commands[0].function_name == "set_plot_title"
+
+def test_CommandBuilder_not_a_JSON_object():
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    assert myCommandBuilder.build_commands("not json") == [("nofunction", "not json")]
+    # an array is a batch, and each of its entries that is not a request is answered with an error
+    assert myCommandBuilder.build_commands("[1, 2]") == [("begin_batch", 2), ("begin_request", None), ("nofunction", ""),
+                                                         ("begin_request", None), ("nofunction", ""), ("end_batch", "")]
+
+def test_CommandBuilder_build_request():
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    origin = object()
+    request = myCommandBuilder.build_request(json.dumps({"jsonrpc": "2.0", "method": "getFitResult",
+                                                         "params": {"curveNumber": 2}, "id": 17}), origin)
+    assert request.origin is origin
+    assert request.request_id == 17
+    assert request.commands == [("get_fit_result", 2)]
+    assert myCommandBuilder.build_request("not json", origin) == (origin, None, [("nofunction", "not json")])
+
+def test_CommandBuilder_point_list_request():
+    myCommandBuilder = commandbuilder.CommandBuilder(max_num_curves=10)
+    request = myCommandBuilder.build_point_list_request([{"curveNumber": 2, "xval": 1., "yval": 2.},
+                                                         {"curveNumber": 2, "xval": 3., "yval": 4.}], "origin")
+    assert (request.origin, request.request_id) == ("origin", None)
+    assert [command.function_name for command in request.commands] == ["plot_checked_columns"]
+    assert np.array_equal(request.commands[0].argument["y"], [2., 4.])
+    assert myCommandBuilder.build_point_list_request("not a list").commands == []
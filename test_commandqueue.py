@@ -0,0 +1,81 @@
+import commandqueue
+import threading
+import time
+import numpy as np
+import pytest
+from commandbuilder import Command, Request
+
+def data_request(curvenumber, xvals, yerr = None):
+    columns = {"curveNumber": curvenumber, "x": np.array(xvals, dtype=np.float64), "y": np.array(xvals, dtype=np.float64)}
+    if yerr is not None:
+        columns["yerr"] = np.array(yerr, dtype=np.float64)
+    return Request(None, None, [Command("plot_checked_columns", columns)])
+
+def test_CommandQueue_notifies_once_until_taken():
+    myCommandQueue = commandqueue.CommandQueue(max_size=10)
+    assert myCommandQueue.put(Request(None, 1, [Command("set_plot_title", "a")])) is True
+    assert myCommandQueue.put(Request(None, 2, [Command("set_plot_title", "b")])) is False
+    assert [request.request_id for request in myCommandQueue.take_all()] == [1, 2]
+    assert myCommandQueue.put(Request(None, 3, [Command("set_plot_title", "c")])) is True
+    metrics = myCommandQueue.metrics()
+    assert (metrics["depth"], metrics["maxDepth"], metrics["numPut"], metrics["numTaken"]) == (1, 2, 3, 2)
+
+def test_CommandQueue_block_waits_for_space():
+    myCommandQueue = commandqueue.CommandQueue(max_size=2, policy="block")
+    producer = threading.Thread(target=lambda: [myCommandQueue.put(data_request(0, [idx])) for idx in range(5)])
+    producer.start()
+    taken = []
+    while producer.is_alive() or len(myCommandQueue) > 0:
+        assert len(myCommandQueue) <= 2
+        taken.extend(myCommandQueue.take_all())
+        time.sleep(0.01)
+    producer.join()
+    assert [request.commands[0].argument["x"][0] for request in taken] == [0., 1., 2., 3., 4.]
+    assert myCommandQueue.metrics()["totalBlockedTime"] > 0.
+
+def test_CommandQueue_close_releases_blocked_producer():
+    myCommandQueue = commandqueue.CommandQueue(max_size=1, policy="block")
+    myCommandQueue.put(data_request(0, [0.]))
+    producer = threading.Thread(target=myCommandQueue.put, args=(data_request(0, [1.]),))
+    producer.start()
+    myCommandQueue.close()
+    producer.join(timeout=5.)
+    assert not producer.is_alive()
+
+def test_CommandQueue_drop_counts():
+    myCommandQueue = commandqueue.CommandQueue(max_size=2, policy="drop")
+    for idx in range(5):
+        myCommandQueue.put(data_request(0, [idx]))
+    assert len(myCommandQueue.take_all()) == 2
+    assert myCommandQueue.metrics()["numDropped"] == 3
+
+def test_CommandQueue_coalesce_merges_data_per_curve():
+    myCommandQueue = commandqueue.CommandQueue(max_size=3, policy="coalesce")
+    myCommandQueue.put(data_request(0, [0., 1.]))
+    myCommandQueue.put(data_request(1, [5.], yerr=[0.5]))
+    myCommandQueue.put(data_request(0, [2.]))
+    myCommandQueue.put(Request(None, 7, [Command("set_plot_title", "title")]))
+    myCommandQueue.put(data_request(0, [3.]))
+    requests = myCommandQueue.take_all()
+    assert len(requests) == 3
+    merged_columns = {command.argument["curveNumber"]: command.argument for command in requests[0].commands}
+    assert merged_columns[0]["x"].tolist() == [0., 1., 2.]
+    assert merged_columns[1]["yerr"].tolist() == [0.5]
+    assert requests[1].request_id == 7
+    assert requests[2].commands[0].argument["x"].tolist() == [3.]
+    assert myCommandQueue.metrics()["numCoalesced"] == 2
+
+def test_CommandQueue_set_policy():
+    myCommandQueue = commandqueue.CommandQueue()
+    assert myCommandQueue.set_policy("coalesce", 10) is True
+    assert (myCommandQueue.policy, myCommandQueue.max_size) == ("coalesce", 10)
+    assert myCommandQueue.set_policy("unknown") is False
+    assert myCommandQueue.set_policy("drop", 0) is False
+
+def test_CommandQueue_coalesce_does_not_wait_when_full_of_data():
+    myCommandQueue = commandqueue.CommandQueue(max_size=1, policy="coalesce")
+    for idx in range(100):
+        myCommandQueue.put(data_request(idx % 3, [idx]))
+    requests = myCommandQueue.take_all()
+    assert len(requests) == 1
+    assert sum([len(command.argument["x"]) for command in requests[0].commands]) == 100
@@ -0,0 +1,185 @@
+import curvestore
+import numpy as np
+import pytest
+
+def test_CurveData_append():
+    mycurve = curvestore.CurveData(initial_capacity=2)
+    for idx in range(10):
+        mycurve.append(float(idx), 2.*idx)
+    assert len(mycurve) == 10
+    assert mycurve.capacity == 16
+    assert np.array_equal(mycurve.x, np.arange(10.))
+    assert np.array_equal(mycurve.y, 2.*np.arange(10.))
+    assert mycurve.err is None
+
+def test_CurveData_views_are_not_copies():
+    mycurve = curvestore.CurveData()
+    mycurve.extend([1., 2., 3.], [4., 5., 6.], [0.1, 0.2, 0.3])
+    assert mycurve.x.base is mycurve._x
+    assert mycurve.y.base is mycurve._y
+    assert mycurve.err.base is mycurve._err
+    assert mycurve.x.dtype == np.float64
+
+def test_CurveData_errorbars_missing_for_some_points():
+    mycurve = curvestore.CurveData()
+    mycurve.append(1., 1.)
+    mycurve.append(2., 2., 0.5)
+    mycurve.extend([3., 4.], [3., 4.])
+    assert np.array_equal(mycurve.err, [0., 0.5, 0., 0.])
+
+def test_CurveData_extend_grows_geometrically():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.extend(np.arange(5.), np.arange(5.))
+    assert mycurve.capacity == 8
+    mycurve.extend(np.arange(100.), np.arange(100.))
+    assert mycurve.capacity == 128
+    assert len(mycurve) == 105
+    assert mycurve.nbytes == 3*128*8
+    assert mycurve.used_nbytes == 3*105*8
+
+def test_CurveStore():
+    mystore = curvestore.CurveStore(initial_capacity=4)
+    mystore.create_curve(3).append(1., 2.)
+    mystore.create_curve(1)
+    assert 3 in mystore
+    assert 2 not in mystore
+    assert mystore.curve_numbers() == [1, 3]
+    assert mystore.create_curve(3).num_points == 1
+    assert mystore.memory_report()[3] == {"numPoints": 1, "capacity": 4,
+                                          "nbytes": 96, "usedNbytes": 24}
+    assert mystore.nbytes == 192
+    assert mystore.remove_curve(3) is True
+    assert mystore.remove_curve(3) is False
+    assert mystore.curve_numbers() == [1]
+
+def test_CurveData_append_keeps_sorted_order():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    rng = np.random.default_rng(1)
+    xvals = rng.uniform(0., 1., 1000)
+    for (idx, xval) in enumerate(xvals):
+        mycurve.append(xval, 10.*xval, float(idx))
+    sort_indices = np.argsort(xvals, kind="stable")
+    assert np.array_equal(mycurve.x, xvals[sort_indices])
+    assert np.array_equal(mycurve.y, 10.*xvals[sort_indices])
+    assert np.array_equal(mycurve.err, np.arange(1000.)[sort_indices])
+
+def test_CurveData_monotonic_append_keeps_gap_at_end():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    for idx in range(100):
+        mycurve.append(float(idx), 0.)
+        assert mycurve.gap_start == mycurve.num_points
+        assert mycurve.gap_end == mycurve.capacity
+
+def test_CurveData_out_of_order_then_monotonic():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    for xval in [1., 2., 3., 1.5, 4., 5., 0., 5.]:
+        mycurve.append(xval, xval)
+    assert np.array_equal(mycurve.x, [0., 1., 1.5, 2., 3., 4., 5., 5.])
+    assert np.array_equal(mycurve.y, mycurve.x)
+
+@pytest.mark.parametrize("xvals_new",[
+    [10., 11., 12.],
+    [2.5, 0.5, 12.],
+    [3., 3., 1.]
+    ])
+def test_CurveData_extend_merges_sorted(xvals_new):
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    xvals_old = [3., 1., 2.]
+    for xval in xvals_old:
+        mycurve.append(xval, -xval)
+    mycurve.extend(xvals_new, [-q for q in xvals_new])
+    assert np.array_equal(mycurve.x, np.sort(xvals_old + xvals_new))
+    assert np.array_equal(mycurve.y, -mycurve.x)
+
+def test_CurveData_max_points_keeps_memory_flat():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.set_retention(max_points=100)
+    capacities = set()
+    for idx in range(10000):
+        mycurve.append(float(idx), 2.*idx)
+        capacities.add(mycurve.capacity)
+    assert len(mycurve) == 100
+    assert np.array_equal(mycurve.x, np.arange(9900., 10000.))
+    assert np.array_equal(mycurve.y, 2.*mycurve.x)
+    assert mycurve.capacity <= 4*100
+    assert mycurve.capacity == max(capacities)
+
+def test_CurveData_max_points_with_extend_and_out_of_order():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.set_retention(max_points=5)
+    mycurve.extend(np.arange(10.), np.arange(10.))
+    assert np.array_equal(mycurve.x, np.arange(5., 10.))
+    mycurve.append(7.5, 7.5)
+    assert np.array_equal(mycurve.x, [6., 7., 7.5, 8., 9.])
+    mycurve.extend([20., 6.5], [20., 6.5])
+    assert np.array_equal(mycurve.x, [7., 7.5, 8., 9., 20.])
+    assert np.array_equal(mycurve.y, mycurve.x)
+
+def test_CurveData_max_xwindow():
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.set_retention(max_xwindow=2.5)
+    for idx in range(20):
+        mycurve.append(0.5*idx, float(idx))
+    assert np.array_equal(mycurve.x, [7., 7.5, 8., 8.5, 9., 9.5])
+
+def test_CurveData_max_age(monkeypatch):
+    fake_time = [100.]
+    monkeypatch.setattr(curvestore.time, "monotonic", lambda: fake_time[0])
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.set_retention(max_age=10.)
+    for idx in range(30):
+        fake_time[0] = 100. + idx
+        mycurve.append(float(idx), 0.)
+    assert np.array_equal(mycurve.x, np.arange(19., 30.))
+    mycurve.set_retention()
+    assert "_t" not in mycurve.column_names
+    assert mycurve.nbytes == 3*mycurve.capacity*8
+
+def test_CurveStore_retention_outlives_curve():
+    mystore = curvestore.CurveStore(initial_capacity=4)
+    mystore.set_retention(1, max_points=3)
+    mystore.create_curve(1).extend(np.arange(10.), np.arange(10.))
+    assert np.array_equal(mystore[1].x, [7., 8., 9.])
+    mystore.remove_curve(1)
+    mystore.create_curve(1).extend(np.arange(10.), np.arange(10.))
+    assert len(mystore[1]) == 3
+    mystore.clear_retention()
+    mystore[1].extend(np.arange(10.), np.arange(10.))
+    assert len(mystore[1]) == 13
+
+def test_CurveData_spilled_curve_keeps_growing(tmp_path):
+    mycurve = curvestore.CurveData(initial_capacity=4)
+    mycurve.extend([3., 1., 2.], [3., 1., 2.], [0.3, 0.1, 0.2])
+    mycurve.spill_to_disk(str(tmp_path / "curve0"))
+    assert mycurve.is_spilled
+    assert isinstance(mycurve._x, np.memmap)
+    for idx in range(100):
+        mycurve.append(4. + idx, 4. + idx)
+    mycurve.append(0.5, 0.5, 0.05)
+    assert mycurve.capacity == 128
+    assert np.array_equal(mycurve.x, np.concatenate(([0.5, 1., 2., 3.], 4. + np.arange(100.))))
+    assert np.array_equal(mycurve.y, mycurve.x)
+    assert np.array_equal(mycurve.err[:4], [0.05, 0.1, 0.2, 0.3])
+    assert (tmp_path / "curve0_x.bin").stat().st_size == 128*8
+    mycurve.release_files()
+    assert not mycurve.is_spilled
+    assert len(mycurve) == 0
+    assert list(tmp_path.iterdir()) == []
+
+def test_CurveStore_ram_budget_spills_coldest_curves(tmp_path):
+    mystore = curvestore.CurveStore(initial_capacity=1024)
+    for curvenumber in range(3):
+        mystore.create_curve(curvenumber).extend(np.arange(10.), np.arange(10.))
+    mystore[0].append(10., 10.) # curve 0 is now the most recently modified one
+    mystore.set_ram_budget(2*3*1024*8, spill_directory=str(tmp_path))
+    assert [mystore[curvenumber].is_spilled for curvenumber in range(3)] == [False, True, False]
+    assert mystore.ram_nbytes == 2*3*1024*8
+    assert mystore.nbytes == 3*3*1024*8
+    assert mystore.enforce_ram_budget() == []
+    assert np.array_equal(mystore[1].x, np.arange(10.))
+    mystore.remove_curve(1)
+    assert list(tmp_path.glob("*/*.bin")) == []
+    mystore.create_curve(1).extend(np.arange(10.), np.arange(10.))
+    assert mystore.enforce_ram_budget() == [2]
+    mystore.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,64 @@
+import compression
+import framing
+import numpy as np
+import pytest
+
+def test_framing_header_round_trip():
+    header_bytes = framing.pack_header(framing.FRAME_TYPE_ARRAYS, 1000, framing.FLAG_MORE | framing.FLAG_COMPRESSED)
+    assert len(header_bytes) == framing.HEADER_NBYTES == 16
+    assert framing.unpack_header(header_bytes) == framing.FrameHeader(framing.VERSION, framing.FRAME_TYPE_ARRAYS, 3, 1000)
+
+@pytest.mark.parametrize("header_bytes",[
+    b"XXXX" + framing.pack_header(framing.FRAME_TYPE_MESSAGE, 10)[4:],
+    framing.pack_header(framing.FRAME_TYPE_MESSAGE, 10, version=framing.VERSION + 1),
+    framing.pack_header(99, 10),
+    framing.pack_header(framing.FRAME_TYPE_MESSAGE, 10, flags=0x8000),
+    framing.pack_header(framing.FRAME_TYPE_MESSAGE, framing.MAX_FRAME_LENGTH + 1)
+    ])
+def test_framing_illegal_header(header_bytes):
+    with pytest.raises(ValueError):
+        framing.unpack_header(header_bytes)
+
+@pytest.mark.parametrize("hello,version",[("F0000001", 1), ("F0000007", framing.VERSION), ("F0000000", None), ("Fxxxxxxx", None), ("00000001", None)])
+def test_framing_negotiated_version(hello, version):
+    assert framing.negotiated_version(hello) == version
+
+def test_framing_split_into_chunks():
+    parts = [b"abc", np.arange(3.), b"", b"de"]
+    chunks = framing.split_into_chunks(parts, 10)
+    assert [sum([len(part) for part in chunk]) for chunk in chunks] == [10, 10, 9]
+    assert b"".join([bytes(part) for chunk in chunks for part in chunk]) == b"abc" + np.arange(3.).tobytes() + b"de"
+    assert framing.split_into_chunks([], 10) == [[]]
+
+def test_framing_arrays_payload():
+    payload_start = framing.arrays_header(b'{"a": 1}')
+    assert len(payload_start) % 8 == 0
+    (header_bytes, blocks_view) = framing.split_arrays_payload(payload_start + np.arange(2.).tobytes())
+    assert header_bytes.strip() == b'{"a": 1}'
+    assert np.array_equal(np.frombuffer(blocks_view), np.arange(2.))
+    with pytest.raises(ValueError):
+        framing.split_arrays_payload(b"\xff\x00\x00\x00abc")
+
+def test_framing_message_assembler():
+    message_assembler = framing.MessageAssembler()
+    chunk_header = framing.FrameHeader(1, framing.FRAME_TYPE_MESSAGE, framing.FLAG_MORE, 3)
+    last_header = framing.FrameHeader(1, framing.FRAME_TYPE_MESSAGE, 0, 3)
+    assert message_assembler.add(last_header, b"one") == (framing.FRAME_TYPE_MESSAGE, b"one")
+    assert message_assembler.add(chunk_header, b"abc") is None
+    assert message_assembler.add(chunk_header, b"def") is None
+    assert message_assembler.add(last_header, b"ghi") == (framing.FRAME_TYPE_MESSAGE, bytearray(b"abcdefghi"))
+    assert message_assembler.add(chunk_header, b"abc") is None
+    with pytest.raises(ValueError):
+        message_assembler.add(framing.FrameHeader(1, framing.FRAME_TYPE_ARRAYS, 0, 3), b"xyz")
+
+def test_framing_decompressed_length_is_limited():
+    compressor = compression.get_compressor("zlib")
+    data = compressor.compress(b"0" * 10000)
+    assert compressor.decompress(data, 10000) == b"0" * 10000
+    # a small frame must not decompress to more than the limit
+    with pytest.raises(ValueError):
+        compressor.decompress(data, 9999)
+    with pytest.raises(ValueError):
+        compressor.decompress(data[:-4])
+    header = framing.FrameHeader(framing.VERSION, framing.FRAME_TYPE_MESSAGE, framing.FLAG_COMPRESSED, 0)
+    assert framing.decompress_payload(header, compressor.marker.encode() + data) == (b"0" * 10000, "zlib")
@@ -0,0 +1,62 @@
+import headlessplotter
+import jsoncodec
+import plotterclient
+import socketserver
+import subprocess
+import sys
+import threading
+import numpy as np
+import pytest
+
+def test_PlotterCore_does_not_import_Qt():
+    # run in a new interpreter, because the other tests import Qt
+    subprocess.run([sys.executable, "-c",
+        "import sys, headlessplotter; assert not [name for name in sys.modules if name.startswith(('PyQt5', 'pyqtgraph'))]"],
+        check=True)
+
+@pytest.fixture
+def headless_plotter():
+    aTCPIPserver = socketserver.TCPIPserver("127.0.0.1", 0)
+    aTCPIPserver.reportedLengthMessage = True
+    plotter = headlessplotter.HeadlessPlotter(aTCPIPserver)
+    # listening already here, so that the client can connect before the listener thread runs
+    aTCPIPserver.serversocket.listen()
+    run_thread = threading.Thread(target=plotter.run, daemon=True)
+    run_thread.start()
+    yield (plotter, aTCPIPserver.serversocket.getsockname())
+    plotter.stop()
+    run_thread.join(timeout=5.)
+    aTCPIPserver.serversocket.close()
+
+def test_HeadlessPlotter_fits_the_curves_of_its_clients(headless_plotter):
+    (plotter, address) = headless_plotter
+    xvals = np.linspace(0., 10., 50)
+    with plotterclient.Plotter(*address) as client:
+        assert client.add_points(0, xvals, 2.*xvals + 1.) is True
+        assert client.add_points(1, xvals, -xvals) is True
+        client.flush()
+        # the commands that only change the plot are accepted and ignored
+        client.set_config(plotTitle = "scan", axisLabels = ["x", "y"])
+        client.send_message("doFit", {"fitFunction": "linearfit", "curveNumber": 0, "performFitting": ""})
+        fit_response = client.request("getFitResult", {"curveNumber": 0})
+        assert fit_response["result"]["costfunction"] == pytest.approx(0., abs=1e-9)
+        assert client.request("getFitResult", {"curveNumber": 1})["error"]["message"] == "Curve does not have a fitmodel"
+        client.clear(data = 1)
+        assert client.request("getConfig", {"commandQueue": ""})["result"]["numDropped"] == 0
+    assert plotter.curvestore.curve_numbers() == [0]
+    assert len(plotter.curvestore[0]) == 50
+
+def test_HeadlessPlotter_answers_after_a_failing_command(headless_plotter):
+    (plotter, address) = headless_plotter
+    xvals = np.linspace(0., 10., 50)
+    with plotterclient.Plotter(*address) as client:
+        # a response that does not come fails the test instead of hanging it
+        client.connections[0].settimeout(10.)
+        assert client.add_points(0, xvals, 2.*xvals + 1.) is True
+        client.flush()
+        # fitting without a fit function raises, in the middle of a batch
+        batch = [{"jsonrpc": "2.0", "method": "doFit", "params": {"performFitting": ""}, "id": 1},
+                 {"jsonrpc": "2.0", "method": "getFitResult", "params": {"curveNumber": 0}, "id": 2}]
+        client._send(0, jsoncodec.dumps(batch))
+        assert client.request("getFitResult", {"curveNumber": 0})["error"]["message"] == "Curve does not have a fitmodel"
+    assert plotter.batch_responses is None
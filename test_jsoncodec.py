@@ -0,0 +1,49 @@
+import jsoncodec
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize("codec", jsoncodec.available_codecs(), ids=lambda codec: codec.name)
+def test_JSONCodec_roundtrip(codec):
+    message_dict = {"jsonrpc": "2.0", "method": "addData",
+                    "params": {"pointList": [{"curveNumber": 1, "xval": 0.5, "yval": -2, "yerr": 0.01}]},
+                    "id": 3}
+    assert codec.loads(codec.dumps(message_dict)) == message_dict
+    assert codec.loads(codec.dumps(message_dict).encode("utf-8")) == message_dict
+    assert isinstance(codec.dumps(message_dict), str)
+
+@pytest.mark.parametrize("codec", jsoncodec.available_codecs(), ids=lambda codec: codec.name)
+def test_JSONCodec_numpy(codec):
+    result = {"frequency": np.float64(1.5), "values": np.arange(3.), "numRuns": np.int64(4)}
+    assert codec.loads(codec.dumps(result)) == {"frequency": 1.5, "values": [0., 1., 2.], "numRuns": 4}
+    values = codec.array_from_json([1, 2.5, 3])
+    assert values.dtype == np.float64
+    assert np.array_equal(values, [1., 2.5, 3.])
+
+@pytest.mark.parametrize("codec", jsoncodec.available_codecs(), ids=lambda codec: codec.name)
+def test_JSONCodec_invalid_message(codec):
+    with pytest.raises(ValueError):
+        codec.loads("{not json")
+
+def test_set_default_codec():
+    default_codec = jsoncodec.default_codec
+    assert jsoncodec.available_codecs()[-1].name == "json"
+    assert jsoncodec.set_default_codec("json") is True
+    assert jsoncodec.default_codec.name == "json"
+    assert jsoncodec.set_default_codec("blah") is False
+    assert jsoncodec.default_codec.name == "json"
+    jsoncodec.default_codec = default_codec
+
+@pytest.mark.parametrize("codec", jsoncodec.available_codecs(), ids=lambda codec: codec.name)
+def test_JSONCodec_codecs_agree(codec):
+    reference = jsoncodec.get_codec("json")
+    message_dict = {"values": [1.5, float("nan"), float("inf")], "array": np.array([np.nan, 2.]),
+                    "number": np.float64("-inf"), 3: "three", None: "none"}
+    expected = {"values": [1.5, None, None], "array": [None, 2.], "number": None, "3": "three", "null": "none"}
+    assert codec.loads(codec.dumps(message_dict)) == expected
+    assert codec.loads(codec.dumps(message_dict)) == reference.loads(reference.dumps(message_dict))
+    for message in ['{"x": NaN}', '{"x": Infinity}', '{"x": -Infinity}']:
+        with pytest.raises(ValueError):
+            codec.loads(message)
+    # a null in a column is not a number, and is not turned into NaN
+    with pytest.raises(ValueError):
+        codec.array_from_json(codec.loads('[1.0, null, 2.0]'))
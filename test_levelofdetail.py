@@ -0,0 +1,53 @@
+import levelofdetail
+import curvestore
+import numpy as np
+import pytest
+
+def brute_force_pyramid(yvals, factor):
+    levels = []
+    source_mins, source_maxs = yvals, yvals
+    while len(source_mins) > 1:
+        reduce_indices = np.arange(0, len(source_mins), factor)
+        source_mins = np.minimum.reduceat(source_mins, reduce_indices)
+        source_maxs = np.maximum.reduceat(source_maxs, reduce_indices)
+        levels.append((source_mins, source_maxs))
+    return levels
+
+def test_MinMaxPyramid_incremental_update():
+    rng = np.random.default_rng(0)
+    yvals = rng.normal(size=100000)
+    myPyramid = levelofdetail.MinMaxPyramid()
+    for stop in [1, 7, 1000, 1001, 54321, 100000]:
+        myPyramid.update(yvals[:stop], myPyramid.num_points)
+        expected_levels = brute_force_pyramid(yvals[:stop], myPyramid.BLOCK_FACTOR)
+        assert len(myPyramid.level_mins) == len(expected_levels)
+        for (level, (expected_mins, expected_maxs)) in enumerate(expected_levels):
+            assert np.array_equal(myPyramid.level_mins[level][:myPyramid.level_lengths[level]], expected_mins)
+            assert np.array_equal(myPyramid.level_maxs[level][:myPyramid.level_lengths[level]], expected_maxs)
+
+def test_decimate_minmax():
+    xvals = np.linspace(0., 1., 1000000)
+    yvals = np.sin(50.*xvals)
+    yvals[123456] = 10.
+    yvals[654321] = -10.
+    myPyramid = levelofdetail.MinMaxPyramid()
+    myPyramid.update(yvals, 0)
+    (xvals_to_draw, yvals_to_draw) = levelofdetail.decimate_minmax(xvals, yvals, myPyramid, 0., 1., 1000)
+    assert len(xvals_to_draw) <= 2000
+    assert np.all(np.diff(xvals_to_draw) >= 0)
+    assert yvals_to_draw.max() == 10.
+    assert yvals_to_draw.min() == -10.
+    # the spikes are drawn in the pixel column where they are
+    assert abs(xvals_to_draw[np.argmax(yvals_to_draw)] - xvals[123456]) < 2e-3
+    assert levelofdetail.decimate_minmax(xvals, yvals, myPyramid, 0., 1e-3, 1000) is None
+
+def test_CurveData_decimated_follows_new_points():
+    mycurve = curvestore.CurveData()
+    mycurve.extend(np.arange(100000.), np.zeros(100000))
+    assert mycurve.decimated(0., 1e5, 500)[1].max() == 0.
+    mycurve.append(50000.5, 3.)
+    mycurve.extend(np.arange(100000., 200000.), -np.ones(100000))
+    (xvals_to_draw, yvals_to_draw) = mycurve.decimated(0., 2e5, 500)
+    assert yvals_to_draw.max() == 3.
+    assert yvals_to_draw.min() == -1.
+    assert mycurve.decimated(0., 100., 500) is None
@@ -0,0 +1,169 @@
+import plotterclient
+import socketserver
+import commandbuilder
+import helperfunctions
+import jsoncodec
+import numpy as np
+import socket
+import threading
+import time
+import pytest
+
+class FakeSignal():
+    def __init__(self, on_emit = None):
+        self.emitted = []
+        self.on_emit = on_emit
+    def emit(self, value = None):
+        self.emitted.append(value)
+        if self.on_emit is not None:
+            self.on_emit()
+
+class FakeWorkerSignals():
+    def __init__(self, on_emit):
+        self.newdata = FakeSignal()
+        self.newarrays = FakeSignal(on_emit)
+        self.newcommands = FakeSignal(on_emit)
+        self.set_client_communication_socket = FakeSignal()
+
+    def received_columns(self):
+        """ The columns of all received addData messages and binary frames, in the order in which they came """
+        columns_list = list(self.newarrays.emitted)
+        for request in self.newcommands.emitted:
+            columns_list.extend([command.argument for command in request.commands if command.function_name == "plot_checked_columns"])
+        return columns_list
+
+@pytest.fixture
+def plotter_server():
+    """ A TCPIPserver that builds the commands as the GUI does, and a function to wait for a number of points """
+    aTCPIPserver = socketserver.TCPIPserver("127.0.0.1", 0)
+    aTCPIPserver.message_parser = commandbuilder.CommandBuilder(max_num_curves=10).build_request
+    condition = threading.Condition()
+    def on_emit():
+        with condition:
+            condition.notify_all()
+    signals = FakeWorkerSignals(on_emit)
+    def wait_for_points(num_points):
+        with condition:
+            condition.wait_for(lambda: sum([len(columns["x"]) for columns in signals.received_columns()]) >= num_points, timeout = 5.)
+        return signals.received_columns()
+    # listening already here, so that the plotter can connect before the listener thread runs
+    aTCPIPserver.serversocket.listen()
+    threading.Thread(target=aTCPIPserver.listener_function_Qt, args=(signals,), daemon=True).start()
+    yield (aTCPIPserver.serversocket.getsockname(), wait_for_points)
+    aTCPIPserver.serversocket.close()
+
+@pytest.mark.parametrize("use_binary_frames,use_framing",[(False, False), (True, False), (False, True), (True, True)])
+def test_Plotter_sends_single_points_in_few_messages(plotter_server, use_binary_frames, use_framing):
+    (address, wait_for_points) = plotter_server
+    with plotterclient.Plotter(*address, flush_num_points=100, flush_interval=10., use_binary_frames=use_binary_frames,
+                               use_framing=use_framing) as plotter:
+        assert plotter.frame_version == (1 if use_framing else None)
+        for idx in range(250):
+            assert plotter.add_points(idx % 2, float(idx), 2.*idx) is True
+    columns_list = wait_for_points(250)
+    # the full buffers were sent by size, the rest when the plotter was closed
+    assert plotter.num_messages_sent == len(columns_list)
+    assert 2 <= len(columns_list) <= 6
+    for curvenumber in [0, 1]:
+        xvals = np.concatenate([columns["x"] for columns in columns_list if columns["curveNumber"] == curvenumber])
+        assert np.array_equal(xvals, np.arange(curvenumber, 250, 2))
+        yvals = np.concatenate([columns["y"] for columns in columns_list if columns["curveNumber"] == curvenumber])
+        assert np.array_equal(yvals, 2.*xvals)
+
+def test_Plotter_sends_after_the_flush_interval(plotter_server):
+    (address, wait_for_points) = plotter_server
+    with plotterclient.Plotter(*address, flush_num_points=10000, flush_interval=0.02) as plotter:
+        plotter.add_points(3, np.arange(5.), np.ones(5), np.full(5, 0.5))
+        columns_list = wait_for_points(5)
+        assert len(columns_list) == 1
+        assert np.array_equal(columns_list[0]["yerr"], np.full(5, 0.5))
+
+def test_Plotter_copies_the_arrays_and_checks_the_lengths(plotter_server):
+    (address, wait_for_points) = plotter_server
+    with plotterclient.Plotter(*address, flush_interval=10.) as plotter:
+        xvals = np.arange(4.)
+        plotter.add_points(0, xvals, xvals)
+        xvals[:] = -1.
+        assert plotter.add_points(0, np.arange(3.), np.arange(4.)) is False
+        plotter.flush()
+        assert np.array_equal(wait_for_points(4)[0]["x"], np.arange(4.))
+    assert plotter.add_points(0, 1., 1.) is False
+
+def test_Plotter_request_waits_for_its_response():
+    listening_socket = socket.create_server(("127.0.0.1", 0))
+    def answer_function():
+        (server_end, address) = listening_socket.accept()
+        while True:
+            message = helperfunctions.receive_TCPIP_message(server_end)
+            if message == "":
+                break
+            message_dict = jsoncodec.loads(message)
+            if message_dict["method"] == "getConfig":
+                # a response to an earlier message, a notification and an error without id come first
+                helperfunctions.send_TCPIP_message(server_end, helperfunctions.create_JSONRPC_errormessage(-32602, "Wrong", id_arg=-5), True)
+                helperfunctions.send_TCPIP_message(server_end, jsoncodec.dumps({"jsonrpc": "2.0", "method": "curveCleared", "params": {"curveNumber": 0}}), True)
+                helperfunctions.send_TCPIP_message(server_end, helperfunctions.create_JSONRPC_errormessage(-32000, "Illegal frame"), True)
+                helperfunctions.send_TCPIP_message(server_end, helperfunctions.create_JSONRPC_responsemessage({"depth": 0}, id_arg=message_dict["id"]), True)
+        server_end.close()
+    answerer = threading.Thread(target=answer_function)
+    answerer.start()
+    with plotterclient.Plotter(*listening_socket.getsockname()) as plotter:
+        plotter.add_points(0, 1., 1.)
+        response = plotter.request("getConfig", {"commandQueue": ""})
+    answerer.join()
+    listening_socket.close()
+    assert response["result"] == {"depth": 0}
+
+def test_Plotter_requests_about_a_curve_go_with_its_points():
+    listening_socket = socket.create_server(("127.0.0.1", 0))
+    received = []
+    def answer_function(connection_number, server_end):
+        while True:
+            message = helperfunctions.receive_TCPIP_message(server_end)
+            if message == "":
+                break
+            message_dict = jsoncodec.loads(message)
+            received.append((connection_number, message_dict["method"]))
+            helperfunctions.send_TCPIP_message(server_end, helperfunctions.create_JSONRPC_responsemessage(connection_number, id_arg=message_dict["id"]), True)
+        server_end.close()
+    plotter = plotterclient.Plotter(*listening_socket.getsockname(), num_connections=2)
+    answerers = [threading.Thread(target=answer_function, args=(connection_number, listening_socket.accept()[0])) for connection_number in range(2)]
+    for answerer in answerers:
+        answerer.start()
+    plotter.add_points(3, 1., 1.)
+    # the request about curve 3 goes on the connection of its points, the other one on the first connection
+    assert plotter.request("getFitResult", {"curveNumber": 3})["result"] == 1
+    assert plotter.request("getFitResult", {"curveNumber": "all"})["result"] == 0
+    request_id = plotter.send_message("getConfig", {"commandQueue": ""}, connection_number=1)
+    assert plotter.receive_response(request_id, 1)["result"] == 1
+    plotter.close()
+    for answerer in answerers:
+        answerer.join()
+    listening_socket.close()
+    assert received == [(1, "addData"), (1, "getFitResult"), (0, "getFitResult"), (1, "getConfig")]
+
+def test_Plotter_raises_when_the_connection_is_lost():
+    listening_socket = socket.create_server(("127.0.0.1", 0))
+    plotter = plotterclient.Plotter(*listening_socket.getsockname(), flush_interval=0.01)
+    (server_end, address) = listening_socket.accept()
+    server_end.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+    server_end.close()
+    listening_socket.close()
+    with pytest.raises(ConnectionError):
+        for idx in range(1000):
+            plotter.add_points(0, np.arange(1000.), np.arange(1000.))
+            time.sleep(0.01)
+
+def test_Plotter_flush_raises_the_error_of_the_background_thread(plotter_server):
+    (address, wait_for_points) = plotter_server
+    with plotterclient.Plotter(*address) as plotter:
+        def failing_send_columns(columns_dict):
+            raise TypeError("not serializable")
+        plotter._send_columns = failing_send_columns
+        plotter.add_points(0, [1., 2.], [1., 2.])
+        # not a ConnectionError, and flush() does not wait forever for the thread
+        with pytest.raises(TypeError):
+            plotter.flush()
+        assert plotter.flush_thread.is_alive()
+        del plotter._send_columns
+        plotter.send_error = None
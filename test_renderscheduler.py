@@ -0,0 +1,37 @@
+import renderscheduler
+import time
+import pytest
+from pytestqt import qtbot
+
+def test_RenderScheduler_redraws_each_dirty_curve_once(qtbot):
+    redrawn_curves = []
+    myScheduler = renderscheduler.RenderScheduler(redrawn_curves.append, max_fps=50)
+    for idx in range(1000):
+        myScheduler.mark_dirty(idx % 3)
+    myScheduler.discard(2)
+    assert redrawn_curves == []
+    qtbot.waitUntil(lambda: myScheduler.num_frames == 1, timeout=1000)
+    assert redrawn_curves == [0, 1]
+
+def test_RenderScheduler_slows_down_when_frames_overrun(qtbot):
+    myScheduler = renderscheduler.RenderScheduler(lambda curvenumber: time.sleep(0.05), max_fps=50)
+    myScheduler.mark_dirty(0)
+    myScheduler.flush()
+    assert myScheduler.current_fps < 50
+    assert myScheduler.set_max_fps(0.1) is False
+    assert myScheduler.set_max_fps(40) is True
+    assert myScheduler.current_fps == 40
+
+def test_RenderScheduler_hold_coalesces_redraws(qtbot):
+    redrawn_curves = []
+    myScheduler = renderscheduler.RenderScheduler(redrawn_curves.append, max_fps=50)
+    myScheduler.hold()
+    myScheduler.mark_dirty(1)
+    myScheduler.flush()
+    qtbot.wait(100)
+    myScheduler.mark_dirty(0)
+    myScheduler.mark_dirty(1)
+    assert redrawn_curves == []
+    myScheduler.release()
+    assert redrawn_curves == [0, 1]
+    assert myScheduler.num_frames == 1
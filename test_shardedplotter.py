@@ -0,0 +1,55 @@
+import headlessplotter
+import plotterclient
+import shardedplotter
+import socketserver
+import threading
+import numpy as np
+import pytest
+
+@pytest.fixture
+def shards():
+    """ Three HeadlessPlotters as the shards, in this process to be able to look into them """
+    shard_plotters = []
+    run_threads = []
+    ports = []
+    for shard_index in range(3):
+        aTCPIPserver = socketserver.TCPIPserver("127.0.0.1", 0)
+        aTCPIPserver.reportedLengthMessage = True
+        # listening already here, so that the client can connect before the listener thread runs
+        aTCPIPserver.serversocket.listen()
+        shard_plotters.append(headlessplotter.HeadlessPlotter(aTCPIPserver))
+        run_threads.append(threading.Thread(target=shard_plotters[-1].run, daemon=True))
+        run_threads[-1].start()
+        ports.append(aTCPIPserver.serversocket.getsockname()[1])
+    yield (shard_plotters, ports)
+    for (shard_plotter, run_thread) in zip(shard_plotters, run_threads):
+        shard_plotter.stop()
+        run_thread.join(timeout=5.)
+
+def test_ShardedPlotter_sends_the_curves_to_their_shards(shards):
+    (shard_plotters, ports) = shards
+    xvals = np.linspace(0., 10., 50)
+    with plotterclient.ShardedPlotter("127.0.0.1", ports) as plotter:
+        for curvenumber in range(7):
+            assert plotter.add_points(curvenumber, xvals, curvenumber*xvals + 1.) is True
+        # the points of a pointList are split between the shards
+        plotter.send_message("addData", {"pointList": [{"curveNumber": curvenumber, "xval": 11., "yval": curvenumber*11. + 1.} for curvenumber in range(7)]})
+        plotter.flush()
+        for curvenumber in [1, 2, 5]:
+            plotter.send_message("doFit", {"fitFunction": "linearfit", "curveNumber": curvenumber, "performFitting": ""})
+        plotter.clear(data = 6)
+        assert plotter.request("getFitResult", {"curveNumber": 5})["result"]["costfunction"] == pytest.approx(0., abs=1e-9)
+        # the fit results of all shards are merged
+        assert list(plotter.fit_results().keys()) == ["curve1", "curve2", "curve5"]
+        assert len(plotter.request_all("getConfig", {"commandQueue": ""})) == 3
+        with pytest.raises(ValueError):
+            plotter.request("getConfig", {"commandQueue": ""})
+    # every shard has only its own curves, with all their points
+    assert shard_plotters[0].curvestore.curve_numbers() == [0, 3]
+    assert shard_plotters[1].curvestore.curve_numbers() == [1, 4]
+    assert shard_plotters[2].curvestore.curve_numbers() == [2, 5]
+    assert all([len(shard_plotters[curvenumber % 3].curvestore[curvenumber]) == 51 for curvenumber in range(6)])
+
+def test_shard_sysargs():
+    assert shardedplotter.shard_sysargs(["shardedplotter.py", "--shards=4", "--port=6000", "--async"], 2, 6000) == \
+        ["shardedplotter.py", "--async", "--port=6002"]
@@ -0,0 +1,101 @@
+import sharedmemoryring
+import numpy as np
+import pytest
+
+@pytest.fixture
+def myRing():
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=100)
+    reader = sharedmemoryring.SharedMemoryRingReader(writer.name)
+    yield (writer, reader)
+    reader.close()
+    writer.close()
+
+def drain_to_list(reader, max_records = None):
+    drained = []
+    reader.drain(lambda columns: drained.append({key: np.array(value) for (key, value) in columns.items()}), max_records)
+    return drained
+
+def test_SharedMemoryRing_write_and_drain(myRing):
+    (writer, reader) = myRing
+    assert writer.write(3, [1., 2.], [10., 20.], [0.1, 0.2]) == 2
+    assert len(reader) == 2
+    drained = drain_to_list(reader)
+    assert len(drained) == 1
+    assert drained[0]["curveNumber"] == 3
+    assert drained[0]["x"].tolist() == [1., 2.]
+    assert drained[0]["y"].tolist() == [10., 20.]
+    assert drained[0]["yerr"].tolist() == [0.1, 0.2]
+    assert len(reader) == 0
+
+def test_SharedMemoryRing_wraps_around(myRing):
+    (writer, reader) = myRing
+    all_xvals = []
+    for idx in range(7):
+        xvals = np.arange(30.) + 30*idx
+        assert writer.write(0, xvals, xvals) == 30
+        all_xvals.extend([value for columns in drain_to_list(reader) for value in columns["x"].tolist()])
+    assert all_xvals == np.arange(210.).tolist()
+
+def test_SharedMemoryRing_full_ring_times_out(myRing):
+    (writer, reader) = myRing
+    assert writer.write(0, np.arange(150.), np.arange(150.), timeout=0.01) == 100
+    assert len(drain_to_list(reader, max_records=40)[0]["x"]) == 40
+    assert writer.write(0, np.arange(50.), np.arange(50.), timeout=0.01) == 40
+
+def test_SharedMemoryRing_groups_curves(myRing):
+    (writer, reader) = myRing
+    writer.write(0, [1., 2.], [1., 2.])
+    writer.write(1, [5.], [5.])
+    writer.write(0, [3.], [3.])
+    drained = {float(columns["curveNumber"]): columns["x"].tolist() for columns in drain_to_list(reader)}
+    assert drained == {0.: [1., 2., 3.], 1.: [5.]}
+
+def test_SharedMemoryRing_reader_finishes_after_writer_closed():
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=10)
+    reader = sharedmemoryring.SharedMemoryRingReader(writer.name)
+    writer.write(0, [1.], [1.])
+    writer.close()
+    assert reader.is_finished is False
+    assert len(drain_to_list(reader)) == 1
+    assert reader.is_finished is True
+    reader.close()
+
+def test_SharedMemoryRing_reader_attaches_after_writer_closed():
+    # register, write and close, before the plotter got to attach to the ring
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=10)
+    writer.write(2, [1., 2.], [3., 4.])
+    writer.close()
+    reader = sharedmemoryring.SharedMemoryRingReader(writer.name)
+    assert drain_to_list(reader)[0]["x"].tolist() == [1., 2.]
+    assert reader.is_finished is True
+    reader.close()
+    # the side that closed last freed the shared memory
+    with pytest.raises(FileNotFoundError):
+        sharedmemoryring.SharedMemoryRingReader(writer.name)
+
+def test_SharedMemoryRing_writer_frees_after_reader_detached():
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=10)
+    reader = sharedmemoryring.SharedMemoryRingReader(writer.name)
+    reader.close()
+    writer.close()
+    with pytest.raises(FileNotFoundError):
+        sharedmemoryring.SharedMemoryRingReader(writer.name)
+
+def test_SharedMemoryRing_points_without_error_bars(myRing):
+    (writer, reader) = myRing
+    writer.write(0, [1., 2.], [1., 2.])
+    assert "yerr" not in drain_to_list(reader)[0]
+    writer.write(0, [3.], [3.])
+    writer.write(0, [4.], [4.], [0.5])
+    assert drain_to_list(reader)[0]["yerr"].tolist() == [0., 0.5]
+
+def test_SharedMemoryRing_both_sides_free_at_the_same_time():
+    writer = sharedmemoryring.SharedMemoryRingWriter(capacity=10)
+    reader = sharedmemoryring.SharedMemoryRingReader(writer.name)
+    # as when both sides close at the same moment and each sees the flag of the other
+    writer.header[sharedmemoryring.IS_CLOSED_POSITION] = 1
+    reader.header[sharedmemoryring.READER_STATE_POSITION] = sharedmemoryring.READER_DETACHED
+    reader.close()
+    writer.close()
+    with pytest.raises(FileNotFoundError):
+        sharedmemoryring.SharedMemoryRingReader(writer.name)
@@ -0,0 +1,231 @@
+import socketserver
+import helperfunctions
+import framing
+import jsoncodec
+import numpy as np
+import json
+import socket
+import threading
+import pytest
+
+class FakeSignal():
+    def __init__(self):
+        self.emitted = []
+    def emit(self, value):
+        self.emitted.append(value)
+
+class FakeWorkerSignals():
+    def __init__(self):
+        self.newdata = FakeSignal()
+        self.newarrays = FakeSignal()
+        self.newcommands = FakeSignal()
+        self.set_client_communication_socket = FakeSignal()
+
+@pytest.fixture
+def myTCPIPserver():
+    aTCPIPserver = socketserver.TCPIPserver("127.0.0.1", 0)
+    yield aTCPIPserver
+    aTCPIPserver.serversocket.close()
+
+def run_parser_on_sent_bytes(aTCPIPserver, send_function):
+    """ Runs clientsocket_parser on one end of a socket pair while send_function writes into the other end """
+    (server_end, client_end) = socket.socketpair()
+    signals = FakeWorkerSignals()
+    sender = threading.Thread(target=send_function, args=(client_end,))
+    sender.start()
+    result = aTCPIPserver.clientsocket_parser(server_end, signals)
+    sender.join()
+    client_end.close()
+    return (result, signals)
+
+def test_TCPIPserver_json_message(myTCPIPserver):
+    def send_function(client_end):
+        helperfunctions.send_TCPIP_message(client_end, "x"*5000, True)
+        client_end.sendall(b"00000000")
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is True
+    assert signals.newdata.emitted == ["x"*5000]
+
+@pytest.mark.parametrize("yerrs",[None, np.linspace(0.1, 0.2, 1000)])
+def test_TCPIPserver_binary_frame(myTCPIPserver, yerrs):
+    xvals = np.arange(1000.)
+    yvals = np.sin(xvals)
+    def send_function(client_end):
+        assert helperfunctions.send_TCPIP_array_frame(client_end, 4, xvals, yvals, yerrs) is True
+        client_end.sendall(b"00000000")
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is True
+    assert len(signals.newarrays.emitted) == 1
+    columns = signals.newarrays.emitted[0]
+    assert columns["curveNumber"] == 4
+    assert np.array_equal(columns["x"], xvals)
+    assert np.array_equal(columns["y"], yvals)
+    if yerrs is None:
+        assert "yerr" not in columns
+    else:
+        assert np.array_equal(columns["yerr"], yerrs)
+
+def test_TCPIPserver_binary_frames_are_split_and_limited(myTCPIPserver, monkeypatch):
+    monkeypatch.setattr(helperfunctions, "MAX_BINARY_FRAME_POINTS", 300)
+    xvals = np.arange(1000.)
+    def send_function(client_end):
+        assert helperfunctions.send_TCPIP_array_frame(client_end, 2, xvals, xvals) is True
+        # a header that asks for more points than a frame may have
+        header_encoded = json.dumps({"curveNumber": 2, "numPoints": 10**12, "hasErrors": True}).encode("utf-8")
+        client_end.sendall("B{:07d}".format(len(header_encoded)).encode("utf-8") + header_encoded)
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is False
+    assert [len(columns["x"]) for columns in signals.newarrays.emitted] == [300, 300, 300, 100]
+    assert np.array_equal(np.concatenate([columns["x"] for columns in signals.newarrays.emitted]), xvals)
+    # the connection is registered once, and reset when it is closed because of the illegal frame
+    assert len(signals.set_client_communication_socket.emitted) == 2
+    assert signals.set_client_communication_socket.emitted[-1] is None
+
+def test_TCPIPserver_partial_reads():
+    aTCPIPserver = socketserver.TCPIPserver("127.0.0.1", 0, buffersize=16)
+    message_bytes = b"00000100" + b"y"*100 + b"00000000"
+    def send_function(client_end):
+        # one byte at a time, so that every recv_into call gets only a part of the message
+        for idx in range(len(message_bytes)):
+            client_end.sendall(message_bytes[idx:idx+1])
+    (result, signals) = run_parser_on_sent_bytes(aTCPIPserver, send_function)
+    aTCPIPserver.serversocket.close()
+    assert result is True
+    assert signals.newdata.emitted == ["y"*100]
+
+def test_TCPIPserver_reuses_receive_buffer(myTCPIPserver):
+    messages = ["z"*10, "ä"*50000, "w"*20]
+    def send_function(client_end):
+        for message in messages:
+            helperfunctions.send_TCPIP_message(client_end, message, True)
+        client_end.sendall(b"00000000")
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert signals.newdata.emitted == messages
+    assert len(myTCPIPserver.receive_buffer) == len(("ä"*50000).encode("utf-8"))
+
+def test_TCPIPserver_connection_closed_in_message(myTCPIPserver):
+    def send_function(client_end):
+        client_end.sendall(b"00001000" + b"x"*10)
+        client_end.shutdown(socket.SHUT_WR)
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is False
+    assert signals.newdata.emitted == []
+    assert signals.set_client_communication_socket.emitted == [None]
+
+def test_TCPIPserver_message_without_preamble(myTCPIPserver):
+    myTCPIPserver.reportedLengthMessage = False
+    def send_function(client_end):
+        client_end.sendall(b"v"*200000)
+        client_end.shutdown(socket.SHUT_WR)
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is True
+    assert signals.newdata.emitted == ["v"*200000]
+
+def test_TCPIPserver_parses_on_the_worker_thread(myTCPIPserver):
+    myTCPIPserver.message_parser = lambda message_string, origin: [("parsed", message_string, hasattr(origin, "sendall"))]
+    def send_function(client_end):
+        helperfunctions.send_TCPIP_message(client_end, "message", True)
+        client_end.sendall(b"00000000")
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert signals.newdata.emitted == []
+    # the connection the message came from is given to the parser, so that the response can go back to it
+    assert signals.newcommands.emitted == [[("parsed", "message", True)]]
+
+def test_TCPIPserver_compressed_message(myTCPIPserver):
+    message = '{"pointList": [' + ", ".join(['{"xval": 1.5, "yval": 2.5}']*2000) + ']}'
+    def send_function(client_end):
+        helperfunctions.send_TCPIP_message(client_end, "short", True, compression_name="zlib")
+        helperfunctions.send_TCPIP_message(client_end, message, True, compression_name="zlib", compression_threshold=1000)
+        client_end.sendall(b"00000000")
+    (server_end, client_end) = socket.socketpair()
+    send_function(client_end)
+    assert server_end.recv(8) == b"00000005"
+    server_end.recv(5)
+    assert server_end.recv(1) == b"Z"
+    server_end.close()
+    client_end.close()
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is True
+    assert signals.newdata.emitted == ["short", message]
+    # the responses to this client are compressed too
+    assert myTCPIPserver.response_compressions[signals.set_client_communication_socket.emitted[0]] == "zlib"
+
+def test_receive_TCPIP_message_compressed_or_not():
+    (server_end, client_end) = socket.socketpair()
+    message = "ä" * 100000
+    helperfunctions.send_TCPIP_message(server_end, message, True, compression_name="zlib")
+    helperfunctions.send_TCPIP_message(server_end, "plain", True, compression_name="zlib")
+    server_end.sendall(b"00000000")
+    assert helperfunctions.receive_TCPIP_message(client_end) == message
+    assert helperfunctions.receive_TCPIP_message(client_end) == "plain"
+    assert helperfunctions.receive_TCPIP_message(client_end) == ""
+    server_end.close()
+    client_end.close()
+
+def test_TCPIPserver_framed_session(myTCPIPserver, monkeypatch):
+    monkeypatch.setattr(framing, "MAX_FRAME_LENGTH", 1000)
+    long_message = "ä" * 2000 # sent in chunks
+    xvals = np.arange(300.)
+    (server_end, client_end) = socket.socketpair()
+    def send_function():
+        assert helperfunctions.negotiate_TCPIP_framing(client_end) == framing.VERSION
+        helperfunctions.send_TCPIP_message(client_end, "short", True, frame_version=1)
+        helperfunctions.send_TCPIP_message(client_end, long_message, True, frame_version=1)
+        helperfunctions.send_TCPIP_message(client_end, "0123456789"*500, True, compression_name="zlib", frame_version=1)
+        assert helperfunctions.send_TCPIP_array_frame(client_end, 3, xvals, 2*xvals, frame_version=1) is True
+        helperfunctions.send_TCPIP_end(client_end, frame_version=1)
+    sender = threading.Thread(target=send_function)
+    sender.start()
+    signals = FakeWorkerSignals()
+    result = myTCPIPserver.clientsocket_parser(server_end, signals)
+    sender.join()
+    client_end.close()
+    assert result is True
+    assert signals.newdata.emitted == ["short", long_message, "0123456789"*500]
+    assert np.array_equal(signals.newarrays.emitted[0]["y"], 2*xvals)
+    assert myTCPIPserver.response_framings[signals.set_client_communication_socket.emitted[0]] == 1
+    assert signals.set_client_communication_socket.emitted[-1] is None
+
+def test_TCPIPserver_illegal_frame(myTCPIPserver):
+    def send_function(client_end):
+        assert helperfunctions.negotiate_TCPIP_framing(client_end) == framing.VERSION
+        client_end.sendall(b"00000011legacy message")
+        assert jsoncodec.loads(helperfunctions.receive_TCPIP_message(client_end, frame_version=1))["error"]["message"] == "Illegal frame"
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is False
+    assert signals.newdata.emitted == []
+
+def test_receive_TCPIP_message_framed():
+    (server_end, client_end) = socket.socketpair()
+    helperfunctions.send_TCPIP_array_frame(server_end, 0, [1.], [2.], frame_version=1)
+    helperfunctions.send_TCPIP_message(server_end, "ä"*10000, True, compression_name="zlib", frame_version=1)
+    helperfunctions.send_TCPIP_end(server_end, frame_version=1)
+    # array frames are skipped
+    assert helperfunctions.receive_TCPIP_message(client_end, frame_version=1) == "ä"*10000
+    assert helperfunctions.receive_TCPIP_message(client_end, frame_version=1) == ""
+    server_end.close()
+    client_end.close()
+
+@pytest.mark.parametrize("frame_version",[None, 1])
+def test_TCPIPserver_streams_large_point_lists(myTCPIPserver, frame_version):
+    myTCPIPserver.STREAMING_MESSAGE_LENGTH = 10000
+    myTCPIPserver.STREAM_CHUNK_SIZE = 4096
+    myTCPIPserver.message_parser = lambda message_string, origin: ("message", jsoncodec.loads(message_string))
+    myTCPIPserver.point_list_parser = lambda point_list, origin: ("points", point_list)
+    point_list = [{"curveNumber": 0, "xval": float(idx), "yval": 1.} for idx in range(1000)]
+    message = json.dumps({"jsonrpc": "2.0", "method": "addData", "id": 12, "params": {"pointList": point_list}})
+    def send_function(client_end):
+        if frame_version is not None:
+            helperfunctions.negotiate_TCPIP_framing(client_end)
+        helperfunctions.send_TCPIP_message(client_end, message, True, frame_version=frame_version)
+        helperfunctions.send_TCPIP_end(client_end, frame_version)
+    (result, signals) = run_parser_on_sent_bytes(myTCPIPserver, send_function)
+    assert result is True
+    emitted_kinds = [kind for (kind, argument) in signals.newcommands.emitted]
+    assert emitted_kinds[-1] == "message"
+    assert emitted_kinds.count("points") > 1
+    # the points came in batches, and the rest of them with the id in the last message
+    (kind, last_message) = signals.newcommands.emitted[-1]
+    assert last_message["id"] == 12
+    streamed_points = [point for (kind, argument) in signals.newcommands.emitted[:-1] for point in argument]
+    assert streamed_points + last_message["params"]["pointList"] == point_list
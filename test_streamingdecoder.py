@@ -0,0 +1,76 @@
+import streamingdecoder
+import json
+import pytest
+
+def make_message(num_points, method = "addData", is_method_first = True):
+    point_list = [{"curveNumber": idx % 3, "xval": idx * 0.5, "yval": -idx, "yerr": 0.1} for idx in range(num_points)]
+    if is_method_first:
+        message_dict = {"jsonrpc": "2.0", "method": method, "id": 7, "params": {"pointList": point_list}}
+    else:
+        message_dict = {"jsonrpc": "2.0", "params": {"pointList": point_list}, "method": method, "id": 7}
+    return (json.dumps(message_dict).encode("utf-8"), point_list)
+
+def feed_in_chunks(decoder, message_bytes, chunk_size):
+    decoded_points = []
+    for start in range(0, len(message_bytes), chunk_size):
+        point_list = decoder.feed(memoryview(message_bytes)[start:start + chunk_size])
+        if point_list is not None:
+            decoded_points.extend(point_list)
+    return decoded_points
+
+@pytest.mark.parametrize("chunk_size",[7, 100, 4096, 10**6])
+def test_PointListStreamDecoder_gives_all_points_once(chunk_size):
+    (message_bytes, point_list) = make_message(2000)
+    decoder = streamingdecoder.PointListStreamDecoder()
+    decoded_points = feed_in_chunks(decoder, message_bytes, chunk_size)
+    rest_message_bytes = decoder.finish()
+    if rest_message_bytes is None:
+        # feed gave all points
+        assert decoded_points == point_list
+    else:
+        rest_message = json.loads(rest_message_bytes)
+        assert decoded_points + rest_message["params"]["pointList"] == point_list
+        assert rest_message["id"] == 7
+        assert rest_message["method"] == "addData"
+    if chunk_size < len(message_bytes):
+        # the points came while the message was being received
+        assert decoder.num_points_decoded > 1000
+
+@pytest.mark.parametrize("method,is_method_first",[("doFit", True), ("addData", False)])
+def test_PointListStreamDecoder_other_messages_are_not_decoded(method, is_method_first):
+    (message_bytes, point_list) = make_message(500, method, is_method_first)
+    decoder = streamingdecoder.PointListStreamDecoder()
+    assert feed_in_chunks(decoder, message_bytes, 100) == []
+    assert decoder.finish() == message_bytes
+
+def test_PointListStreamDecoder_stops_at_points_that_are_not_flat():
+    message_bytes = b'{"jsonrpc": "2.0", "method": "addData", "id": 1, "params": {"pointList": [{"xval": 1}, {"xval": {"a": 1}}, {"xval": 2}]}}'
+    decoder = streamingdecoder.PointListStreamDecoder()
+    decoded_points = feed_in_chunks(decoder, message_bytes, 87)
+    assert decoded_points == [{"xval": 1}]
+    assert json.loads(decoder.finish())["params"]["pointList"] == [{"xval": {"a": 1}}, {"xval": 2}]
+
+def test_PointListStreamDecoder_nothing_is_left_after_the_last_point():
+    (message_bytes, point_list) = make_message(50)
+    # the last chunk is only the end of the message, after the } of the last point
+    split = message_bytes.rindex(b"}]") + 1
+    decoder = streamingdecoder.PointListStreamDecoder()
+    decoded_points = feed_in_chunks(decoder, message_bytes[:split], split)
+    assert decoder.feed(message_bytes[split:]) is None
+    assert decoded_points == point_list
+    assert decoder.finish() is None
+
+@pytest.mark.parametrize("envelope",[
+    '{"jsonrpc": "2.0", "method": "addData", "params": {"pointList": [',
+    '{"jsonrpc": "1.0", "method": "addData", "id": 1, "params": {"pointList": [',
+    '{"jsonrpc": "2.0", "method": "addData", "id": "1", "params": {"pointList": [',
+    '{"jsonrpc": "2.0", "method": "addData", "id": 1, "extra": 0, "params": {"pointList": [',
+    '{"method": "addData", "id": 1, "params": {"pointList": [',
+    '{"jsonrpc": "2.0", "method": "addData", "id": 1, "params": {"dataPoint": {}, "pointList": ['
+    ])
+def test_PointListStreamDecoder_incomplete_envelopes_are_not_decoded(envelope):
+    # the id comes after the points, or the envelope is not a correct request
+    message_bytes = (envelope + ", ".join(['{"xval": 1}']*100) + ']}, "id": 1}').encode("utf-8")
+    decoder = streamingdecoder.PointListStreamDecoder()
+    assert feed_in_chunks(decoder, message_bytes, 100) == []
+    assert decoder.finish() == message_bytes
@@ -0,0 +1,103 @@
+import json
+import socket
+import threading
+import time
+from subscriptions import SubscriptionManager, EVENTS
+
+class SentMessages():
+    """ The send function of the subscribers, which can be made to wait, like a client that does not read """
+    def __init__(self):
+        self.messages = []
+        self.is_sending_allowed = threading.Event()
+        self.is_sending_allowed.set()
+    def send(self, connection, message_string):
+        self.is_sending_allowed.wait()
+        self.messages.append((connection, json.loads(message_string)))
+
+def test_SubscriptionManager_publishes_to_matching_subscribers():
+    sent_messages = SentMessages()
+    manager = SubscriptionManager(sent_messages.send)
+    assert manager.subscribe("all curves", ["curveAppended", "fitCompleted"]) is True
+    assert manager.subscribe("curve 1", ["curveAppended"], [1]) is True
+    assert manager.subscribe("curve 1", ["noSuchEvent"]) is False
+    assert manager.is_watched("curveAppended", 0) is True
+    assert manager.is_watched("curveCleared", 0) is False
+    assert manager.publish("curveAppended", 0, {"curveNumber": 0}) == 1
+    assert manager.publish("curveAppended", 1, {"curveNumber": 1}) == 2
+    assert manager.publish("curveCleared", 1, {"curveNumber": 1}) == 0
+    assert manager.subscription_of("curve 1") == {"curveAppended": [1]}
+    assert manager.unsubscribe("all curves", ["curveAppended"]) is True
+    assert manager.unsubscribe("nobody") is False
+    assert manager.publish("curveAppended", 2, {"curveNumber": 2}) == 0
+    subscribers = list(manager.subscribers.values())
+    manager.close()
+    for subscriber in subscribers:
+        subscriber.sender_thread.join(timeout=5.)
+    assert sorted([(connection, message["params"]["curveNumber"]) for (connection, message) in sent_messages.messages]) == [
+        ("all curves", 0), ("all curves", 1), ("curve 1", 1)]
+    assert all(["id" not in message for (connection, message) in sent_messages.messages])
+
+def test_SubscriptionManager_slow_subscriber_drops_notifications():
+    slow_messages = SentMessages()
+    slow_messages.is_sending_allowed.clear()
+    fast_messages = SentMessages()
+    manager = SubscriptionManager(lambda connection, message_string: (slow_messages if connection == "slow" else fast_messages).send(connection, message_string),
+                                  max_queue_size=5)
+    manager.subscribe("slow", EVENTS)
+    manager.subscribe("fast", EVENTS)
+    # publishing never waits for the slow subscriber, its queue is full after a few notifications
+    for idx in range(20):
+        manager.publish("curveAppended", 0, {"index": idx})
+    slow_subscriber = manager.subscriber_for("slow")
+    fast_subscriber = manager.subscriber_for("fast")
+    slow_subscriber.put_response(json.dumps({"jsonrpc": "2.0", "result": True, "id": 3}))
+    assert slow_subscriber.num_dropped > 0
+    metrics = {metric["numDropped"] > 0: metric for metric in manager.metrics()}
+    # the sender thread may have taken the first notification out of the queue already
+    assert 5 <= metrics[True]["depth"] <= 6
+    slow_messages.is_sending_allowed.set()
+    for _ in range(500):
+        if len(slow_subscriber.queue) == 0:
+            break
+        time.sleep(0.01)
+    manager.publish("curveCleared", 0, {"index": 20})
+    subscribers = list(manager.subscribers.values())
+    manager.close()
+    for subscriber in subscribers:
+        subscriber.sender_thread.join(timeout=5.)
+    fast_indices = [message["params"]["index"] for (connection, message) in fast_messages.messages if "index" in message["params"]]
+    assert fast_indices == sorted(fast_indices)
+    assert len(fast_indices) + fast_subscriber.num_dropped == 21
+    slow_received = [message for (connection, message) in slow_messages.messages]
+    # the response is not dropped, and the number of dropped notifications comes before the next notification
+    assert slow_received[-3]["id"] == 3
+    assert slow_received[-2] == {"jsonrpc": "2.0", "method": "notificationsDropped", "params": {"numDropped": slow_subscriber.num_dropped}}
+    assert slow_received[-1]["params"]["index"] == 20
+    assert len(slow_received) + slow_subscriber.num_dropped == 20 + 1 + 1 + 1
+
+def test_Subscriber_responses_wait_for_space():
+    sent_messages = SentMessages()
+    sent_messages.is_sending_allowed.clear()
+    manager = SubscriptionManager(sent_messages.send, max_queue_size=3)
+    manager.subscribe("slow", EVENTS)
+    subscriber = manager.subscriber_for("slow")
+    # the sender thread takes the first response and waits in send, the next three fill the queue
+    putter = threading.Thread(target=lambda: [subscriber.put_response(json.dumps({"id": idx})) for idx in range(5)])
+    putter.start()
+    putter.join(timeout=0.5)
+    assert putter.is_alive()
+    assert subscriber.num_queued_responses == 3
+    sent_messages.is_sending_allowed.set()
+    putter.join(timeout=5.)
+    manager.close()
+    subscriber.sender_thread.join(timeout=5.)
+    assert [message["id"] for (connection, message) in sent_messages.messages] == [0, 1, 2, 3, 4]
+
+def test_SubscriptionManager_removes_closed_connections():
+    manager = SubscriptionManager(lambda connection, message_string: connection.sendall(message_string.encode()))
+    (server_end, client_end) = socket.socketpair()
+    manager.subscribe(server_end, ["curveCleared"])
+    server_end.close()
+    assert manager.publish("curveCleared", 0, {"curveNumber": 0}) == 0
+    assert manager.subscribers == {}
+    client_end.close()